@@ -1,3 +1,24 @@
 from fastapi import APIRouter
 
+from app.api.v1 import (
+    admin,
+    instrument_category,
+    instrument_expiry_forecast,
+    instrument_record,
+    instrument_storage_rule,
+    instrument_storage_rule_record,
+    location_cabinet,
+    location_room,
+    setting,
+)
+
 router = APIRouter(prefix="/v1")
+router.include_router(location_room.router)
+router.include_router(location_cabinet.router)
+router.include_router(instrument_category.router)
+router.include_router(instrument_record.router)
+router.include_router(instrument_expiry_forecast.router)
+router.include_router(instrument_storage_rule.router)
+router.include_router(instrument_storage_rule_record.router)
+router.include_router(setting.router)
+router.include_router(admin.router)
@@ -0,0 +1,102 @@
+from fastapi import APIRouter, Depends
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.instrument_expiry_bucket import EXPIRY_BUCKET_CRUD
+from app.database import DB
+from app.model.response import Success
+from app.service.cabinet_reservation import RESERVATION_EXPIRY
+from app.service.cabinet_slot import SLOT_MAPS
+from app.service.compression import COMPRESSION_CACHE
+from app.service.expire_recompute import EXPIRE_RECOMPUTE
+from app.service.instrument_expiry import INSTRUMENT_EXPIRY
+from app.service.placement import PLACEMENTS
+from app.service.response_cache import RESPONSE_CACHE
+from app.service.setting_cache import SETTING_CACHE
+from app.service.single_flight import SINGLE_FLIGHT
+from app.service.storage_rule import STORAGE_RULES
+from app.util.id_generator import ID_GENERATOR
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/id-generator", response_model=Success)
+async def get_id_generator_stats() -> Success:
+    """获取 ID 生成器的运行指标（缓冲区深度、补充耗时等）"""
+    return Success(data=[ID_GENERATOR.stats])
+
+
+@router.get("/db-pool", response_model=Success)
+async def get_db_pool_stats() -> Success:
+    """获取主库和从库连接池的运行指标（使用中和空闲的连接数、等待数量、获取连接的等待时间）及从库的复制延迟"""
+    return Success(data=[DB.stats])
+
+
+@router.get("/storage-rules", response_model=Success)
+async def get_storage_rule_stats() -> Success:
+    """获取内存中存储规则索引的统计信息（规则数量、受限的器械类别数量、加载和增量更新次数）"""
+    return Success(data=[STORAGE_RULES.stats])
+
+
+@router.get("/cabinet-reservations", response_model=Success)
+async def get_cabinet_reservation_stats() -> Success:
+    """获取本进程容量预留过期任务的统计信息（等待到期的预留数量、下一次到期的时间、已经过期的数量）"""
+    return Success(data=[RESERVATION_EXPIRY.stats])
+
+
+@router.get("/placements", response_model=Success)
+async def get_placement_stats() -> Success:
+    """获取本进程存储柜剩余容量索引的统计信息（存储柜数量、可用存储柜数量、堆大小、加载和增量更新次数）"""
+    return Success(data=[PLACEMENTS.stats])
+
+
+@router.get("/cabinet-slots", response_model=Success)
+async def get_slot_map_stats() -> Success:
+    """获取本进程存储柜槽位占用位图副本的统计信息（缓存的存储柜数量、从数据库加载的次数）"""
+    return Success(data=[SLOT_MAPS.stats])
+
+
+@router.get("/instrument-expiry", response_model=Success)
+async def get_instrument_expiry_stats() -> Success:
+    """获取本进程器械过期任务的统计信息（是否持有租约、等待到期的器械数量、已经过期的数量等）"""
+    return Success(data=[INSTRUMENT_EXPIRY.stats])
+
+
+@router.get("/expire-recompute", response_model=Success)
+async def get_expire_recompute_stats() -> Success:
+    """获取本进程过期时间重新计算任务的统计信息（是否持有租约、处理的分段和器械数量、吞吐量）"""
+    return Success(data=[EXPIRE_RECOMPUTE.stats])
+
+
+@router.get("/setting-cache", response_model=Success)
+async def get_setting_cache_stats() -> Success:
+    """获取本进程设置项快照的统计信息（快照版本、设置项数量、加载和增量更新次数）"""
+    return Success(data=[SETTING_CACHE.stats])
+
+
+@router.get("/response-cache", response_model=Success)
+async def get_response_cache_stats() -> Success:
+    """获取本进程响应缓存的统计信息（缓存的响应数量和大小、命中率、淘汰和失效次数）"""
+    return Success(data=[RESPONSE_CACHE.stats])
+
+
+@router.get("/compression", response_model=Success)
+async def get_compression_stats() -> Success:
+    """获取本进程响应压缩的统计信息（可用的压缩方式、压缩结果的缓存命中率、压缩比）"""
+    return Success(data=[COMPRESSION_CACHE.stats])
+
+
+@router.get("/single-flight", response_model=Success)
+async def get_single_flight_stats() -> Success:
+    """获取本进程合并相同请求的统计信息（正在执行的请求数量、共享响应的次数、等待超时和出错次数）"""
+    return Success(data=[SINGLE_FLIGHT.stats])
+
+
+@router.post("/expiry-forecast/rebuild", response_model=Success)
+async def rebuild_expiry_forecast(
+    session: AsyncSession = Depends(DB.get_session),
+) -> Success:
+    """根据器械表重新统计过期预测的计数，升级后第一次使用过期预测之前需要调用一次"""
+    buckets = await EXPIRY_BUCKET_CRUD.rebuild(session)
+    await session.commit()
+    return Success(data=[{"buckets": buckets}])
@@ -0,0 +1,207 @@
+from typing import Callable, Optional, Sequence, Type
+
+from datetime import datetime
+
+from fastapi import APIRouter, Body, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.crud.pagination import ListFilter
+from app.database import DB
+from app.database.table import Base
+from app.exception.error_code import resource_not_found
+from app.middleware.conditional_get import none_match, version_etag
+from app.model.base import DataModel, InCreateModel, InUpdateModel
+from app.model.file_format import FileFormat
+from app.model.response import Success
+from app.model.serializer import EnvelopeResponse
+from app.service.export import RowExporter
+from app.util.type.guid import GUID
+
+# 批量操作单次请求最多包含的记录数量
+MAX_BULK_SIZE = 10000
+
+
+def no_filter() -> ListFilter:
+    """列表接口默认不添加过滤条件，按照 ID （创建时间）排序"""
+    return ListFilter()
+
+
+def create_crud_router(
+    *,
+    prefix: str,
+    tags: list[str],
+    resource_name: str,
+    crud: CRUDBase,
+    model: Type[DataModel],
+    create_model: Type[InCreateModel],
+    update_model: Type[InUpdateModel],
+    response_model: Type[Success],
+    list_filter: Callable[..., ListFilter] = no_filter,
+    exportable: bool = False,
+) -> APIRouter:
+    """生成包含通用增删改查接口的路由
+
+    Args:
+        prefix (str): 路由前缀
+        tags (list[str]): 接口文档中的标签
+        resource_name (str): 资源名称，用于异常信息
+        crud (CRUDBase): 资源对应的 CRUD 对象
+        model (Type[DataModel]): 资源的数据模型
+        create_model (Type[InCreateModel]): 创建资源时使用的数据模型
+        update_model (Type[InUpdateModel]): 更新资源时使用的数据模型
+        response_model (Type[Success]): 响应数据模型
+        list_filter (Callable[..., ListFilter], optional): 生成列表过滤条件的依赖. Defaults to no_filter.
+        exportable (bool, optional): 是否添加流式导出接口. Defaults to False.
+
+    Returns:
+        APIRouter: 生成的路由
+    """
+    router = APIRouter(prefix=prefix, tags=tags)
+
+    def respond(
+        rows: Sequence[Base], next_cursor: Optional[str] = None
+    ) -> EnvelopeResponse:
+        # 数据库中的记录写入时已经校验过，读取时不再校验
+        return EnvelopeResponse(response_model.of(model.from_rows(rows), next_cursor))
+
+    def with_etag(response: Response, etag: bytes) -> Response:
+        response.headers["ETag"] = etag.decode()
+        return response
+
+    @router.get("", response_model=response_model)
+    async def list_resources(
+        request: Request,
+        created_after: Optional[datetime] = Query(None, title="创建时间下限（包含）"),
+        created_before: Optional[datetime] = Query(None, title="创建时间上限（包含）"),
+        after: Optional[str] = Query(None, title="分页游标，使用上一页响应中的 next_cursor"),
+        limit: int = Query(100, gt=0, le=1000, title="最多返回的记录数"),
+        filters: ListFilter = Depends(list_filter),
+        session: AsyncSession = Depends(DB.get_read_session),
+    ) -> Response:
+        page = {
+            "list_filter": filters,
+            "after": after,
+            "created_after": created_after,
+            "created_before": created_before,
+            "limit": limit,
+        }
+        # 先只查询 ID 和行版本生成 ETag ，在加载完整记录之前查询，
+        # 两次查询之间记录被修改时 ETag 比响应体旧，只会让下一次请求重新获取
+        versions = await crud.get_page_versions(session, **page)
+        etag = version_etag(model.__name__, limit, *map(tuple, versions))
+        if none_match(request.headers, etag):
+            # 客户端缓存的响应仍然有效，不需要加载和序列化记录
+            return with_etag(Response(status_code=304), etag)
+        rows, next_cursor = await crud.get_page(session, **page)
+        return with_etag(respond(rows, next_cursor), etag)
+
+    if exportable:
+        exporter = RowExporter(crud, model)
+
+        @router.get("/export", response_class=StreamingResponse)
+        async def export_resources(
+            file_format: FileFormat = Query(
+                FileFormat.NDJSON, alias="format", title="导出格式"
+            ),
+            created_after: Optional[datetime] = Query(None, title="创建时间下限（包含）"),
+            created_before: Optional[datetime] = Query(None, title="创建时间上限（包含）"),
+            filters: ListFilter = Depends(list_filter),
+        ) -> StreamingResponse:
+            """流式导出全部记录，数据在读取的同时分批发送"""
+            filename = f"{prefix.strip('/')}.{file_format.value}"
+            return StreamingResponse(
+                exporter.stream(
+                    file_format,
+                    where=filters.where,
+                    created_after=created_after,
+                    created_before=created_before,
+                ),
+                media_type=file_format.media_type,
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+            )
+
+    @router.get("/{guid}", response_model=response_model)
+    async def get_resource(
+        request: Request,
+        guid: GUID,
+        session: AsyncSession = Depends(DB.get_read_session),
+    ) -> Response:
+        version = await crud.get_version(session, guid)
+        if version is None:
+            raise resource_not_found(resource_name)
+        etag = version_etag(model.__name__, guid.guid, version)
+        if none_match(request.headers, etag):
+            # 客户端缓存的响应仍然有效，不需要加载和序列化记录
+            return with_etag(Response(status_code=304), etag)
+        row = await crud.get(session, guid)
+        if row is None:
+            raise resource_not_found(resource_name)
+        return with_etag(respond([row]), etag)
+
+    @router.post("", response_model=response_model)
+    async def create_resource(
+        obj: create_model = Body(...),  # type: ignore
+        session: AsyncSession = Depends(DB.get_session),
+    ) -> EnvelopeResponse:
+        row = await crud.create(session, obj)
+        response = respond([row])
+        await session.commit()
+        return response
+
+    @router.post("/bulk", response_model=response_model)
+    async def create_resources(
+        objs: list[create_model] = Body(..., max_items=MAX_BULK_SIZE),  # type: ignore
+        session: AsyncSession = Depends(DB.get_session),
+    ) -> EnvelopeResponse:
+        rows = await crud.create_multi(session, objs)
+        response = respond(rows)
+        await session.commit()
+        return response
+
+    @router.put("/bulk", response_model=response_model)
+    async def update_resources(
+        objs: dict[GUID, update_model] = Body(...),  # type: ignore
+        session: AsyncSession = Depends(DB.get_session),
+    ) -> EnvelopeResponse:
+        rows = await crud.update_multi(session, objs)
+        response = respond(rows)
+        await session.commit()
+        return response
+
+    @router.put("/{guid}", response_model=response_model)
+    async def update_resource(
+        guid: GUID,
+        obj: update_model = Body(...),  # type: ignore
+        session: AsyncSession = Depends(DB.get_session),
+    ) -> EnvelopeResponse:
+        row = await crud.update(session, guid, obj)
+        if row is None:
+            raise resource_not_found(resource_name)
+        response = respond([row])
+        await session.commit()
+        return response
+
+    @router.delete("/bulk", response_model=response_model)
+    async def delete_resources(
+        guids: list[GUID] = Body(..., max_items=MAX_BULK_SIZE),
+        session: AsyncSession = Depends(DB.get_session),
+    ) -> EnvelopeResponse:
+        rows = await crud.delete_multi(session, guids)
+        response = respond(rows)
+        await session.commit()
+        return response
+
+    @router.delete("/{guid}", response_model=response_model)
+    async def delete_resource(
+        guid: GUID, session: AsyncSession = Depends(DB.get_session)
+    ) -> EnvelopeResponse:
+        row = await crud.delete(session, guid)
+        if row is None:
+            raise resource_not_found(resource_name)
+        response = respond([row])
+        await session.commit()
+        return response
+
+    return router
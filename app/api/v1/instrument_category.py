@@ -0,0 +1,47 @@
+from fastapi import Depends, Query
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.base import create_crud_router
+from app.crud.expire_recompute_job import RECOMPUTE_JOB_CRUD
+from app.crud.instrument_category import CATEGORY_CRUD
+from app.database import DB
+from app.exception.error_code import resource_not_found
+from app.model.expire_recompute_job import (
+    ExpireRecomputeJob,
+    ExpireRecomputeJobInResponse,
+)
+from app.model.instrument_category import (
+    InstrumentCategory,
+    InstrumentCategoryInCreate,
+    InstrumentCategoryInUpdate,
+    InstrumentCategoryInResponse,
+)
+from app.model.serializer import EnvelopeResponse
+from app.util.type.guid import GUID
+
+router = create_crud_router(
+    prefix="/instrument-categories",
+    tags=["instrument_category"],
+    resource_name="Instrument category",
+    crud=CATEGORY_CRUD,
+    model=InstrumentCategory,
+    create_model=InstrumentCategoryInCreate,
+    update_model=InstrumentCategoryInUpdate,
+    response_model=InstrumentCategoryInResponse,
+)
+
+
+@router.get("/{guid}/recompute-jobs", response_model=ExpireRecomputeJobInResponse)
+async def get_recompute_jobs(
+    guid: GUID,
+    limit: int = Query(20, ge=1, le=100, title="最多返回的任务数量"),
+    session: AsyncSession = Depends(DB.get_read_session),
+) -> EnvelopeResponse:
+    """获取修改过期时长后重新计算器械过期时间的任务和进度，最新的任务在最前"""
+    jobs = await RECOMPUTE_JOB_CRUD.get_by_category(session, guid, limit)
+    if not jobs and await CATEGORY_CRUD.get(session, guid) is None:
+        raise resource_not_found("Instrument category")
+    return EnvelopeResponse(
+        ExpireRecomputeJobInResponse.of(ExpireRecomputeJob.from_rows(jobs))
+    )
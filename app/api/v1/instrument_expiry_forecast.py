@@ -0,0 +1,57 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.instrument_expiry_bucket import EXPIRY_BUCKET_CRUD
+from app.database import DB
+from app.exception.error_code import field_invalid
+from app.model.instrument_expiry_forecast import (
+    ExpiryForecast,
+    ExpiryForecastInResponse,
+)
+from app.model.serializer import EnvelopeResponse
+from app.util.type.guid import GUID
+
+# 最长的预测天数和一次请求中最多的天数
+_MAX_DAYS = 366
+_MAX_HORIZONS = 10
+
+router = APIRouter(prefix="/expiry-forecast", tags=["instrument"])
+
+
+@router.get("", response_model=ExpiryForecastInResponse)
+async def get_expiry_forecast(
+    days: list[int] = Query([1, 7, 30], title="预测的天数", description="可以指定多个"),
+    room: Optional[GUID] = Query(None, title="房间"),
+    category: Optional[GUID] = Query(None, title="器械类别"),
+    session: AsyncSession = Depends(DB.get_read_session),
+) -> EnvelopeResponse:
+    """按照房间和器械类别统计未来若干天内过期的器械数量
+
+    结果由按小时增量维护的计数汇总得到，不会扫描器械表。
+    """
+    horizons = sorted(set(days))
+    if (
+        len(horizons) > _MAX_HORIZONS
+        or not 1 <= horizons[0] <= horizons[-1] <= _MAX_DAYS
+    ):
+        raise field_invalid(
+            "days",
+            f"At most {_MAX_HORIZONS} values between 1 and {_MAX_DAYS} are allowed.",
+        )
+
+    rows = await EXPIRY_BUCKET_CRUD.forecast(session, horizons, room, category)
+    return EnvelopeResponse(
+        ExpiryForecastInResponse.of(
+            [
+                ExpiryForecast.construct(
+                    room=GUID(row[0], need_varification=False),
+                    category=GUID(row[1], need_varification=False),
+                    expiring=dict(zip(horizons, row[2:])),
+                )
+                for row in rows
+            ]
+        )
+    )
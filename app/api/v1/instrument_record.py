@@ -0,0 +1,93 @@
+from typing import Optional
+
+from datetime import datetime
+
+from fastapi import Depends, Query, Request
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.base import create_crud_router
+from app.crud.instrument_event import INSTRUMENT_EVENT_CRUD
+from app.crud.instrument_record import INSTRUMENT_CRUD
+from app.crud.pagination import ListFilter
+from app.database import DB
+from app.database.table.instrument_record import InstrumentStatus
+from app.exception.error_code import field_invalid, resource_not_found
+from app.model.file_format import FileFormat
+from app.model.instrument_event import InstrumentEvent, InstrumentEventInResponse
+from app.model.instrument_import import InstrumentImportReportInResponse
+from app.model.instrument_record import (
+    InstrumentRecord,
+    InstrumentRecordInCreate,
+    InstrumentRecordInUpdate,
+    InstrumentRecordInResponse,
+)
+from app.model.serializer import EnvelopeResponse
+from app.service.instrument_import import InstrumentImporter, guess_format
+from app.util.type.guid import GUID
+
+
+def instrument_filter(
+    cabinet: Optional[GUID] = Query(None, title="所在存储柜"),
+    category: Optional[GUID] = Query(None, title="器械类别"),
+    expire_after: Optional[datetime] = Query(None, title="过期时间下限（包含）"),
+    expire_before: Optional[datetime] = Query(None, title="过期时间上限（包含）"),
+    status: Optional[InstrumentStatus] = Query(None, title="器械状态"),
+) -> ListFilter:
+    """器械列表的过滤条件，设置了过期时间范围时按照过期时间排序"""
+    return INSTRUMENT_CRUD.list_filter(
+        cabinet, category, expire_after, expire_before, status
+    )
+
+
+router = create_crud_router(
+    prefix="/instruments",
+    tags=["instrument"],
+    resource_name="Instrument",
+    crud=INSTRUMENT_CRUD,
+    model=InstrumentRecord,
+    create_model=InstrumentRecordInCreate,
+    update_model=InstrumentRecordInUpdate,
+    response_model=InstrumentRecordInResponse,
+    list_filter=instrument_filter,
+    exportable=True,
+)
+
+
+@router.post("/import", response_model=InstrumentImportReportInResponse)
+async def import_instruments(
+    request: Request,
+    file_format: Optional[FileFormat] = Query(
+        None, alias="format", title="数据格式，默认根据 Content-Type 推断"
+    ),
+    offset: int = Query(0, ge=0, title="跳过的记录数，用于继续中断的导入"),
+    chunk_size: Optional[int] = Query(None, gt=0, le=50000, title="每批的记录数"),
+) -> InstrumentImportReportInResponse:
+    """批量导入器械记录
+
+    请求体为 CSV （需要表头）或 NDJSON 格式的数据，可以使用 gzip 压缩。
+    数据会分批校验并写入，返回每批的导入结果和继续导入时使用的偏移量。
+    """
+    if file_format is None:
+        file_format = guess_format(request.headers.get("content-type", ""))
+    if file_format is None:
+        raise field_invalid("format", "Expect csv or ndjson.")
+
+    importer = InstrumentImporter(chunk_size=chunk_size)
+    report = await importer.run(request.stream(), file_format, offset)
+    return InstrumentImportReportInResponse(data=[report])
+
+
+@router.get("/{guid}/events", response_model=InstrumentEventInResponse)
+async def get_instrument_events(
+    guid: GUID,
+    limit: int = Query(100, ge=1, le=1000, title="最多返回的事件数量"),
+    session: AsyncSession = Depends(DB.get_read_session),
+) -> EnvelopeResponse:
+    """获取器械最近的生命周期事件，按照发生顺序排列"""
+    events = await INSTRUMENT_EVENT_CRUD.get_by_instrument(session, guid, limit)
+    if not events and await INSTRUMENT_CRUD.get(session, guid) is None:
+        raise resource_not_found("Instrument")
+    return EnvelopeResponse(
+        InstrumentEventInResponse.of(InstrumentEvent.from_rows(events))
+    )
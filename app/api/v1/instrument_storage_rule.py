@@ -0,0 +1,66 @@
+from typing import Optional
+
+from fastapi import Body, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.base import MAX_BULK_SIZE, create_crud_router
+from app.crud.instrument_storage_rule import STORAGE_RULE_CRUD
+from app.database import DB
+from app.model.instrument_storge_rule import (
+    PlacementCheck,
+    PlacementCheckInResponse,
+    PlacementQuery,
+    RuleSimulation,
+    RuleViolationInResponse,
+    StorageRule,
+    StorageRuleInCreate,
+    StorageRuleInUpdate,
+    StorageRuleInResponse,
+)
+from app.model.serializer import EnvelopeResponse
+from app.service.rule_simulation import simulate_rule
+from app.service.storage_rule import STORAGE_RULES
+
+router = create_crud_router(
+    prefix="/storage-rules",
+    tags=["storage_rule"],
+    resource_name="Storage rule",
+    crud=STORAGE_RULE_CRUD,
+    model=StorageRule,
+    create_model=StorageRuleInCreate,
+    update_model=StorageRuleInUpdate,
+    response_model=StorageRuleInResponse,
+)
+
+
+@router.post("/check", response_model=PlacementCheckInResponse)
+async def check_placements(
+    queries: list[PlacementQuery] = Body(..., max_items=MAX_BULK_SIZE),
+    session: AsyncSession = Depends(DB.get_session),
+) -> EnvelopeResponse:
+    """批量检查器械类别能否存放在存储柜中，使用内存中编译好的存储规则"""
+    await STORAGE_RULES.refresh(session)
+    allowed = STORAGE_RULES.may_store_many(
+        (query.instrument_category.guid, query.cabinet.guid) for query in queries
+    )
+    return EnvelopeResponse(
+        PlacementCheckInResponse.of(
+            [
+                PlacementCheck.construct(**query.__dict__, allowed=result)
+                for query, result in zip(queries, allowed)
+            ]
+        )
+    )
+
+
+@router.post("/simulate", response_model=RuleViolationInResponse)
+async def simulate_storage_rule(
+    rule: RuleSimulation = Body(...),
+    max_per_cabinet: Optional[int] = Query(
+        None, ge=0, title="每个存储柜最多返回的器械数量", description="为空时返回全部违反规则的器械"
+    ),
+    session: AsyncSession = Depends(DB.get_read_session),
+) -> EnvelopeResponse:
+    """检查现有的器械中哪些会违反提交的存储规则（只检查这一条规则），按照存储柜分组返回，不会修改任何数据"""
+    violations = await simulate_rule(session, rule, max_per_cabinet)
+    return EnvelopeResponse(RuleViolationInResponse.of(violations))
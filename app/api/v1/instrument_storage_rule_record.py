@@ -0,0 +1,20 @@
+from app.api.v1.base import create_crud_router
+from app.crud.instrument_storage_rule_record import RULE_RECORD_CRUD
+from app.model.instrument_storage_rule_record import (
+    StorageRuleRecord,
+    StorageRuleRecordInCreate,
+    StorageRuleRecordInUpdate,
+    StorageRuleRecordInResponse,
+)
+
+router = create_crud_router(
+    prefix="/storage-rule-records",
+    tags=["storage_rule_record"],
+    resource_name="Storage rule record",
+    crud=RULE_RECORD_CRUD,
+    model=StorageRuleRecord,
+    create_model=StorageRuleRecordInCreate,
+    update_model=StorageRuleRecordInUpdate,
+    response_model=StorageRuleRecordInResponse,
+    exportable=True,
+)
@@ -0,0 +1,239 @@
+from fastapi import Body, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.base import MAX_BULK_SIZE, create_crud_router
+from app.crud.location_cabinet import CABINET_CRUD
+from app.crud.location_cabinet_reservation import RESERVATION_CRUD
+from app.crud.location_cabinet_slot import SLOT_CRUD
+from app.database import DB
+from app.database.table.location_cabinet_reservation import ReservationStatus
+from app.exception.error_code import (
+    capacity_exceeded,
+    reservation_closed,
+    resource_not_found,
+)
+from app.model.location_cabinet import (
+    Cabinet,
+    CabinetInCreate,
+    CabinetInUpdate,
+    CabinetInResponse,
+    CabinetSlots,
+    CabinetSlotsInResponse,
+    PlacementRecommendation,
+    PlacementRecommendationInResponse,
+    PlacementRequest,
+)
+from app.model.location_cabinet_reservation import (
+    CabinetReservation,
+    CabinetReservationInResponse,
+    ReservationInCreate,
+)
+from app.model.serializer import EnvelopeResponse
+from app.service.cabinet_reservation import RESERVATION_EXPIRY
+from app.service.placement import PLACEMENTS
+from app.service.storage_rule import STORAGE_RULES
+from app.util.env import SETTINGS
+from app.util.type.guid import GUID
+
+router = create_crud_router(
+    prefix="/cabinets",
+    tags=["cabinet"],
+    resource_name="Cabinet",
+    crud=CABINET_CRUD,
+    model=Cabinet,
+    create_model=CabinetInCreate,
+    update_model=CabinetInUpdate,
+    response_model=CabinetInResponse,
+    exportable=True,
+)
+
+
+@router.post("/recommendations", response_model=PlacementRecommendationInResponse)
+async def recommend_placements(
+    requests: list[PlacementRequest] = Body(..., max_items=MAX_BULK_SIZE),
+    session: AsyncSession = Depends(DB.get_read_session),
+) -> EnvelopeResponse:
+    """为一批器械推荐存放的存储柜，使用内存中的存储规则和剩余容量索引，不会占用容量"""
+    await STORAGE_RULES.refresh(session)
+    await PLACEMENTS.refresh(session)
+    cabinets = PLACEMENTS.recommend(
+        [
+            (
+                request.instrument_category.guid,
+                None if request.preferred_room is None else request.preferred_room.guid,
+            )
+            for request in requests
+        ]
+    )
+    return EnvelopeResponse(
+        PlacementRecommendationInResponse.of(
+            [
+                PlacementRecommendation.construct(
+                    **request.__dict__,
+                    cabinet=(
+                        None
+                        if cabinet is None
+                        else GUID(cabinet, need_varification=False)
+                    ),
+                )
+                for request, cabinet in zip(requests, cabinets)
+            ]
+        )
+    )
+
+
+@router.put("/{guid}/counter-shards", response_model=CabinetInResponse)
+async def set_cabinet_counter_shards(
+    guid: GUID,
+    shards: int = Query(
+        ...,
+        ge=0,
+        le=SETTINGS.cabinet_capacity.max_counter_shards,
+        title="容量分片数量",
+        description="为 0 时关闭分片。存取频繁的存储柜开启分片后，并发存取只会锁定其中一个分片，当前容量由后台任务定期汇总",
+    ),
+    session: AsyncSession = Depends(DB.get_session),
+) -> EnvelopeResponse:
+    """修改存储柜的容量分片数量"""
+    cabinet = await CABINET_CRUD.set_counter_shards(session, guid, shards)
+    if cabinet is None:
+        raise resource_not_found("Cabinet")
+    response = EnvelopeResponse(CabinetInResponse.of(Cabinet.from_rows([cabinet])))
+    await session.commit()
+    return response
+
+
+@router.put("/{guid}/slots", response_model=CabinetInResponse)
+async def set_cabinet_slot_count(
+    guid: GUID,
+    slot_count: int = Query(
+        ...,
+        ge=0,
+        le=SETTINGS.cabinet_slot.max_slots,
+        title="槽位数量",
+        description="为 0 时不再记录器械占用的槽位。减少槽位数量时，被移除的槽位必须都是空闲的；已经存放的器械不会自动分配槽位",
+    ),
+    session: AsyncSession = Depends(DB.get_session),
+) -> EnvelopeResponse:
+    """修改存储柜的槽位数量"""
+    cabinet = await SLOT_CRUD.set_slot_count(session, guid, slot_count)
+    if cabinet is None:
+        raise resource_not_found("Cabinet")
+    response = EnvelopeResponse(CabinetInResponse.of(Cabinet.from_rows([cabinet])))
+    await session.commit()
+    return response
+
+
+@router.get("/{guid}/slots", response_model=CabinetSlotsInResponse)
+async def find_free_slots(
+    guid: GUID,
+    count: int = Query(1, ge=1, title="查找的空闲槽位数量"),
+    contiguous: bool = Query(False, title="是否查找连续的空闲槽位", description="用于占用多个槽位的托盘"),
+    session: AsyncSession = Depends(DB.get_read_session),
+) -> EnvelopeResponse:
+    """使用内存中的槽位占用位图查找存储柜中的空闲槽位，不会占用槽位"""
+    layout = await SLOT_CRUD.layout(session, guid.guid)
+    if layout is None:
+        if await CABINET_CRUD.get(session, guid) is None:
+            raise resource_not_found("Cabinet")
+        slots = CabinetSlots.construct(
+            cabinet=guid, slot_count=0, free_count=0, free_slots=[]
+        )
+    else:
+        if contiguous:
+            start = layout.first_run(count)
+            free_slots = [] if start is None else list(range(start, start + count))
+        else:
+            free_slots = layout.first_free(count)
+        slots = CabinetSlots.construct(
+            cabinet=guid,
+            slot_count=layout.slot_count,
+            free_count=layout.free_count,
+            free_slots=free_slots,
+        )
+    return EnvelopeResponse(CabinetSlotsInResponse.of([slots]))
+
+
+@router.post("/{guid}/reservations", response_model=CabinetReservationInResponse)
+async def reserve_cabinet_slots(
+    guid: GUID,
+    reservation: ReservationInCreate = Body(...),
+    session: AsyncSession = Depends(DB.get_session),
+) -> EnvelopeResponse:
+    """预留存储柜的容量，预留的容量立即计入当前容量，到期之前没有确认或释放时自动归还"""
+    if await CABINET_CRUD.get(session, guid) is None:
+        raise resource_not_found("Cabinet")
+    ttl: float = reservation.ttl or SETTINGS.reservation.default_ttl  # type: ignore
+    created = await RESERVATION_CRUD.reserve(session, guid, reservation.slots, ttl)
+    if created is None:
+        raise capacity_exceeded(guid.guid)
+
+    reservation_id: int = created.id  # type: ignore
+    response = EnvelopeResponse(
+        CabinetReservationInResponse.of(CabinetReservation.from_rows([created]))
+    )
+    await session.commit()
+    RESERVATION_EXPIRY.schedule(reservation_id, ttl)
+    return response
+
+
+@router.get("/reservations/{guid}", response_model=CabinetReservationInResponse)
+async def get_cabinet_reservation(
+    guid: GUID,
+    session: AsyncSession = Depends(DB.get_session),
+) -> EnvelopeResponse:
+    """获取一条容量预留"""
+    reservation = await RESERVATION_CRUD.get(session, guid)
+    if reservation is None:
+        raise resource_not_found("Reservation")
+    return EnvelopeResponse(
+        CabinetReservationInResponse.of(CabinetReservation.from_rows([reservation]))
+    )
+
+
+@router.post(
+    "/reservations/{guid}/confirm", response_model=CabinetReservationInResponse
+)
+async def confirm_cabinet_reservation(
+    guid: GUID,
+    session: AsyncSession = Depends(DB.get_session),
+) -> EnvelopeResponse:
+    """确认未到期的容量预留，预留的容量转为已占用的容量"""
+    reservation = await RESERVATION_CRUD.confirm(session, guid)
+    if reservation is None:
+        raise await _reservation_closed(session, guid)
+    response = EnvelopeResponse(
+        CabinetReservationInResponse.of(CabinetReservation.from_rows([reservation]))
+    )
+    await session.commit()
+    RESERVATION_EXPIRY.cancel(guid.guid)
+    return response
+
+
+@router.post(
+    "/reservations/{guid}/release", response_model=CabinetReservationInResponse
+)
+async def release_cabinet_reservation(
+    guid: GUID,
+    session: AsyncSession = Depends(DB.get_session),
+) -> EnvelopeResponse:
+    """释放容量预留，并将预留的容量归还到存储柜"""
+    reservation = await RESERVATION_CRUD.release(session, guid)
+    if reservation is None:
+        raise await _reservation_closed(session, guid)
+    response = EnvelopeResponse(
+        CabinetReservationInResponse.of(CabinetReservation.from_rows([reservation]))
+    )
+    await session.commit()
+    RESERVATION_EXPIRY.cancel(guid.guid)
+    return response
+
+
+async def _reservation_closed(session: AsyncSession, guid: GUID) -> HTTPException:
+    reservation = await RESERVATION_CRUD.get(session, guid)
+    if reservation is None:
+        return resource_not_found("Reservation")
+    # 状态仍然是 ACTIVE 说明已经到期，只是还没有被后台任务标记为过期
+    status: ReservationStatus = reservation.status  # type: ignore
+    state = "expired" if status is ReservationStatus.ACTIVE else status.name.lower()
+    return reservation_closed(guid.guid, state)
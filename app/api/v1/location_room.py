@@ -0,0 +1,19 @@
+from app.api.v1.base import create_crud_router
+from app.crud.location_room import ROOM_CRUD
+from app.model.location_room import (
+    Room,
+    RoomInCreate,
+    RoomInUpdate,
+    RoomInResponse,
+)
+
+router = create_crud_router(
+    prefix="/rooms",
+    tags=["room"],
+    resource_name="Room",
+    crud=ROOM_CRUD,
+    model=Room,
+    create_model=RoomInCreate,
+    update_model=RoomInUpdate,
+    response_model=RoomInResponse,
+)
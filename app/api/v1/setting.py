@@ -0,0 +1,19 @@
+from app.api.v1.base import create_crud_router
+from app.crud.setting import SETTING_CRUD
+from app.model.setting import (
+    Setting,
+    SettingInCreate,
+    SettingInUpdate,
+    SettingInResponse,
+)
+
+router = create_crud_router(
+    prefix="/settings",
+    tags=["setting"],
+    resource_name="Setting",
+    crud=SETTING_CRUD,
+    model=Setting,
+    create_model=SettingInCreate,
+    update_model=SettingInUpdate,
+    response_model=SettingInResponse,
+)
@@ -0,0 +1,535 @@
+from typing import (
+    Any,
+    AsyncIterator,
+    Generic,
+    Iterable,
+    Mapping,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+)
+
+from enum import Enum
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    ColumnElement,
+    Enum as SQLAlchemyEnum,
+    Row,
+    Text,
+    any_,
+    bindparam,
+    cast,
+    column,
+    delete,
+    insert,
+    literal_column,
+    select,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.filter import created_between
+from app.crud.pagination import ListFilter, decode_cursor, encode_cursor
+from app.database.table import Base
+from app.util.type.guid import GUID
+
+_TableT = TypeVar("_TableT", bound=Base)
+
+# PostgreSQL 单条语句最多能使用的绑定参数数量
+MAX_BIND_PARAMS = 32767
+
+# 由数据库维护的列，创建时值为空则使用数据库的默认值
+_SERVER_MANAGED_COLUMNS = ("created_at", "updated_at")
+
+# PostgreSQL 的系统列 xmin ，记录每次更新（包括没有写入 updated_at 的批量更新）都会改变
+ROW_VERSION = cast(literal_column("xmin"), Text)
+
+
+def guid_value(guid: GUID | int) -> int:
+    """获取 GUID 的数值
+
+    Args:
+        guid (GUID | int): GUID 对象或数值
+
+    Returns:
+        int: GUID 数值
+    """
+    return guid.guid if isinstance(guid, GUID) else guid
+
+
+class CRUDBase(Generic[_TableT]):
+    """通用的异步 CRUD 操作
+
+    批量操作都会合并为尽量少的 SQL 语句：
+
+        - 批量创建： INSERT ... VALUES (...), (...) RETURNING
+        - 批量更新： UPDATE ... FROM (VALUES ...) RETURNING
+        - 批量删除： DELETE ... WHERE id = ANY(...) RETURNING
+
+    所有操作都不会提交事务，需要由调用者在完成全部操作后提交。
+    每次写入之后都会调用 after_write ，子类可以用来维护依赖数据表内容的缓存。
+    """
+
+    table: Type[_TableT]
+
+    def __init__(self, table: Type[_TableT]):
+        """初始化 CRUD 对象
+
+        Args:
+            table (Type[_TableT]): 操作的数据表
+        """
+        self.table = table
+        self._columns: dict[str, Column] = {
+            table_column.key: table_column
+            for table_column in table.__table__.columns  # type: ignore
+        }
+
+    def to_row(
+        self, obj: BaseModel | Mapping[str, Any], for_update: bool = False
+    ) -> dict[str, Any]:
+        """将数据模型转换为数据表中的一行
+
+        会丢弃表中不存在的字段，并将 GUID 、枚举值等转换为数据表能接受的类型。
+
+        Args:
+            obj (BaseModel | Mapping[str, Any]): 数据模型或字典
+            for_update (bool, optional): 是否用于更新，更新时会保留值为空的字段. Defaults to False.
+
+        Returns:
+            dict[str, Any]: 数据表中的一行
+        """
+        data = obj.dict() if isinstance(obj, BaseModel) else obj
+
+        row: dict[str, Any] = {}
+        for key, value in data.items():
+            table_column = self._columns.get(key)
+            if table_column is None:
+                continue
+            if value is None and not for_update:
+                if key in _SERVER_MANAGED_COLUMNS or table_column.default is not None:
+                    continue
+            row[key] = self._to_column_value(table_column, value)
+        return row
+
+    @staticmethod
+    def _to_column_value(table_column: Column, value: Any) -> Any:
+        if value is None:
+            return None
+        if isinstance(value, GUID):
+            return value.guid
+        if isinstance(table_column.type, SQLAlchemyEnum):
+            enum_class = table_column.type.enum_class
+            if enum_class is not None and not isinstance(value, Enum):
+                return enum_class(value)
+            return value
+        if isinstance(value, str) and type(value) is not str:
+            return str(value)  # pydantic 中的 HttpUrl 等字符串子类
+        return value
+
+    def after_write(
+        self, session: AsyncSession, rows: Sequence[_TableT], deleted: bool
+    ) -> None:
+        """写入（创建、更新或删除）记录之后调用，默认不做任何处理
+
+        调用时事务还没有提交，需要在提交之后才生效的操作使用 app.database.after_commit.on_commit 。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            rows (Sequence[_TableT]): 写入后的记录（删除时为被删除的记录）
+            deleted (bool): 是否为删除
+        """
+
+    def _chunk_size(self, params_per_row: int) -> int:
+        return max(MAX_BIND_PARAMS // max(params_per_row, 1), 1)
+
+    @staticmethod
+    def _group_by_keys(
+        rows: Iterable[dict[str, Any]]
+    ) -> dict[tuple[str, ...], list[dict[str, Any]]]:
+        groups: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        return groups
+
+    async def get(self, session: AsyncSession, guid: GUID | int) -> Optional[_TableT]:
+        """获取一条记录
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guid (GUID | int): 记录 ID
+
+        Returns:
+            Optional[_TableT]: 记录，不存在时返回 None
+        """
+        return await session.get(self.table, guid_value(guid))
+
+    async def get_multi_by_ids(
+        self, session: AsyncSession, guids: Iterable[GUID | int]
+    ) -> Sequence[_TableT]:
+        """按照 ID 获取多条记录
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guids (Iterable[GUID | int]): 记录 ID
+
+        Returns:
+            Sequence[_TableT]: 存在的记录，按照 ID 排序
+        """
+        ids = [guid_value(guid) for guid in guids]
+        if not ids:
+            return []
+
+        result = await session.scalars(
+            select(self.table)
+            .where(self.table.id == any_(self._id_array(ids)))
+            .order_by(self.table.id)
+        )
+        return result.all()
+
+    async def get_page(
+        self,
+        session: AsyncSession,
+        *,
+        list_filter: ListFilter = ListFilter(),
+        after: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> tuple[Sequence[_TableT], Optional[str]]:
+        """使用游标分页获取多条记录
+
+        从上一页最后一条记录之后开始查询（ keyset 分页），不会扫描之前的记录，
+        任意一页的查询代价都相同。创建时间的过滤条件会转换为主键的范围条件。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            list_filter (ListFilter, optional): 过滤条件和排序方式. Defaults to ListFilter().
+            after (Optional[str], optional): 上一页返回的游标. Defaults to None.
+            created_after (Optional[datetime], optional): 创建时间下限（包含）. Defaults to None.
+            created_before (Optional[datetime], optional): 创建时间上限（包含）. Defaults to None.
+            limit (int, optional): 最多返回的记录数. Defaults to 100.
+
+        Raises:
+            HTTPException: 游标不合法时抛出异常
+
+        Returns:
+            tuple[Sequence[_TableT], Optional[str]]: 记录和下一页的游标（没有下一页时为 None ）
+        """
+        keys, conditions = self._page_conditions(
+            list_filter, after, created_after, created_before
+        )
+        result = await session.scalars(
+            select(self.table).where(*conditions).order_by(*keys).limit(limit)
+        )
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_cursor(
+                keys, [getattr(rows[-1], key.key) for key in keys]
+            )
+        return rows, next_cursor
+
+    async def get_page_versions(
+        self,
+        session: AsyncSession,
+        *,
+        list_filter: ListFilter = ListFilter(),
+        after: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> Sequence[Row[tuple[int, str]]]:
+        """获取与 get_page 相同的一页记录的 ID 和行版本
+
+        只查询两列，用于在加载和序列化完整记录之前生成 ETag 。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            list_filter (ListFilter, optional): 过滤条件和排序方式. Defaults to ListFilter().
+            after (Optional[str], optional): 上一页返回的游标. Defaults to None.
+            created_after (Optional[datetime], optional): 创建时间下限（包含）. Defaults to None.
+            created_before (Optional[datetime], optional): 创建时间上限（包含）. Defaults to None.
+            limit (int, optional): 最多返回的记录数. Defaults to 100.
+
+        Raises:
+            HTTPException: 游标不合法时抛出异常
+
+        Returns:
+            Sequence[Row[tuple[int, str]]]: 按照分页顺序排列的记录 ID 和行版本
+        """
+        keys, conditions = self._page_conditions(
+            list_filter, after, created_after, created_before
+        )
+        result = await session.execute(
+            select(self.table.id, ROW_VERSION)
+            .where(*conditions)
+            .order_by(*keys)
+            .limit(limit)
+        )
+        return result.all()
+
+    async def get_version(
+        self, session: AsyncSession, guid: GUID | int
+    ) -> Optional[str]:
+        """获取一条记录的行版本
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guid (GUID | int): 记录 ID
+
+        Returns:
+            Optional[str]: 行版本，记录不存在时返回 None
+        """
+        return await session.scalar(
+            select(ROW_VERSION)
+            .select_from(self.table)
+            .where(self.table.id == guid_value(guid))
+        )
+
+    def _page_conditions(
+        self,
+        list_filter: ListFilter,
+        after: Optional[str],
+        created_after: Optional[datetime],
+        created_before: Optional[datetime],
+    ) -> tuple[tuple[ColumnElement[Any], ...], list[ColumnElement[bool]]]:
+        keys = (*list_filter.order_by, self.table.id)
+
+        conditions = [
+            *list_filter.where,
+            *created_between(self.table.id, created_after, created_before),
+        ]
+        if after is not None:
+            cursor_values = decode_cursor(after, keys)
+            conditions.append(
+                self.table.id > cursor_values[0]
+                if len(keys) == 1
+                else tuple_(*keys) > tuple_(*cursor_values)
+            )
+        return keys, conditions
+
+    async def stream(
+        self,
+        session: AsyncSession,
+        columns: Sequence[ColumnElement[Any]],
+        *,
+        where: Sequence[ColumnElement[bool]] = (),
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """使用服务端游标分批读取记录，内存占用与总记录数无关
+
+        只查询需要的列，不会创建 ORM 对象。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            columns (Sequence[ColumnElement[Any]]): 查询的列
+            where (Sequence[ColumnElement[bool]], optional): 额外的过滤条件. Defaults to ().
+            created_after (Optional[datetime], optional): 创建时间下限（包含）. Defaults to None.
+            created_before (Optional[datetime], optional): 创建时间上限（包含）. Defaults to None.
+            batch_size (int, optional): 每批读取的记录数. Defaults to 1000.
+
+        Yields:
+            Sequence[Row]: 一批记录，按照 ID （创建时间）排序
+        """
+        result = await session.stream(
+            select(*columns)
+            .where(
+                *where,
+                *created_between(self.table.id, created_after, created_before),
+            )
+            .order_by(self.table.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+    async def create(
+        self, session: AsyncSession, obj: BaseModel | Mapping[str, Any]
+    ) -> _TableT:
+        """创建一条记录
+
+        Args:
+            session (AsyncSession): 数据库会话
+            obj (BaseModel | Mapping[str, Any]): 要创建的记录
+
+        Returns:
+            _TableT: 创建完成的记录
+        """
+        [created] = await self.create_multi(session, [obj])
+        return created
+
+    async def create_multi(
+        self, session: AsyncSession, objs: Sequence[BaseModel | Mapping[str, Any]]
+    ) -> list[_TableT]:
+        """批量创建记录，使用一条多行的 INSERT ... RETURNING 语句
+
+        行数超过单条语句的参数上限时才会拆分为多条语句。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            objs (Sequence[BaseModel | Mapping[str, Any]]): 要创建的记录
+
+        Returns:
+            list[_TableT]: 创建完成的记录
+        """
+        created: list[_TableT] = []
+
+        rows = [self.to_row(obj) for obj in objs]
+        for keys, group in self._group_by_keys(rows).items():
+            chunk_size = self._chunk_size(len(keys))
+            for start in range(0, len(group), chunk_size):
+                result = await session.scalars(
+                    insert(self.table)
+                    .values(group[start : start + chunk_size])
+                    .returning(self.table)
+                )
+                created.extend(result.all())
+        self.after_write(session, created, deleted=False)
+        return created
+
+    async def update(
+        self,
+        session: AsyncSession,
+        guid: GUID | int,
+        obj: BaseModel | Mapping[str, Any],
+    ) -> Optional[_TableT]:
+        """更新一条记录
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guid (GUID | int): 记录 ID
+            obj (BaseModel | Mapping[str, Any]): 要更新的字段
+
+        Returns:
+            Optional[_TableT]: 更新后的记录，不存在时返回 None
+        """
+        row = self.to_row(obj, for_update=True)
+        row.pop("id", None)
+        if not row:
+            return await self.get(session, guid)
+
+        result = await session.scalars(
+            update(self.table)
+            .where(self.table.id == guid_value(guid))
+            .values(row)
+            .returning(self.table)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        updated = result.one_or_none()
+        if updated is not None:
+            self.after_write(session, [updated], deleted=False)
+        return updated
+
+    async def update_multi(
+        self,
+        session: AsyncSession,
+        objs: Mapping[GUID | int, BaseModel | Mapping[str, Any]],
+    ) -> list[_TableT]:
+        """批量更新记录，使用 UPDATE ... FROM (VALUES ...) RETURNING 语句
+
+        更新字段相同的记录会合并到同一条语句中。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            objs (Mapping[GUID | int, BaseModel | Mapping[str, Any]]): 记录 ID 和要更新的字段
+
+        Returns:
+            list[_TableT]: 更新后的记录（不存在的记录会被忽略）
+        """
+        rows = []
+        for guid, obj in objs.items():
+            row = self.to_row(obj, for_update=True)
+            row.pop("id", None)
+            if row:
+                rows.append({**row, "id": guid_value(guid)})
+
+        updated: list[_TableT] = []
+        for keys, group in self._group_by_keys(rows).items():
+            fields = [key for key in keys if key != "id"]
+            value_table = values(
+                column("id", BigInteger),
+                *(column(key, self._columns[key].type) for key in fields),
+                name="update_values",
+            )
+
+            chunk_size = self._chunk_size(len(keys))
+            for start in range(0, len(group), chunk_size):
+                chunk = group[start : start + chunk_size]
+                data = value_table.data(
+                    [(row["id"], *(row[key] for key in fields)) for row in chunk]
+                )
+                result = await session.scalars(
+                    update(self.table)
+                    .where(self.table.id == data.c.id)
+                    .values(
+                        {
+                            key: cast(data.c[key], self._columns[key].type)
+                            for key in fields
+                        }
+                    )
+                    .returning(self.table)
+                    .execution_options(
+                        synchronize_session=False, populate_existing=True
+                    )
+                )
+                updated.extend(result.all())
+        self.after_write(session, updated, deleted=False)
+        return updated
+
+    async def delete(
+        self, session: AsyncSession, guid: GUID | int
+    ) -> Optional[_TableT]:
+        """删除一条记录
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guid (GUID | int): 记录 ID
+
+        Returns:
+            Optional[_TableT]: 被删除的记录，不存在时返回 None
+        """
+        deleted = await self.delete_multi(session, [guid])
+        return deleted[0] if deleted else None
+
+    async def delete_multi(
+        self, session: AsyncSession, guids: Iterable[GUID | int]
+    ) -> list[_TableT]:
+        """批量删除记录，使用 DELETE ... WHERE id = ANY(...) RETURNING 语句
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guids (Iterable[GUID | int]): 记录 ID
+
+        Returns:
+            list[_TableT]: 被删除的记录（不存在的记录会被忽略）
+        """
+        ids = [guid_value(guid) for guid in guids]
+        if not ids:
+            return []
+
+        result = await session.scalars(
+            delete(self.table)
+            .where(self.table.id == any_(self._id_array(ids)))
+            .returning(self.table)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = list(result.all())
+        self.after_write(session, deleted, deleted=True)
+        return deleted
+
+    @staticmethod
+    def _id_array(ids: list[int]):
+        # 整个 ID 列表只占用一个绑定参数
+        return bindparam("ids", ids, type_=ARRAY(BigInteger), unique=True)
@@ -0,0 +1,239 @@
+from typing import Any, Mapping, Optional, Sequence
+
+from datetime import timedelta
+
+from sqlalchemy import (
+    ColumnElement,
+    DateTime,
+    any_,
+    case,
+    func,
+    insert,
+    literal,
+    null,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase, guid_value
+from app.crud.instrument_expiry_bucket import EXPIRY_BUCKET_CRUD
+from app.database.table.expire_recompute_job import (
+    ExpireRecomputeJob,
+    RecomputeStatus,
+)
+from app.database.table.instrument_record import Instrument, InstrumentStatus
+from app.util.type.guid import GUID
+
+_Job = ExpireRecomputeJob
+
+_UTC_NOW = func.timezone("UTC", func.now(), type_=DateTime)
+
+
+def _new_expire_time(
+    old_duration: Optional[int], new_duration: Optional[int]
+) -> ColumnElement:
+    # 原来的过期时间已经包含了旧的过期时长，只需要加上两者的差值，手动修改过的过期时间也会保留偏移
+    if new_duration is None:
+        return null()
+    if old_duration is None:
+        # 原来永不过期的器械从创建时间开始计算，单独设置过过期时间的器械保持不变
+        return func.coalesce(
+            Instrument.expire_time,
+            Instrument.created_at + timedelta(milliseconds=new_duration),
+        )
+    return Instrument.expire_time + timedelta(milliseconds=new_duration - old_duration)
+
+
+class _CRUDExpireRecomputeJob(CRUDBase[ExpireRecomputeJob]):
+    async def create_jobs(
+        self,
+        session: AsyncSession,
+        changes: Mapping[int, tuple[Optional[int], Optional[int]]],
+    ) -> None:
+        """为修改了过期时长的器械分类创建重新计算过期时间的任务
+
+        只记录当前最大的器械 ID ，不会在请求中统计或修改器械，之后创建的器械已经使用新的过期时长。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            changes (Mapping[int, tuple[Optional[int], Optional[int]]]): 器械分类 ID 和修改前后的过期时长
+        """
+        if not changes:
+            return
+        result = await session.execute(
+            select(Instrument.instrument_category, func.max(Instrument.id))
+            .where(
+                Instrument.instrument_category == any_(self._id_array(list(changes)))
+            )
+            .group_by(Instrument.instrument_category)
+        )
+        upper_bounds = dict(result.all())
+        if not upper_bounds:
+            return
+
+        await session.execute(
+            insert(_Job).values(
+                [
+                    {
+                        "id": GUID.generate().guid,
+                        "category": category,
+                        "old_duration_MS": changes[category][0],
+                        "new_duration_MS": changes[category][1],
+                        "status": RecomputeStatus.PENDING,
+                        "upper_bound": upper_bound,
+                        "last_id": 0,
+                        "processed": 0,
+                    }
+                    for category, upper_bound in upper_bounds.items()
+                ]
+            )
+        )
+
+    async def next_job(self, session: AsyncSession) -> Optional[int]:
+        """获取最早创建的没有完成的任务
+
+        同一个分类的多次修改按照创建顺序依次执行，每个任务都基于上一个任务的结果。
+
+        Args:
+            session (AsyncSession): 数据库会话
+
+        Returns:
+            Optional[int]: 任务 ID ，没有需要执行的任务时返回 None
+        """
+        return await session.scalar(
+            select(_Job.id)
+            .where(_Job.status != RecomputeStatus.FINISHED)
+            .order_by(_Job.id)
+            .limit(1)
+        )
+
+    async def run_chunk(
+        self, session: AsyncSession, job_id: int, chunk_size: int
+    ) -> Optional[tuple[int, bool]]:
+        """执行任务中的下一段：在 (last_id, 分段结束的 ID] 范围内使用一条 UPDATE 修改过期时间
+
+        任务记录在同一个事务中加锁并更新，分段提交后才会开始下一段；
+        租约交接时两个进程同时执行同一个任务，也不会重复处理同一段。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            job_id (int): 任务 ID
+            chunk_size (int): 每一段最多处理的器械数量
+
+        Returns:
+            Optional[tuple[int, bool]]: 这一段处理的器械数量和任务是否已经完成，任务不存在或已经完成时返回 None
+        """
+        result = await session.execute(
+            select(
+                _Job.category,
+                _Job.old_duration_MS,
+                _Job.new_duration_MS,
+                _Job.status,
+                _Job.upper_bound,
+                _Job.last_id,
+            )
+            .where(_Job.id == job_id)
+            .with_for_update()
+        )
+        job = result.one_or_none()
+        if job is None or job.status is RecomputeStatus.FINISHED:
+            return None
+
+        in_range = (
+            Instrument.instrument_category == job.category,
+            Instrument.id > job.last_id,
+            Instrument.id <= job.upper_bound,
+        )
+        started: dict[str, Any] = {}
+        if job.status is RecomputeStatus.PENDING:
+            total = await session.scalar(
+                select(func.count()).select_from(Instrument).where(*in_range)
+            )
+            started = {
+                "status": RecomputeStatus.RUNNING,
+                "total": total,
+                "started_at": _UTC_NOW,
+            }
+
+        # 使用 (instrument_category, id) 索引找到这一段最后一个器械的 ID
+        chunk_end = await session.scalar(
+            select(Instrument.id)
+            .where(*in_range)
+            .order_by(Instrument.id)
+            .offset(chunk_size - 1)
+            .limit(1)
+        )
+        if chunk_end is None:
+            chunk_end = job.upper_bound
+
+        chunk = (
+            Instrument.instrument_category == job.category,
+            Instrument.id.between(job.last_id + 1, chunk_end),
+        )
+        # 这一段修改前后分别按照时间段汇总，只调整过期预测中变化的计数；
+        # 修改前统计时锁定这一段的器械，统计之后不会被其他事务移动
+        before = await EXPIRY_BUCKET_CRUD.count_instruments(session, *chunk, lock=True)
+
+        expire_time = _new_expire_time(job.old_duration_MS, job.new_duration_MS)
+        result = await session.execute(
+            update(Instrument)
+            .where(*chunk)
+            .values(
+                expire_time=expire_time,
+                # 与修改单个器械的过期时间一致，新的过期时间还没有到达时恢复为正常状态
+                status=case(
+                    (
+                        or_(expire_time.is_(None), expire_time > _UTC_NOW),
+                        literal(InstrumentStatus.NORMAL, Instrument.status.type),
+                    ),
+                    else_=Instrument.status,
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        processed: int = result.rowcount  # type: ignore
+        deltas = await EXPIRY_BUCKET_CRUD.count_instruments(session, *chunk)
+        deltas.subtract(before)
+        await EXPIRY_BUCKET_CRUD.adjust(session, deltas)
+
+        finished = chunk_end >= job.upper_bound
+        progress = {
+            **started,
+            "last_id": chunk_end,
+            "processed": _Job.processed + processed,
+        }
+        if finished:
+            progress.update(status=RecomputeStatus.FINISHED, finished_at=_UTC_NOW)
+        await session.execute(
+            update(_Job)
+            .where(_Job.id == job_id)
+            .values(progress)
+            .execution_options(synchronize_session=False)
+        )
+        return processed, finished
+
+    async def get_by_category(
+        self, session: AsyncSession, category: GUID | int, limit: int
+    ) -> Sequence[ExpireRecomputeJob]:
+        """获取器械分类最近的重新计算任务
+
+        Args:
+            session (AsyncSession): 数据库会话
+            category (GUID | int): 器械分类 ID
+            limit (int): 最多返回的任务数量
+
+        Returns:
+            Sequence[ExpireRecomputeJob]: 任务，最新的任务在最前
+        """
+        result = await session.scalars(
+            select(_Job)
+            .where(_Job.category == guid_value(category))
+            .order_by(_Job.id.desc())
+            .limit(limit)
+        )
+        return result.all()
+
+
+RECOMPUTE_JOB_CRUD = _CRUDExpireRecomputeJob(ExpireRecomputeJob)
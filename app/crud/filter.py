@@ -0,0 +1,36 @@
+from typing import Optional
+
+from datetime import datetime
+
+from sqlalchemy import ColumnElement, Column
+
+from app.util.type.guid import GUID
+
+
+def created_between(
+    id_column: Column,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> list[ColumnElement[bool]]:
+    """将创建时间的过滤条件转换为主键的范围条件
+
+    记录 ID 的高位就是创建时的时间戳，所以可以直接使用主键索引进行范围扫描，
+    不需要在 created_at 上建立单独的索引。
+
+    Args:
+        id_column (Column): 表的主键列
+        start (Optional[datetime], optional): 开始时间（包含）. Defaults to None.
+        end (Optional[datetime], optional): 结束时间（包含）. Defaults to None.
+
+    Returns:
+        list[ColumnElement[bool]]: 过滤条件，没有限制时返回空列表
+    """
+    lower, upper = GUID.range_of_time(start, end)
+
+    if lower is not None and upper is not None:
+        return [id_column.between(lower, upper)]
+    if lower is not None:
+        return [id_column >= lower]
+    if upper is not None:
+        return [id_column <= upper]
+    return []
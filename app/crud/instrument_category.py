@@ -0,0 +1,104 @@
+from typing import Any, Mapping, Optional, Sequence
+
+from pydantic import BaseModel
+
+from sqlalchemy import any_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase, guid_value
+from app.crud.expire_recompute_job import RECOMPUTE_JOB_CRUD
+from app.database.table.instrument_category import InstrumentCategory
+from app.service.expire_recompute import EXPIRE_RECOMPUTE
+from app.service.response_cache import RESPONSE_CACHE
+from app.util.type.guid import GUID
+
+
+class _CRUDInstrumentCategory(CRUDBase[InstrumentCategory]):
+    def after_write(
+        self, session: AsyncSession, rows: Sequence[InstrumentCategory], deleted: bool
+    ) -> None:
+        RESPONSE_CACHE.track(
+            session, InstrumentCategory.__tablename__, (row.id for row in rows)
+        )
+
+    async def update(
+        self,
+        session: AsyncSession,
+        guid: GUID | int,
+        obj: BaseModel | Mapping[str, Any],
+    ) -> Optional[InstrumentCategory]:
+        """更新一条器械分类，修改了过期时长时创建重新计算器械过期时间的任务
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guid (GUID | int): 记录 ID
+            obj (BaseModel | Mapping[str, Any]): 要更新的字段
+
+        Returns:
+            Optional[InstrumentCategory]: 更新后的记录，不存在时返回 None
+        """
+        previous = await self._lock_durations(session, {guid: obj})
+        updated = await super().update(session, guid, obj)
+        await self._create_recompute_jobs(
+            session, previous, [] if updated is None else [updated]
+        )
+        return updated
+
+    async def update_multi(
+        self,
+        session: AsyncSession,
+        objs: Mapping[GUID | int, BaseModel | Mapping[str, Any]],
+    ) -> list[InstrumentCategory]:
+        """批量更新器械分类，修改了过期时长时创建重新计算器械过期时间的任务
+
+        Args:
+            session (AsyncSession): 数据库会话
+            objs (Mapping[GUID | int, BaseModel | Mapping[str, Any]]): 记录 ID 和要更新的字段
+
+        Returns:
+            list[InstrumentCategory]: 更新后的记录（不存在的记录会被忽略）
+        """
+        previous = await self._lock_durations(session, objs)
+        updated = await super().update_multi(session, objs)
+        await self._create_recompute_jobs(session, previous, updated)
+        return updated
+
+    async def _lock_durations(
+        self,
+        session: AsyncSession,
+        objs: Mapping[GUID | int, BaseModel | Mapping[str, Any]],
+    ) -> dict[int, Optional[int]]:
+        # 锁定要修改过期时长的分类并读取原来的过期时长，创建器械时读取过期时长会加共享锁，
+        # 提交之后不会再有使用旧的过期时长创建的器械
+        ids = [
+            guid_value(guid)
+            for guid, obj in objs.items()
+            if "expire_duration_MS" in self.to_row(obj, for_update=True)
+        ]
+        if not ids:
+            return {}
+        result = await session.execute(
+            select(InstrumentCategory.id, InstrumentCategory.expire_duration_MS)
+            .where(InstrumentCategory.id == any_(self._id_array(ids)))
+            .with_for_update()
+        )
+        return dict(result.all())
+
+    @staticmethod
+    async def _create_recompute_jobs(
+        session: AsyncSession,
+        previous: Mapping[int, Optional[int]],
+        updated: list[InstrumentCategory],
+    ) -> None:
+        changes = {
+            category.id: (previous[category.id], category.expire_duration_MS)
+            for category in updated
+            if category.id in previous
+            and previous[category.id] != category.expire_duration_MS
+        }
+        if changes:
+            await RECOMPUTE_JOB_CRUD.create_jobs(session, changes)  # type: ignore
+            EXPIRE_RECOMPUTE.track(session)
+
+
+CATEGORY_CRUD = _CRUDInstrumentCategory(InstrumentCategory)
@@ -0,0 +1,69 @@
+from typing import Sequence
+
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase, guid_value
+from app.database.table.instrument_event import InstrumentEvent, InstrumentEventType
+from app.util.type.guid import GUID
+
+
+class _CRUDInstrumentEvent(CRUDBase[InstrumentEvent]):
+    async def record(
+        self,
+        session: AsyncSession,
+        event_type: InstrumentEventType,
+        events: Sequence[tuple[int, datetime]],
+    ) -> None:
+        """批量记录器械的生命周期事件
+
+        Args:
+            session (AsyncSession): 数据库会话
+            event_type (InstrumentEventType): 事件类型
+            events (Sequence[tuple[int, datetime]]): 器械 ID 和事件发生的时间
+        """
+        if not events:
+            return
+        chunk_size = self._chunk_size(4)
+        for start in range(0, len(events), chunk_size):
+            await session.execute(
+                insert(InstrumentEvent).values(
+                    [
+                        {
+                            "id": GUID.generate().guid,
+                            "instrument": instrument,
+                            "event_type": event_type,
+                            "occurred_at": occurred_at,
+                        }
+                        for instrument, occurred_at in events[
+                            start : start + chunk_size
+                        ]
+                    ]
+                )
+            )
+
+    async def get_by_instrument(
+        self, session: AsyncSession, instrument: GUID | int, limit: int
+    ) -> Sequence[InstrumentEvent]:
+        """按照发生顺序获取一个器械最近的事件
+
+        Args:
+            session (AsyncSession): 数据库会话
+            instrument (GUID | int): 器械 ID
+            limit (int): 最多返回的事件数量
+
+        Returns:
+            Sequence[InstrumentEvent]: 器械的事件，最新的事件在最后
+        """
+        result = await session.scalars(
+            select(InstrumentEvent)
+            .where(InstrumentEvent.instrument == guid_value(instrument))
+            .order_by(InstrumentEvent.id.desc())
+            .limit(limit)
+        )
+        return list(reversed(result.all()))
+
+
+INSTRUMENT_EVENT_CRUD = _CRUDInstrumentEvent(InstrumentEvent)
@@ -0,0 +1,232 @@
+from typing import Any, Iterable, Mapping, Optional, Sequence
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import (
+    ColumnElement,
+    DateTime,
+    Row,
+    delete,
+    func,
+    or_,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase, guid_value
+from app.database.table.instrument_expiry_bucket import InstrumentExpiryBucket
+from app.database.table.instrument_record import Instrument
+from app.database.table.location_cabinet import Cabinet
+from app.util.type.guid import GUID
+
+_Bucket = InstrumentExpiryBucket
+
+_UTC_NOW = func.timezone("UTC", func.now(), type_=DateTime)
+_CURRENT_BUCKET = func.date_trunc("hour", _UTC_NOW, type_=DateTime)
+
+# 存储柜、器械类别、过期时间所在的小时
+BucketKey = tuple[int, int, datetime]
+
+
+def expiry_bucket(expire_time: datetime) -> datetime:
+    """过期时间所在的时间段（小时）的开始时间
+
+    Args:
+        expire_time (datetime): 不带时区的 UTC 过期时间
+
+    Returns:
+        datetime: 时间段的开始时间
+    """
+    return expire_time.replace(minute=0, second=0, microsecond=0)
+
+
+def bucket_deltas(
+    rows: Iterable[tuple[Any, Any, Optional[datetime]]], sign: int = 1
+) -> Counter[BucketKey]:
+    """统计器械在各个时间段中的数量变化
+
+    Args:
+        rows (Iterable[tuple[Any, Any, Optional[datetime]]]): 器械的存储柜、器械类别和过期时间
+        sign (int, optional): 增加时为 1 ，减少时为 -1. Defaults to 1.
+
+    Returns:
+        Counter[BucketKey]: 时间段和数量的变化量，不会过期的器械不计入
+    """
+    deltas: Counter[BucketKey] = Counter()
+    for cabinet, category, expire_time in rows:
+        if expire_time is not None:
+            deltas[(cabinet, category, expiry_bucket(expire_time))] += sign
+    return deltas
+
+
+class _CRUDInstrumentExpiryBucket(CRUDBase[InstrumentExpiryBucket]):
+    async def adjust(
+        self, session: AsyncSession, deltas: Mapping[BucketKey, int]
+    ) -> None:
+        """在写入器械的事务中调整时间段中的器械数量
+
+        同一个事务中的变化先合并，每个时间段只执行一次 INSERT ... ON CONFLICT DO UPDATE ；
+        按照固定的顺序加锁，并发的事务不会互相死锁。已经过去的时间段不会再用于预测，直接忽略。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            deltas (Mapping[BucketKey, int]): 时间段和数量的变化量
+        """
+        current = expiry_bucket(datetime.now(timezone.utc).replace(tzinfo=None))
+        changes = sorted(
+            (bucket, cabinet, category, delta)
+            for (cabinet, category, bucket), delta in deltas.items()
+            if delta and bucket >= current
+        )
+        chunk_size = self._chunk_size(5)
+        for start in range(0, len(changes), chunk_size):
+            statement = insert(_Bucket).values(
+                [
+                    {
+                        "id": GUID.generate().guid,
+                        "bucket": bucket,
+                        "cabinet": cabinet,
+                        "category": category,
+                        "count": delta,
+                    }
+                    for bucket, cabinet, category, delta in changes[
+                        start : start + chunk_size
+                    ]
+                ]
+            )
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[_Bucket.bucket, _Bucket.cabinet, _Bucket.category],
+                    set_={"count": _Bucket.count + statement.excluded.count},
+                )
+            )
+
+    async def count_instruments(
+        self, session: AsyncSession, *where: ColumnElement[bool], lock: bool = False
+    ) -> Counter[BucketKey]:
+        """按照时间段统计满足条件的器械数量，用于在批量修改器械的前后计算变化量
+
+        Args:
+            session (AsyncSession): 数据库会话
+            *where (ColumnElement[bool]): 器械的过滤条件
+            lock (bool, optional): 是否锁定满足条件的器械，统计之后、修改之前其他事务不能修改这些器械. Defaults to False.
+
+        Returns:
+            Counter[BucketKey]: 时间段和器械数量，只包含没有过去的时间段
+        """
+        instruments = select(
+            Instrument.located_cabinet,
+            Instrument.instrument_category,
+            Instrument.expire_time,
+        ).where(*where)
+        if lock:
+            instruments = instruments.with_for_update()
+        rows = instruments.subquery()
+
+        bucket = func.date_trunc("hour", rows.c.expire_time, type_=DateTime)
+        result = await session.execute(
+            select(
+                rows.c.located_cabinet, rows.c.instrument_category, bucket, func.count()
+            )
+            .where(rows.c.expire_time >= _CURRENT_BUCKET)
+            .group_by(rows.c.located_cabinet, rows.c.instrument_category, bucket)
+        )
+        return Counter(
+            {
+                (cabinet, category, time): count
+                for cabinet, category, time, count in result
+            }
+        )
+
+    async def forecast(
+        self,
+        session: AsyncSession,
+        days: Sequence[int],
+        room: Optional[GUID | int] = None,
+        category: Optional[GUID | int] = None,
+    ) -> list[Row]:
+        """按照房间和器械类别统计未来若干天内过期的器械数量
+
+        只汇总当前小时到最长预测天数之间的计数；精度为一小时，当前小时内已经过期的器械也会计入。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            days (Sequence[int]): 预测的天数
+            room (Optional[GUID | int], optional): 只统计房间中的存储柜. Defaults to None.
+            category (Optional[GUID | int], optional): 只统计器械类别. Defaults to None.
+
+        Returns:
+            list[Row]: 房间、器械类别和每个天数对应的器械数量，按照房间和器械类别排序
+        """
+        where = [
+            _Bucket.bucket >= _CURRENT_BUCKET,
+            _Bucket.bucket < _UTC_NOW + timedelta(days=max(days)),
+        ]
+        if room is not None:
+            where.append(Cabinet.located_room == guid_value(room))
+        if category is not None:
+            where.append(_Bucket.category == guid_value(category))
+
+        result = await session.execute(
+            select(
+                Cabinet.located_room.label("room"),
+                _Bucket.category,
+                *(
+                    func.coalesce(
+                        func.sum(_Bucket.count).filter(
+                            _Bucket.bucket < _UTC_NOW + timedelta(days=day)
+                        ),
+                        0,
+                    )
+                    for day in days
+                ),
+            )
+            .join(Cabinet, Cabinet.id == _Bucket.cabinet)
+            .where(*where)
+            .group_by(Cabinet.located_room, _Bucket.category)
+            .having(func.sum(_Bucket.count) != 0)
+            .order_by(Cabinet.located_room, _Bucket.category)
+        )
+        return list(result.all())
+
+    async def prune(self, session: AsyncSession) -> int:
+        """删除已经过去的时间段和数量为零的时间段
+
+        Args:
+            session (AsyncSession): 数据库会话
+
+        Returns:
+            int: 删除的时间段数量
+        """
+        result = await session.execute(
+            delete(_Bucket)
+            .where(or_(_Bucket.bucket < _CURRENT_BUCKET, _Bucket.count == 0))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount  # type: ignore
+
+    async def rebuild(self, session: AsyncSession) -> int:
+        """根据器械表重新统计全部时间段，用于初始化或修复计数
+
+        重新统计期间锁定计数表，正在写入器械的事务会在提交后才开始统计，
+        之后写入器械的事务等待重新统计完成后再调整计数，不会重复或遗漏。
+
+        Args:
+            session (AsyncSession): 数据库会话
+
+        Returns:
+            int: 重新统计后的时间段数量
+        """
+        await session.execute(
+            text(f"LOCK TABLE {_Bucket.__tablename__} IN EXCLUSIVE MODE")
+        )
+        await session.execute(delete(_Bucket))
+        counts = await self.count_instruments(session)
+        await self.adjust(session, counts)
+        return len(counts)
+
+
+EXPIRY_BUCKET_CRUD = _CRUDInstrumentExpiryBucket(InstrumentExpiryBucket)
@@ -0,0 +1,564 @@
+from typing import Any, Awaitable, Callable, Iterable, Mapping, Optional, Sequence
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from pydantic import BaseModel
+
+from sqlalchemy import Row, select, any_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.crud.base import CRUDBase, guid_value
+from app.crud.instrument_expiry_bucket import EXPIRY_BUCKET_CRUD, bucket_deltas
+from app.crud.location_cabinet import CABINET_CRUD
+from app.crud.location_cabinet_slot import SLOT_CRUD
+from app.crud.pagination import ListFilter
+from app.database.table.instrument_record import Instrument, InstrumentStatus
+from app.database.table.instrument_category import InstrumentCategory
+from app.database.table.location_cabinet import Cabinet
+from app.exception.error_code import (
+    capacity_exceeded,
+    field_invalid,
+    resource_not_found,
+    slot_occupied,
+    slots_exhausted,
+    storage_forbidden,
+)
+from app.service.instrument_expiry import INSTRUMENT_EXPIRY
+from app.service.storage_rule import STORAGE_RULES
+from app.util.type.guid import GUID
+
+# 修改后需要调整过期预测计数的字段
+_FORECAST_FIELDS = frozenset(("located_cabinet", "instrument_category", "expire_time"))
+
+
+def _to_naive_utc(time: datetime) -> datetime:
+    # 数据库中保存的是不带时区的 UTC 时间
+    if time.tzinfo is None:
+        return time
+    return time.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class _CRUDInstrument(CRUDBase[Instrument]):
+    @staticmethod
+    def list_filter(
+        cabinet: Optional[GUID | int] = None,
+        category: Optional[GUID | int] = None,
+        expire_after: Optional[datetime] = None,
+        expire_before: Optional[datetime] = None,
+        status: Optional[InstrumentStatus] = None,
+    ) -> ListFilter:
+        """生成器械列表的过滤条件
+
+        按照过期时间过滤时结果按照过期时间排序，使用 (expire_time, id) 索引分页；
+        否则按照 ID 排序，存储柜和器械类别的过滤条件分别使用 (列, id) 索引。
+
+        Args:
+            cabinet (Optional[GUID | int], optional): 所在存储柜. Defaults to None.
+            category (Optional[GUID | int], optional): 器械类别. Defaults to None.
+            expire_after (Optional[datetime], optional): 过期时间下限（包含）. Defaults to None.
+            expire_before (Optional[datetime], optional): 过期时间上限（包含）. Defaults to None.
+            status (Optional[InstrumentStatus], optional): 器械状态. Defaults to None.
+
+        Returns:
+            ListFilter: 过滤条件和排序方式
+        """
+        where = []
+        if cabinet is not None:
+            where.append(Instrument.located_cabinet == guid_value(cabinet))
+        if category is not None:
+            where.append(Instrument.instrument_category == guid_value(category))
+        if status is not None:
+            where.append(Instrument.status == status)
+
+        if expire_after is None and expire_before is None:
+            return ListFilter(where=tuple(where))
+
+        if expire_after is not None:
+            where.append(Instrument.expire_time >= _to_naive_utc(expire_after))
+        if expire_before is not None:
+            where.append(Instrument.expire_time <= _to_naive_utc(expire_before))
+        return ListFilter(where=tuple(where), order_by=(Instrument.expire_time,))
+
+    def to_row(
+        self, obj: BaseModel | Mapping[str, Any], for_update: bool = False
+    ) -> dict[str, Any]:
+        row = super().to_row(obj, for_update)
+        if row.get("expire_time") is not None:
+            row["expire_time"] = _to_naive_utc(row["expire_time"])
+        # 修改过期时间后器械恢复为正常状态，到达新的过期时间后重新过期
+        if for_update and "expire_time" in row:
+            row["status"] = InstrumentStatus.NORMAL
+        return row
+
+    def after_write(
+        self, session: AsyncSession, rows: Sequence[Instrument], deleted: bool
+    ) -> None:
+        INSTRUMENT_EXPIRY.track(session, rows, deleted)
+
+    async def get_expire_durations(
+        self, session: AsyncSession, category_ids: set[int]
+    ) -> dict[int, int | None]:
+        """获取器械分类的过期时长
+
+        Args:
+            session (AsyncSession): 数据库会话
+            category_ids (set[int]): 器械分类 ID
+
+        Raises:
+            HTTPException: 有器械分类不存在时抛出异常
+
+        Returns:
+            dict[int, int | None]: 器械分类 ID 和对应的过期时长（毫秒）
+        """
+        # 加共享锁，修改过期时长的事务会等待正在创建的器械提交，重新计算过期时间时不会遗漏
+        result = await session.execute(
+            select(InstrumentCategory.id, InstrumentCategory.expire_duration_MS)
+            .where(InstrumentCategory.id == any_(self._id_array(list(category_ids))))
+            .with_for_update(read=True)
+        )
+        durations = {row.id: row.expire_duration_MS for row in result}
+
+        if len(durations) != len(category_ids):
+            raise resource_not_found("Instrument category")
+        return durations
+
+    async def check_cabinets_exist(
+        self, session: AsyncSession, cabinet_ids: set[int]
+    ) -> None:
+        """检查存储柜是否都存在
+
+        Args:
+            session (AsyncSession): 数据库会话
+            cabinet_ids (set[int]): 存储柜 ID
+
+        Raises:
+            HTTPException: 有存储柜不存在时抛出异常
+        """
+        result = await session.scalars(
+            select(Cabinet.id).where(
+                Cabinet.id == any_(self._id_array(list(cabinet_ids)))
+            )
+        )
+        if len(result.all()) != len(cabinet_ids):
+            raise resource_not_found("Cabinet")
+
+    @staticmethod
+    async def check_storage_rules(
+        session: AsyncSession, pairs: set[tuple[int, int]]
+    ) -> None:
+        """检查存储规则是否允许器械类别存放在存储柜中
+
+        Args:
+            session (AsyncSession): 数据库会话
+            pairs (set[tuple[int, int]]): 器械类别 ID 和存储柜 ID
+
+        Raises:
+            HTTPException: 存储规则不允许存放时抛出异常
+        """
+        await STORAGE_RULES.refresh(session)
+        for (category, cabinet), allowed in zip(
+            pairs, STORAGE_RULES.may_store_many(pairs)
+        ):
+            if not allowed:
+                raise storage_forbidden(category, cabinet)
+
+    @staticmethod
+    async def adjust_capacity(session: AsyncSession, deltas: Mapping[int, int]) -> None:
+        """调整存储柜的当前容量
+
+        Args:
+            session (AsyncSession): 数据库会话
+            deltas (Mapping[int, int]): 存储柜 ID 和当前容量的变化量
+
+        Raises:
+            HTTPException: 存储柜容量不足时抛出异常
+        """
+        rejected = await CABINET_CRUD.adjust_current_number(session, deltas)
+        if rejected:
+            raise capacity_exceeded(min(rejected))
+
+    @staticmethod
+    async def release_slots(
+        session: AsyncSession, rows: Iterable[Instrument | Row]
+    ) -> None:
+        """释放器械占用的槽位
+
+        Args:
+            session (AsyncSession): 数据库会话
+            rows (Iterable[Instrument | Row]): 包含 located_cabinet 和 slot 的器械记录
+        """
+        slots: dict[int, list[int]] = {}
+        for row in rows:
+            if row.slot is not None:
+                slots.setdefault(row.located_cabinet, []).append(row.slot)  # type: ignore
+        for cabinet, cabinet_slots in slots.items():
+            await SLOT_CRUD.release(session, cabinet, cabinet_slots)
+
+    @staticmethod
+    async def assign_slots(session: AsyncSession, rows: list[dict[str, Any]]) -> None:
+        """为存放在有槽位的存储柜中的器械占用槽位，直接修改记录中的 slot 字段
+
+        先占用指定的槽位，再为没有指定槽位的器械分配空闲槽位，同一个存储柜中的器械优先使用连续的槽位。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            rows (list[dict[str, Any]]): 器械记录
+
+        Raises:
+            HTTPException: 指定的槽位不存在或已被占用、空闲槽位不足时抛出异常
+        """
+        requested: dict[int, list[int]] = {}
+        counts: Counter[int] = Counter()
+        for row in rows:
+            if row.get("slot") is None:
+                counts[row["located_cabinet"]] += 1
+            else:
+                requested.setdefault(row["located_cabinet"], []).append(row["slot"])
+
+        for cabinet, slots in requested.items():
+            layout = await SLOT_CRUD.layout(session, cabinet)
+            if (
+                layout is None
+                or max(slots) >= layout.slot_count
+                or len(set(slots)) != len(slots)
+            ):
+                raise field_invalid(
+                    "slot", "Slots must be unique and less than the slot count."
+                )
+            if not await SLOT_CRUD.claim(session, cabinet, slots):
+                layout = await SLOT_CRUD.layout(session, cabinet, reload=True)
+                raise slot_occupied(
+                    cabinet,
+                    next(
+                        (
+                            slot
+                            for slot in slots
+                            if not layout or not layout.is_free([slot])
+                        ),
+                        slots[0],
+                    ),
+                )
+
+        assigned, exhausted = await SLOT_CRUD.assign(session, counts)
+        if exhausted:
+            raise slots_exhausted(min(exhausted))
+        free_slots = {cabinet: iter(slots) for cabinet, slots in assigned.items()}
+        for row in rows:
+            slots_of_cabinet = free_slots.get(row["located_cabinet"])
+            if row.get("slot") is None and slots_of_cabinet is not None:
+                row["slot"] = next(slots_of_cabinet)
+
+    async def create_multi(
+        self, session: AsyncSession, objs: Sequence[BaseModel | Mapping[str, Any]]
+    ) -> list[Instrument]:
+        """批量创建器械记录，没有指定过期时间时根据器械分类的过期时长计算
+
+        存储规则使用内存中编译好的索引检查，不需要为每条记录查询数据库；
+        存储柜的当前容量在同一个事务中原子地增加，容量不足时整批创建失败。
+        存放在有槽位的存储柜中的器械会同时占用槽位，过期预测的计数也在同一个事务中增加。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            objs (Sequence[BaseModel | Mapping[str, Any]]): 要创建的器械记录
+
+        Raises:
+            HTTPException: 存储柜或器械分类不存在、存储规则不允许存放、存储柜容量或槽位不足时抛出异常
+
+        Returns:
+            list[Instrument]: 创建完成的器械记录
+        """
+        rows = [self.to_row(obj) for obj in objs]
+        if not rows:
+            return []
+
+        await self.check_cabinets_exist(
+            session, {row["located_cabinet"] for row in rows}
+        )
+        durations = await self.get_expire_durations(
+            session, {row["instrument_category"] for row in rows}
+        )
+
+        await self.check_storage_rules(
+            session,
+            {(row["instrument_category"], row["located_cabinet"]) for row in rows},
+        )
+        await self.adjust_capacity(
+            session, Counter(row["located_cabinet"] for row in rows)
+        )
+        await self.assign_slots(session, rows)
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        for row in rows:
+            if row.get("expire_time") is not None:
+                # 保留创建时指定的过期时间
+                continue
+            duration = durations[row["instrument_category"]]
+            row["expire_time"] = (
+                None if duration is None else now + timedelta(milliseconds=duration)
+            )
+
+        created = await super().create_multi(session, rows)
+        await EXPIRY_BUCKET_CRUD.adjust(
+            session,
+            bucket_deltas(
+                (row.located_cabinet, row.instrument_category, row.expire_time)
+                for row in created
+            ),
+        )
+        return created
+
+    async def _lock_instruments(
+        self, session: AsyncSession, targets: Mapping[int, int], ids: set[int]
+    ) -> dict[int, Row]:
+        if not ids:
+            return {}
+        result = await session.execute(
+            select(
+                Instrument.id,
+                Instrument.located_cabinet,
+                Instrument.instrument_category,
+                Instrument.expire_time,
+                Instrument.slot,
+            )
+            .where(Instrument.id == any_(self._id_array(list(ids))))
+            .with_for_update()
+        )
+        previous = {row.id: row for row in result}
+
+        # 先腾出移动到其他存储柜的器械占用的槽位，避免与新存储柜中的槽位冲突
+        vacated = [
+            row
+            for row in previous.values()
+            if row.slot is not None
+            and row.id in targets
+            and targets[row.id] != row.located_cabinet
+        ]
+        if vacated:
+            await session.execute(
+                update(Instrument)
+                .where(
+                    Instrument.id == any_(self._id_array([row.id for row in vacated]))
+                )
+                .values(slot=None)
+                .execution_options(synchronize_session=False)
+            )
+            await self.release_slots(session, vacated)
+        return previous
+
+    async def _move_instruments(
+        self,
+        session: AsyncSession,
+        objs: Mapping[GUID | int, BaseModel | Mapping[str, Any]],
+        update_rows: Callable[[], Awaitable[list[Instrument]]],
+    ) -> list[Instrument]:
+        # 先锁定要移动、修改器械类别或过期时间的器械，读取原来的值，更新后在同一个事务中
+        # 重新计算过期时间、检查存储规则，调整两边存储柜的容量和槽位以及过期预测的计数
+        targets: dict[int, int] = {}
+        tracked: set[int] = set()
+        expire_set: set[int] = set()
+        for guid, obj in objs.items():
+            row = self.to_row(obj, for_update=True)
+            if not _FORECAST_FIELDS.isdisjoint(row):
+                tracked.add(guid_value(guid))
+            if "expire_time" in row:
+                expire_set.add(guid_value(guid))
+            if row.get("located_cabinet") is not None:
+                targets[guid_value(guid)] = row["located_cabinet"]
+        previous = await self._lock_instruments(session, targets, tracked)
+
+        updated: list[Instrument] = await update_rows()
+        relocated = [
+            row
+            for row in updated
+            if row.id in previous
+            and (
+                previous[row.id].located_cabinet != row.located_cabinet
+                or previous[row.id].instrument_category != row.instrument_category
+            )
+        ]
+        await self._recompute_expire_times(
+            session,
+            previous,
+            [
+                row
+                for row in relocated
+                if row.id not in expire_set
+                and previous[row.id].instrument_category != row.instrument_category
+            ],
+        )
+
+        changed = [previous[row.id] for row in updated if row.id in previous]
+        deltas = bucket_deltas(
+            (row.located_cabinet, row.instrument_category, row.expire_time)
+            for row in updated
+            if row.id in previous
+        )
+        deltas.subtract(
+            bucket_deltas(
+                (row.located_cabinet, row.instrument_category, row.expire_time)
+                for row in changed
+            )
+        )
+        await EXPIRY_BUCKET_CRUD.adjust(session, deltas)
+
+        if not relocated:
+            return updated
+        await self.check_storage_rules(
+            session, {(row.instrument_category, row.located_cabinet) for row in relocated}  # type: ignore
+        )
+
+        moved = [
+            row
+            for row in relocated
+            if previous[row.id].located_cabinet != row.located_cabinet  # type: ignore
+        ]
+        if not moved:
+            return updated
+
+        capacity_deltas: Counter[int] = Counter()
+        for row in moved:
+            capacity_deltas[row.located_cabinet] += 1  # type: ignore
+            capacity_deltas[previous[row.id].located_cabinet] -= 1  # type: ignore
+        await self.adjust_capacity(session, capacity_deltas)
+
+        slot_rows = [
+            {"id": row.id, "located_cabinet": row.located_cabinet} for row in moved
+        ]
+        await self.assign_slots(session, slot_rows)
+        slots = {row["id"]: {"slot": row["slot"]} for row in slot_rows if "slot" in row}
+        if not slots:
+            return updated
+        await super().update_multi(session, slots)  # type: ignore
+        # 会话中已经加载的器械不会被 RETURNING 的结果覆盖，直接写入新的槽位
+        for row in moved:
+            if row.id in slots:
+                set_committed_value(row, "slot", slots[row.id]["slot"])
+        return updated
+
+    async def _recompute_expire_times(
+        self, session: AsyncSession, previous: Mapping[int, Row], rows: list[Instrument]
+    ) -> None:
+        # 与修改器械分类的过期时长一致：加上新旧两个分类过期时长的差值，
+        # 原来的分类永不过期时从创建时间开始计算，新的分类永不过期时清空过期时间
+        if not rows:
+            return
+        durations = await self.get_expire_durations(
+            session,
+            {row.instrument_category for row in rows}  # type: ignore
+            | {previous[row.id].instrument_category for row in rows},
+        )
+
+        changes: dict[int, dict[str, Optional[datetime]]] = {}
+        for row in rows:
+            old_duration = durations[previous[row.id].instrument_category]
+            new_duration = durations[row.instrument_category]  # type: ignore
+            expire_time: Optional[datetime] = row.expire_time  # type: ignore
+            if new_duration is None:
+                expire_time = None
+            elif old_duration is None:
+                expire_time = expire_time or row.created_at + timedelta(  # type: ignore
+                    milliseconds=new_duration
+                )
+            elif expire_time is not None:
+                expire_time += timedelta(milliseconds=new_duration - old_duration)
+            if expire_time != row.expire_time:
+                changes[row.id] = {"expire_time": expire_time}  # type: ignore
+        if not changes:
+            return
+
+        await super().update_multi(session, changes)  # type: ignore
+        # 与槽位相同，会话中已经加载的器械需要直接写入新的过期时间和状态
+        for row in rows:
+            if row.id in changes:
+                set_committed_value(row, "expire_time", changes[row.id]["expire_time"])
+                set_committed_value(row, "status", InstrumentStatus.NORMAL)
+
+    async def update(
+        self,
+        session: AsyncSession,
+        guid: GUID | int,
+        obj: BaseModel | Mapping[str, Any],
+    ) -> Optional[Instrument]:
+        """更新一条器械记录，移动到其他存储柜时同时调整两个存储柜的当前容量
+
+        移动到其他存储柜或修改器械类别时检查存储规则；修改器械类别且没有同时指定过期时间时，
+        按照新旧两个器械分类的过期时长重新计算过期时间。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guid (GUID | int): 记录 ID
+            obj (BaseModel | Mapping[str, Any]): 要更新的字段
+
+        Raises:
+            HTTPException: 存储规则不允许存放或存储柜容量不足时抛出异常
+
+        Returns:
+            Optional[Instrument]: 更新后的记录，不存在时返回 None
+        """
+
+        async def update_rows() -> list[Instrument]:
+            updated = await super(_CRUDInstrument, self).update(session, guid, obj)
+            return [] if updated is None else [updated]
+
+        updated = await self._move_instruments(session, {guid: obj}, update_rows)
+        return updated[0] if updated else None
+
+    async def update_multi(
+        self,
+        session: AsyncSession,
+        objs: Mapping[GUID | int, BaseModel | Mapping[str, Any]],
+    ) -> list[Instrument]:
+        """批量更新器械记录，移动到其他存储柜时同时调整存储柜的当前容量
+
+        存储规则和过期时间的处理与 update 相同。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            objs (Mapping[GUID | int, BaseModel | Mapping[str, Any]]): 记录 ID 和要更新的字段
+
+        Raises:
+            HTTPException: 存储规则不允许存放或存储柜容量不足时抛出异常
+
+        Returns:
+            list[Instrument]: 更新后的记录（不存在的记录会被忽略）
+        """
+        return await self._move_instruments(
+            session,
+            objs,
+            lambda: super(_CRUDInstrument, self).update_multi(session, objs),
+        )
+
+    async def delete_multi(
+        self, session: AsyncSession, guids: Iterable[GUID | int]
+    ) -> list[Instrument]:
+        """批量删除器械记录，减少所在存储柜的当前容量和过期预测的计数并释放占用的槽位
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guids (Iterable[GUID | int]): 记录 ID
+
+        Returns:
+            list[Instrument]: 被删除的记录（不存在的记录会被忽略）
+        """
+        deleted = await super().delete_multi(session, guids)
+        deltas: Counter[int] = Counter()
+        for row in deleted:
+            deltas[row.located_cabinet] -= 1  # type: ignore
+        await CABINET_CRUD.adjust_current_number(session, deltas)
+        await self.release_slots(session, deleted)
+        await EXPIRY_BUCKET_CRUD.adjust(
+            session,
+            bucket_deltas(
+                (
+                    (row.located_cabinet, row.instrument_category, row.expire_time)
+                    for row in deleted
+                ),
+                -1,
+            ),
+        )
+        return deleted
+
+
+INSTRUMENT_CRUD = _CRUDInstrument(Instrument)
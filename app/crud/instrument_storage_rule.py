@@ -0,0 +1,24 @@
+from typing import Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.database.table.instrument_storage_rule import InstrumentStorageRule
+from app.service.response_cache import RESPONSE_CACHE
+from app.service.storage_rule import STORAGE_RULES
+
+
+class _CRUDStorageRule(CRUDBase[InstrumentStorageRule]):
+    def after_write(
+        self,
+        session: AsyncSession,
+        rows: Sequence[InstrumentStorageRule],
+        deleted: bool,
+    ) -> None:
+        STORAGE_RULES.track_rules(session, rows, deleted)
+        RESPONSE_CACHE.track(
+            session, InstrumentStorageRule.__tablename__, (row.id for row in rows)
+        )
+
+
+STORAGE_RULE_CRUD = _CRUDStorageRule(InstrumentStorageRule)
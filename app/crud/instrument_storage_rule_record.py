@@ -0,0 +1,21 @@
+from typing import Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.database.table.instrument_storage_rule_record import StorageRuleRecord
+from app.service.response_cache import RESPONSE_CACHE
+from app.service.storage_rule import STORAGE_RULES
+
+
+class _CRUDRuleRecord(CRUDBase[StorageRuleRecord]):
+    def after_write(
+        self, session: AsyncSession, rows: Sequence[StorageRuleRecord], deleted: bool
+    ) -> None:
+        STORAGE_RULES.track_records(session, rows, deleted)
+        RESPONSE_CACHE.track(
+            session, StorageRuleRecord.__tablename__, (row.id for row in rows)
+        )
+
+
+RULE_RECORD_CRUD = _CRUDRuleRecord(StorageRuleRecord)
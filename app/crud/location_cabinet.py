@@ -0,0 +1,417 @@
+from typing import Any, Iterable, Mapping, Optional, Sequence
+
+from asyncio import sleep
+from time import monotonic
+
+from pydantic import BaseModel
+
+from sqlalchemy import (
+    BigInteger,
+    ColumnElement,
+    Integer,
+    and_,
+    any_,
+    case,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase, guid_value
+from app.database.table.location_cabinet import Cabinet, CabinetStatus
+from app.database.table.location_cabinet_counter_shard import CabinetCounterShard
+from app.database.table.location_cabinet_slot_segment import CabinetSlotSegment
+from app.service.cabinet_slot import SLOT_MAPS
+from app.service.placement import PLACEMENTS
+from app.service.response_cache import RESPONSE_CACHE
+from app.service.storage_rule import STORAGE_RULES
+from app.util.type.guid import GUID
+
+_Shard = CabinetCounterShard
+
+# 容量分片都被其他事务锁定时的重试间隔和最长等待时间（秒）
+_SHARD_RETRY_DELAY = 0.005
+_SHARD_WAIT_SECONDS = 5.0
+
+# 容量变化后返回的列，用于更新推荐存放位置的容量索引
+_CAPACITY_COLUMNS = (
+    Cabinet.id,
+    Cabinet.located_room,
+    Cabinet.max_number,
+    Cabinet.current_number,
+    Cabinet.status,
+)
+
+
+def _derived_status(current_number: ColumnElement[int]) -> ColumnElement[Any]:
+    # 与 Cabinet 模型的 derive_status 一致：容量已满时为满载，不再满载时恢复为启用；
+    # 禁用的存储柜保持禁用，满载不会覆盖禁用状态，取出器械时也不会被重新启用
+    return case(
+        (Cabinet.status == CabinetStatus.DISABLED, Cabinet.status),
+        (
+            current_number >= Cabinet.max_number,
+            literal(CabinetStatus.FULL_LOAD, Cabinet.status.type),
+        ),
+        (
+            Cabinet.status == CabinetStatus.FULL_LOAD,
+            literal(CabinetStatus.ENABLED, Cabinet.status.type),
+        ),
+        else_=Cabinet.status,
+    )
+
+
+def _split(total: int, parts: int) -> list[int]:
+    quotient, remainder = divmod(total, parts)
+    return [quotient + (index < remainder) for index in range(parts)]
+
+
+class _CRUDCabinet(CRUDBase[Cabinet]):
+    def after_write(
+        self, session: AsyncSession, rows: Sequence[Cabinet], deleted: bool
+    ) -> None:
+        # 存储规则中的房间需要展开为房间中的存储柜
+        STORAGE_RULES.track_cabinets(session, rows, deleted)
+        PLACEMENTS.track_cabinets(session, rows, deleted)
+        RESPONSE_CACHE.track(session, Cabinet.__tablename__, (row.id for row in rows))
+
+    async def adjust_current_number(
+        self, session: AsyncSession, deltas: Mapping[int, int]
+    ) -> set[int]:
+        """批量调整存储柜的当前容量，并在同一条语句中更新存储柜状态
+
+        使用一条 UPDATE ... FROM (VALUES ...) WHERE current_number + delta <= max_number 语句，
+        容量检查和修改在数据库中原子地完成，并发存入时不会超过最大容量，禁用的存储柜不能增加容量。
+        减少容量时不做检查，最少减少到 0 。开启了容量分片的存储柜改为更新其中的分片。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            deltas (Mapping[int, int]): 存储柜 ID 和当前容量的变化量
+
+        Returns:
+            set[int]: 容量不足、已禁用或不存在，没有修改的存储柜 ID
+        """
+        changes = {cabinet: delta for cabinet, delta in deltas.items() if delta}
+        if not changes:
+            return set()
+
+        data = values(
+            column("id", BigInteger),
+            column("delta", Integer),
+            name="cabinet_deltas",
+        ).data(list(changes.items()))
+        current_number = func.greatest(Cabinet.current_number + data.c.delta, 0)
+        result = await session.execute(
+            update(Cabinet)
+            .where(
+                Cabinet.id == data.c.id,
+                Cabinet.counter_shards == 0,
+                or_(
+                    data.c.delta <= 0,
+                    and_(
+                        Cabinet.status != CabinetStatus.DISABLED,
+                        Cabinet.current_number + data.c.delta <= Cabinet.max_number,
+                    ),
+                ),
+            )
+            .values(
+                current_number=current_number, status=_derived_status(current_number)
+            )
+            .returning(*_CAPACITY_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+        updated = result.all()
+        PLACEMENTS.track_cabinets(session, updated, deleted=False)
+        RESPONSE_CACHE.track(
+            session, Cabinet.__tablename__, (row.id for row in updated)
+        )
+        rejected = set(changes).difference(row.id for row in updated)
+        if not rejected:
+            return rejected
+
+        sharded = await session.execute(
+            select(Cabinet.id, Cabinet.status).where(
+                Cabinet.id == any_(self._id_array(list(rejected))),
+                Cabinet.counter_shards > 0,
+            )
+        )
+        for cabinet, status in sharded.all():
+            if changes[cabinet] > 0 and status is CabinetStatus.DISABLED:
+                continue
+            if await self._adjust_shards(session, cabinet, changes[cabinet]):
+                PLACEMENTS.track_used(session, cabinet, changes[cabinet])
+                rejected.discard(cabinet)
+        return rejected
+
+    async def _adjust_shards(
+        self, session: AsyncSession, cabinet: int, delta: int
+    ) -> bool:
+        # 只使用没有被其他事务锁定的分片，不会等待行锁，也就不会和其他事务互相等待形成死锁；
+        # 可用的分片都被锁定时短暂等待后重试
+        increase = delta > 0
+        remaining = abs(delta)
+        deadline = monotonic() + _SHARD_WAIT_SECONDS
+        while remaining:
+            taken = await self._take_from_shard(session, cabinet, remaining, increase)
+            if taken:
+                remaining -= taken
+                continue
+            if monotonic() > deadline or not await self._has_available_shard(
+                session, cabinet, increase
+            ):
+                break
+            await sleep(_SHARD_RETRY_DELAY)
+
+        if remaining and increase:
+            # 容量不足时归还已经占用的分片容量
+            await self._adjust_shards(session, cabinet, remaining - delta)
+            return False
+        return True
+
+    @staticmethod
+    def _available(increase: bool) -> ColumnElement[int]:
+        shard = _Shard.__table__.c
+        if increase:
+            return shard.max_number - shard.current_number
+        return shard.current_number
+
+    async def _take_from_shard(
+        self, session: AsyncSession, cabinet: int, amount: int, increase: bool
+    ) -> int:
+        shard = _Shard.__table__.c
+        available = self._available(increase)
+        picked = (
+            select(shard.id, func.least(available, amount).label("taken"))
+            .where(shard.cabinet == cabinet, available > 0)
+            .order_by(func.random())
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .cte("picked_shard")
+        )
+        change = picked.c.taken if increase else -picked.c.taken
+        # 使用 Core 语句才能返回 CTE 中的列
+        result = await session.execute(
+            update(_Shard.__table__)
+            .where(shard.id == picked.c.id)
+            .values(current_number=shard.current_number + change)
+            .returning(picked.c.taken)
+        )
+        return result.scalar_one_or_none() or 0
+
+    async def _has_available_shard(
+        self, session: AsyncSession, cabinet: int, increase: bool
+    ) -> bool:
+        shard = _Shard.__table__.c
+        result = await session.scalars(
+            select(shard.id)
+            .where(shard.cabinet == cabinet, self._available(increase) > 0)
+            .limit(1)
+        )
+        return result.first() is not None
+
+    async def set_counter_shards(
+        self, session: AsyncSession, guid: GUID | int, shards: int
+    ) -> Optional[Cabinet]:
+        """修改存储柜的容量分片数量，当前容量和最大容量平均分配到各个分片
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guid (GUID | int): 存储柜 ID
+            shards (int): 分片数量，为 0 时关闭分片
+
+        Returns:
+            Optional[Cabinet]: 修改后的存储柜，不存在时返回 None
+        """
+        cabinet_id = guid_value(guid)
+        # 只读取需要的列，返回的存储柜对象由最后的 UPDATE ... RETURNING 创建
+        cabinet = (
+            await session.execute(
+                select(
+                    Cabinet.max_number, Cabinet.current_number, Cabinet.counter_shards
+                )
+                .where(Cabinet.id == cabinet_id)
+                .with_for_update()
+            )
+        ).one_or_none()
+        if cabinet is None:
+            return None
+
+        shard_numbers = await session.scalars(
+            delete(_Shard)
+            .where(_Shard.cabinet == cabinet_id)
+            .returning(_Shard.current_number)
+        )
+        total: int = (
+            sum(shard_numbers.all())
+            if cabinet.counter_shards
+            else cabinet.current_number
+        )
+
+        if shards:
+            await session.execute(
+                insert(_Shard).values(
+                    [
+                        {
+                            "id": GUID.generate().guid,
+                            "cabinet": cabinet_id,
+                            "shard": shard,
+                            "max_number": max_number,
+                            "current_number": current_number,
+                        }
+                        for shard, (max_number, current_number) in enumerate(
+                            zip(
+                                _split(cabinet.max_number, shards),
+                                _split(total, shards),
+                            )
+                        )
+                    ]
+                )
+            )
+
+        result = await session.scalars(
+            update(Cabinet)
+            .where(Cabinet.id == cabinet_id)
+            .values(
+                counter_shards=shards,
+                current_number=total,
+                status=_derived_status(literal(total)),
+            )
+            .returning(Cabinet)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        cabinet = result.one()
+        PLACEMENTS.track_cabinets(session, [cabinet], deleted=False)
+        RESPONSE_CACHE.track(session, Cabinet.__tablename__, [cabinet.id])
+        return cabinet
+
+    async def rebalance_counter_shards(
+        self, session: AsyncSession, cabinet_ids: Iterable[int]
+    ) -> None:
+        """按照存储柜的最大容量重新分配分片的最大容量，分片的当前容量保持不变
+
+        Args:
+            session (AsyncSession): 数据库会话
+            cabinet_ids (Iterable[int]): 开启了容量分片的存储柜 ID
+        """
+        ids = list(cabinet_ids)
+        if not ids:
+            return
+
+        result = await session.execute(
+            select(_Shard.id, _Shard.cabinet, _Shard.current_number, Cabinet.max_number)
+            .join(Cabinet, Cabinet.id == _Shard.cabinet)
+            .where(_Shard.cabinet == any_(self._id_array(ids)))
+            .order_by(_Shard.cabinet, _Shard.shard)
+            .with_for_update(of=_Shard)
+        )
+        shards: dict[int, list[Any]] = {}
+        for row in result:
+            shards.setdefault(row.cabinet, []).append(row)
+
+        changes = []
+        for rows in shards.values():
+            free = max(rows[0].max_number - sum(row.current_number for row in rows), 0)
+            for row, share in zip(rows, _split(free, len(rows))):
+                changes.append((row.id, row.current_number + share))
+        if not changes:
+            return
+
+        data = values(
+            column("id", BigInteger),
+            column("max_number", Integer),
+            name="shard_max_numbers",
+        ).data(changes)
+        await session.execute(
+            update(_Shard)
+            .where(_Shard.id == data.c.id)
+            .values(max_number=data.c.max_number)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def roll_up_counter_shards(self, session: AsyncSession) -> int:
+        """将分片的当前容量汇总到存储柜中，并更新存储柜状态
+
+        Args:
+            session (AsyncSession): 数据库会话
+
+        Returns:
+            int: 当前容量发生变化的存储柜数量
+        """
+        totals = (
+            select(
+                _Shard.cabinet,
+                func.sum(_Shard.current_number).cast(Integer).label("total"),
+            )
+            .group_by(_Shard.cabinet)
+            .subquery()
+        )
+        result = await session.execute(
+            update(Cabinet)
+            .where(
+                Cabinet.id == totals.c.cabinet,
+                Cabinet.counter_shards > 0,
+                Cabinet.current_number != totals.c.total,
+            )
+            .values(
+                current_number=totals.c.total, status=_derived_status(totals.c.total)
+            )
+            .returning(*_CAPACITY_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+        updated = result.all()
+        PLACEMENTS.track_cabinets(session, updated, deleted=False)
+        RESPONSE_CACHE.track(
+            session, Cabinet.__tablename__, (row.id for row in updated)
+        )
+        return len(updated)
+
+    async def update(
+        self,
+        session: AsyncSession,
+        guid: GUID | int,
+        obj: BaseModel | Mapping[str, Any],
+    ) -> Optional[Cabinet]:
+        updated = await super().update(session, guid, obj)
+        if updated is not None and updated.counter_shards:
+            await self.rebalance_counter_shards(session, [updated.id])  # type: ignore
+        return updated
+
+    async def update_multi(
+        self,
+        session: AsyncSession,
+        objs: Mapping[GUID | int, BaseModel | Mapping[str, Any]],
+    ) -> list[Cabinet]:
+        updated = await super().update_multi(session, objs)
+        await self.rebalance_counter_shards(
+            session, [row.id for row in updated if row.counter_shards]  # type: ignore
+        )
+        return updated
+
+    async def delete_multi(
+        self, session: AsyncSession, guids: Iterable[GUID | int]
+    ) -> list[Cabinet]:
+        deleted = await super().delete_multi(session, guids)
+        sharded = [row.id for row in deleted if row.counter_shards]
+        if sharded:
+            await session.execute(
+                delete(_Shard).where(_Shard.cabinet == any_(self._id_array(sharded)))  # type: ignore
+            )
+        slotted = [row.id for row in deleted if row.slot_count]
+        if slotted:
+            await session.execute(
+                delete(CabinetSlotSegment).where(
+                    CabinetSlotSegment.cabinet == any_(self._id_array(slotted))  # type: ignore
+                )
+            )
+        for row in deleted:
+            SLOT_MAPS.invalidate(row.id)  # type: ignore
+        return deleted
+
+
+CABINET_CRUD = _CRUDCabinet(Cabinet)
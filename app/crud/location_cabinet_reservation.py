@@ -0,0 +1,189 @@
+from typing import Iterable, Optional, Sequence
+
+from collections import Counter
+from datetime import timedelta
+
+from sqlalchemy import (
+    ColumnElement,
+    DateTime,
+    Float,
+    any_,
+    extract,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase, guid_value
+from app.crud.location_cabinet import CABINET_CRUD
+from app.database.table.location_cabinet_reservation import (
+    CabinetReservation,
+    ReservationStatus,
+)
+from app.util.type.guid import GUID
+
+# 数据库中的时间都按照 UTC 保存，到期判断统一使用数据库的时间，与进程的时钟无关
+_UTC_NOW = func.timezone("UTC", func.now(), type_=DateTime)
+
+
+class _CRUDCabinetReservation(CRUDBase[CabinetReservation]):
+    async def reserve(
+        self, session: AsyncSession, cabinet: GUID | int, slots: int, ttl: float
+    ) -> Optional[CabinetReservation]:
+        """预留存储柜的容量，预留的容量立即计入存储柜的当前容量
+
+        Args:
+            session (AsyncSession): 数据库会话
+            cabinet (GUID | int): 存储柜 ID
+            slots (int): 预留的容量
+            ttl (float): 预留的有效时间（秒）
+
+        Returns:
+            Optional[CabinetReservation]: 创建的预留，容量不足时返回 None
+        """
+        cabinet_id = guid_value(cabinet)
+        if await CABINET_CRUD.adjust_current_number(session, {cabinet_id: slots}):
+            return None
+
+        result = await session.scalars(
+            insert(CabinetReservation)
+            .values(
+                id=GUID.generate().guid,
+                cabinet=cabinet_id,
+                slots=slots,
+                status=ReservationStatus.ACTIVE,
+                expires_at=_UTC_NOW + timedelta(seconds=ttl),
+            )
+            .returning(CabinetReservation)
+        )
+        return result.one()
+
+    async def confirm(
+        self, session: AsyncSession, guid: GUID | int
+    ) -> Optional[CabinetReservation]:
+        """确认未到期的预留，预留的容量转为已占用的容量，不会再过期
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guid (GUID | int): 预留 ID
+
+        Returns:
+            Optional[CabinetReservation]: 确认后的预留，不存在、已经结束或者已经到期时返回 None
+        """
+        result = await session.scalars(
+            update(CabinetReservation)
+            .where(
+                CabinetReservation.id == guid_value(guid),
+                CabinetReservation.status == ReservationStatus.ACTIVE,
+                CabinetReservation.expires_at > _UTC_NOW,
+            )
+            .values(status=ReservationStatus.CONFIRMED)
+            .returning(CabinetReservation)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        return result.one_or_none()
+
+    async def release(
+        self, session: AsyncSession, guid: GUID | int
+    ) -> Optional[CabinetReservation]:
+        """释放预留，并将预留的容量归还到存储柜
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guid (GUID | int): 预留 ID
+
+        Returns:
+            Optional[CabinetReservation]: 释放后的预留，不存在或已经结束时返回 None
+        """
+        released = await self._finish(
+            session, [guid_value(guid)], ReservationStatus.RELEASED
+        )
+        return released[0] if released else None
+
+    async def expire(
+        self, session: AsyncSession, guids: Iterable[GUID | int]
+    ) -> Sequence[CabinetReservation]:
+        """将已经到期的预留标记为过期，并将预留的容量归还到存储柜
+
+        状态使用带条件的 UPDATE 修改，多个进程同时处理同一条预留时只有一个会归还容量。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guids (Iterable[GUID | int]): 预留 ID ，没有到期或已经结束的预留会被忽略
+
+        Returns:
+            Sequence[CabinetReservation]: 标记为过期的预留
+        """
+        ids = [guid_value(guid) for guid in guids]
+        if not ids:
+            return []
+        return await self._finish(
+            session,
+            ids,
+            ReservationStatus.EXPIRED,
+            CabinetReservation.expires_at <= _UTC_NOW,
+        )
+
+    async def _finish(
+        self,
+        session: AsyncSession,
+        ids: list[int],
+        status: ReservationStatus,
+        *conditions: ColumnElement[bool],
+    ) -> Sequence[CabinetReservation]:
+        result = await session.scalars(
+            update(CabinetReservation)
+            .where(
+                CabinetReservation.id == any_(self._id_array(ids)),
+                CabinetReservation.status == ReservationStatus.ACTIVE,
+                *conditions,
+            )
+            .values(status=status)
+            .returning(CabinetReservation)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        finished = result.all()
+
+        deltas: Counter[int] = Counter()
+        for reservation in finished:
+            deltas[reservation.cabinet] -= reservation.slots  # type: ignore
+        await CABINET_CRUD.adjust_current_number(session, deltas)
+        return finished
+
+    async def due_within(
+        self,
+        session: AsyncSession,
+        seconds: Optional[float] = None,
+        guids: Optional[Iterable[GUID | int]] = None,
+    ) -> list[tuple[int, float]]:
+        """查询未结束的预留距离到期的时间，只使用未结束预留的部分索引
+
+        Args:
+            session (AsyncSession): 数据库会话
+            seconds (Optional[float], optional): 只查询这段时间内到期的预留，为空时不限制. Defaults to None.
+            guids (Optional[Iterable[GUID | int]], optional): 只查询这些预留，为空时不限制. Defaults to None.
+
+        Returns:
+            list[tuple[int, float]]: 预留 ID 和距离到期的秒数（已经到期时为负数）
+        """
+        conditions = [CabinetReservation.status == ReservationStatus.ACTIVE]
+        if seconds is not None:
+            conditions.append(
+                CabinetReservation.expires_at <= _UTC_NOW + timedelta(seconds=seconds)
+            )
+        if guids is not None:
+            ids = [guid_value(guid) for guid in guids]
+            conditions.append(CabinetReservation.id == any_(self._id_array(ids)))
+
+        remaining = extract("epoch", CabinetReservation.expires_at - _UTC_NOW)
+        result = await session.execute(
+            select(
+                CabinetReservation.id, remaining.cast(Float).label("remaining")
+            ).where(*conditions)
+        )
+        return [(row.id, row.remaining) for row in result]
+
+
+RESERVATION_CRUD = _CRUDCabinetReservation(CabinetReservation)
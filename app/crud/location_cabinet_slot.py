@@ -0,0 +1,272 @@
+from typing import Iterable, Mapping, Optional
+
+from asyncpg import BitString
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase, guid_value
+from app.database.table.location_cabinet import Cabinet
+from app.database.table.location_cabinet_slot_segment import (
+    SEGMENT_SLOTS,
+    CabinetSlotSegment,
+)
+from app.exception.error_code import slot_occupied
+from app.service.cabinet_slot import (
+    SEGMENT_MASK,
+    SLOT_MAPS,
+    SlotLayout,
+    padding_mask,
+    slot_mask,
+    split_segments,
+)
+from app.service.response_cache import RESPONSE_CACHE
+from app.util.type.guid import GUID
+
+_Segment = CabinetSlotSegment
+
+# 内存中的位图与数据库冲突时最多重试的次数
+_CLAIM_ATTEMPTS = 3
+
+
+def _bits(mask: int) -> BitString:
+    return BitString.from_int(mask, SEGMENT_SLOTS)
+
+
+_NO_SLOTS = _bits(0)
+
+
+class _CRUDSlotSegment(CRUDBase[CabinetSlotSegment]):
+    async def layout(
+        self, session: AsyncSession, cabinet: int, reload: bool = False
+    ) -> Optional[SlotLayout]:
+        """获取存储柜的槽位占用位图，优先使用内存中的副本
+
+        Args:
+            session (AsyncSession): 数据库会话
+            cabinet (int): 存储柜 ID
+            reload (bool, optional): 是否忽略内存中的副本，从数据库重新加载. Defaults to False.
+
+        Returns:
+            Optional[SlotLayout]: 槽位占用位图，存储柜不存在或没有槽位时返回 None
+        """
+        layout = None if reload else SLOT_MAPS.get(cabinet)
+        if layout is None:
+            slot_count = await session.scalar(
+                select(Cabinet.slot_count).where(Cabinet.id == cabinet)
+            )
+            if slot_count is None:
+                return None
+
+            occupied = 0
+            if slot_count:
+                result = await session.execute(
+                    select(_Segment.segment, _Segment.occupancy).where(
+                        _Segment.cabinet == cabinet
+                    )
+                )
+                for segment, occupancy in result:
+                    occupied |= occupancy.to_int() << (segment * SEGMENT_SLOTS)
+            # 没有槽位的存储柜也保存下来，创建器械时不需要每次查询
+            layout = SlotLayout(slot_count, occupied)
+            SLOT_MAPS.put(cabinet, layout)
+        return layout if layout.slot_count else None
+
+    async def claim(
+        self, session: AsyncSession, cabinet: int, slots: Iterable[int]
+    ) -> bool:
+        """占用存储柜中的槽位
+
+        每一段使用一条 UPDATE ... WHERE occupancy & mask = 0 语句，只锁定涉及到的段，
+        任意一个槽位已经被占用时撤销这次占用的全部槽位。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            cabinet (int): 存储柜 ID
+            slots (Iterable[int]): 槽位序号
+
+        Returns:
+            bool: 是否全部占用成功
+        """
+        mask = slot_mask(slots)
+        claimed: dict[int, int] = {}
+        # 按照段的顺序修改，同时占用多个段的事务不会互相等待形成死锁
+        for segment, bits in sorted(split_segments(mask).items()):
+            result = await session.scalars(
+                update(_Segment)
+                .where(
+                    _Segment.cabinet == cabinet,
+                    _Segment.segment == segment,
+                    _Segment.occupancy.op("&")(_bits(bits)) == _NO_SLOTS,
+                )
+                .values(occupancy=_Segment.occupancy.op("|")(_bits(bits)))
+                .returning(_Segment.segment)
+                .execution_options(synchronize_session=False)
+            )
+            if result.one_or_none() is None:
+                await self._clear(session, cabinet, claimed)
+                SLOT_MAPS.invalidate(cabinet)
+                return False
+            claimed[segment] = bits
+
+        SLOT_MAPS.apply(session, cabinet, occupy=mask, release=0)
+        return True
+
+    async def release(
+        self, session: AsyncSession, cabinet: int, slots: Iterable[int]
+    ) -> None:
+        """释放存储柜中的槽位
+
+        Args:
+            session (AsyncSession): 数据库会话
+            cabinet (int): 存储柜 ID
+            slots (Iterable[int]): 槽位序号
+        """
+        mask = slot_mask(slots)
+        if not mask:
+            return
+        await self._clear(session, cabinet, split_segments(mask))
+        SLOT_MAPS.apply(session, cabinet, occupy=0, release=mask)
+
+    async def _clear(
+        self, session: AsyncSession, cabinet: int, segments: Mapping[int, int]
+    ) -> None:
+        for segment, bits in sorted(segments.items()):
+            await session.execute(
+                update(_Segment)
+                .where(_Segment.cabinet == cabinet, _Segment.segment == segment)
+                .values(
+                    occupancy=_Segment.occupancy.op("&")(_bits(~bits & SEGMENT_MASK))
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+    async def claim_free(
+        self, session: AsyncSession, cabinet: int, count: int
+    ) -> Optional[list[int]]:
+        """占用存储柜中的空闲槽位，优先使用连续的槽位，没有足够长的连续槽位时使用序号最小的槽位
+
+        Args:
+            session (AsyncSession): 数据库会话
+            cabinet (int): 存储柜 ID
+            count (int): 槽位数量
+
+        Returns:
+            Optional[list[int]]: 占用的槽位，存储柜没有槽位时为空列表，空闲槽位不足时返回 None
+        """
+        layout = await self.layout(session, cabinet)
+        fresh = False
+        for _ in range(_CLAIM_ATTEMPTS):
+            if layout is None:
+                return []
+            start = layout.first_run(count)
+            slots = (
+                list(range(start, start + count))
+                if start is not None
+                else layout.first_free(count)
+            )
+            if len(slots) == count:
+                if await self.claim(session, cabinet, slots):
+                    return slots
+            elif fresh:
+                return None
+            # 内存中的位图可能已经过期（其他进程占用或释放了槽位），重新加载后再试
+            layout = await self.layout(session, cabinet, reload=True)
+            fresh = True
+        return None
+
+    async def assign(
+        self, session: AsyncSession, counts: Mapping[int, int]
+    ) -> tuple[dict[int, list[int]], set[int]]:
+        """为多个存储柜分配空闲槽位
+
+        Args:
+            session (AsyncSession): 数据库会话
+            counts (Mapping[int, int]): 存储柜 ID 和需要的槽位数量
+
+        Returns:
+            tuple[dict[int, list[int]], set[int]]: 有槽位的存储柜分配到的槽位，以及空闲槽位不足的存储柜
+                （没有为这些存储柜占用任何槽位）
+        """
+        assigned: dict[int, list[int]] = {}
+        exhausted: set[int] = set()
+        for cabinet, count in sorted(counts.items()):
+            if count <= 0:
+                continue
+            slots = await self.claim_free(session, cabinet, count)
+            if slots is None:
+                exhausted.add(cabinet)
+            elif slots:
+                assigned[cabinet] = slots
+        return assigned, exhausted
+
+    async def set_slot_count(
+        self, session: AsyncSession, guid: GUID | int, slot_count: int
+    ) -> Optional[Cabinet]:
+        """修改存储柜的槽位数量，保留现有的占用
+
+        Args:
+            session (AsyncSession): 数据库会话
+            guid (GUID | int): 存储柜 ID
+            slot_count (int): 槽位数量，为 0 时不再记录槽位
+
+        Raises:
+            HTTPException: 减少的槽位中有已经被占用的槽位时抛出异常
+
+        Returns:
+            Optional[Cabinet]: 修改后的存储柜，不存在时返回 None
+        """
+        cabinet_id = guid_value(guid)
+        old_count = await session.scalar(
+            select(Cabinet.slot_count).where(Cabinet.id == cabinet_id).with_for_update()
+        )
+        if old_count is None:
+            return None
+
+        result = await session.execute(
+            delete(_Segment)
+            .where(_Segment.cabinet == cabinet_id)
+            .returning(_Segment.segment, _Segment.occupancy)
+        )
+        occupied = 0
+        for segment, occupancy in result:
+            occupied |= occupancy.to_int() << (segment * SEGMENT_SLOTS)
+        occupied &= (1 << old_count) - 1
+
+        removed = occupied >> slot_count
+        if removed:
+            raise slot_occupied(
+                cabinet_id, (removed & -removed).bit_length() - 1 + slot_count
+            )
+
+        if slot_count:
+            occupied |= padding_mask(slot_count)
+            await session.execute(
+                insert(_Segment).values(
+                    [
+                        {
+                            "id": GUID.generate().guid,
+                            "cabinet": cabinet_id,
+                            "segment": segment,
+                            "occupancy": _bits(
+                                (occupied >> (segment * SEGMENT_SLOTS)) & SEGMENT_MASK
+                            ),
+                        }
+                        for segment in range(-(-slot_count // SEGMENT_SLOTS))
+                    ]
+                )
+            )
+        SLOT_MAPS.invalidate(cabinet_id)
+        RESPONSE_CACHE.track(session, Cabinet.__tablename__, [cabinet_id])
+
+        result = await session.scalars(
+            update(Cabinet)
+            .where(Cabinet.id == cabinet_id)
+            .values(slot_count=slot_count)
+            .returning(Cabinet)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        return result.one()
+
+
+SLOT_CRUD = _CRUDSlotSegment(CabinetSlotSegment)
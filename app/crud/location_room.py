@@ -0,0 +1,17 @@
+from typing import Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.database.table.location_room import Room
+from app.service.response_cache import RESPONSE_CACHE
+
+
+class _CRUDRoom(CRUDBase[Room]):
+    def after_write(
+        self, session: AsyncSession, rows: Sequence[Room], deleted: bool
+    ) -> None:
+        RESPONSE_CACHE.track(session, Room.__tablename__, (row.id for row in rows))
+
+
+ROOM_CRUD = _CRUDRoom(Room)
@@ -0,0 +1,82 @@
+from typing import Any, NamedTuple, Sequence
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import datetime
+
+from sqlalchemy import Column, ColumnElement, DateTime
+
+from app.exception.error_code import field_invalid
+
+
+class ListFilter(NamedTuple):
+    """列表查询的过滤条件和排序方式
+
+    分页时总是在排序列之后追加主键，排序列需要和过滤条件一起对应一个索引，
+    这样任意一页都只需要一次索引范围扫描。排序列不能为空值。
+    """
+
+    where: tuple[ColumnElement[bool], ...] = ()
+    order_by: tuple[Column, ...] = ()
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(key: Column, value: Any) -> Any:
+    if isinstance(key.type, DateTime):
+        return datetime.fromisoformat(value)
+    # bool 是 int 的子类， JSON 中的 true 不能作为 ID
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"invalid value for {key.key}")
+    return value
+
+
+def encode_cursor(keys: Sequence[Column], values: Sequence[Any]) -> str:
+    """将分页位置编码为不透明的游标
+
+    Args:
+        keys (Sequence[Column]): 排序列
+        values (Sequence[Any]): 当前页最后一条记录在排序列上的值
+
+    Returns:
+        str: 游标字符串
+    """
+    payload = {
+        "k": [key.key for key in keys],
+        "v": [_encode_value(value) for value in values],
+    }
+    data = json.dumps(payload, separators=(",", ":")).encode()
+    return urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, keys: Sequence[Column]) -> tuple[Any, ...]:
+    """解析游标
+
+    Args:
+        cursor (str): 上一页返回的游标
+        keys (Sequence[Column]): 当前查询的排序列
+
+    Raises:
+        HTTPException: 游标不合法或与当前查询的排序方式不一致时抛出异常
+
+    Returns:
+        tuple[Any, ...]: 排序列上的值
+    """
+    try:
+        data = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(data)
+        if payload["k"] != [key.key for key in keys]:
+            raise ValueError("cursor belongs to another ordering")
+        return tuple(
+            _decode_value(key, value)
+            for key, value in zip(keys, payload["v"], strict=True)
+        )
+    except (BinasciiError, ValueError, TypeError, KeyError) as error:
+        raise field_invalid(
+            "after", "Use the next_cursor returned by the previous page."
+        ) from error
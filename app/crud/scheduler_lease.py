@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.database.table.scheduler_lease import SchedulerLease
+from app.util.type.guid import GUID
+
+
+class _CRUDSchedulerLease(CRUDBase[SchedulerLease]):
+    async def acquire(
+        self, session: AsyncSession, job: str, owner: str, lease_seconds: float
+    ) -> bool:
+        """获取或续约后台任务的租约
+
+        租约没有持有者、已经过期或者由自己持有时更新持有者和过期时间，
+        多个进程同时获取时只有一个会成功。
+
+        Args:
+            session (AsyncSession): 数据库会话
+            job (str): 任务名称
+            owner (str): 租约持有者
+            lease_seconds (float): 租约时长（秒）
+
+        Returns:
+            bool: 是否持有租约
+        """
+        exists = await session.scalar(
+            select(SchedulerLease.id).where(SchedulerLease.job == job)
+        )
+        if exists is None:
+            await session.execute(
+                insert(SchedulerLease)
+                .values(
+                    id=GUID.generate().guid,
+                    job=job,
+                    lease_expire_at=func.now() - timedelta(seconds=1),
+                )
+                .on_conflict_do_nothing(index_elements=[SchedulerLease.job])
+            )
+
+        result = await session.execute(
+            update(SchedulerLease)
+            .where(
+                SchedulerLease.job == job,
+                or_(
+                    SchedulerLease.lease_owner == owner,
+                    SchedulerLease.lease_owner.is_(None),
+                    SchedulerLease.lease_expire_at <= func.now(),
+                ),
+            )
+            .values(
+                lease_owner=owner,
+                lease_expire_at=func.now() + timedelta(seconds=lease_seconds),
+            )
+            .returning(SchedulerLease.id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.one_or_none() is not None
+
+    async def release(self, session: AsyncSession, job: str, owner: str) -> None:
+        """释放自己持有的租约，其他进程可以立即获取
+
+        Args:
+            session (AsyncSession): 数据库会话
+            job (str): 任务名称
+            owner (str): 租约持有者
+        """
+        await session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.job == job, SchedulerLease.lease_owner == owner)
+            .values(lease_owner=None, lease_expire_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+
+LEASE_CRUD = _CRUDSchedulerLease(SchedulerLease)
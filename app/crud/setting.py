@@ -0,0 +1,35 @@
+from typing import Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.database.table.setting import Setting
+from app.service.setting_cache import SETTING_CACHE
+
+
+class _CRUDSetting(CRUDBase[Setting]):
+    def after_write(
+        self, session: AsyncSession, rows: Sequence[Setting], deleted: bool
+    ) -> None:
+        SETTING_CACHE.track(session, rows, deleted)
+
+    async def get_by_key(
+        self, session: AsyncSession, setting_key: str
+    ) -> Optional[Setting]:
+        """按照键名获取设置项
+
+        Args:
+            session (AsyncSession): 数据库会话
+            setting_key (str): 设置项键名
+
+        Returns:
+            Optional[Setting]: 设置项，不存在时返回 None
+        """
+        result = await session.scalars(
+            select(Setting).where(Setting.setting_key == setting_key)
+        )
+        return result.one_or_none()
+
+
+SETTING_CRUD = _CRUDSetting(Setting)
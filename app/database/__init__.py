@@ -1,29 +1,57 @@
-from typing import AsyncIterable
+from typing import Any, AsyncIterable, Optional
+
+from asyncio import Task, CancelledError, create_task, gather, sleep
+from itertools import count
 
 from sqlalchemy.engine.url import URL
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 
+from app.database.pool import MeteredQueuePool
+from app.database.routing import ReplicaState, RoutingSession
 from app.util.env import SETTINGS
 
 
-class _DataBaseEngine:
-    _CONNECT_URL: URL = URL.create(
+def _connect_url(host: Optional[str], port: Optional[int]) -> URL:
+    return URL.create(
         drivername="postgresql+asyncpg",
         username=SETTINGS.database.username,
         password=SETTINGS.database.password,
-        host=SETTINGS.database.host,
-        port=SETTINGS.database.port,
+        host=host,
+        port=port,
         database=SETTINGS.database.database_name,
         query={
-            "charset": "utf8mb4",
+            "prepared_statement_cache_size": str(
+                SETTINGS.database.statement_cache_size
+            ),
         },
     )
+
+
+class _DataBaseEngine:
+    _CONNECT_URL: URL = _connect_url(SETTINGS.database.host, SETTINGS.database.port)
     _engine: AsyncEngine
     _session_factory: sessionmaker
 
-    def __init__(self):
-        self._engine = create_async_engine(self._CONNECT_URL, echo=True)
+    def __init__(self, connect_url: Optional[URL] = None):
+        """创建数据库引擎
+
+        Args:
+            connect_url (Optional[URL], optional): 连接地址，为空时连接主库. Defaults to None.
+        """
+        settings = SETTINGS.database
+        self._engine = create_async_engine(
+            connect_url or self._CONNECT_URL,
+            echo=settings.echo,
+            poolclass=MeteredQueuePool,
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_recycle=settings.pool_recycle,
+            pool_pre_ping=settings.pool_pre_ping,
+            # asyncpg 自身的语句缓存，与上面的预编译语句缓存保持一致
+            connect_args={"statement_cache_size": settings.statement_cache_size},
+        )
         self._session_factory = sessionmaker(
             bind=self._engine,  # type: ignore
             class_=AsyncSession,
@@ -32,10 +60,20 @@ class _DataBaseEngine:
             expire_on_commit=True,
         )
 
+    @property
+    def engine(self) -> AsyncEngine:
+        """异步数据库引擎"""
+        return self._engine
+
     async def disconnect(self) -> None:
         """断开与数据库的连接"""
         await self._engine.dispose()
 
+    @property
+    def pool_stats(self) -> dict[str, Any]:
+        """连接池的统计信息（连接数、等待数量和获取连接的等待时间）"""
+        return self._engine.sync_engine.pool.stats  # type: ignore
+
     async def get_session(self) -> AsyncIterable[Session]:
         """获取一个与数据库的会话
 
@@ -45,18 +83,137 @@ class _DataBaseEngine:
         async with self._session_factory() as session:
             yield session
 
+    def new_session(self) -> AsyncSession:
+        """创建一个新的数据库会话，用于请求之外的后台任务
+
+        Returns:
+            AsyncSession: 数据库会话（需要使用 async with 管理生命周期）
+        """
+        return self._session_factory()
+
+
+class _ReplicaEngine(_DataBaseEngine):
+    """从库引擎，定期检查复制延迟"""
+
+    def __init__(self, host: str, port: Optional[int]):
+        super().__init__(_connect_url(host, port))
+        self.state = ReplicaState(
+            f"{host}:{port}", SETTINGS.database.replica_max_lag_seconds  # type: ignore
+        )
+
+    async def check(self) -> bool:
+        """检查复制延迟
+
+        Returns:
+            bool: 从库是否可以参与读取
+        """
+        timeout: float = SETTINGS.database.replica_check_interval  # type: ignore
+        return await self.state.check(self._engine, max(timeout, 1.0))
+
+
+def _parse_replica_host(address: str) -> tuple[str, Optional[int]]:
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        return address, SETTINGS.database.port
+    return host, int(port)
+
 
 class _DataBaseClient:
     client: _DataBaseEngine
+    replicas: list[_ReplicaEngine]
+
+    def __init__(self):
+        self.replicas = []
+        self._replica_cursor = count()
+        self._monitor: Optional[Task] = None
 
     def connect_database(self) -> None:
-        """连接到数据库"""
+        """连接到数据库（主库和配置的全部从库）"""
         self.client = _DataBaseEngine()
+        self.replicas = [
+            _ReplicaEngine(*_parse_replica_host(address))
+            for address in SETTINGS.database.replica_hosts  # type: ignore
+        ]
+
+    async def start_replica_monitor(self) -> None:
+        """检查一次全部从库的复制延迟，并启动后台定期检查"""
+        if not self.replicas:
+            return
+        await gather(*(replica.check() for replica in self.replicas))
+        self._monitor = create_task(self._monitor_replicas())
+
+    async def _monitor_replicas(self) -> None:
+        interval: float = SETTINGS.database.replica_check_interval  # type: ignore
+        try:
+            while True:
+                await sleep(interval)
+                await gather(*(replica.check() for replica in self.replicas))
+        except CancelledError:
+            pass
 
     async def disconnect_database(self) -> None:
         """断开与数据库的连接"""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await gather(self._monitor, return_exceptions=True)
+            self._monitor = None
+        for replica in self.replicas:
+            await replica.disconnect()
         if self.client is not None:
             await self.client.disconnect()
 
+    def _choose_replica(self) -> Optional[_ReplicaEngine]:
+        healthy = [replica for replica in self.replicas if replica.state.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._replica_cursor) % len(healthy)]
+
+    def new_read_session(self) -> AsyncSession:
+        """创建一个读写分离的会话
+
+        查询轮流使用复制延迟正常的从库，写入之后整个会话改为使用主库。
+        没有可用的从库时只使用主库。
+
+        Returns:
+            AsyncSession: 数据库会话（需要使用 async with 管理生命周期）
+        """
+        replica = self._choose_replica()
+        return AsyncSession(
+            sync_session_class=RoutingSession,
+            primary=self.client.engine.sync_engine,
+            replica=None if replica is None else replica.engine.sync_engine,
+            autocommit=False,
+            expire_on_commit=True,
+        )
+
+    async def get_session(self) -> AsyncIterable[AsyncSession]:
+        """获取一个与主库的会话，用于 FastAPI 的依赖注入
+
+        Returns:
+            AsyncIterable[AsyncSession]: 数据库会话
+        """
+        async for session in self.client.get_session():
+            yield session  # type: ignore
+
+    async def get_read_session(self) -> AsyncIterable[AsyncSession]:
+        """获取一个读写分离的会话，用于只读接口的依赖注入
+
+        Returns:
+            AsyncIterable[AsyncSession]: 数据库会话
+        """
+        async with self.new_read_session() as session:
+            yield session
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """主库和从库的连接池及复制延迟信息"""
+        return {
+            "primary": self.client.pool_stats,
+            "replicas": [
+                {**replica.state.stats, "pool": replica.pool_stats}
+                for replica in self.replicas
+            ],
+        }
+
 
 DB = _DataBaseClient()
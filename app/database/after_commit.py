@@ -0,0 +1,74 @@
+from typing import Any, Callable, NamedTuple, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from loguru import logger
+
+# 会话中等待事务结束后处理的变更，按照调用方的键分别保存
+_HOOKS_KEY = "after_commit_hooks"
+
+_PendingT = TypeVar("_PendingT")
+
+
+class _Hook(NamedTuple):
+    pending: Any
+    on_commit: Optional[Callable[[Any], None]]
+    on_rollback: Optional[Callable[[Any], None]]
+
+
+def on_commit(
+    session: AsyncSession,
+    key: str,
+    factory: Callable[[], _PendingT],
+    callback: Optional[Callable[[_PendingT], None]],
+    on_rollback: Optional[Callable[[_PendingT], None]] = None,
+) -> _PendingT:
+    """获取会话中等待事务提交后处理的变更，用于在提交之后更新进程内的缓存
+
+    同一个会话中使用相同键的调用共享同一个变更容器，调用方直接修改返回的容器。
+    事务提交后按照第一次调用的顺序把容器传给 callback ；回滚时丢弃容器，
+    传入 on_rollback 时先把容器传给它。回调抛出的异常只记录日志，不影响其他回调。
+
+    Args:
+        session (AsyncSession): 数据库会话
+        key (str): 调用方的键，不同的缓存使用不同的键
+        factory (Callable[[], _PendingT]): 会话中第一次调用时创建变更容器
+        callback (Optional[Callable[[_PendingT], None]]): 事务提交后处理变更
+        on_rollback (Optional[Callable[[_PendingT], None]], optional): 事务回滚后处理变更. Defaults to None.
+
+    Returns:
+        _PendingT: 变更容器
+    """
+    sync_session = session.sync_session
+    hooks: Optional[dict[str, _Hook]] = sync_session.info.get(_HOOKS_KEY)
+    if hooks is None:
+        hooks = sync_session.info[_HOOKS_KEY] = {}
+        if not event.contains(sync_session, "after_commit", _after_commit):
+            event.listen(sync_session, "after_commit", _after_commit)
+            event.listen(sync_session, "after_rollback", _after_rollback)
+
+    hook = hooks.get(key)
+    if hook is None:
+        hook = hooks[key] = _Hook(factory(), callback, on_rollback)
+    return hook.pending
+
+
+def _run(hooks: Optional[dict[str, _Hook]], committed: bool) -> None:
+    for key, hook in (hooks or {}).items():
+        callback = hook.on_commit if committed else hook.on_rollback
+        if callback is None:
+            continue
+        try:
+            callback(hook.pending)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(f"can not apply {key} after the transaction")
+
+
+def _after_commit(sync_session: Session) -> None:
+    _run(sync_session.info.pop(_HOOKS_KEY, None), True)
+
+
+def _after_rollback(sync_session: Session) -> None:
+    _run(sync_session.info.pop(_HOOKS_KEY, None), False)
@@ -0,0 +1,71 @@
+from typing import Any
+
+from time import perf_counter
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+from app.util.metrics import Histogram
+
+# 获取连接等待时间的直方图分桶上限（毫秒），空闲连接通常在 1 毫秒内就能取得
+CHECKOUT_WAIT_BUCKETS_MS: tuple[float, ...] = (
+    0.1,
+    0.5,
+    1,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+    30000,
+)
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """记录连接等待情况的连接池
+
+    等待时间包括连接池已空、需要建立新连接时的连接耗时。
+    调用 dispose 后引擎会创建新的连接池，统计数据随之重置。
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._checkout_wait = Histogram(CHECKOUT_WAIT_BUCKETS_MS)
+        self._waiting = 0
+        self._max_waiting = 0
+        self._timeouts = 0
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        self._waiting += 1
+        self._max_waiting = max(self._max_waiting, self._waiting)
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self._timeouts += 1
+            raise
+        finally:
+            self._waiting -= 1
+            self._checkout_wait.observe((perf_counter() - start) * 1000)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """连接池的统计信息"""
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout": self._timeout,
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": self.overflow(),
+            "waiting": self._waiting,
+            "max_waiting": self._max_waiting,
+            "timeouts": self._timeouts,
+            "checkout_wait_ms": self._checkout_wait.snapshot(),
+        }
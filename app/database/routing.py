@@ -0,0 +1,128 @@
+from typing import Any, Optional
+
+from time import time
+from asyncio import TimeoutError as AsyncTimeoutError, wait_for
+
+from sqlalchemy import Engine, Select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from loguru import logger
+
+# 主库（非恢复状态）的延迟视为 0 ，从库收到的 WAL 都已回放时也没有延迟
+_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class ReplicaState:
+    """从库的复制延迟和可用状态"""
+
+    def __init__(self, name: str, max_lag_seconds: float):
+        """初始化从库状态，第一次检查之前从库不会参与读取
+
+        Args:
+            name (str): 从库名称（主机地址和端口）
+            max_lag_seconds (float): 允许的最大复制延迟（秒）
+        """
+        self.name = name
+        self.max_lag_seconds = max_lag_seconds
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    async def check(self, engine: AsyncEngine, timeout: float) -> bool:
+        """查询从库的复制延迟，超过上限、无法连接或超时时移出读取轮换
+
+        Args:
+            engine (AsyncEngine): 从库的引擎
+            timeout (float): 查询的超时时间（秒）
+
+        Returns:
+            bool: 从库是否可用
+        """
+        try:
+            lag = await wait_for(self._query_lag(engine), timeout)
+            self.lag_seconds = None if lag is None else float(lag)
+            self.last_error = None
+        except AsyncTimeoutError:
+            self.lag_seconds = None
+            self.last_error = f"lag check timed out after {timeout} s"
+        except (SQLAlchemyError, OSError) as error:
+            self.lag_seconds = None
+            self.last_error = str(error)
+
+        first_check = self.checked_at is None
+        self.checked_at = time()
+        healthy = (
+            self.lag_seconds is not None and self.lag_seconds <= self.max_lag_seconds
+        )
+        if healthy != self.healthy or first_check:
+            if healthy:
+                logger.info(f"replica {self.name} joined the read rotation")
+            else:
+                reason = self.last_error or f"lag {self.lag_seconds} s"
+                logger.warning(f"replica {self.name} left the read rotation: {reason}")
+        self.healthy = healthy
+        return healthy
+
+    @staticmethod
+    async def _query_lag(engine: AsyncEngine) -> Any:
+        async with engine.connect() as connection:
+            return (await connection.execute(_LAG_QUERY)).scalar()
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """从库的状态信息"""
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+            "checked_at": self.checked_at,
+            "last_error": self.last_error,
+        }
+
+
+def _is_write(clause: Any) -> bool:
+    if isinstance(clause, UpdateBase):
+        return True
+    return isinstance(clause, Select) and clause._for_update_arg is not None
+
+
+class RoutingSession(Session):
+    """读写分离的会话
+
+    查询在从库上执行；写入（包括 flush 和 SELECT ... FOR UPDATE ）在主库上执行，
+    并且之后的所有语句都使用主库，保证会话能读到自己写入的数据。
+    """
+
+    def __init__(
+        self, *, primary: Engine, replica: Optional[Engine] = None, **kwargs: Any
+    ):
+        """初始化会话
+
+        Args:
+            primary (Engine): 主库引擎
+            replica (Optional[Engine], optional): 从库引擎，为空时只使用主库. Defaults to None.
+        """
+        super().__init__(**kwargs)
+        self._primary = primary
+        self._replica = replica
+        self.sticky = replica is None
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Engine:
+        if not self.sticky and (self._flushing or _is_write(clause)):
+            self.sticky = True
+        if self.sticky:
+            return self._primary
+        return self._replica  # type: ignore
@@ -0,0 +1,62 @@
+from typing import Optional
+
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, BigInteger, DateTime, Index, Integer
+from sqlalchemy import Enum as SQLAlchemyEnum
+
+from app.database.table import Base
+from app.util.type.enum import ValidatedEnum
+
+
+class RecomputeStatus(ValidatedEnum):
+    PENDING = 0
+    RUNNING = 1
+    FINISHED = 2
+
+
+class ExpireRecomputeJob(Base):
+    """修改器械分类的过期时长后，重新计算该分类下器械过期时间的任务
+
+    任务按照器械 ID 分段执行，每一段单独提交并记录已经处理到的 ID ，中断后从记录的位置继续。
+    """
+
+    __tablename__ = "expire_recompute_job"
+    __table_args__ = (Index("ix_expire_recompute_job_category_id", "category", "id"),)
+
+    category = Column(BigInteger, nullable=False, comment="器械分类")
+    old_duration_MS = Column(BigInteger, nullable=True, comment="修改前的过期时长")
+    new_duration_MS = Column(BigInteger, nullable=True, comment="修改后的过期时长")
+
+    status = Column(
+        SQLAlchemyEnum(RecomputeStatus),
+        nullable=False,
+        default=RecomputeStatus.PENDING,
+        comment="任务状态",
+    )
+    upper_bound = Column(
+        BigInteger, nullable=False, comment="需要处理的最大器械 ID ，之后创建的器械已经使用新的过期时长"
+    )
+    last_id = Column(BigInteger, nullable=False, default=0, comment="已经处理到的器械 ID")
+    total = Column(Integer, nullable=True, comment="需要处理的器械数量，开始执行时统计")
+    processed = Column(Integer, nullable=False, default=0, comment="已经处理的器械数量")
+    started_at = Column(DateTime, nullable=True, comment="开始执行的时间（UTC）")
+    finished_at = Column(DateTime, nullable=True, comment="完成的时间（UTC）")
+
+    @property
+    def progress(self) -> Optional[float]:
+        """已经处理的比例，还没有开始执行时为 None"""
+        if self.status is RecomputeStatus.FINISHED:
+            return 1.0
+        if not self.total:
+            return None
+        return min(self.processed / self.total, 1.0)
+
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        """从开始执行到完成（或者到现在）平均每秒处理的器械数量"""
+        if self.started_at is None:
+            return None
+        end = self.finished_at or datetime.now(timezone.utc).replace(tzinfo=None)
+        seconds = (end - self.started_at).total_seconds()
+        return round(self.processed / seconds, 1) if seconds > 0 else None
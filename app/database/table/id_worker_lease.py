@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, BigInteger, Integer, DateTime, func
+
+from app.database.table import Base
+from app.util.string_length import MIDDLE_LENGTH
+
+
+class IDWorkerLease(Base):
+    """雪花 ID 生成器的 worker 序号租约
+
+    记录 ID 为 (data_center << 8) | worker ，每个序号同一时间只能被一个服务进程持有。
+    """
+
+    __tablename__ = "id_worker_lease"
+
+    data_center = Column(Integer, nullable=False, comment="数据中心序号")
+    worker = Column(Integer, nullable=False, comment="机器序号")
+
+    lease_owner = Column(String(MIDDLE_LENGTH), nullable=True, comment="租约持有者")
+    lease_expire_at = Column(
+        DateTime, nullable=False, server_default=func.now(), comment="租约过期时间"
+    )
+    last_timestamp_ms = Column(
+        BigInteger, nullable=False, default=0, comment="持有者最后生成 ID 时使用的时间戳"
+    )
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, BigInteger, DateTime, Index
+from sqlalchemy import Enum as SQLAlchemyEnum
+
+from app.database.table import Base
+from app.util.type.enum import ValidatedEnum
+
+
+class InstrumentEventType(ValidatedEnum):
+    EXPIRED = 0
+
+
+class InstrumentEvent(Base):
+    """器械生命周期中发生的事件，例如到达过期时间后被标记为已过期"""
+
+    __tablename__ = "instrument_events"
+    __table_args__ = (Index("ix_instrument_events_instrument_id", "instrument", "id"),)
+
+    instrument = Column(BigInteger, nullable=False, comment="器械")
+    event_type = Column(
+        SQLAlchemyEnum(InstrumentEventType), nullable=False, comment="事件类型"
+    )
+    occurred_at = Column(DateTime, nullable=False, comment="事件发生的时间（UTC）")
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, BigInteger, DateTime, Integer, Index
+
+from app.database.table import Base
+
+
+class InstrumentExpiryBucket(Base):
+    """按小时统计的即将过期的器械数量
+
+    与器械在同一个事务中增量更新，过期预测只需要汇总这些计数，不需要扫描器械表。
+    按照存储柜而不是房间统计，存储柜移动到其他房间时不需要调整计数。
+    """
+
+    __tablename__ = "instrument_expiry_bucket"
+    __table_args__ = (
+        Index(
+            "ix_instrument_expiry_bucket_bucket_cabinet_category",
+            "bucket",
+            "cabinet",
+            "category",
+            unique=True,
+        ),
+    )
+
+    bucket = Column(DateTime, nullable=False, comment="过期时间所在小时的开始时间")
+    cabinet = Column(BigInteger, nullable=False, comment="所在存储柜")
+    category = Column(BigInteger, nullable=False, comment="器械类别")
+    count = Column(Integer, nullable=False, default=0, comment="器械数量")
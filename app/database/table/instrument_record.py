@@ -1,12 +1,48 @@
-from sqlalchemy import Column, BigInteger, DateTime
+from sqlalchemy import Column, BigInteger, DateTime, Integer, Index, text
+from sqlalchemy import Enum as SQLAlchemyEnum
 
 from app.database.table import Base
+from app.util.type.enum import ValidatedEnum
+
+
+class InstrumentStatus(ValidatedEnum):
+    NORMAL = 0
+    EXPIRED = 1
 
 
 class Instrument(Base):
     __tablename__ = "instruments"
+    __table_args__ = (
+        # 列表接口按照这些列过滤时，分页使用的 (列, id) 顺序可以直接走索引
+        Index("ix_instruments_located_cabinet_id", "located_cabinet", "id"),
+        Index("ix_instruments_instrument_category_id", "instrument_category", "id"),
+        Index("ix_instruments_expire_time_id", "expire_time", "id"),
+        # 只索引还没有过期的器械，过期任务按照过期时间分段加载
+        Index(
+            "ix_instruments_pending_expire_time",
+            "expire_time",
+            "id",
+            postgresql_where=text("status = 'NORMAL' AND expire_time IS NOT NULL"),
+        ),
+        # 同一个存储柜中的槽位只能被一个器械占用
+        Index(
+            "ix_instruments_located_cabinet_slot",
+            "located_cabinet",
+            "slot",
+            unique=True,
+            postgresql_where=text("slot IS NOT NULL"),
+        ),
+    )
 
-    loacted_cabinet = Column(BigInteger, nullable=False, comment="所在存储柜")
+    located_cabinet = Column(BigInteger, nullable=False, comment="所在存储柜")
     instrument_category = Column(BigInteger, nullable=False, comment="所属分类")
 
     expire_time = Column(DateTime, comment="过期时间")  # 与器械分类中的过期时间一致， Null 表示永不过期
+    slot = Column(Integer, nullable=True, comment="占用的槽位，存储柜没有槽位时为空")
+    status = Column(
+        SQLAlchemyEnum(InstrumentStatus),
+        nullable=False,
+        default=InstrumentStatus.NORMAL,
+        server_default=InstrumentStatus.NORMAL.name,
+        comment="器械状态，到达过期时间后由过期任务修改为已过期",
+    )
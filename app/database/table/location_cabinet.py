@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, BigInteger, Integer
+from sqlalchemy import Column, String, BigInteger, Integer, text
 from sqlalchemy import Enum as SQLAlchemyEnum
 
 from app.database.table import Base
@@ -24,6 +24,20 @@ class Cabinet(Base):
 
     max_number = Column(Integer, nullable=False, default=0, comment="最大容量")
     current_number = Column(Integer, nullable=False, default=0, comment="当前容量")
+    counter_shards = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default=text("0"),
+        comment="容量分片数量，为 0 时直接更新当前容量",
+    )
+    slot_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default=text("0"),
+        comment="槽位数量，为 0 时不记录器械占用的槽位",
+    )
 
     status = Column(
         SQLAlchemyEnum(CabinetStatus),
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, BigInteger, Integer, Index
+
+from app.database.table import Base
+
+
+class CabinetCounterShard(Base):
+    """热点存储柜的容量分片
+
+    存储柜的最大容量平均分配到各个分片，器械存取时只锁定其中一个分片，
+    存储柜中的当前容量和状态由后台任务定期汇总。
+    """
+
+    __tablename__ = "location_cabinet_counter_shard"
+    __table_args__ = (
+        Index(
+            "ix_location_cabinet_counter_shard_cabinet_shard",
+            "cabinet",
+            "shard",
+            unique=True,
+        ),
+    )
+
+    cabinet = Column(BigInteger, nullable=False, comment="所属存储柜")
+    shard = Column(Integer, nullable=False, comment="分片序号")
+
+    max_number = Column(Integer, nullable=False, default=0, comment="分片最大容量")
+    current_number = Column(Integer, nullable=False, default=0, comment="分片当前容量")
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, BigInteger, Integer, DateTime, Index, text
+from sqlalchemy import Enum as SQLAlchemyEnum
+
+from app.database.table import Base
+from app.util.type.enum import ValidatedEnum
+
+
+class ReservationStatus(ValidatedEnum):
+    ACTIVE = 0
+    CONFIRMED = 1
+    RELEASED = 2
+    EXPIRED = 3
+
+
+class CabinetReservation(Base):
+    """存储柜的容量预留
+
+    预留的容量在创建时就计入存储柜的当前容量，确认后转为已占用的容量，
+    释放或过期时归还到存储柜。
+    """
+
+    __tablename__ = "location_cabinet_reservation"
+    __table_args__ = (
+        # 只索引未到期的预留，过期任务按照过期时间范围查询
+        Index(
+            "ix_location_cabinet_reservation_active_expires_at",
+            "expires_at",
+            postgresql_where=text("status = 'ACTIVE'"),
+        ),
+    )
+
+    cabinet = Column(BigInteger, nullable=False, comment="预留的存储柜")
+    slots = Column(Integer, nullable=False, comment="预留的容量")
+
+    status = Column(
+        SQLAlchemyEnum(ReservationStatus),
+        nullable=False,
+        default=ReservationStatus.ACTIVE,
+        comment="预留状态",
+    )
+    expires_at = Column(DateTime, nullable=False, comment="过期时间（UTC）")
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, BigInteger, Integer, Index
+from sqlalchemy.dialects.postgresql import BIT
+
+from app.database.table import Base
+
+# 每一段位图包含的槽位数量
+SEGMENT_SLOTS = 1024
+
+
+class CabinetSlotSegment(Base):
+    """存储柜槽位占用位图的一段
+
+    槽位按照 SEGMENT_SLOTS 分段保存，每一段是一个定长的位串，为 1 的位表示槽位已被占用，
+    最后一段中超出槽位数量的位始终为 1 。修改占用时只锁定涉及到的段，不会锁定整个存储柜。
+    """
+
+    __tablename__ = "location_cabinet_slot_segment"
+    __table_args__ = (
+        Index(
+            "ix_location_cabinet_slot_segment_cabinet_segment",
+            "cabinet",
+            "segment",
+            unique=True,
+        ),
+    )
+
+    cabinet = Column(BigInteger, nullable=False, comment="所属存储柜")
+    segment = Column(Integer, nullable=False, comment="分段序号")
+    occupancy = Column(
+        BIT(SEGMENT_SLOTS, varying=True), nullable=False, comment="槽位占用位图"
+    )
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, DateTime, func
+
+from app.database.table import Base
+from app.util.string_length import MIDDLE_LENGTH, SHORT_LENGTH
+
+
+class SchedulerLease(Base):
+    """后台任务的租约，同一个任务同一时间只由持有租约的服务进程执行"""
+
+    __tablename__ = "scheduler_lease"
+
+    job = Column(String(SHORT_LENGTH), nullable=False, unique=True, comment="任务名称")
+    lease_owner = Column(String(MIDDLE_LENGTH), nullable=True, comment="租约持有者")
+    lease_expire_at = Column(
+        DateTime, nullable=False, server_default=func.now(), comment="租约过期时间"
+    )
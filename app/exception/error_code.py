@@ -43,3 +43,81 @@ def field_invalid(arg_name: str, except_info: str) -> HTTPException:
         status_code=status.HTTP_400_BAD_REQUEST,
         detail=f"Arguments {arg_name} is invalid. {except_info}",
     )
+
+
+def storage_forbidden(category: int, cabinet: int) -> HTTPException:
+    """生成存储规则不允许存放异常对象
+
+    Args:
+        category (int): 器械类别 ID
+        cabinet (int): 存储柜 ID
+
+    Returns:
+        HTTPException: 生成的 HTTP 异常对象
+    """
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail=f"Instrument category {category} is not allowed in cabinet {cabinet}.",
+    )
+
+
+def capacity_exceeded(cabinet: int) -> HTTPException:
+    """生成存储柜容量不足异常对象
+
+    Args:
+        cabinet (int): 存储柜 ID
+
+    Returns:
+        HTTPException: 生成的 HTTP 异常对象
+    """
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Cabinet {cabinet} is disabled or does not have enough capacity.",
+    )
+
+
+def reservation_closed(reservation: int, state: str) -> HTTPException:
+    """生成容量预留已经结束异常对象
+
+    Args:
+        reservation (int): 预留 ID
+        state (str): 预留的状态（ confirmed 、 released 或 expired ）
+
+    Returns:
+        HTTPException: 生成的 HTTP 异常对象
+    """
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Reservation {reservation} is already {state}.",
+    )
+
+
+def slots_exhausted(cabinet: int) -> HTTPException:
+    """生成存储柜空闲槽位不足异常对象
+
+    Args:
+        cabinet (int): 存储柜 ID
+
+    Returns:
+        HTTPException: 生成的 HTTP 异常对象
+    """
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Cabinet {cabinet} does not have enough free slots.",
+    )
+
+
+def slot_occupied(cabinet: int, slot: int) -> HTTPException:
+    """生成槽位已被占用异常对象
+
+    Args:
+        cabinet (int): 存储柜 ID
+        slot (int): 槽位序号
+
+    Returns:
+        HTTPException: 生成的 HTTP 异常对象
+    """
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Slot {slot} of cabinet {cabinet} is occupied.",
+    )
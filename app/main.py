@@ -1,7 +1,6 @@
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 
 from starlette.exceptions import HTTPException
 from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
@@ -9,9 +8,17 @@ from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
 from app.api import root_router
 from app.database import DB
 from app.exception import handler
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.conditional_get import ConditionalGetMiddleware
+from app.middleware.response_cache import ResponseCacheMiddleware
+from app.service.cabinet_capacity import COUNTER_SHARD_ROLLUP
+from app.service.cabinet_reservation import RESERVATION_EXPIRY
+from app.service.expire_recompute import EXPIRE_RECOMPUTE
+from app.service.instrument_expiry import INSTRUMENT_EXPIRY
+from app.service.setting_cache import SETTING_CACHE
 from app.util.log import LOG
 from app.util.env import SETTINGS
-from app.util.type.guid import init_snowflake_client
+from app.util.type.guid import init_snowflake_client, close_snowflake_client
 
 app = FastAPI(
     title=SETTINGS.docs.docs_title,
@@ -27,9 +34,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-app.add_middleware(GZipMiddleware, minimum_size=SETTINGS.service.gzip_min_size)
+app.add_middleware(CompressionMiddleware, minimum_size=SETTINGS.service.gzip_min_size)
+
+# 在压缩中间件的外层，根据压缩后的响应体生成 ETag
+app.add_middleware(ConditionalGetMiddleware)
+
+# 在条件请求中间件的外层，缓存压缩后带有 ETag 的响应
+app.add_middleware(ResponseCacheMiddleware)
 
 if SETTINGS.service.use_https_only:
     app.add_middleware(HTTPSRedirectMiddleware)
@@ -39,8 +53,21 @@ if SETTINGS.service.use_https_only:
 # 启动事件
 app.add_event_handler("startup", LOG.start_logging)
 app.add_event_handler("startup", DB.connect_database)
+app.add_event_handler("startup", DB.start_replica_monitor)
+app.add_event_handler("startup", SETTING_CACHE.start)
+app.add_event_handler("startup", COUNTER_SHARD_ROLLUP.start)
+app.add_event_handler("startup", RESERVATION_EXPIRY.start)
 app.add_event_handler("startup", init_snowflake_client)
+# 过期事件和重新计算任务的 ID 由 ID 生成器生成
+app.add_event_handler("startup", INSTRUMENT_EXPIRY.start)
+app.add_event_handler("startup", EXPIRE_RECOMPUTE.start)
 # 结束事件
+app.add_event_handler("shutdown", EXPIRE_RECOMPUTE.stop)
+app.add_event_handler("shutdown", INSTRUMENT_EXPIRY.stop)
+app.add_event_handler("shutdown", RESERVATION_EXPIRY.stop)
+app.add_event_handler("shutdown", COUNTER_SHARD_ROLLUP.stop)
+app.add_event_handler("shutdown", SETTING_CACHE.stop)
+app.add_event_handler("shutdown", close_snowflake_client)
 app.add_event_handler("shutdown", DB.disconnect_database)
 app.add_event_handler("shutdown", LOG.stop_logging)
 
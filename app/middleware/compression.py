@@ -0,0 +1,97 @@
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.middleware.conditional_get import encoded_etag, etag_of, find_etag
+from app.service.compression import (
+    COMPRESSION_CACHE,
+    Codec,
+    StreamCompressor,
+    negotiate,
+)
+
+# 响应缓存在请求中设置这个键，表示响应会被缓存，使用较高的压缩等级
+CACHED_SCOPE_KEY = "response_cache.cacheable"
+
+
+class CompressionMiddleware:
+    """按照 Accept-Encoding 使用 zstd 、 brotli 或 gzip 压缩响应
+
+    一次性发送的响应压缩整个响应体，压缩结果按照未压缩响应体的 ETag 缓存，这个摘要只计算一次，
+    路由没有设置 ETag 时同时用来生成压缩后响应的 ETag ；分段发送的响应（例如导出）
+    使用流式压缩器逐段压缩。已经压缩过的响应和小于最小长度的响应原样发送。
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codec = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+
+        cached: bool = scope.get(CACHED_SCOPE_KEY, False)
+        start: Optional[Message] = None
+        passthrough = False
+        compressor: Optional[StreamCompressor] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                passthrough = "content-encoding" in Headers(raw=message["headers"])
+                if passthrough:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough or start is None:
+                await send(message)
+                return
+
+            body: bytes = message.get("body", b"")
+            more_body: bool = message.get("more_body", False)
+            if compressor is not None:
+                # 流式响应的后续分段
+                data = compressor.compress(body)
+                if not more_body:
+                    data += compressor.flush()
+                await send({**message, "body": data})
+                return
+
+            if not more_body:
+                if len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+                etag = etag_of(body)
+                data = await COMPRESSION_CACHE.compress(codec, body, cached, etag)
+                _set_encoding(start, codec, len(data))
+                if find_etag(start["headers"]) is None:
+                    MutableHeaders(scope=start)["ETag"] = encoded_etag(
+                        etag, f"{codec.name}{codec.level(cached)}"
+                    ).decode()
+                await send(start)
+                await send({**message, "body": data})
+                return
+
+            compressor = codec.compressor(codec.dynamic_level)
+            _set_encoding(start, codec, None)
+            await send(start)
+            await send({**message, "body": compressor.compress(body)})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _set_encoding(start: Message, codec: Codec, length: Optional[int]) -> None:
+    headers = MutableHeaders(scope=start)
+    headers["Content-Encoding"] = codec.name
+    if length is None:
+        del headers["Content-Length"]
+    else:
+        headers["Content-Length"] = str(length)
+    headers.add_vary_header("Accept-Encoding")
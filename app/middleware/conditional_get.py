@@ -0,0 +1,157 @@
+from typing import Optional
+
+from hashlib import blake2b
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# 304 响应中不包含的响应头（没有响应体）
+_ENTITY_HEADERS = {b"content-length", b"content-type", b"content-encoding"}
+
+
+def etag_of(body: bytes) -> bytes:
+    """根据响应体生成强 ETag ，不同压缩方式的响应体不同， ETag 也不同
+
+    Args:
+        body (bytes): 响应体
+
+    Returns:
+        bytes: 带引号的 ETag
+    """
+    return b'"' + blake2b(body, digest_size=16).hexdigest().encode() + b'"'
+
+
+def encoded_etag(etag: bytes, encoding: str) -> bytes:
+    """根据未压缩响应体的 ETag 生成压缩后响应的强 ETag ，不需要再计算压缩后响应体的摘要
+
+    Args:
+        etag (bytes): 未压缩响应体的 ETag
+        encoding (str): 压缩方式和压缩等级
+
+    Returns:
+        bytes: 带引号的 ETag
+    """
+    return etag[:-1] + b"-" + encoding.encode() + b'"'
+
+
+def version_etag(*parts: object) -> bytes:
+    """根据记录的 ID 和行版本生成弱 ETag ，不需要先渲染响应体
+
+    弱 ETag 表示语义相同，不同压缩方式的响应使用同一个 ETag 。
+
+    Args:
+        *parts (object): 决定响应内容的值，例如资源类型、分页大小、记录 ID 和行版本
+
+    Returns:
+        bytes: 带引号的弱 ETag
+    """
+    digest = blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return b'W/"' + digest.encode() + b'"'
+
+
+def find_etag(headers: list[tuple[bytes, bytes]]) -> Optional[bytes]:
+    """从响应头中查找 ETag
+
+    Args:
+        headers (list[tuple[bytes, bytes]]): 响应头
+
+    Returns:
+        Optional[bytes]: ETag ，没有时返回 None
+    """
+    return next((value for name, value in headers if name == b"etag"), None)
+
+
+def none_match(request_headers: Headers, etag: bytes) -> bool:
+    """请求头 If-None-Match 中是否包含这个 ETag （按照弱比较）
+
+    Args:
+        request_headers (Headers): 请求头
+        etag (bytes): 响应的 ETag
+
+    Returns:
+        bool: 包含时客户端缓存的响应仍然有效，应该返回 304
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    etag_value = etag.decode().removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag_value:
+            return True
+    return False
+
+
+def not_modified(headers: list[tuple[bytes, bytes]]) -> Message:
+    """生成 304 响应的开始消息，保留 ETag 、 Vary 和跨域等响应头
+
+    Args:
+        headers (list[tuple[bytes, bytes]]): 原本的响应头
+
+    Returns:
+        Message: ASGI 响应开始消息
+    """
+    return {
+        "type": "http.response.start",
+        "status": 304,
+        "headers": [
+            (name, value) for name, value in headers if name not in _ENTITY_HEADERS
+        ],
+    }
+
+
+class ConditionalGetMiddleware:
+    """为 GET 请求的 200 响应添加强 ETag ，并按照 If-None-Match 返回 304
+
+    路由或压缩中间件已经设置 ETag 时（例如根据行版本生成的弱 ETag ）直接使用，不再计算响应体的摘要；
+    否则 ETag 由最终的响应体计算，需要注册在压缩中间件的外层。
+    只处理一次性发送的响应，流式响应（例如导出）原样发送，不会被缓冲。
+    注册在响应缓存的内层时，缓存命中的请求由响应缓存直接返回 304 ，不需要加载和序列化数据。
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        start: Optional[Message] = None
+        streaming = False
+
+        async def send_with_etag(message: Message) -> None:
+            nonlocal start, streaming
+            if message["type"] == "http.response.start":
+                if message["status"] != 200:
+                    streaming = True
+                    await send(message)
+                else:
+                    # 等到响应体后才能计算 ETag
+                    start = message
+                return
+            if message["type"] != "http.response.body" or streaming or start is None:
+                await send(message)
+                return
+
+            body: bytes = message.get("body", b"")
+            if message.get("more_body", False):
+                streaming = True
+                await send(start)
+                await send(message)
+                return
+
+            headers = list(start.get("headers", ()))
+            etag = find_etag(headers)
+            if etag is None:
+                etag = etag_of(body)
+                headers.append((b"etag", etag))
+            if none_match(request_headers, etag):
+                await send(not_modified(headers))
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send({**start, "headers": headers})
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
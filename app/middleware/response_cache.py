@@ -0,0 +1,215 @@
+from typing import Hashable, NamedTuple, Optional
+
+from time import monotonic
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.database.table.instrument_category import InstrumentCategory
+from app.database.table.instrument_storage_rule import InstrumentStorageRule
+from app.database.table.instrument_storage_rule_record import StorageRuleRecord
+from app.database.table.location_cabinet import Cabinet
+from app.database.table.location_room import Room
+from app.middleware.compression import CACHED_SCOPE_KEY
+from app.middleware.conditional_get import find_etag, none_match, not_modified
+from app.service.response_cache import (
+    RESPONSE_CACHE,
+    CachedResponse,
+    item_tag,
+    table_tag,
+)
+from app.service.single_flight import SINGLE_FLIGHT, SingleFlightTimeout
+from app.util.env import SETTINGS
+from app.util.type.guid import GUID
+
+# 缓存的资源路径和对应的表，只缓存资源列表和单条记录，子资源（例如存储柜的槽位）依赖其他表，不做缓存
+_CACHED_RESOURCES: dict[str, str] = {
+    "/api/v1/rooms": Room.__tablename__,
+    "/api/v1/cabinets": Cabinet.__tablename__,
+    "/api/v1/instrument-categories": InstrumentCategory.__tablename__,
+    "/api/v1/storage-rules": InstrumentStorageRule.__tablename__,
+    "/api/v1/storage-rule-records": StorageRuleRecord.__tablename__,
+}
+
+# 请求头中包含这些指令时跳过缓存
+_BYPASS_DIRECTIVES = {"no-cache", "no-store"}
+
+_CACHE_HEADER = b"x-cache"
+
+
+def _tags_of(path: str) -> Optional[tuple[str, ...]]:
+    table = _CACHED_RESOURCES.get(path)
+    if table is not None:
+        return (table_tag(table),)
+
+    parent, _, guid = path.rpartition("/")
+    table = _CACHED_RESOURCES.get(parent)
+    if table is None:
+        return None
+    try:
+        return (item_tag(table, GUID.parse_str(guid).guid),)
+    except ValueError:
+        return None
+
+
+def _bypass(headers: Headers) -> bool:
+    directives = headers.get("cache-control", "").lower().replace(" ", "").split(",")
+    return not _BYPASS_DIRECTIVES.isdisjoint(directives)
+
+
+class _Rendered(NamedTuple):
+    """内层返回的完整响应"""
+
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+
+async def _replay(
+    send: Send,
+    request_headers: Headers,
+    response: _Rendered | CachedResponse,
+    cache_header: bytes,
+) -> None:
+    # 客户端的缓存仍然有效时只发送 304
+    response_headers = [*response.headers, (_CACHE_HEADER, cache_header)]
+    etag = find_etag(response.headers)
+    if (
+        response.status == 200
+        and etag is not None
+        and none_match(request_headers, etag)
+    ):
+        await send(not_modified(response_headers))
+        await send({"type": "http.response.body", "body": b""})
+        return
+    await send(
+        {
+            "type": "http.response.start",
+            "status": response.status,
+            "headers": response_headers,
+        }
+    )
+    await send({"type": "http.response.body", "body": response.body})
+
+
+def _with_cache_header(send: Send, value: bytes) -> Send:
+    async def send_with_header(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            message["headers"] = [*message.get("headers", ()), (_CACHE_HEADER, value)]
+        await send(message)
+
+    return send_with_header
+
+
+class ResponseCacheMiddleware:
+    """缓存房间、存储柜、器械分类和存储规则的查询响应
+
+    需要注册在压缩中间件的外层，缓存的是已经序列化和压缩的响应体，命中时不再经过路由和压缩。
+    缓存键由路径、排序后的查询参数、 Accept-Encoding 和 Origin 组成；请求头中包含
+    Cache-Control: no-cache 或 no-store 时跳过缓存。响应头 X-Cache 表示是否命中缓存。
+
+    需要注册在条件请求中间件的外层，缓存的响应带有 ETag 。命中时直接按照 If-None-Match 返回 304 ；
+    没有命中时去掉请求中的 If-None-Match 获取完整的响应用于缓存，再由这里决定是否返回 304 。
+
+    没有命中缓存的相同请求同时到达时只有第一个请求经过路由查询和序列化，其他请求等待并共享
+    同一个响应（ X-Cache: COALESCED ），出错时所有请求都收到同一个异常。
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not SETTINGS.response_cache.enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+        tags = _tags_of(scope["path"])
+        if tags is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if _bypass(headers):
+            RESPONSE_CACHE.record_bypass()
+            await self.app(scope, receive, _with_cache_header(send, b"BYPASS"))
+            return
+
+        query = urlencode(
+            sorted(parse_qsl(scope["query_string"].decode(), keep_blank_values=True))
+        )
+        encoding = headers.get("accept-encoding", "").lower().replace(" ", "")
+        # 跨域响应头与请求的 Origin 有关
+        key = (scope["path"], query, encoding, headers.get("origin"))
+
+        entry = RESPONSE_CACHE.get(key)
+        if entry is not None:
+            await _replay(send, headers, entry, b"HIT")
+            return
+
+        generations = RESPONSE_CACHE.generations(tags)
+        started_at = monotonic()
+        # 去掉 If-None-Match ，内层总是返回完整的响应
+        inner_scope = {
+            **scope,
+            CACHED_SCOPE_KEY: True,
+            "headers": [
+                (name, value)
+                for name, value in scope["headers"]
+                if name != b"if-none-match"
+            ],
+        }
+
+        async def render() -> _Rendered:
+            return await self._render(
+                inner_scope, receive, key, tags, generations, started_at
+            )
+
+        settings = SETTINGS.response_cache
+        if not settings.coalesce:
+            await _replay(send, headers, await render(), b"MISS")
+            return
+        try:
+            # 失效计数也是键的一部分，写入提交之后到达的请求不会共享提交之前开始的查询
+            response, shared = await SINGLE_FLIGHT.run(
+                (key, generations),
+                render,
+                settings.coalesce_timeout_seconds,  # type: ignore
+            )
+        except SingleFlightTimeout:
+            # 等待超时，单独处理这个请求
+            response, shared = await render(), False
+        await _replay(send, headers, response, b"COALESCED" if shared else b"MISS")
+
+    async def _render(
+        self,
+        scope: Scope,
+        receive: Receive,
+        key: Hashable,
+        tags: tuple[str, ...],
+        generations: tuple[int, ...],
+        started_at: float,
+    ) -> _Rendered:
+        start: Optional[Message] = None
+        chunks: list[bytes] = []
+
+        async def capture(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        if start is None:
+            raise RuntimeError("No response returned.")
+
+        response = _Rendered(
+            start["status"], list(start.get("headers", ())), b"".join(chunks)
+        )
+        if response.status == 200:
+            RESPONSE_CACHE.store(key, tags, generations, started_at, *response)
+        return response
@@ -1,17 +1,25 @@
-from typing import Optional
+from typing import Any, Callable, Iterable, Optional, Type, TypeVar
 
+from random import random
 from datetime import datetime, timezone
 
-from pydantic import BaseConfig, Field
+from pydantic import BaseConfig, Field, ValidationError
 from pydantic import BaseModel as __BaseModel
+from pydantic.fields import SHAPE_SINGLETON, ModelField
 
+from loguru import logger
+
+from app.util.env import SETTINGS
 from app.util.type.guid import GUID
 
 
 class OuterModelConfig(BaseConfig):
     """要返回到外部（客户端）的数据模型的配置"""
 
+    orm_mode = True
     arbitrary_types_allowed = True
+    # 联合类型优先保留原本的类型，避免响应中的字典被转换为空的数据模型
+    smart_union = True
     json_encoders = {
         datetime: lambda dt: (
             dt.replace(tzinfo=timezone.utc).isoformat().replace("+00:00", "Z")
@@ -37,6 +45,52 @@ class BaseModel(__BaseModel):
     Config = OuterModelConfig
 
 
+_DataModelT = TypeVar("_DataModelT", bound="DataModel")
+
+_RowConverter = Callable[[Any], Any]
+_RowPlan = list[tuple[str, Optional[_RowConverter], ModelField]]
+
+_ROW_PLANS: dict[type, _RowPlan] = {}
+
+_MISSING = object()
+
+_object_setattr = object.__setattr__
+
+
+def _to_guid(value: Any) -> GUID:
+    """数据库中保存的是数值，写入时已经校验过"""
+    return value if isinstance(value, GUID) else GUID(value, need_varification=False)
+
+
+def _row_converter(field: ModelField) -> Optional[_RowConverter]:
+    if field.shape == SHAPE_SINGLETON and isinstance(field.type_, type):
+        if issubclass(field.type_, GUID):
+            return _to_guid
+    return None
+
+
+def _compile_row_plan(model: Type["DataModel"]) -> _RowPlan:
+    plan = [
+        (name, _row_converter(field), field) for name, field in model.__fields__.items()
+    ]
+    _ROW_PLANS[model] = plan
+    return plan
+
+
+def _verify_row(model: Type["DataModel"], row: Any, trusted: "DataModel") -> None:
+    """使用完整的校验流程重新创建数据模型，并与直接创建的结果比较"""
+    try:
+        validated = model.from_orm(row)
+    except ValidationError as error:
+        logger.warning(f"{model.__name__} {trusted.id.guid} failed validation: {error}")
+        return
+    if validated.dict() != trusted.dict():
+        logger.warning(
+            f"{model.__name__} {trusted.id.guid} differs from the validated model: "
+            + f"{trusted.dict()} != {validated.dict()}"
+        )
+
+
 class DataModel(__BaseModel):
     id: GUID = Field(
         ...,
@@ -56,6 +110,57 @@ class DataModel(__BaseModel):
 
     Config = OuterModelConfig
 
+    @classmethod
+    def derive_row_values(cls, values: dict[str, Any]) -> None:
+        """补充或修正由校验器计算的字段，从数据库读取记录时校验器不会执行
+
+        Args:
+            values (dict[str, Any]): 从记录中读取的字段值，直接在其中修改
+        """
+
+    @classmethod
+    def from_rows(cls: Type[_DataModelT], rows: Iterable[Any]) -> list[_DataModelT]:
+        """使用从数据库读取的记录直接创建数据模型，不执行校验
+
+        记录在写入时已经校验过，读取时只转换 GUID 等需要包装的字段，
+        结果与 from_orm 一致（ URL 字段保留为字符串）。
+        可以通过 TRUSTED_READ_VERIFY_RATIO 按比例抽样，使用 from_orm 校验并记录不一致的结果。
+
+        Args:
+            rows (Iterable[Any]): ORM 对象或包含对应字段的记录
+
+        Returns:
+            list[_DataModelT]: 数据模型列表
+        """
+        plan = _ROW_PLANS.get(cls) or _compile_row_plan(cls)
+        verify_ratio = SETTINGS.trusted_read.verify_ratio
+
+        models: list[_DataModelT] = []
+        for row in rows:
+            values: dict[str, Any] = {}
+            fields_set: set[str] = set()
+            for name, converter, field in plan:
+                value = getattr(row, name, _MISSING)
+                if value is _MISSING:
+                    values[name] = field.get_default()
+                    continue
+                values[name] = (
+                    value if converter is None or value is None else converter(value)
+                )
+                fields_set.add(name)
+            cls.derive_row_values(values)
+
+            # 与 construct 相同，但是字段已经按照声明顺序读取，不需要再次遍历
+            model = cls.__new__(cls)
+            _object_setattr(model, "__dict__", values)
+            _object_setattr(model, "__fields_set__", fields_set)
+            model._init_private_attributes()
+
+            if verify_ratio and random() < verify_ratio:
+                _verify_row(cls, row, model)
+            models.append(model)
+        return models
+
 
 class InCreateModel(__BaseModel):
     id: Optional[GUID] = Field(
@@ -63,11 +168,37 @@ class InCreateModel(__BaseModel):
         title="记录 ID",
         description="数据库中的记录 ID ，也是表中的主键。使用雪花算法生成的全局唯一识别码，依赖于 pysnowflake 。",
     )
+    created_at: Optional[datetime] = Field(
+        None,
+        title="记录创建时间",
+        description="由数据库生成，创建时不需设置。",
+    )
+    updated_at: Optional[datetime] = Field(
+        None,
+        title="记录更新时间",
+        description="由数据库生成，创建时不需设置。",
+    )
 
     Config = InnerModelConfig
 
 
 class InUpdateModel(__BaseModel):
+    id: Optional[GUID] = Field(
+        None,
+        title="记录 ID",
+        description="更新时不能修改记录 ID ，使用请求路径中的 ID 。",
+    )
+    created_at: Optional[datetime] = Field(
+        None,
+        title="记录创建时间",
+        description="由数据库维护，更新时不需设置。",
+    )
+    updated_at: Optional[datetime] = Field(
+        None,
+        title="记录更新时间",
+        description="由数据库维护，更新时不需设置。",
+    )
+
     def dict(self, *args, **kwargs) -> dict:
         kwargs.update({"exclude_unset": True})
         return super().dict(*args, **kwargs)
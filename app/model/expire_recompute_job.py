@@ -0,0 +1,36 @@
+from typing import Optional
+
+from datetime import datetime
+
+from pydantic import Field
+
+from app.model.base import DataModel
+from app.model.response import Success
+from app.database.table.expire_recompute_job import RecomputeStatus
+from app.util.type.guid import GUID
+
+
+class ExpireRecomputeJob(DataModel):
+    category: GUID = Field(..., title="器械分类")
+    old_duration_MS: Optional[int] = Field(None, title="修改前的过期时长")
+    new_duration_MS: Optional[int] = Field(None, title="修改后的过期时长")
+    status: RecomputeStatus = Field(
+        ...,
+        title="任务状态",
+        description="""
+        可选的任务状态为：
+
+            - PENDING  (0): 等待执行
+            - RUNNING  (1): 正在分段执行
+            - FINISHED (2): 已完成""",
+    )
+    total: Optional[int] = Field(None, title="需要处理的器械数量", description="开始执行时统计")
+    processed: int = Field(..., title="已经处理的器械数量")
+    progress: Optional[float] = Field(None, title="已经处理的比例（ 0 ~ 1 ）")
+    rows_per_second: Optional[float] = Field(None, title="平均每秒处理的器械数量")
+    started_at: Optional[datetime] = Field(None, title="开始执行的时间")
+    finished_at: Optional[datetime] = Field(None, title="完成的时间")
+
+
+class ExpireRecomputeJobInResponse(Success):
+    data: list[ExpireRecomputeJob]
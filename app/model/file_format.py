@@ -0,0 +1,15 @@
+from enum import Enum
+
+
+class FileFormat(str, Enum):
+    """批量导入导出使用的数据格式"""
+
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+    @property
+    def media_type(self) -> str:
+        """对应的 Content-Type"""
+        if self is FileFormat.CSV:
+            return "text/csv; charset=utf-8"
+        return "application/x-ndjson"
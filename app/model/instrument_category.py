@@ -1,11 +1,12 @@
 from typing import Optional
 
-from pydantic import Field, HttpUrl
+from pydantic import Field
 
 from app.model.response import Success
 from app.model.base import DataModel, InCreateModel, InUpdateModel
 from app.util.regex_pattern import NAME_PATTERN
-from app.util.string_length import SHORT_LENGTH, LONG_LENGTH, URL_LENGTH
+from app.util.type.url import LimitedHttpUrl
+from app.util.string_length import SHORT_LENGTH, LONG_LENGTH
 
 
 class _BaseInstrumentCategory(DataModel):
@@ -22,9 +23,8 @@ class _BaseInstrumentCategory(DataModel):
         title="器械分类备注",
         example="A Category Comment",
     )
-    category_image_url: Optional[HttpUrl] = Field(
+    category_image_url: Optional[LimitedHttpUrl] = Field(  # type: ignore
         None,
-        max_length=URL_LENGTH,
         title="器械分类图片的 URL",
         example="https://example.com/image.png",
     )
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from pydantic import Field
+
+from app.model.base import DataModel
+from app.model.response import Success
+from app.database.table.instrument_event import InstrumentEventType
+from app.util.type.guid import GUID
+
+
+class InstrumentEvent(DataModel):
+    instrument: GUID = Field(..., title="器械")
+    event_type: InstrumentEventType = Field(
+        ...,
+        title="事件类型",
+        description="""
+        可选的事件类型为：
+
+            - EXPIRED (0): 到达过期时间后被标记为已过期""",
+    )
+    occurred_at: datetime = Field(..., title="事件发生的时间")
+
+
+class InstrumentEventInResponse(Success):
+    data: list[InstrumentEvent]
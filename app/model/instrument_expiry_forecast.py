@@ -0,0 +1,19 @@
+from pydantic import Field
+
+from app.model.base import BaseModel
+from app.model.response import Success
+from app.util.type.guid import GUID
+
+
+class ExpiryForecast(BaseModel):
+    room: GUID = Field(..., title="房间")
+    category: GUID = Field(..., title="器械类别")
+    expiring: dict[int, int] = Field(
+        ...,
+        title="即将过期的器械数量",
+        description="键为预测的天数，值为房间中这一类器械在这些天内过期的数量，精度为一小时",
+    )
+
+
+class ExpiryForecastInResponse(Success):
+    data: list[ExpiryForecast]
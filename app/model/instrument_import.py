@@ -0,0 +1,46 @@
+from typing import Optional
+
+from pydantic import Field
+
+from app.model.base import BaseModel
+from app.model.response import Success
+
+
+class ImportRowError(BaseModel):
+    offset: int = Field(
+        ..., title="记录偏移量", description="出错的记录在文件中的序号（从 0 开始，不包括 CSV 表头）"
+    )
+    error: str = Field(..., title="错误信息")
+
+
+class ImportChunkReport(BaseModel):
+    index: int = Field(..., title="批次序号")
+    start_offset: int = Field(..., title="批次中第一条记录的偏移量")
+    end_offset: int = Field(..., title="批次结束的偏移量（不包含）")
+    imported: int = Field(0, title="成功导入的记录数")
+    failed: int = Field(0, title="校验失败的记录数")
+    errors: list[ImportRowError] = Field([], title="校验失败的记录（数量有上限）")
+    error: Optional[str] = Field(
+        None,
+        title="批次错误信息",
+        description="批次写入数据库失败时的错误信息，此时整个批次都没有导入",
+    )
+
+
+class InstrumentImportReport(BaseModel):
+    start_offset: int = Field(..., title="开始导入的偏移量")
+    next_offset: int = Field(
+        ...,
+        title="下一次导入的偏移量",
+        description="所有在此之前的记录都已经处理完成，导入中断后使用此偏移量继续导入",
+    )
+    imported: int = Field(0, title="成功导入的记录数")
+    failed: int = Field(0, title="校验失败的记录数")
+    completed: bool = Field(False, title="是否已经处理完整个文件")
+    error: Optional[str] = Field(None, title="导入中断的原因")
+    elapsed_ms: float = Field(0, title="导入耗时（毫秒）")
+    chunks: list[ImportChunkReport] = Field([], title="各批次的导入结果")
+
+
+class InstrumentImportReportInResponse(Success):
+    data: list[InstrumentImportReport]
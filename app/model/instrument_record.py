@@ -4,9 +4,10 @@ from datetime import datetime
 
 from pydantic import Field
 
+from app.database.table.instrument_record import InstrumentStatus
 from app.util.type.guid import GUID
 from app.model.response import Success
-from app.model.base import DataModel, InCreateModel
+from app.model.base import DataModel, InCreateModel, InUpdateModel
 
 
 class _BaseInstrumentRecord(DataModel):
@@ -15,16 +16,39 @@ class _BaseInstrumentRecord(DataModel):
     expire_time: Optional[datetime] = Field(
         None,
         title="过期时间",
-        description="用于记录器械消毒过期的时间，创建时不需主动设置。",
+        description="用于记录器械消毒过期的时间，创建时没有指定则根据器械分类的过期时长计算。",
     )
 
 
 class InstrumentRecord(_BaseInstrumentRecord):
-    pass
+    slot: Optional[int] = Field(
+        None,
+        title="占用的槽位",
+        description="存储柜中占用的槽位序号（从 0 开始），存储柜没有槽位时为空。",
+    )
+    status: InstrumentStatus = Field(
+        InstrumentStatus.NORMAL,
+        title="器械状态",
+        description="""
+        可选的器械状态为：
+
+            - NORMAL  (0): 正常
+            - EXPIRED (1): 已过期，到达过期时间后由过期任务修改，修改过期时间后恢复为正常""",
+    )
 
 
 class InstrumentRecordInCreate(InCreateModel, _BaseInstrumentRecord):
-    pass
+    slot: Optional[int] = Field(
+        None,
+        ge=0,
+        title="占用的槽位",
+        description="存放在有槽位的存储柜中时可以指定槽位，为空时自动分配空闲槽位。",
+    )
+
+
+class InstrumentRecordInUpdate(InUpdateModel, _BaseInstrumentRecord):
+    located_cabinet: Optional[GUID] = Field(None, title="存放器械的存储柜")
+    instrument_category: Optional[GUID] = Field(None, title="器械类别")
 
 
 class InstrumentRecordInResponse(Success):
@@ -28,7 +28,7 @@ class _BaseStorageRuleRecord(DataModel):
         ...,
         title="规则涉及到的存储存储",
     )
-    instrument_catrgory: GUID = Field(
+    instrument_category: GUID = Field(
         ...,
         title="规则涉及到的器械类别",
     )
@@ -72,7 +72,7 @@ class StorageRuleRecordInUpdate(InUpdateModel):
         None,
         title="规则涉及到的存储存储",
     )
-    instrument_catrgory: Optional[GUID] = Field(
+    instrument_category: Optional[GUID] = Field(
         None,
         title="规则涉及到的器械类别",
     )
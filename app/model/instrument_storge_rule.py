@@ -3,10 +3,12 @@ from typing import Optional
 from pydantic import Field
 
 from app.model.response import Success
-from app.model.base import DataModel, InCreateModel, InUpdateModel
+from app.model.base import BaseModel, DataModel, InCreateModel, InUpdateModel
+from app.util.type.guid import GUID
 from app.util.regex_pattern import NAME_PATTERN
 from app.util.string_length import SHORT_LENGTH, LONG_LENGTH
 from app.database.table.instrument_storage_rule import RuleStatus, RuleType
+from app.database.table.instrument_storage_rule_record import StorageLocationType
 
 
 class _BaseStorageRule(DataModel):
@@ -126,3 +128,51 @@ class StorageRuleInUpdate(InUpdateModel, _BaseStorageRule):
 
 class StorageRuleInResponse(Success):
     data: list[StorageRule]
+
+
+class PlacementQuery(BaseModel):
+    instrument_category: GUID = Field(..., title="器械类别")
+    cabinet: GUID = Field(..., title="存储柜")
+
+
+class PlacementCheck(PlacementQuery):
+    allowed: bool = Field(..., title="是否允许存放", description="全部启用的存储规则都允许时为 true")
+
+
+class PlacementCheckInResponse(Success):
+    data: list[PlacementCheck]
+
+
+class SimulatedRuleRecord(BaseModel):
+    storage_location_type: StorageLocationType = Field(
+        StorageLocationType.ROOM,
+        title="存储位置类型",
+        description="房间类型（ ROOM ）的位置会展开为房间中当前的全部存储柜",
+    )
+    storage_location: GUID = Field(..., title="规则涉及到的存储位置")
+    instrument_category: GUID = Field(..., title="规则涉及到的器械类别")
+
+
+class RuleSimulation(BaseModel):
+    rule_status: RuleStatus = Field(
+        RuleStatus.ENABLED,
+        title="存储规则状态",
+        description="禁用的规则不会产生任何冲突",
+    )
+    rule_type: RuleType = Field(..., title="存储规则类型")
+    records: list[SimulatedRuleRecord] = Field(
+        ..., title="存储规则记录", description="规则生效后完整的规则记录"
+    )
+
+
+class RuleViolation(BaseModel):
+    cabinet: GUID = Field(..., title="存储柜")
+    violation_count: int = Field(..., title="违反规则的器械数量")
+    # 违反规则的器械可能有几十万条，直接使用字符串形式的 ID ，不创建 GUID 对象
+    instruments: list[str] = Field(
+        ..., title="违反规则的器械 ID", description="按照 ID 排序，数量可能受到请求参数的限制"
+    )
+
+
+class RuleViolationInResponse(Success):
+    data: list[RuleViolation]
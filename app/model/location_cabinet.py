@@ -1,13 +1,38 @@
-from typing import Optional
+from typing import Any, Optional
 
-from pydantic import Field, HttpUrl, validator
+from pydantic import Field, validator
 
 from app.model.response import Success
-from app.model.base import DataModel, InCreateModel, InUpdateModel
+from app.model.base import BaseModel, DataModel, InCreateModel, InUpdateModel
 from app.database.table.location_cabinet import CabinetStatus
 from app.util.type.guid import GUID
 from app.util.regex_pattern import NAME_PATTERN
-from app.util.string_length import SHORT_LENGTH, LONG_LENGTH, URL_LENGTH
+from app.util.type.url import LimitedHttpUrl
+from app.util.string_length import SHORT_LENGTH, LONG_LENGTH
+
+
+def derive_status(
+    max_number: int, current_number: int, status: CabinetStatus
+) -> CabinetStatus:
+    """根据容量得出存储柜状态，与修改容量时数据库中更新的状态一致
+
+    禁用的存储柜保持禁用；其他存储柜容量已满时为满载，不再满载时恢复为启用。
+
+    Args:
+        max_number (int): 最大容量
+        current_number (int): 当前容量
+        status (CabinetStatus): 保存的状态
+
+    Returns:
+        CabinetStatus: 存储柜状态
+    """
+    if status is CabinetStatus.DISABLED:
+        return status
+    if current_number >= max_number:
+        return CabinetStatus.FULL_LOAD
+    if status is CabinetStatus.FULL_LOAD:
+        return CabinetStatus.ENABLED
+    return status
 
 
 class _BaseCabinet(DataModel):
@@ -29,9 +54,8 @@ class _BaseCabinet(DataModel):
         title="存储柜备注",
         example="Some comment of the cabinet",
     )
-    cabinet_image_url: Optional[HttpUrl] = Field(
+    cabinet_image_url: Optional[LimitedHttpUrl] = Field(  # type: ignore
         None,
-        max_length=URL_LENGTH,
         title="存储柜图片的 URL",
         example="http://www.example.com/image.png",
     )
@@ -44,7 +68,7 @@ class _BaseCabinet(DataModel):
     )
     current_number: int = Field(
         ...,
-        gt=0,
+        ge=0,
         title="存储柜当前容量",
         description="当前容量不能超过最大值，且当达到最大时会更新存储柜状态为满载",
         example=100,
@@ -106,13 +130,29 @@ class _BaseCabinet(DataModel):
         assert max_number is not None, "max_number is required"
         assert current_number is not None, "current_number is required"
 
-        if max_number == current_number:
-            return CabinetStatus.FULL_LOAD
-        return value
+        return derive_status(max_number, current_number, value)
+
+    @classmethod
+    def derive_row_values(cls, values: dict[str, Any]) -> None:
+        """与 check_status 一致，根据容量得出存储柜状态
+
+        Args:
+            values (dict[str, Any]): 从记录中读取的字段值
+        """
+        max_number: int | None = values.get("max_number")
+        current_number: int | None = values.get("current_number")
+        if max_number is not None and current_number is not None:
+            values["status"] = derive_status(
+                max_number, current_number, values["status"]
+            )
 
 
 class Cabinet(_BaseCabinet):
-    pass
+    slot_count: int = Field(
+        0,
+        title="存储柜槽位数量",
+        description="为 0 时不记录器械占用的槽位，通过 /cabinets/{guid}/slots 修改",
+    )
 
 
 class CabinetInCreate(InCreateModel, _BaseCabinet):
@@ -163,9 +203,8 @@ class CabinetInUpdate(InUpdateModel, _BaseCabinet):
         title="存储柜备注",
         example="Some comment of the cabinet",
     )
-    cabinet_image_url: Optional[HttpUrl] = Field(
+    cabinet_image_url: Optional[LimitedHttpUrl] = Field(  # type: ignore
         None,
-        max_length=URL_LENGTH,
         title="存储柜图片的 URL",
         example="http://www.example.com/image.png",
     )
@@ -178,7 +217,7 @@ class CabinetInUpdate(InUpdateModel, _BaseCabinet):
     )
     current_number: Optional[int] = Field(
         None,
-        gt=0,
+        ge=0,
         title="存储柜当前容量",
         description="当前容量不能超过最大值，且当达到最大时会更新存储柜状态为满载",
         example=100,
@@ -199,3 +238,39 @@ class CabinetInUpdate(InUpdateModel, _BaseCabinet):
 
 class CabinetInResponse(Success):
     data: list[Cabinet]
+
+
+class CabinetSlots(BaseModel):
+    cabinet: GUID = Field(..., title="存储柜")
+    slot_count: int = Field(..., title="槽位数量")
+    free_count: int = Field(..., title="空闲槽位数量")
+    free_slots: list[int] = Field(
+        ...,
+        title="找到的空闲槽位",
+        description="序号最小的空闲槽位；查找连续槽位时为第一段足够长的连续空闲槽位，没有时为空",
+    )
+
+
+class CabinetSlotsInResponse(Success):
+    data: list[CabinetSlots]
+
+
+class PlacementRequest(BaseModel):
+    instrument_category: GUID = Field(..., title="器械类别")
+    preferred_room: Optional[GUID] = Field(
+        None,
+        title="优先存放的房间",
+        description="优先推荐房间中的存储柜，房间中没有合适的存储柜时推荐其他房间的存储柜",
+    )
+
+
+class PlacementRecommendation(PlacementRequest):
+    cabinet: Optional[GUID] = Field(
+        ...,
+        title="推荐存放的存储柜",
+        description="满足存储规则、已启用且有剩余容量的存储柜，没有合适的存储柜时为空",
+    )
+
+
+class PlacementRecommendationInResponse(Success):
+    data: list[PlacementRecommendation]
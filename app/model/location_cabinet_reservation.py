@@ -0,0 +1,44 @@
+from typing import Optional
+
+from datetime import datetime
+
+from pydantic import Field
+
+from app.model.base import BaseModel, DataModel
+from app.model.response import Success
+from app.database.table.location_cabinet_reservation import ReservationStatus
+from app.util.env import SETTINGS
+from app.util.type.guid import GUID
+
+
+class CabinetReservation(DataModel):
+    cabinet: GUID = Field(..., title="预留的存储柜")
+    slots: int = Field(..., title="预留的容量")
+    status: ReservationStatus = Field(
+        ...,
+        title="预留状态",
+        description="""
+        可选的预留状态为：
+
+            - ACTIVE    (0): 未到期，容量已经计入存储柜的当前容量
+            - CONFIRMED (1): 已确认，预留的容量转为已占用的容量
+            - RELEASED  (2): 已释放，容量已经归还到存储柜
+            - EXPIRED   (3): 已过期，容量已经归还到存储柜""",
+    )
+    expires_at: datetime = Field(..., title="过期时间")
+
+
+class ReservationInCreate(BaseModel):
+    slots: int = Field(..., gt=0, title="预留的容量", example=10)
+    ttl: Optional[float] = Field(
+        None,
+        gt=0,
+        le=SETTINGS.reservation.max_ttl,
+        title="预留的有效时间（秒）",
+        description="到期之前没有确认或释放的预留会自动过期并归还容量，为空时使用默认的有效时间",
+        example=900,
+    )
+
+
+class CabinetReservationInResponse(Success):
+    data: list[CabinetReservation]
@@ -1,11 +1,12 @@
 from typing import Optional
 
-from pydantic import Field, HttpUrl
+from pydantic import Field
 
 from app.model.response import Success
 from app.model.base import DataModel, InCreateModel, InUpdateModel
 from app.util.regex_pattern import NAME_PATTERN
-from app.util.string_length import SHORT_LENGTH, LONG_LENGTH, URL_LENGTH
+from app.util.type.url import LimitedHttpUrl
+from app.util.string_length import SHORT_LENGTH, LONG_LENGTH
 
 
 class _BaseRoom(DataModel):
@@ -23,9 +24,8 @@ class _BaseRoom(DataModel):
         title="房间备注",
         example="This is a room comment",
     )
-    room_image_url: Optional[HttpUrl] = Field(
+    room_image_url: Optional[LimitedHttpUrl] = Field(  # type: ignore
         None,
-        max_length=URL_LENGTH,
         title="房间图片的 URL",
         example="https://example.com/image.png",
     )
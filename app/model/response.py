@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Sequence
 
 from pydantic import HttpUrl, Field, validator
 
@@ -39,6 +39,7 @@ class Success(Response):
         msg (Optional[str]): 详细错误信息 (必为 Success)
         data (list[BaseModel | dict]): 响应附带的数据
         data_length (Optional[int]): 相应附带的数据长度
+        next_cursor (Optional[str]): 获取下一页数据使用的游标
         info (Optional[str | HttpUrl]): 附加的说明信息
     """
 
@@ -70,6 +71,11 @@ class Success(Response):
         title="数据条目数量",
         description="携带的数据条数",
     )
+    next_cursor: Optional[str] = Field(
+        None,
+        title="下一页的游标",
+        description="分页查询时作为 after 参数获取下一页数据，没有下一页时为空",
+    )
 
     @validator("data_length", always=True)
     def add_data_length(cls, _, values: dict) -> Optional[int]:
@@ -84,6 +90,23 @@ class Success(Response):
         data: list[BaseModel | dict] | None = values.get("data")
         return len(data) if data else 0
 
+    @classmethod
+    def of(
+        cls, data: Sequence[BaseModel | dict], next_cursor: Optional[str] = None
+    ) -> "Success":
+        """使用已经校验过的数据直接创建响应，跳过字段校验
+
+        Args:
+            data (Sequence[BaseModel | dict]): 响应附带的数据（必须是当前响应模型接受的类型）
+            next_cursor (Optional[str], optional): 下一页的游标. Defaults to None.
+
+        Returns:
+            Success: 响应对象
+        """
+        return cls.construct(
+            data=list(data), data_length=len(data), next_cursor=next_cursor
+        )
+
 
 class Error(Response):
     """失败响应模型
@@ -0,0 +1,183 @@
+from typing import Any, Callable, Optional, Type
+
+from enum import Enum
+from datetime import datetime
+
+from orjson import (
+    OPT_NON_STR_KEYS,
+    OPT_PASSTHROUGH_DATETIME,
+    dumps as orjson_dumps,
+)
+
+from pydantic import BaseModel as PydanticBaseModel
+from pydantic.fields import SHAPE_SINGLETON, ModelField
+
+from fastapi.encoders import jsonable_encoder
+
+from starlette.responses import Response as HTTPResponse
+
+from app.model.base import OuterModelConfig
+from app.util.type.guid import GUID
+
+Encoder = Callable[[Any], Any]
+
+# 编码结果缓存的最大条目数
+_MEMO_SIZE = 4096
+
+# orjson 可以直接输出的类型
+_NATIVE_TYPES = (str, int, float, bool)
+
+_OPTIONS = OPT_NON_STR_KEYS | OPT_PASSTHROUGH_DATETIME
+
+_legacy_encode_datetime: Encoder = OuterModelConfig.json_encoders[datetime]
+
+
+def memoize(encoder: Encoder) -> Encoder:
+    """缓存编码结果，同一批数据中通常有大量相同的值（例如批量写入的时间）
+
+    Args:
+        encoder (Encoder): 编码函数，参数需要可以作为字典的键
+
+    Returns:
+        Encoder: 带缓存的编码函数
+    """
+    cache: dict[Any, Any] = {}
+
+    def encode(value: Any) -> Any:
+        encoded = cache.get(value)
+        if encoded is None:
+            if len(cache) >= _MEMO_SIZE:
+                cache.clear()
+            encoded = cache[value] = encoder(value)
+        return encoded
+
+    return encode
+
+
+_encode_naive_datetime = memoize(_legacy_encode_datetime)
+
+
+def encode_datetime(value: datetime) -> str:
+    """与 OuterModelConfig 中的编码方式一致，输出以 Z 结尾的 UTC 时间
+
+    Args:
+        value (datetime): 时间
+
+    Returns:
+        str: ISO 8601 格式的时间字符串
+    """
+    if value.tzinfo is None:
+        return _encode_naive_datetime(value)
+    # 时区不同的时间可能相等，不能共用缓存
+    return _legacy_encode_datetime(value)
+
+
+def encode_guid(value: GUID) -> str:
+    """将 GUID 编码为字符串"""
+    return value.to_string()
+
+
+def _encode_value(value: Any) -> Any:
+    """按照值的实际类型编码，与 jsonable_encoder 的结果一致"""
+    if value is None or type(value) in _NATIVE_TYPES:
+        return value
+    if isinstance(value, PydanticBaseModel):
+        return encode_model(value)
+    if isinstance(value, GUID):
+        return value.to_string()
+    if isinstance(value, datetime):
+        return encode_datetime(value)
+    if isinstance(value, Enum):
+        return _encode_value(value.value)
+    if isinstance(value, dict):
+        return {_encode_value(key): _encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [_encode_value(item) for item in value]
+    if isinstance(value, _NATIVE_TYPES):
+        return value
+    return jsonable_encoder(value, custom_encoder=OuterModelConfig.json_encoders)
+
+
+def _compile_field(field: ModelField) -> Optional[Encoder]:
+    """根据字段声明的类型选择编码函数，返回 None 表示值可以直接输出"""
+    field_type = field.type_
+    if field.shape != SHAPE_SINGLETON or not isinstance(field_type, type):
+        return _encode_value
+    if issubclass(field_type, GUID):
+        return encode_guid
+    if issubclass(field_type, datetime):
+        return encode_datetime
+    if issubclass(field_type, _NATIVE_TYPES) and not issubclass(field_type, Enum):
+        return None
+    return _encode_value
+
+
+_PLANS: dict[type, list[tuple[str, Optional[Encoder]]]] = {}
+
+
+def _compile_model(
+    model: Type[PydanticBaseModel],
+) -> list[tuple[str, Optional[Encoder]]]:
+    plan = [
+        (name, _compile_field(field))
+        for name, field in model.__fields__.items()
+        # 与 model.dict() 一致，不输出声明了 exclude=True 的字段
+        if field.field_info.exclude is not True
+    ]
+    _PLANS[model] = plan
+    return plan
+
+
+def encode_model(model: PydanticBaseModel) -> dict[str, Any]:
+    """使用预先编译的字段编码函数将数据模型转换为 orjson 可以直接输出的字典
+
+    Args:
+        model (PydanticBaseModel): 数据模型
+
+    Returns:
+        dict[str, Any]: 字段顺序与 model.dict() 一致
+    """
+    plan = _PLANS.get(type(model)) or _compile_model(type(model))
+    values = model.__dict__
+
+    encoded: dict[str, Any] = {}
+    for name, encoder in plan:
+        value = values.get(name)
+        encoded[name] = value if encoder is None or value is None else encoder(value)
+    return encoded
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return encode_datetime(value)
+    encoded = _encode_value(value)
+    if encoded is value:
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+    return encoded
+
+
+def dumps(content: Any) -> bytes:
+    """将响应数据编码为 JSON
+
+    输出与 JSONResponse(jsonable_encoder(content)) 完全一致，
+    但是跳过了响应模型的校验和 jsonable_encoder 的遍历，每个值只会被处理一次。
+
+    Args:
+        content (Any): 响应数据（通常是 Success 或 Error 对象）
+
+    Returns:
+        bytes: JSON 数据
+    """
+    return orjson_dumps(_encode_value(content), default=_default, option=_OPTIONS)
+
+
+class EnvelopeResponse(HTTPResponse):
+    """使用 dumps 编码的 JSON 响应
+
+    直接返回响应对象时 FastAPI 不会再次校验 response_model ，接口声明的 response_model 只用于生成文档。
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
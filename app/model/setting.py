@@ -1,4 +1,4 @@
-from typing import Optional, TypeAlias
+from typing import Any, Optional, TypeAlias
 
 from pydantic import Field, validator
 
@@ -10,6 +10,35 @@ from app.util.string_length import SHORT_LENGTH, LONG_LENGTH
 ParsedValue: TypeAlias = str | int | float | bool
 
 
+def parse_setting_value(value_type: SettingValueType, raw_value: str) -> ParsedValue:
+    """将设置值转换为设置项类型对应的数据
+
+    Args:
+        value_type (SettingValueType): 设置项数据的类型
+        raw_value (str): 保存的设置值
+
+    Raises:
+        ValueError: 当类型与值不匹配时抛出异常
+
+    Returns:
+        ParsedValue: 转换类型后的设置值
+    """
+    try:
+        if value_type == SettingValueType.INTEGER:
+            return int(raw_value)
+        if value_type == SettingValueType.FLOAT:
+            return float(raw_value)
+        if value_type == SettingValueType.BOOLEAN:
+            if raw_value.lower() == "true":
+                return True
+            if raw_value.lower() == "false":
+                return False
+            raise ValueError
+        return raw_value  # 默认类型不需要转换
+    except ValueError as err:
+        raise ValueError(f"Setting value doesn't match the type: {value_type}") from err
+
+
 class _BaseSetting(DataModel):
     value_type: SettingValueType = Field(
         ...,
@@ -72,22 +101,23 @@ class _BaseSetting(DataModel):
         assert value_type is not None, "value_type is required"
         assert raw_value is not None, "setting_value is required"
 
+        return parse_setting_value(value_type, raw_value)
+
+    @classmethod
+    def derive_row_values(cls, values: dict[str, Any]) -> None:
+        """与 check_value 一致，记录转换类型后的设置值
+
+        Args:
+            values (dict[str, Any]): 从记录中读取的字段值
+        """
+        value_type: SettingValueType | None = values.get("value_type")
+        raw_value: str | None = values.get("setting_value")
+        if value_type is None or raw_value is None:
+            return
         try:
-            if value_type == SettingValueType.INTEGER:
-                return int(raw_value)
-            if value_type == SettingValueType.FLOAT:
-                return float(raw_value)
-            if value_type == SettingValueType.BOOLEAN:
-                if raw_value.lower() == "true":
-                    return True
-                if raw_value.lower() == "false":
-                    return False
-                raise ValueError
-            return raw_value  # 默认类型不需要转换
-        except ValueError as err:
-            raise ValueError(
-                f"Setting value doesn't match the type: {value_type}"
-            ) from err
+            values["value"] = parse_setting_value(value_type, raw_value)
+        except ValueError:
+            values["value"] = None  # 不会出现在响应中，由使用设置值的地方处理
 
 
 class Setting(_BaseSetting):
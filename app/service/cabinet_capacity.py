@@ -0,0 +1,56 @@
+from typing import Optional
+
+from asyncio import Task, CancelledError, create_task, sleep
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from loguru import logger
+
+from app.crud.location_cabinet import CABINET_CRUD
+from app.database import DB
+from app.util.env import SETTINGS
+
+
+class _CounterShardRollup:
+    """定期将容量分片汇总到存储柜的后台任务"""
+
+    def __init__(self):
+        self._task: Optional[Task] = None
+
+    async def start(self) -> None:
+        """启动后台汇总任务"""
+        self._task = create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台汇总任务"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except CancelledError:
+            pass
+        self._task = None
+
+    async def roll_up(self) -> int:
+        """汇总一次全部开启了容量分片的存储柜
+
+        Returns:
+            int: 当前容量发生变化的存储柜数量
+        """
+        async with DB.client.new_session() as session:
+            changed = await CABINET_CRUD.roll_up_counter_shards(session)
+            await session.commit()
+        return changed
+
+    async def _run(self) -> None:
+        interval: float = SETTINGS.cabinet_capacity.rollup_interval  # type: ignore
+        while True:
+            await sleep(interval)
+            try:
+                await self.roll_up()
+            except (SQLAlchemyError, OSError) as error:
+                logger.warning(f"cabinet counter shard rollup failed: {error}")
+
+
+COUNTER_SHARD_ROLLUP = _CounterShardRollup()
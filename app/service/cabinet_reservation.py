@@ -0,0 +1,150 @@
+from typing import Any, Optional
+
+from asyncio import (
+    Event,
+    Task,
+    CancelledError,
+    TimeoutError as AsyncTimeoutError,
+    create_task,
+    wait_for,
+)
+from heapq import heappop, heappush
+from time import monotonic
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from loguru import logger
+
+from app.crud.location_cabinet_reservation import RESERVATION_CRUD
+from app.database import DB
+from app.util.env import SETTINGS
+
+
+class _ReservationExpiry:
+    """在容量预留到期时归还容量的后台任务
+
+    每个进程在内存中维护一个按照到期时间排序的堆，只在堆顶的预留到期时访问数据库，
+    不会定期扫描整个预留表。其他进程创建的预留（包括已经退出的进程留下的预留）
+    通过定期查询即将到期的预留加入堆中，查询只使用未结束预留的部分索引。
+    过期使用带状态条件的 UPDATE ，多个进程同时处理同一条预留时只有一个会归还容量。
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int]] = []
+        self._scheduled: set[int] = set()
+        self._wakeup = Event()
+        self._next_sync = 0.0
+        self._expired = 0
+        self._task: Optional[Task] = None
+
+    def schedule(self, reservation: int, ttl: float) -> None:
+        """在预留到期时将其过期
+
+        Args:
+            reservation (int): 预留 ID
+            ttl (float): 距离到期的时间（秒）
+        """
+        if reservation in self._scheduled:
+            return
+        self._scheduled.add(reservation)
+        heappush(self._heap, (monotonic() + ttl, reservation))
+        if self._heap[0][1] == reservation:
+            self._wakeup.set()
+
+    def cancel(self, reservation: int) -> None:
+        """预留已经确认或释放，不再需要过期（堆中的记录在到期时跳过）
+
+        Args:
+            reservation (int): 预留 ID
+        """
+        self._scheduled.discard(reservation)
+
+    async def start(self) -> None:
+        """启动后台过期任务"""
+        self._task = create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台过期任务"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        interval: float = SETTINGS.reservation.sync_interval  # type: ignore
+        while True:
+            try:
+                if monotonic() >= self._next_sync:
+                    self._next_sync = monotonic() + interval
+                    await self._sync(interval)
+                await self._expire_due()
+            except (SQLAlchemyError, OSError) as error:
+                logger.warning(f"cabinet reservation expiry failed: {error}")
+            await self._sleep()
+
+    async def _sleep(self) -> None:
+        # 丢弃堆顶已经确认或释放的预留，避免为它们提前醒来
+        while self._heap and self._heap[0][1] not in self._scheduled:
+            heappop(self._heap)
+        deadline = self._next_sync
+        if self._heap:
+            deadline = min(deadline, self._heap[0][0])
+        self._wakeup.clear()
+        try:
+            await wait_for(self._wakeup.wait(), max(deadline - monotonic(), 0))
+        except AsyncTimeoutError:
+            pass
+
+    async def _sync(self, interval: float) -> None:
+        # 查询两个间隔内到期的预留，下一次查询之前到期的预留都已经在堆中
+        async with DB.client.new_session() as session:
+            due = await RESERVATION_CRUD.due_within(session, seconds=interval * 2)
+        for reservation, remaining in due:
+            self.schedule(reservation, remaining)
+
+    async def _expire_due(self) -> None:
+        now = monotonic()
+        due: list[int] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, reservation = heappop(self._heap)
+            if reservation in self._scheduled:
+                self._scheduled.discard(reservation)
+                due.append(reservation)
+        if not due:
+            return
+
+        async with DB.client.new_session() as session:
+            expired = await RESERVATION_CRUD.expire(session, due)
+            # 进程的时钟比数据库先到期的预留重新加入堆中，已经结束的预留会被忽略
+            expired_ids = {reservation.id for reservation in expired}
+            unexpired = [guid for guid in due if guid not in expired_ids]
+            pending = (
+                await RESERVATION_CRUD.due_within(session, guids=unexpired)
+                if unexpired
+                else []
+            )
+            await session.commit()
+
+        for reservation, remaining in pending:
+            self.schedule(reservation, remaining)
+        if expired:
+            self._expired += len(expired)
+            logger.info(f"expired {len(expired)} cabinet reservations")
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """过期任务的统计信息（等待到期的预留数量、下一次到期的时间和已经过期的数量）"""
+        return {
+            "scheduled": len(self._scheduled),
+            "next_expiry_in": (
+                max(self._heap[0][0] - monotonic(), 0) if self._heap else None
+            ),
+            "expired": self._expired,
+        }
+
+
+RESERVATION_EXPIRY = _ReservationExpiry()
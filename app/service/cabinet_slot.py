@@ -0,0 +1,219 @@
+from typing import Any, Iterable, Optional
+
+from time import monotonic
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.after_commit import on_commit
+from app.database.table.location_cabinet_slot_segment import SEGMENT_SLOTS
+from app.util.env import SETTINGS
+
+# 会话中修改过槽位占用的存储柜，回滚后需要重新加载
+_PENDING_KEY = "slot_changes"
+
+SEGMENT_MASK = (1 << SEGMENT_SLOTS) - 1
+
+
+def slot_mask(slots: Iterable[int]) -> int:
+    """将槽位序号转换为位图，第 i 个槽位对应第 i 位
+
+    Args:
+        slots (Iterable[int]): 槽位序号
+
+    Returns:
+        int: 位图
+    """
+    mask = 0
+    for slot in slots:
+        mask |= 1 << slot
+    return mask
+
+
+def split_segments(mask: int) -> dict[int, int]:
+    """将位图按照段拆分
+
+    Args:
+        mask (int): 位图
+
+    Returns:
+        dict[int, int]: 段序号和段中的位图（只包含不为 0 的段）
+    """
+    segments: dict[int, int] = {}
+    segment = 0
+    while mask:
+        bits = mask & SEGMENT_MASK
+        if bits:
+            segments[segment] = bits
+        mask >>= SEGMENT_SLOTS
+        segment += 1
+    return segments
+
+
+def padding_mask(slot_count: int) -> int:
+    """最后一段中超出槽位数量的位，这些位始终标记为已占用
+
+    Args:
+        slot_count (int): 槽位数量
+
+    Returns:
+        int: 位图
+    """
+    total = -(-slot_count // SEGMENT_SLOTS) * SEGMENT_SLOTS
+    return ((1 << total) - 1) ^ ((1 << slot_count) - 1)
+
+
+class SlotLayout:
+    """一个存储柜的槽位占用位图在内存中的副本"""
+
+    __slots__ = ("slot_count", "occupied", "loaded_at")
+
+    def __init__(self, slot_count: int, occupied: int):
+        """创建槽位占用位图
+
+        Args:
+            slot_count (int): 槽位数量
+            occupied (int): 占用位图，第 i 位为 1 表示第 i 个槽位已被占用
+        """
+        self.slot_count = slot_count
+        self.occupied = occupied & ((1 << slot_count) - 1)
+        self.loaded_at = monotonic()
+
+    @property
+    def free_bits(self) -> int:
+        """空闲槽位的位图"""
+        return ~self.occupied & ((1 << self.slot_count) - 1)
+
+    @property
+    def free_count(self) -> int:
+        """空闲槽位的数量"""
+        return self.free_bits.bit_count()
+
+    def first_free(self, count: int) -> list[int]:
+        """查找序号最小的若干个空闲槽位
+
+        Args:
+            count (int): 槽位数量
+
+        Returns:
+            list[int]: 空闲槽位，空闲槽位不足时返回全部空闲槽位
+        """
+        free = self.free_bits
+        slots = []
+        while free and len(slots) < count:
+            lowest = free & -free
+            slots.append(lowest.bit_length() - 1)
+            free ^= lowest
+        return slots
+
+    def first_run(self, length: int) -> Optional[int]:
+        """查找序号最小的连续空闲槽位
+
+        Args:
+            length (int): 连续槽位的数量
+
+        Returns:
+            Optional[int]: 第一个槽位的序号，没有足够长的连续空闲槽位时返回 None
+        """
+        if length <= 0:
+            return None
+        # 每次与右移后的自身取交集，第 i 位为 1 表示从第 i 个槽位开始的 covered 个槽位都空闲，
+        # 每次移动的距离翻倍，只需要 log(length) 次位运算
+        runs = self.free_bits
+        covered = 1
+        while runs and covered < length:
+            step = min(covered, length - covered)
+            runs &= runs >> step
+            covered += step
+        if not runs:
+            return None
+        return (runs & -runs).bit_length() - 1
+
+    def is_free(self, slots: Iterable[int]) -> bool:
+        """判断槽位是否都存在并且空闲
+
+        Args:
+            slots (Iterable[int]): 槽位序号
+
+        Returns:
+            bool: 是否都空闲
+        """
+        mask = slot_mask(slots)
+        return mask & self.free_bits == mask
+
+
+class SlotMaps:
+    """存储柜槽位占用位图在内存中的副本
+
+    查找空闲槽位只使用内存中的位图，占用槽位时在数据库中使用带条件的 UPDATE 确认，
+    与其他进程冲突时重新加载。超过 CABINET_SLOT_REFRESH_SECONDS 的副本在使用前重新加载，
+    事务回滚后修改过的存储柜也会重新加载。
+    """
+
+    def __init__(self):
+        self._layouts: dict[int, SlotLayout] = {}
+        self._loads = 0
+
+    def get(self, cabinet: int) -> Optional[SlotLayout]:
+        """获取没有过期的槽位占用位图
+
+        Args:
+            cabinet (int): 存储柜 ID
+
+        Returns:
+            Optional[SlotLayout]: 槽位占用位图，没有加载或已经过期时返回 None
+        """
+        layout = self._layouts.get(cabinet)
+        if layout is None:
+            return None
+        refresh_seconds: float = SETTINGS.cabinet_slot.refresh_seconds  # type: ignore
+        if monotonic() - layout.loaded_at > refresh_seconds:
+            del self._layouts[cabinet]
+            return None
+        return layout
+
+    def put(self, cabinet: int, layout: SlotLayout) -> None:
+        """保存从数据库加载的槽位占用位图
+
+        Args:
+            cabinet (int): 存储柜 ID
+            layout (SlotLayout): 槽位占用位图
+        """
+        self._layouts[cabinet] = layout
+        self._loads += 1
+
+    def invalidate(self, cabinet: int) -> None:
+        """丢弃存储柜的槽位占用位图，下次使用时重新加载
+
+        Args:
+            cabinet (int): 存储柜 ID
+        """
+        self._layouts.pop(cabinet, None)
+
+    def apply(
+        self, session: AsyncSession, cabinet: int, occupy: int, release: int
+    ) -> None:
+        """将已经写入数据库的占用变化应用到内存中的位图，事务回滚时丢弃这个存储柜的位图
+
+        Args:
+            session (AsyncSession): 数据库会话
+            cabinet (int): 存储柜 ID
+            occupy (int): 新占用的槽位位图
+            release (int): 释放的槽位位图
+        """
+        layout = self._layouts.get(cabinet)
+        if layout is not None:
+            layout.occupied = (layout.occupied | occupy) & ~release
+
+        on_commit(session, _PENDING_KEY, set, None, self._discard).add(cabinet)
+
+    def _discard(self, cabinets: set[int]) -> None:
+        for cabinet in cabinets:
+            self.invalidate(cabinet)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """槽位占用位图副本的统计信息"""
+        return {"cabinets": len(self._layouts), "loads": self._loads}
+
+
+SLOT_MAPS = SlotMaps()
@@ -0,0 +1,219 @@
+from typing import Any, Callable, Hashable, NamedTuple, Optional, Protocol
+
+from asyncio import to_thread
+from collections import OrderedDict
+import zlib
+
+from app.util.env import SETTINGS
+
+try:
+    import zstandard
+except ImportError:  # 未安装时不提供 zstd 压缩
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # 未安装时不提供 brotli 压缩
+    brotli = None
+
+
+class StreamCompressor(Protocol):
+    """流式压缩器，用于分段发送的响应"""
+
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    def flush(self) -> bytes:
+        ...
+
+
+class Codec(NamedTuple):
+    """压缩方式（ Content-Encoding ）"""
+
+    name: str
+    # 每次都重新生成的响应使用较低的压缩等级，会被缓存的响应使用较高的压缩等级
+    dynamic_level: int
+    cached_level: int
+    compress: Callable[[bytes, int], bytes]
+    compressor: Callable[[int], StreamCompressor]
+
+    def level(self, cached: bool) -> int:
+        """响应是否会被响应缓存保存对应的压缩等级"""
+        return self.cached_level if cached else self.dynamic_level
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)  # type: ignore
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _gzip(data: bytes, level: int) -> bytes:
+    # 不写入修改时间，相同的响应体压缩后完全相同， ETag 保持不变
+    return zlib.compress(data, level, wbits=31)
+
+
+def _gzip_stream(level: int) -> StreamCompressor:
+    return zlib.compressobj(level, wbits=31)
+
+
+def _available_codecs() -> list[Codec]:
+    codecs = []
+    if zstandard is not None:
+        codecs.append(
+            Codec(
+                "zstd",
+                3,
+                15,
+                lambda data, level: zstandard.ZstdCompressor(level).compress(data),
+                lambda level: zstandard.ZstdCompressor(level).compressobj(),
+            )
+        )
+    if brotli is not None:
+        codecs.append(
+            Codec(
+                "br",
+                4,
+                9,
+                lambda data, level: brotli.compress(data, quality=level),
+                _BrotliStream,
+            )
+        )
+    codecs.append(Codec("gzip", 5, 9, _gzip, _gzip_stream))
+    return codecs
+
+
+# 按照优先顺序排列，权重相同时使用靠前的压缩方式
+CODECS = _available_codecs()
+
+
+def negotiate(accept_encoding: str) -> Optional[Codec]:
+    """根据请求头 Accept-Encoding 选择压缩方式
+
+    Args:
+        accept_encoding (str): 请求头 Accept-Encoding 的值
+
+    Returns:
+        Optional[Codec]: 权重最高的压缩方式，客户端不接受任何可用的压缩方式时返回 None
+    """
+    weights: dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip()] = weight
+
+    wildcard = weights.get("*", 0.0)
+    best: Optional[Codec] = None
+    best_weight = 0.0
+    for codec in CODECS:
+        weight = weights.get(codec.name, wildcard)
+        if weight > best_weight:
+            best, best_weight = codec, weight
+    return best
+
+
+class CompressionCache:
+    """压缩响应体，并按照未压缩响应体的 ETag 缓存各种压缩方式的结果
+
+    相同的响应体再次发送时直接使用缓存的压缩结果，不再压缩；较大的响应体在线程池中压缩，
+    不阻塞事件循环。
+    """
+
+    def __init__(self):
+        self._variants: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._offloaded = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+
+    async def compress(
+        self, codec: Codec, body: bytes, cached: bool, etag: bytes
+    ) -> bytes:
+        """压缩响应体
+
+        Args:
+            codec (Codec): 压缩方式
+            body (bytes): 未压缩的响应体
+            cached (bool): 响应是否会被响应缓存保存，是时使用较高的压缩等级
+            etag (bytes): 未压缩响应体的 ETag ，由调用方计算，同时用作响应的 ETag
+
+        Returns:
+            bytes: 压缩后的响应体
+        """
+        settings = SETTINGS.compression
+        level = codec.level(cached)
+        cacheable = len(body) <= settings.cache_max_entry_bytes  # type: ignore
+
+        key = None
+        if cacheable:
+            key = (etag, codec.name, level)
+            variant = self._variants.get(key)
+            if variant is not None:
+                self._variants.move_to_end(key)
+                self._hits += 1
+                return variant
+        self._misses += 1
+
+        if len(body) >= settings.offload_bytes:  # type: ignore
+            self._offloaded += 1
+            variant = await to_thread(codec.compress, body, level)
+        else:
+            variant = codec.compress(body, level)
+        self._bytes_in += len(body)
+        self._bytes_out += len(variant)
+
+        if key is not None:
+            self._store(key, variant, settings.cache_max_bytes)  # type: ignore
+        return variant
+
+    def _store(self, key: Hashable, variant: bytes, max_bytes: int) -> None:
+        if len(variant) > max_bytes:
+            return
+        previous = self._variants.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._variants[key] = variant
+        self._bytes += len(variant)
+        while self._bytes > max_bytes:
+            _, evicted = self._variants.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def clear(self) -> None:
+        """清空缓存的压缩结果"""
+        self._variants.clear()
+        self._bytes = 0
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """压缩的统计信息（可用的压缩方式、缓存的压缩结果数量和大小、命中率、压缩比）"""
+        lookups = self._hits + self._misses
+        return {
+            "codecs": [codec.name for codec in CODECS],
+            "variants": len(self._variants),
+            "bytes": self._bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": round(self._hits / lookups, 4) if lookups else None,
+            "offloaded": self._offloaded,
+            "compression_ratio": (
+                round(self._bytes_out / self._bytes_in, 4) if self._bytes_in else None
+            ),
+        }
+
+
+COMPRESSION_CACHE = CompressionCache()
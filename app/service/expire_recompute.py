@@ -0,0 +1,139 @@
+from typing import Any, Optional
+
+from asyncio import (
+    Event,
+    Task,
+    CancelledError,
+    TimeoutError as AsyncTimeoutError,
+    create_task,
+    wait_for,
+)
+from time import monotonic, perf_counter
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from loguru import logger
+
+from app.crud.expire_recompute_job import RECOMPUTE_JOB_CRUD
+from app.database import DB
+from app.database.after_commit import on_commit
+from app.service.job_lease import JobLease
+from app.util.env import SETTINGS
+
+# 会话中创建了任务，提交后唤醒后台任务
+_PENDING_KEY = "expire_recompute_jobs"
+
+
+class _ExpireRecompute:
+    """执行过期时间重新计算任务的后台任务
+
+    修改器械分类的过期时长只会在同一个事务中创建任务，不会在请求中修改器械。
+    持有租约的一个进程按照器械 ID 分段执行任务，每一段是一条 UPDATE ... WHERE id BETWEEN
+    语句并单独提交，不会长时间锁定器械或者产生很大的事务；已经处理到的 ID 与这一段一起提交，
+    进程重启或接管后从记录的位置继续。本进程创建的任务在提交后立即开始执行。
+    """
+
+    def __init__(self):
+        self._lease = JobLease("expire_recompute")
+        self._wakeup = Event()
+        self._current_job: Optional[int] = None
+        self._chunks = 0
+        self._rows = 0
+        self._busy_seconds = 0.0
+        self._last_chunk_ms: Optional[float] = None
+        self._task: Optional[Task] = None
+
+    def track(self, session: AsyncSession) -> None:
+        """会话中创建了任务，事务提交后唤醒后台任务
+
+        Args:
+            session (AsyncSession): 数据库会话
+        """
+        on_commit(session, _PENDING_KEY, lambda: None, lambda _: self._wakeup.set())
+
+    async def start(self) -> None:
+        """启动后台任务，没有开启时不做任何处理"""
+        if SETTINGS.expire_recompute.enabled:
+            self._wakeup = Event()
+            self._task = create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务并释放租约，没有完成的任务由其他进程继续执行"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except CancelledError:
+            pass
+        self._task = None
+        self._current_job = None
+        await self._lease.release()
+
+    async def _run(self) -> None:
+        settings = SETTINGS.expire_recompute
+        lease_seconds: float = settings.lease_seconds  # type: ignore
+        poll_interval: float = settings.poll_interval  # type: ignore
+        pause_seconds: float = settings.pause_seconds  # type: ignore
+        while True:
+            delay = poll_interval
+            try:
+                if monotonic() >= self._lease.next_renew:
+                    await self._lease.renew(lease_seconds)
+                if self._lease.held and await self._run_chunk():
+                    # 每一段之间稍作停顿，给其他事务留出时间
+                    delay = pause_seconds
+            except (SQLAlchemyError, OSError) as error:
+                logger.warning(f"expire time recompute failed: {error}")
+            await self._sleep(min(delay, self._lease.next_renew - monotonic()))
+
+    async def _sleep(self, seconds: float) -> None:
+        self._wakeup.clear()
+        try:
+            await wait_for(self._wakeup.wait(), max(seconds, 0))
+        except AsyncTimeoutError:
+            pass
+
+    async def _run_chunk(self) -> bool:
+        chunk_size: int = SETTINGS.expire_recompute.chunk_size  # type: ignore
+        start = perf_counter()
+        async with DB.client.new_session() as session:
+            job = await RECOMPUTE_JOB_CRUD.next_job(session)
+            if job is None:
+                self._current_job = None
+                return False
+            result = await RECOMPUTE_JOB_CRUD.run_chunk(session, job, chunk_size)
+            await session.commit()
+
+        elapsed = perf_counter() - start
+        self._current_job = job
+        self._chunks += 1
+        self._busy_seconds += elapsed
+        self._last_chunk_ms = round(elapsed * 1000, 3)
+        if result is not None:
+            processed, finished = result
+            self._rows += processed
+            if finished:
+                self._current_job = None
+                logger.info(f"expire time recompute job {job} finished")
+        return True
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """后台任务的统计信息（是否持有租约、正在执行的任务、处理的分段和器械数量、吞吐量）"""
+        return {
+            "leader": self._lease.held,
+            "current_job": self._current_job,
+            "chunks": self._chunks,
+            "rows": self._rows,
+            "rows_per_second": (
+                round(self._rows / self._busy_seconds, 1)
+                if self._busy_seconds
+                else None
+            ),
+            "last_chunk_ms": self._last_chunk_ms,
+        }
+
+
+EXPIRE_RECOMPUTE = _ExpireRecompute()
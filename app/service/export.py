@@ -0,0 +1,166 @@
+from typing import Any, AsyncIterator, Optional, Sequence, Type
+
+import csv
+import json
+from io import StringIO
+from enum import Enum
+from datetime import datetime
+
+from pydantic import BaseModel
+from pydantic.fields import ModelField
+
+from sqlalchemy import ColumnElement, Row
+from sqlalchemy.exc import SQLAlchemyError
+
+from loguru import logger
+
+from app.crud.base import CRUDBase
+from app.database import DB
+from app.model.base import OuterModelConfig
+from app.model.file_format import FileFormat
+from app.model.serializer import Encoder, memoize
+from app.util.env import SETTINGS
+from app.util.type.guid import GUID
+
+
+def _field_encoder(field: ModelField) -> Optional[Encoder]:
+    """获取与响应模型输出一致的字段编码方式
+
+    Args:
+        field (ModelField): 数据模型的字段
+
+    Returns:
+        Optional[Encoder]: 编码函数，值不需要转换时返回 None
+    """
+    field_type = field.type_
+    if not isinstance(field_type, type):
+        return None
+    if issubclass(field_type, GUID):
+        return str  # 数据库中保存的是数值，响应中使用字符串
+    if issubclass(field_type, datetime):
+        return memoize(OuterModelConfig.json_encoders[datetime])
+    if issubclass(field_type, Enum):
+        return lambda value: value.value if isinstance(value, Enum) else value
+    return None
+
+
+class RowExporter:
+    """将数据表中的记录按照响应模型的字段编码为 NDJSON 或 CSV
+
+    直接编码查询到的列，不创建 ORM 对象和数据模型。输出的字段名和值与列表接口中的数据一致。
+    """
+
+    def __init__(self, crud: CRUDBase, model: Type[BaseModel]):
+        """初始化导出器
+
+        Args:
+            crud (CRUDBase): 资源对应的 CRUD 对象
+            model (Type[BaseModel]): 资源的数据模型
+        """
+        table_columns = crud.table.__table__.columns  # type: ignore
+        fields = [
+            field for field in model.__fields__.values() if field.name in table_columns
+        ]
+
+        self.crud = crud
+        self.field_names: list[str] = [field.name for field in fields]
+        self.columns: list[ColumnElement[Any]] = [
+            table_columns[field.name] for field in fields
+        ]
+        self._encoders: list[tuple[int, Encoder]] = [
+            (index, encoder)
+            for index, encoder in enumerate(map(_field_encoder, fields))
+            if encoder is not None
+        ]
+
+    def _encode_row(self, row: Row) -> list[Any]:
+        values = list(row)
+        for index, encoder in self._encoders:
+            if values[index] is not None:
+                values[index] = encoder(values[index])
+        return values
+
+    def encode_ndjson(self, rows: Sequence[Row]) -> bytes:
+        """将一批记录编码为 NDJSON
+
+        Args:
+            rows (Sequence[Row]): 查询到的记录
+
+        Returns:
+            bytes: 每行一个 JSON 对象
+        """
+        names = self.field_names
+        return "".join(
+            json.dumps(
+                dict(zip(names, self._encode_row(row))),
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            + "\n"
+            for row in rows
+        ).encode()
+
+    def encode_csv(self, rows: Sequence[Row], with_header: bool = False) -> bytes:
+        """将一批记录编码为 CSV
+
+        Args:
+            rows (Sequence[Row]): 查询到的记录
+            with_header (bool, optional): 是否在开头添加表头. Defaults to False.
+
+        Returns:
+            bytes: CSV 数据，空值输出为空字段
+        """
+        buffer = StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if with_header:
+            writer.writerow(self.field_names)
+        writer.writerows(map(self._encode_row, rows))
+        return buffer.getvalue().encode()
+
+    async def stream(
+        self,
+        file_format: FileFormat,
+        *,
+        where: Sequence[ColumnElement[bool]] = (),
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+    ) -> AsyncIterator[bytes]:
+        """使用服务端游标逐批读取并编码记录
+
+        使用独立的只读会话（有可用的从库时在从库上读取），响应发送完成（或客户端断开）后才会关闭。
+
+        Args:
+            file_format (FileFormat): 导出格式
+            where (Sequence[ColumnElement[bool]], optional): 额外的过滤条件. Defaults to ().
+            created_after (Optional[datetime], optional): 创建时间下限（包含）. Defaults to None.
+            created_before (Optional[datetime], optional): 创建时间上限（包含）. Defaults to None.
+
+        Yields:
+            bytes: 一批记录编码后的数据
+        """
+        if file_format is FileFormat.CSV:
+            yield self.encode_csv([], with_header=True)
+
+        exported = 0
+        try:
+            async with DB.new_read_session() as session:
+                async for rows in self.crud.stream(
+                    session,
+                    self.columns,
+                    where=where,
+                    created_after=created_after,
+                    created_before=created_before,
+                    batch_size=SETTINGS.export.batch_size,  # type: ignore
+                ):
+                    exported += len(rows)
+                    if file_format is FileFormat.CSV:
+                        yield self.encode_csv(rows)
+                    else:
+                        yield self.encode_ndjson(rows)
+        except SQLAlchemyError as error:
+            # 响应头已经发送，只能中断响应，由客户端根据不完整的数据判断失败
+            logger.error(
+                f"export of {self.crud.table.__tablename__} failed "
+                + f"after {exported} rows: {error}"
+            )
+            raise
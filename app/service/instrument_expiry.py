@@ -0,0 +1,340 @@
+from typing import Any, Iterable, Optional
+
+from asyncio import (
+    Event,
+    Task,
+    CancelledError,
+    TimeoutError as AsyncTimeoutError,
+    create_task,
+    wait_for,
+)
+from datetime import datetime, timedelta, timezone
+from heapq import heapify, heappop, heappush
+from time import monotonic
+
+from sqlalchemy import (
+    ARRAY,
+    BigInteger,
+    DateTime,
+    Float,
+    any_,
+    bindparam,
+    extract,
+    func,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from loguru import logger
+
+from app.crud.instrument_event import INSTRUMENT_EVENT_CRUD
+from app.crud.instrument_expiry_bucket import EXPIRY_BUCKET_CRUD
+from app.database import DB
+from app.database.after_commit import on_commit
+from app.database.table.instrument_event import InstrumentEventType
+from app.database.table.instrument_record import Instrument, InstrumentStatus
+from app.service.job_lease import JobLease
+from app.util.env import SETTINGS
+
+# 会话中写入的器械，提交后更新等待队列
+_PENDING_KEY = "instrument_expiry_changes"
+
+# 到期判断统一使用数据库的时间
+_UTC_NOW = func.timezone("UTC", func.now(), type_=DateTime)
+
+# 与部分索引的条件一致，使用常量而不是绑定参数，预编译的语句也能使用部分索引
+_PENDING_EXPIRY = text(
+    "instruments.status = 'NORMAL' AND instruments.expire_time IS NOT NULL"
+)
+
+# 重新加载时到期时间变化小于这个值（秒）的器械不重新入堆
+_DEADLINE_TOLERANCE = 0.5
+
+# 清理过期预测中已经过去的时间段的间隔（秒）
+_PRUNE_INTERVAL = 3600
+
+# 堆中失效的记录超过有效记录数量的这个倍数时重建堆
+_COMPACT_RATIO = 2
+_COMPACT_MIN_SIZE = 64
+
+
+class _InstrumentExpiry:
+    """在器械到达过期时间时将其标记为已过期并记录过期事件的后台任务
+
+    开启了过期任务的进程通过数据库中的租约选出一个进程执行。持有租约的进程只把一个时间窗口
+    （ INSTRUMENT_EXPIRY_WINDOW_SECONDS ）内到期的器械加载到按照到期时间排序的堆里，
+    加载只使用未过期器械的部分索引，不会扫描整个器械表；堆顶的器械到期时批量修改状态。
+    本进程写入的器械在提交后立即更新堆，其他进程写入的器械在下一次加载窗口时加入。
+
+    持有租约的进程同时每小时删除一次过期预测中已经过去的时间段。
+
+    过期使用带状态条件的 UPDATE ，租约交接期间两个进程同时处理同一个器械时只有一个会修改状态
+    并记录事件。进程重启后重新加载窗口，停机期间已经到期的器械会立即过期。
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int]] = []
+        self._deadlines: dict[int, float] = {}
+        self._wakeup = Event()
+        self._lease = JobLease("instrument_expiry")
+        self._next_sync = 0.0
+        self._next_prune = 0.0
+        self._loads = 0
+        self._expired = 0
+        self._task: Optional[Task] = None
+
+    # 等待队列
+
+    def schedule(self, instrument: int, remaining: float) -> None:
+        """在器械到期时将其过期
+
+        Args:
+            instrument (int): 器械 ID
+            remaining (float): 距离到期的时间（秒），已经到期时为负数
+        """
+        deadline = monotonic() + remaining
+        old = self._deadlines.get(instrument)
+        if old is not None and abs(old - deadline) < _DEADLINE_TOLERANCE:
+            return
+        self._deadlines[instrument] = deadline
+        heappush(self._heap, (deadline, instrument))
+        if self._heap[0][1] == instrument:
+            self._wakeup.set()
+        if len(self._heap) > _COMPACT_RATIO * len(self._deadlines) + _COMPACT_MIN_SIZE:
+            self._heap = [
+                (deadline, instrument)
+                for instrument, deadline in self._deadlines.items()
+            ]
+            heapify(self._heap)
+
+    def cancel(self, instrument: int) -> None:
+        """器械已经删除、不再过期或者到期时间移出了窗口（堆中的记录在到期时跳过）
+
+        Args:
+            instrument (int): 器械 ID
+        """
+        self._deadlines.pop(instrument, None)
+
+    def _clear(self) -> None:
+        self._heap.clear()
+        self._deadlines.clear()
+
+    # 跟踪会话中的写入
+
+    def track(self, session: AsyncSession, rows: Iterable[Any], deleted: bool) -> None:
+        """记录会话中写入的器械，事务提交后更新等待队列
+
+        Args:
+            session (AsyncSession): 数据库会话
+            rows (Iterable[Any]): 写入的器械
+            deleted (bool): 是否为删除
+        """
+        changes = [
+            (
+                row.id,
+                None
+                if deleted or row.status is not InstrumentStatus.NORMAL
+                else row.expire_time,
+            )
+            for row in rows
+        ]
+        if not changes:
+            return
+
+        on_commit(session, _PENDING_KEY, list, self._apply_changes).extend(changes)
+
+    def _apply_changes(self, changes: list[tuple[int, Optional[datetime]]]) -> None:
+        if not self._lease.held:
+            return
+        window: float = SETTINGS.instrument_expiry.window_seconds  # type: ignore
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        for instrument, expire_time in changes:
+            remaining = (
+                None if expire_time is None else (expire_time - now).total_seconds()
+            )
+            if remaining is None or remaining > window:
+                self.cancel(instrument)
+            else:
+                self.schedule(instrument, remaining)
+
+    # 后台任务
+
+    async def start(self) -> None:
+        """启动后台过期任务，没有开启时不做任何处理"""
+        if SETTINGS.instrument_expiry.enabled:
+            self._wakeup = Event()
+            self._task = create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台过期任务并释放租约"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except CancelledError:
+            pass
+        self._task = None
+
+        self._clear()
+        await self._lease.release()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if monotonic() >= self._lease.next_renew:
+                    await self._renew_lease()
+                if self._lease.held:
+                    if monotonic() >= self._next_sync:
+                        await self._load_window()
+                    await self._expire_due()
+                    if monotonic() >= self._next_prune:
+                        await self._prune_forecast()
+            except (SQLAlchemyError, OSError) as error:
+                logger.warning(f"instrument expiry failed: {error}")
+            await self._sleep()
+
+    async def _renew_lease(self) -> None:
+        lease_seconds: float = SETTINGS.instrument_expiry.lease_seconds  # type: ignore
+        held = self._lease.held
+        await self._lease.renew(lease_seconds)
+        if self._lease.held and not held:
+            # 刚刚接管过期任务，立即加载窗口
+            self._next_sync = 0.0
+        elif held and not self._lease.held:
+            self._clear()
+
+    async def _sleep(self) -> None:
+        # 丢弃堆顶已经取消或者重新入堆的记录，避免为它们提前醒来
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heappop(self._heap)
+        deadline = self._lease.next_renew
+        if self._lease.held:
+            deadline = min(deadline, self._next_sync)
+            if self._heap:
+                deadline = min(deadline, self._heap[0][0])
+        self._wakeup.clear()
+        try:
+            await wait_for(self._wakeup.wait(), max(deadline - monotonic(), 0))
+        except AsyncTimeoutError:
+            pass
+
+    async def _load_window(self) -> None:
+        settings = SETTINGS.instrument_expiry
+        window: float = settings.window_seconds  # type: ignore
+        window_size: int = settings.window_size  # type: ignore
+        sync_interval: float = settings.sync_interval  # type: ignore
+
+        self._next_sync = monotonic() + sync_interval
+        remaining = extract("epoch", Instrument.expire_time - _UTC_NOW).cast(Float)
+        async with DB.client.new_session() as session:
+            result = await session.execute(
+                select(Instrument.id, remaining.label("remaining"))
+                .where(
+                    _PENDING_EXPIRY,
+                    Instrument.expire_time <= _UTC_NOW + timedelta(seconds=window),
+                )
+                .order_by(Instrument.expire_time, Instrument.id)
+                .limit(window_size)
+            )
+            rows = result.all()
+
+        for instrument, seconds in rows:
+            self.schedule(instrument, seconds)
+        self._loads += 1
+
+        # 窗口装满时最后一个器械之后的器械没有加载，在它到期时加载下一个窗口
+        if len(rows) == window_size:
+            self._next_sync = min(
+                self._next_sync, monotonic() + max(rows[-1].remaining, 0)
+            )
+
+    async def _prune_forecast(self) -> None:
+        # 过期预测只汇总没有过去的时间段，由持有租约的进程定期删除之前的计数
+        self._next_prune = monotonic() + _PRUNE_INTERVAL
+        async with DB.client.new_session() as session:
+            pruned = await EXPIRY_BUCKET_CRUD.prune(session)
+            await session.commit()
+        if pruned:
+            logger.info(f"pruned {pruned} expiry forecast buckets")
+
+    async def _expire_due(self) -> None:
+        batch_size: int = SETTINGS.instrument_expiry.batch_size  # type: ignore
+        while True:
+            now = monotonic()
+            due: list[int] = []
+            while self._heap and self._heap[0][0] <= now and len(due) < batch_size:
+                deadline, instrument = heappop(self._heap)
+                if self._deadlines.get(instrument) == deadline:
+                    del self._deadlines[instrument]
+                    due.append(instrument)
+            if not due:
+                return
+            await self._expire(due)
+
+    async def _expire(self, due: list[int]) -> None:
+        ids = bindparam("ids", due, type_=ARRAY(BigInteger), unique=True)
+        async with DB.client.new_session() as session:
+            result = await session.execute(
+                update(Instrument)
+                .where(
+                    Instrument.id == any_(ids),
+                    _PENDING_EXPIRY,
+                    Instrument.expire_time <= _UTC_NOW,
+                )
+                .values(status=InstrumentStatus.EXPIRED)
+                .returning(Instrument.id, Instrument.expire_time)
+                .execution_options(synchronize_session=False)
+            )
+            expired = result.all()
+            await INSTRUMENT_EVENT_CRUD.record(
+                session, InstrumentEventType.EXPIRED, expired
+            )
+
+            # 过期时间被修改为更晚的器械重新入堆，已经删除或过期的器械会被忽略
+            expired_ids = {instrument for instrument, _ in expired}
+            unexpired = [
+                instrument for instrument in due if instrument not in expired_ids
+            ]
+            pending = []
+            if unexpired:
+                remaining = extract("epoch", Instrument.expire_time - _UTC_NOW)
+                result = await session.execute(
+                    select(Instrument.id, remaining.cast(Float)).where(
+                        Instrument.id
+                        == any_(
+                            bindparam(
+                                "ids", unexpired, type_=ARRAY(BigInteger), unique=True
+                            )
+                        ),
+                        _PENDING_EXPIRY,
+                    )
+                )
+                pending = result.all()
+            await session.commit()
+
+        for instrument, seconds in pending:
+            self.schedule(instrument, seconds)
+        if expired:
+            self._expired += len(expired)
+            logger.info(f"expired {len(expired)} instruments")
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """过期任务的统计信息（是否持有租约、等待到期的器械数量、下一次到期的时间等）"""
+        return {
+            "leader": self._lease.held,
+            "scheduled": len(self._deadlines),
+            "heap_size": len(self._heap),
+            "next_expiry_in": (
+                max(self._heap[0][0] - monotonic(), 0) if self._heap else None
+            ),
+            "window_loads": self._loads,
+            "expired": self._expired,
+        }
+
+
+INSTRUMENT_EXPIRY = _InstrumentExpiry()
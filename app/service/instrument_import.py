@@ -0,0 +1,568 @@
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Optional
+
+import csv
+import json
+from zlib import MAX_WBITS, decompressobj, error as ZlibError
+from codecs import getincrementaldecoder
+from pathlib import Path
+from time import perf_counter
+from asyncio import to_thread
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from asyncpg import InterfaceError, PostgresError
+
+from pydantic import ValidationError
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from loguru import logger
+
+from app.crud.instrument_category import CATEGORY_CRUD
+from app.crud.instrument_expiry_bucket import EXPIRY_BUCKET_CRUD, bucket_deltas
+from app.crud.location_cabinet import CABINET_CRUD
+from app.crud.location_cabinet_slot import SLOT_CRUD
+from app.database import DB
+from app.database.table.instrument_record import Instrument
+from app.model.file_format import FileFormat
+from app.model.instrument_import import (
+    ImportChunkReport,
+    ImportRowError,
+    InstrumentImportReport,
+)
+from app.model.instrument_record import InstrumentRecordInCreate
+from app.service.storage_rule import STORAGE_RULES
+from app.util.env import SETTINGS
+from app.util.type.guid import GUID, init_snowflake_client, close_snowflake_client
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# COPY 写入的列，创建时间和更新时间使用数据库的默认值
+_COPY_COLUMNS = ("id", "located_cabinet", "instrument_category", "expire_time", "slot")
+_REQUIRED_FIELDS = {"located_cabinet", "instrument_category"}
+_ID_FIELD = InstrumentRecordInCreate.__fields__["id"]
+
+# 校验结果缓存的最大条目数
+_VALIDATION_CACHE_SIZE = 4096
+
+# 校验通过的记录：偏移量、 ID 、存储柜、器械类别、过期时间
+_ValidRecord = tuple[int, int, int, int, Optional[datetime]]
+
+ChunkCallback = Callable[[ImportChunkReport], None]
+
+
+class InstrumentImportError(ValueError):
+    """导入的文件无法解析"""
+
+
+async def decompress_stream(
+    stream: AsyncIterable[bytes], read_size: int
+) -> AsyncIterator[bytes]:
+    """按需解压 gzip 格式的数据流，未压缩的数据原样返回
+
+    每次解压的输出不超过 read_size ，不会因为压缩率过高一次性占用大量内存。
+
+    Args:
+        stream (AsyncIterable[bytes]): 数据流
+        read_size (int): 每次解压输出的最大字节数
+
+    Raises:
+        InstrumentImportError: 压缩数据不完整时抛出异常
+
+    Yields:
+        bytes: 解压后的数据
+    """
+    chunks = stream.__aiter__()
+
+    head = b""
+    async for data in chunks:
+        head += data
+        if len(head) >= len(GZIP_MAGIC):
+            break
+
+    if not head.startswith(GZIP_MAGIC):
+        if head:
+            yield head
+        async for data in chunks:
+            yield data
+        return
+
+    decompressor = decompressobj(MAX_WBITS | 16)
+    member_started = False
+    data: Optional[bytes] = head
+    while data is not None:
+        while data:
+            member_started = True
+            output = decompressor.decompress(data, read_size)
+            if decompressor.eof:
+                # 多个 gzip 成员拼接在一起时继续解压下一个成员
+                data = decompressor.unused_data
+                decompressor = decompressobj(MAX_WBITS | 16)
+                member_started = False
+            else:
+                data = decompressor.unconsumed_tail
+            if output:
+                yield output
+        data = await anext(chunks, None)
+
+    if member_started and not decompressor.eof:
+        raise InstrumentImportError("gzip data is truncated")
+
+
+async def iter_lines(
+    stream: AsyncIterable[bytes], read_size: int
+) -> AsyncIterator[str]:
+    """将 UTF-8 编码的数据流（可以是 gzip 压缩的）按行拆分
+
+    Args:
+        stream (AsyncIterable[bytes]): 数据流
+        read_size (int): 每次解压输出的最大字节数
+
+    Yields:
+        str: 去掉换行符的一行数据
+    """
+    decoder = getincrementaldecoder("utf-8-sig")()
+    rest = ""
+    async for data in decompress_stream(stream, read_size):
+        lines = (rest + decoder.decode(data)).split("\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+
+    rest += decoder.decode(b"", final=True)
+    if rest:
+        yield rest.rstrip("\r")
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+class InstrumentImporter:
+    """器械记录批量导入
+
+    数据按行流式读取，每 chunk_size 条记录为一批：
+
+        1. 使用 InstrumentRecordInCreate 校验每条记录（在线程池中执行，不阻塞事件循环）
+        2. 检查引用的存储柜和器械类别（已经确认存在的会缓存，不会重复查询）
+        3. 批量调整存储柜的当前容量，并使用 COPY 写入器械记录
+        4. 提交事务
+
+    校验失败的记录会被跳过并报告，写入数据库失败时停止导入。
+    每批单独提交，报告中的 next_offset 之前的记录都已经处理完成，可以从这里继续导入。
+    """
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        max_errors_per_chunk: Optional[int] = None,
+        read_size: Optional[int] = None,
+    ):
+        """初始化导入器
+
+        Args:
+            chunk_size (Optional[int], optional): 每批的记录数. Defaults to None.
+            max_errors_per_chunk (Optional[int], optional): 每批最多报告的错误记录数. Defaults to None.
+            read_size (Optional[int], optional): 每次读取的数据大小. Defaults to None.
+
+        没有设置的参数使用环境变量中的设置。
+        """
+        settings = SETTINGS.instrument_import
+        self.chunk_size: int = chunk_size or settings.chunk_size  # type: ignore
+        self.max_errors_per_chunk: int = (
+            settings.max_errors_per_chunk
+            if max_errors_per_chunk is None
+            else max_errors_per_chunk
+        )  # type: ignore
+        self.read_size: int = read_size or settings.read_size  # type: ignore
+
+        self._validated: dict[tuple, tuple[int, int, Optional[datetime]]] = {}
+        self._known_cabinets: set[int] = set()
+        self._expire_durations: dict[int, Optional[int]] = {}
+
+    async def run(
+        self,
+        stream: AsyncIterable[bytes],
+        file_format: FileFormat,
+        offset: int = 0,
+        on_chunk: Optional[ChunkCallback] = None,
+    ) -> InstrumentImportReport:
+        """导入数据流中的器械记录
+
+        Args:
+            stream (AsyncIterable[bytes]): CSV 或 NDJSON 格式的数据流（可以是 gzip 压缩的）
+            file_format (FileFormat): 数据格式
+            offset (int, optional): 跳过的记录数，用于继续中断的导入. Defaults to 0.
+            on_chunk (Optional[ChunkCallback], optional): 每批处理完成后的回调. Defaults to None.
+
+        Returns:
+            InstrumentImportReport: 导入结果
+        """
+        report = InstrumentImportReport(start_offset=offset, next_offset=offset)
+        started_at = perf_counter()
+        try:
+            await self._run(stream, file_format, report, on_chunk)
+        except (InstrumentImportError, UnicodeDecodeError, ZlibError) as error:
+            report.error = str(error)
+
+        report.elapsed_ms = round((perf_counter() - started_at) * 1000, 3)
+        logger.info(
+            f"instrument import finished: imported {report.imported}, "
+            + f"failed {report.failed}, next offset {report.next_offset}, "
+            + f"completed {report.completed}, {report.elapsed_ms} ms"
+        )
+        return report
+
+    async def _run(
+        self,
+        stream: AsyncIterable[bytes],
+        file_format: FileFormat,
+        report: InstrumentImportReport,
+        on_chunk: Optional[ChunkCallback],
+    ) -> None:
+        header: Optional[list[str]] = None
+        record_offset = 0
+        batch: list[str] = []
+
+        async for line in iter_lines(stream, self.read_size):
+            if not line.strip():
+                continue
+            if file_format is FileFormat.CSV and header is None:
+                header = self._parse_header(line)
+                continue
+
+            if record_offset >= report.start_offset:
+                batch.append(line)
+            record_offset += 1
+
+            if len(batch) >= self.chunk_size:
+                if not await self._import_chunk(
+                    report, file_format, header, batch, on_chunk
+                ):
+                    return
+                batch = []
+
+        if batch and not await self._import_chunk(
+            report, file_format, header, batch, on_chunk
+        ):
+            return
+        report.completed = True
+
+    @staticmethod
+    def _parse_header(line: str) -> list[str]:
+        header = [name.strip() for name in next(csv.reader((line,)))]
+        missing = _REQUIRED_FIELDS.difference(header)
+        if missing:
+            raise InstrumentImportError(
+                f"CSV header is missing columns: {', '.join(sorted(missing))}"
+            )
+        return header
+
+    async def _import_chunk(
+        self,
+        report: InstrumentImportReport,
+        file_format: FileFormat,
+        header: Optional[list[str]],
+        lines: list[str],
+        on_chunk: Optional[ChunkCallback],
+    ) -> bool:
+        start = report.next_offset
+        chunk = ImportChunkReport(
+            index=len(report.chunks), start_offset=start, end_offset=start + len(lines)
+        )
+        report.chunks.append(chunk)
+
+        records = await to_thread(
+            self._validate_lines, chunk, file_format, header, lines
+        )
+        try:
+            async with DB.client.new_session() as session:
+                await self._load_references(session, records)
+                rows, offsets, deltas = self._build_rows(chunk, records)
+                if rows:
+                    # 先通过会话执行 UPDATE 开启事务， COPY 才会在同一个事务中执行
+                    rejected = await CABINET_CRUD.adjust_current_number(session, deltas)
+                    if rejected:
+                        rows, offsets = self._drop_rejected(
+                            chunk,
+                            rows,
+                            offsets,
+                            rejected,
+                            "Cabinet does not have enough capacity.",
+                        )
+                    rows, offsets = await self._assign_slots(
+                        session, chunk, rows, offsets
+                    )
+                    if rows:
+                        await self._copy_rows(session, rows)
+                        await EXPIRY_BUCKET_CRUD.adjust(
+                            session, bucket_deltas(row[1:4] for row in rows)
+                        )
+                    await session.commit()
+        except (SQLAlchemyError, PostgresError, InterfaceError, OSError) as error:
+            chunk.error = f"{error.__class__.__name__}: {error}"
+            report.error = f"chunk {chunk.index} failed: {chunk.error}"
+            logger.error(f"instrument import {report.error}")
+            if on_chunk is not None:
+                on_chunk(chunk)
+            return False
+
+        chunk.imported = len(rows)
+        report.imported += chunk.imported
+        report.failed += chunk.failed
+        report.next_offset = chunk.end_offset
+        if on_chunk is not None:
+            on_chunk(chunk)
+        return True
+
+    def _add_error(self, chunk: ImportChunkReport, offset: int, error: str) -> None:
+        chunk.failed += 1
+        if len(chunk.errors) < self.max_errors_per_chunk:
+            chunk.errors.append(ImportRowError(offset=offset, error=error))
+
+    def _validate_lines(
+        self,
+        chunk: ImportChunkReport,
+        file_format: FileFormat,
+        header: Optional[list[str]],
+        lines: list[str],
+    ) -> list[_ValidRecord]:
+        records: list[_ValidRecord] = []
+        for offset, line in enumerate(lines, chunk.start_offset):
+            try:
+                data = self._parse_line(file_format, header, line)
+                guid = self._validate_id(data.pop("id", None))
+                cabinet, category, expire_time = self._validate_fields(data, guid)
+            except ValidationError as error:
+                self._add_error(chunk, offset, _format_validation_error(error))
+                continue
+            except (ValueError, csv.Error) as error:
+                self._add_error(chunk, offset, str(error))
+                continue
+            records.append((offset, guid, cabinet, category, expire_time))
+        return records
+
+    @staticmethod
+    def _validate_id(value: Any) -> int:
+        if value is None:
+            return GUID.generate().guid
+
+        guid, error = _ID_FIELD.validate(value, {}, loc="id")
+        if error is not None:
+            raise ValidationError([error], InstrumentRecordInCreate)
+        return guid.guid
+
+    def _validate_fields(
+        self, data: dict[str, Any], guid: int
+    ) -> tuple[int, int, Optional[datetime]]:
+        # 同一批导入的记录大多引用相同的存储柜和器械类别，相同字段值的校验结果可以直接复用
+        try:
+            key: Optional[tuple] = tuple(data.items())
+            cached = self._validated.get(key)  # type: ignore
+        except TypeError:  # NDJSON 中有列表等不能作为键的值
+            key, cached = None, None
+        if cached is not None:
+            return cached
+
+        # 传入已经分配的 ID ，否则每次校验都会通过 default_factory 多消耗一个新的 ID
+        record = InstrumentRecordInCreate.parse_obj({**data, "id": guid})
+        expire_time = record.expire_time
+        if expire_time is not None and expire_time.tzinfo is not None:
+            expire_time = expire_time.astimezone(timezone.utc).replace(tzinfo=None)
+        fields = (
+            record.located_cabinet.guid,
+            record.instrument_category.guid,
+            expire_time,
+        )
+
+        if key is not None:
+            if len(self._validated) >= _VALIDATION_CACHE_SIZE:
+                self._validated.clear()
+            self._validated[key] = fields
+        return fields
+
+    @staticmethod
+    def _parse_line(
+        file_format: FileFormat, header: Optional[list[str]], line: str
+    ) -> dict[str, Any]:
+        if file_format is FileFormat.NDJSON:
+            data = json.loads(line)
+            if not isinstance(data, dict):
+                raise ValueError("record must be a JSON object")
+            return data
+
+        assert header is not None
+        values = next(csv.reader((line,)))
+        if len(values) != len(header):
+            raise ValueError(f"expected {len(header)} columns, got {len(values)}")
+        # CSV 中的空字段视为没有设置
+        return {key: value for key, value in zip(header, values) if value != ""}
+
+    async def _load_references(
+        self, session: AsyncSession, records: list[_ValidRecord]
+    ) -> None:
+        cabinets = {cabinet for _, _, cabinet, _, _ in records}
+        unknown_cabinets = cabinets.difference(self._known_cabinets)
+        if unknown_cabinets:
+            for cabinet in await CABINET_CRUD.get_multi_by_ids(
+                session, unknown_cabinets
+            ):
+                self._known_cabinets.add(cabinet.id)  # type: ignore
+
+        categories = {category for _, _, _, category, _ in records}
+        unknown_categories = categories.difference(self._expire_durations)
+        if unknown_categories:
+            for category in await CATEGORY_CRUD.get_multi_by_ids(
+                session, unknown_categories
+            ):
+                self._expire_durations[category.id] = category.expire_duration_MS  # type: ignore
+
+        await STORAGE_RULES.refresh(session)
+
+    def _build_rows(
+        self, chunk: ImportChunkReport, records: list[_ValidRecord]
+    ) -> tuple[list[tuple[Any, ...]], list[int], Counter[int]]:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        default_expire_times = {
+            category: None
+            if duration is None
+            else now + timedelta(milliseconds=duration)
+            for category, duration in self._expire_durations.items()
+        }
+
+        rows: list[tuple[Any, ...]] = []
+        offsets: list[int] = []
+        deltas: Counter[int] = Counter()
+        for offset, guid, cabinet, category, expire_time in records:
+            if cabinet not in self._known_cabinets:
+                self._add_error(chunk, offset, "Cabinet not found.")
+                continue
+            if category not in default_expire_times:
+                self._add_error(chunk, offset, "Instrument category not found.")
+                continue
+            if not STORAGE_RULES.may_store(category, cabinet):
+                self._add_error(
+                    chunk, offset, "Instrument category is not allowed in this cabinet."
+                )
+                continue
+
+            if expire_time is None:
+                expire_time = default_expire_times[category]
+            rows.append((guid, cabinet, category, expire_time))
+            offsets.append(offset)
+            deltas[cabinet] += 1
+        return rows, offsets, deltas
+
+    def _drop_rejected(
+        self,
+        chunk: ImportChunkReport,
+        rows: list[tuple[Any, ...]],
+        offsets: list[int],
+        rejected: set[int],
+        error: str,
+    ) -> tuple[list[tuple[Any, ...]], list[int]]:
+        # 被拒绝的存储柜没有增加容量或占用槽位，这一批中存入这些存储柜的记录都不写入
+        kept_rows, kept_offsets = [], []
+        for offset, row in zip(offsets, rows):
+            if row[1] in rejected:
+                self._add_error(chunk, offset, error)
+            else:
+                kept_rows.append(row)
+                kept_offsets.append(offset)
+        return kept_rows, kept_offsets
+
+    async def _assign_slots(
+        self,
+        session: AsyncSession,
+        chunk: ImportChunkReport,
+        rows: list[tuple[Any, ...]],
+        offsets: list[int],
+    ) -> tuple[list[tuple[Any, ...]], list[int]]:
+        # 导入的器械都自动分配槽位，没有槽位的存储柜中的器械槽位为空
+        counts: Counter[int] = Counter(row[1] for row in rows)
+        assigned, exhausted = await SLOT_CRUD.assign(session, counts)
+        if exhausted:
+            # 空闲槽位不足的存储柜归还已经增加的容量
+            await CABINET_CRUD.adjust_current_number(
+                session, {cabinet: -counts[cabinet] for cabinet in exhausted}
+            )
+            rows, offsets = self._drop_rejected(
+                chunk,
+                rows,
+                offsets,
+                exhausted,
+                "Cabinet does not have enough free slots.",
+            )
+        free_slots = {cabinet: iter(slots) for cabinet, slots in assigned.items()}
+        return [
+            (*row, next(free_slots[row[1]]) if row[1] in free_slots else None)
+            for row in rows
+        ], offsets
+
+    @staticmethod
+    async def _copy_rows(session: AsyncSession, rows: list[tuple[Any, ...]]) -> None:
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(  # type: ignore
+            Instrument.__tablename__, records=rows, columns=_COPY_COLUMNS
+        )
+
+
+def guess_format(name: str) -> Optional[FileFormat]:
+    """根据文件名或内容类型推断导入的数据格式
+
+    Args:
+        name (str): 文件名或 Content-Type
+
+    Returns:
+        Optional[FileFormat]: 数据格式，无法推断时返回 None
+    """
+    name = name.lower()
+    if "csv" in name:
+        return FileFormat.CSV
+    if "ndjson" in name or "jsonl" in name or "json" in name:
+        return FileFormat.NDJSON
+    return None
+
+
+async def _read_file(path: Path, read_size: int) -> AsyncIterator[bytes]:
+    with path.open("rb") as file:
+        while data := await to_thread(file.read, read_size):
+            yield data
+
+
+async def import_file(
+    path: Path,
+    file_format: FileFormat,
+    offset: int = 0,
+    chunk_size: Optional[int] = None,
+    on_chunk: Optional[ChunkCallback] = None,
+) -> InstrumentImportReport:
+    """从本地文件导入器械记录，用于命令行工具
+
+    会自行连接数据库并启动 ID 生成器，导入完成后关闭。
+
+    Args:
+        path (Path): 文件路径
+        file_format (FileFormat): 数据格式
+        offset (int, optional): 跳过的记录数. Defaults to 0.
+        chunk_size (Optional[int], optional): 每批的记录数. Defaults to None.
+        on_chunk (Optional[ChunkCallback], optional): 每批处理完成后的回调. Defaults to None.
+
+    Returns:
+        InstrumentImportReport: 导入结果
+    """
+    DB.connect_database()
+    await init_snowflake_client()
+    try:
+        importer = InstrumentImporter(chunk_size=chunk_size)
+        return await importer.run(
+            _read_file(path, importer.read_size), file_format, offset, on_chunk
+        )
+    finally:
+        await close_snowflake_client()
+        await DB.disconnect_database()
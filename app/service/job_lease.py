@@ -0,0 +1,57 @@
+from os import getpid
+from socket import gethostname
+from time import monotonic
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from loguru import logger
+
+from app.crud.scheduler_lease import LEASE_CRUD
+from app.database import DB
+
+
+class JobLease:
+    """后台任务在数据库中的租约，开启了同一个任务的多个进程中只有持有租约的进程执行任务"""
+
+    def __init__(self, job: str):
+        """创建租约
+
+        Args:
+            job (str): 任务名称
+        """
+        self.job = job
+        self.owner = f"{gethostname()[:32]}:{getpid()}"
+        self.held = False
+        self.next_renew = 0.0
+
+    async def renew(self, lease_seconds: float) -> None:
+        """获取或续约租约，每隔租约时长的三分之一调用一次
+
+        Args:
+            lease_seconds (float): 租约时长（秒）
+        """
+        # 先设置下一次续约的时间，数据库不可用时不会连续重试
+        self.next_renew = monotonic() + lease_seconds / 3
+        async with DB.client.new_session() as session:
+            held = await LEASE_CRUD.acquire(
+                session, self.job, self.owner, lease_seconds
+            )
+            await session.commit()
+
+        if held and not self.held:
+            logger.info(f"{self.job} lease acquired")
+        elif not held and self.held:
+            logger.warning(f"{self.job} lease is taken by others")
+        self.held = held
+
+    async def release(self) -> None:
+        """释放持有的租约，其他进程可以立即接管任务"""
+        if not self.held:
+            return
+        self.held = False
+        try:
+            async with DB.client.new_session() as session:
+                await LEASE_CRUD.release(session, self.job, self.owner)
+                await session.commit()
+        except (SQLAlchemyError, OSError) as error:
+            logger.warning(f"can not release {self.job} lease: {error}")
@@ -0,0 +1,349 @@
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Sequence
+
+from asyncio import Lock
+from collections import Counter
+from heapq import heapify, heappop, heappush
+from time import monotonic
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from loguru import logger
+
+from app.database.after_commit import on_commit
+from app.database.table.location_cabinet import Cabinet, CabinetStatus
+from app.service.storage_rule import STORAGE_RULES
+from app.util.env import SETTINGS
+
+# 会话中等待提交后应用的容量变更
+_PENDING_KEY = "placement_changes"
+
+# 堆中失效的记录超过有效记录数量的这个倍数时重建堆
+_COMPACT_RATIO = 2
+_COMPACT_MIN_SIZE = 64
+
+# 堆中的记录：（剩余容量的相反数，存储柜 ID ），堆顶是剩余容量最多的存储柜
+_HeapEntry = tuple[int, int]
+
+
+class _CabinetCapacity(NamedTuple):
+    room: int
+    free: int
+    status: CabinetStatus
+
+    @property
+    def available(self) -> bool:
+        return self.status is CabinetStatus.ENABLED and self.free > 0
+
+
+class PlacementIndex:
+    """按照剩余容量排序的存储柜索引，用于为一批器械推荐存放位置
+
+    每个房间和全部存储柜各有一个按照剩余容量（ max_number - current_number ）排序的堆，
+    只包含启用且有剩余容量的存储柜。容量变化时直接压入新的记录，旧的记录在弹出时发现
+    与当前容量不一致后丢弃，失效记录过多时重建堆。
+
+    通过 CRUD 对象修改的容量在事务提交后增量更新；其他进程的修改每隔
+    CABINET_PLACEMENT_REFRESH_SECONDS 重新加载。推荐结果只是建议，
+    存入器械时仍然会在数据库中原子地检查容量。
+    """
+
+    def __init__(self):
+        self._cabinets: dict[int, _CabinetCapacity] = {}
+        self._room_sizes: Counter[int] = Counter()
+        self._heap: list[_HeapEntry] = []
+        self._room_heaps: dict[int, list[_HeapEntry]] = {}
+
+        self._lock = Lock()
+        self._loaded_at: Optional[float] = None
+        self._loads = 0
+        self._incremental_updates = 0
+
+    # 推荐
+
+    def recommend(
+        self, items: Sequence[tuple[int, Optional[int]]]
+    ) -> list[Optional[int]]:
+        """为一批器械推荐存放的存储柜
+
+        优先使用指定房间中剩余容量最多的存储柜，房间中容量不足时使用其他房间的存储柜。
+        同一批器械会依次占用推荐的存储柜的剩余容量，推荐的器械数量不会超过剩余容量。
+
+        Args:
+            items (Sequence[tuple[int, Optional[int]]]): 器械类别 ID 和优先存放的房间 ID
+
+        Returns:
+            list[Optional[int]]: 与输入顺序一致的存储柜 ID ，没有合适的存储柜时为 None
+        """
+        groups: dict[tuple[int, Optional[int]], list[int]] = {}
+        for index, item in enumerate(items):
+            groups.setdefault(item, []).append(index)
+
+        results: list[Optional[int]] = [None] * len(items)
+        planned: Counter[int] = Counter()
+        for (category, room), indexes in groups.items():
+            candidates = STORAGE_RULES.candidate_cabinets(category)
+            if candidates is not None:
+                # 白名单限制的器械类别只检查白名单中的存储柜
+                self._fill_from(candidates, category, room, indexes, planned, results)
+                continue
+            if room is not None:
+                indexes = self._fill_from_heap(
+                    self._room_heaps.get(room, []),
+                    room,
+                    category,
+                    indexes,
+                    planned,
+                    results,
+                )
+            if indexes:
+                self._fill_from_heap(
+                    self._heap, None, category, indexes, planned, results
+                )
+        return results
+
+    def _fill_from_heap(
+        self,
+        heap: list[_HeapEntry],
+        room: Optional[int],
+        category: int,
+        indexes: list[int],
+        planned: Counter[int],
+        results: list[Optional[int]],
+    ) -> list[int]:
+        # 按照剩余容量从大到小弹出存储柜，结束后放回仍然有效的记录
+        popped: list[_HeapEntry] = []
+        filled = 0
+        while filled < len(indexes) and heap:
+            entry = heappop(heap)
+            capacity = self._cabinets.get(entry[1])
+            if (
+                capacity is None
+                or not capacity.available
+                or capacity.free != -entry[0]
+                or (room is not None and capacity.room != room)
+            ):
+                continue
+            popped.append(entry)
+            filled += self._assign(
+                entry[1], category, indexes, filled, planned, results
+            )
+        for entry in popped:
+            heappush(heap, entry)
+        return indexes[filled:]
+
+    def _fill_from(
+        self,
+        cabinets: Iterable[int],
+        category: int,
+        room: Optional[int],
+        indexes: list[int],
+        planned: Counter[int],
+        results: list[Optional[int]],
+    ) -> None:
+        def priority(cabinet: int) -> tuple[bool, int]:
+            capacity = self._cabinets[cabinet]
+            return capacity.room != room, -capacity.free
+
+        available = [
+            cabinet
+            for cabinet in cabinets
+            if cabinet in self._cabinets and self._cabinets[cabinet].available
+        ]
+        filled = 0
+        for cabinet in sorted(available, key=priority):
+            if filled == len(indexes):
+                break
+            filled += self._assign(cabinet, category, indexes, filled, planned, results)
+
+    def _assign(
+        self,
+        cabinet: int,
+        category: int,
+        indexes: list[int],
+        filled: int,
+        planned: Counter[int],
+        results: list[Optional[int]],
+    ) -> int:
+        if not STORAGE_RULES.may_store(category, cabinet):
+            return 0
+        count = min(
+            self._cabinets[cabinet].free - planned[cabinet], len(indexes) - filled
+        )
+        if count <= 0:
+            return 0
+        for index in indexes[filled : filled + count]:
+            results[index] = cabinet
+        planned[cabinet] += count
+        return count
+
+    # 加载
+
+    async def refresh(self, session: AsyncSession) -> None:
+        """距离上次加载超过设置的间隔时重新加载全部存储柜的容量
+
+        Args:
+            session (AsyncSession): 数据库会话
+        """
+        interval: float = SETTINGS.placement.refresh_seconds  # type: ignore
+        if self._loaded_at is not None and monotonic() - self._loaded_at < interval:
+            return
+
+        async with self._lock:
+            if self._loaded_at is not None and monotonic() - self._loaded_at < interval:
+                return
+            await self._load(session)
+            self._loaded_at = monotonic()
+
+    async def _load(self, session: AsyncSession) -> None:
+        result = await session.execute(
+            select(
+                Cabinet.id,
+                Cabinet.located_room,
+                Cabinet.max_number,
+                Cabinet.current_number,
+                Cabinet.status,
+            )
+        )
+        self._cabinets = {
+            cabinet_id: _CabinetCapacity(room, max_number - current_number, status)
+            for cabinet_id, room, max_number, current_number, status in result
+        }
+        self._room_sizes = Counter(
+            capacity.room for capacity in self._cabinets.values()
+        )
+        self._rebuild()
+        self._loads += 1
+        logger.debug(f"placement index loaded: {len(self._cabinets)} cabinets")
+
+    def _rebuild(self, room: Optional[int] = None) -> None:
+        if room is None:
+            self._heap = self._entries(self._cabinets)
+            rooms: dict[int, list[int]] = {}
+            for cabinet_id, capacity in self._cabinets.items():
+                rooms.setdefault(capacity.room, []).append(cabinet_id)
+            self._room_heaps = {
+                room_id: self._entries(cabinet_ids)
+                for room_id, cabinet_ids in rooms.items()
+            }
+            return
+        self._room_heaps[room] = self._entries(
+            cabinet_id
+            for cabinet_id, capacity in self._cabinets.items()
+            if capacity.room == room
+        )
+
+    def _entries(self, cabinet_ids: Iterable[int]) -> list[_HeapEntry]:
+        entries = []
+        for cabinet_id in cabinet_ids:
+            capacity = self._cabinets[cabinet_id]
+            if capacity.available:
+                entries.append((-capacity.free, cabinet_id))
+        heapify(entries)
+        return entries
+
+    # 增量更新
+
+    def apply_cabinet(
+        self, cabinet_id: int, capacity: Optional[_CabinetCapacity]
+    ) -> None:
+        """应用一个存储柜的变更
+
+        Args:
+            cabinet_id (int): 存储柜 ID
+            capacity (Optional[_CabinetCapacity]): 新的所在房间、剩余容量和状态，删除时为 None
+        """
+        old = self._cabinets.pop(cabinet_id, None)
+        if old is not None:
+            self._room_sizes[old.room] -= 1
+        if capacity is not None:
+            self._cabinets[cabinet_id] = capacity
+            self._room_sizes[capacity.room] += 1
+            if capacity.available:
+                entry = (-capacity.free, cabinet_id)
+                heappush(self._heap, entry)
+                heappush(self._room_heaps.setdefault(capacity.room, []), entry)
+                self._compact(capacity.room)
+
+    def apply_used(self, cabinet_id: int, used: int) -> None:
+        """应用一个存储柜已用容量的变化，用于只修改了容量分片的存储柜
+
+        Args:
+            cabinet_id (int): 存储柜 ID
+            used (int): 已用容量的变化量
+        """
+        capacity = self._cabinets.get(cabinet_id)
+        if capacity is not None:
+            self.apply_cabinet(
+                cabinet_id, capacity._replace(free=max(capacity.free - used, 0))
+            )
+
+    def _compact(self, room: int) -> None:
+        limit = _COMPACT_RATIO * len(self._cabinets) + _COMPACT_MIN_SIZE
+        if len(self._heap) > limit:
+            self._rebuild()
+            return
+        room_limit = _COMPACT_RATIO * self._room_sizes[room] + _COMPACT_MIN_SIZE
+        if len(self._room_heaps.get(room, ())) > room_limit:
+            self._rebuild(room)
+
+    # 跟踪会话中的写入
+
+    def _track(self, session: AsyncSession, change: Callable[[], None]) -> None:
+        on_commit(session, _PENDING_KEY, list, self._apply_changes).append(change)
+
+    def _apply_changes(self, changes: list[Callable[[], None]]) -> None:
+        for change in changes:
+            change()
+            self._incremental_updates += 1
+
+    def track_cabinets(
+        self, session: AsyncSession, rows: Iterable[Any], deleted: bool
+    ) -> None:
+        """记录会话中写入的存储柜，事务提交后应用
+
+        Args:
+            session (AsyncSession): 数据库会话
+            rows (Iterable[Any]): 写入的存储柜或包含 id 、 located_room 、 max_number 、
+                current_number 和 status 的记录
+            deleted (bool): 是否为删除
+        """
+        for row in rows:
+            capacity = None
+            if not deleted:
+                capacity = _CabinetCapacity(
+                    row.located_room, row.max_number - row.current_number, row.status
+                )
+            self._track(
+                session,
+                lambda cabinet_id=row.id, capacity=capacity: self.apply_cabinet(
+                    cabinet_id, capacity
+                ),
+            )
+
+    def track_used(self, session: AsyncSession, cabinet_id: int, used: int) -> None:
+        """记录会话中容量分片的变化，事务提交后应用
+
+        Args:
+            session (AsyncSession): 数据库会话
+            cabinet_id (int): 存储柜 ID
+            used (int): 已用容量的变化量
+        """
+        self._track(session, lambda: self.apply_used(cabinet_id, used))
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """容量索引的统计信息"""
+        return {
+            "cabinets": len(self._cabinets),
+            "available_cabinets": sum(
+                capacity.available for capacity in self._cabinets.values()
+            ),
+            "heap_size": len(self._heap),
+            "rooms": len(self._room_heaps),
+            "loads": self._loads,
+            "incremental_updates": self._incremental_updates,
+        }
+
+
+PLACEMENTS = PlacementIndex()
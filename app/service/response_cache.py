@@ -0,0 +1,261 @@
+from typing import Any, Hashable, Iterable, NamedTuple, Optional
+
+from collections import OrderedDict
+from time import monotonic
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import DB
+from app.database.after_commit import on_commit
+from app.util.env import SETTINGS
+
+# 会话中写入的表和记录，提交后使相关的响应失效
+_PENDING_KEY = "response_cache_changes"
+
+# 失效计数的数量超过这个值时清空整个缓存，避免删除过的记录的计数一直占用内存
+_MAX_GENERATIONS = 65536
+
+Headers = list[tuple[bytes, bytes]]
+
+
+class CachedResponse(NamedTuple):
+    """已经序列化（和压缩）的响应"""
+
+    status: int
+    headers: Headers
+    body: bytes
+    tags: tuple[str, ...]
+    expires_at: float
+
+
+def table_tag(table: str) -> str:
+    """表中任何记录变化时都会失效的响应（列表）的标签
+
+    Args:
+        table (str): 表名
+
+    Returns:
+        str: 标签
+    """
+    return table
+
+
+def item_tag(table: str, row_id: int) -> str:
+    """单条记录变化时失效的响应的标签
+
+    Args:
+        table (str): 表名
+        row_id (int): 记录 ID
+
+    Returns:
+        str: 标签
+    """
+    return f"{table}:{row_id}"
+
+
+class ResponseCache:
+    """进程内的 LRU 响应缓存，按照标签精确失效
+
+    每个响应带有它依赖的标签：列表依赖整张表，单条记录依赖这条记录。通过 CRUD 对象写入时，
+    事务提交后使对应表的列表和被写入的记录失效。请求开始时记录标签的失效计数，
+    写入与请求并发时计数发生变化，请求读取到的可能是旧数据，响应不会被缓存。
+
+    查询接口可能读取从库：配置了从库时，标签失效后的一段时间（最大复制延迟加上检查间隔）内
+    开始的请求可能读取到还没有复制的旧数据，响应也不会被缓存。
+    失效只在本进程内生效，其他进程的写入在缓存的有效时间（和从库的复制延迟）之后才可见。
+    """
+
+    def __init__(self):
+        self._entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+        self._keys_by_tag: dict[str, set[Hashable]] = {}
+        self._generations: dict[str, int] = {}
+        self._invalidated_at: dict[str, float] = {}
+        self._cleared_at = float("-inf")
+        self._epoch = 0
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._bypasses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._replica_skips = 0
+
+    # 读写缓存
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        """获取缓存的响应，过期的响应会被删除
+
+        Args:
+            key (Hashable): 缓存键
+
+        Returns:
+            Optional[CachedResponse]: 缓存的响应，没有缓存时返回 None
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry
+
+    def generations(self, tags: Iterable[str]) -> tuple[int, ...]:
+        """获取标签当前的失效计数，在请求开始时调用
+
+        Args:
+            tags (Iterable[str]): 标签
+
+        Returns:
+            tuple[int, ...]: 失效计数
+        """
+        return (self._epoch, *(self._generations.get(tag, 0) for tag in tags))
+
+    def store(
+        self,
+        key: Hashable,
+        tags: tuple[str, ...],
+        generations: tuple[int, ...],
+        started_at: float,
+        status: int,
+        headers: Headers,
+        body: bytes,
+    ) -> bool:
+        """缓存响应，请求期间标签已经失效，或请求开始时从库可能还没有复制最近的写入时不缓存
+
+        Args:
+            key (Hashable): 缓存键
+            tags (tuple[str, ...]): 响应依赖的标签
+            generations (tuple[int, ...]): 请求开始时标签的失效计数
+            started_at (float): 请求开始（获取失效计数）的 monotonic 时间
+            status (int): 状态码
+            headers (Headers): 响应头
+            body (bytes): 响应体
+
+        Returns:
+            bool: 是否已经缓存
+        """
+        settings = SETTINGS.response_cache
+        if len(body) > settings.max_entry_bytes:  # type: ignore
+            return False
+        if self.generations(tags) != generations:
+            return False
+        if started_at - self._last_invalidated(tags) < self._replica_window():
+            self._replica_skips += 1
+            return False
+
+        self._remove(key)
+        self._entries[key] = CachedResponse(
+            status,
+            headers,
+            body,
+            tags,
+            monotonic() + settings.ttl_seconds,  # type: ignore
+        )
+        self._bytes += len(body)
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        self._stores += 1
+
+        while self._entries and (
+            len(self._entries) > settings.max_entries  # type: ignore
+            or self._bytes > settings.max_bytes  # type: ignore
+        ):
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+        return True
+
+    def _last_invalidated(self, tags: tuple[str, ...]) -> float:
+        times = (self._invalidated_at.get(tag, float("-inf")) for tag in tags)
+        return max(self._cleared_at, *times)
+
+    @staticmethod
+    def _replica_window() -> float:
+        # 从库的复制延迟在两次检查之间可能超过最大延迟，再加上一个检查间隔
+        if not DB.replicas:
+            return 0.0
+        settings = SETTINGS.database
+        return settings.replica_max_lag_seconds + settings.replica_check_interval  # type: ignore
+
+    def record_bypass(self) -> None:
+        """记录一次跳过缓存的请求"""
+        self._bypasses += 1
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    # 失效
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """使依赖这些标签的响应失效
+
+        Args:
+            tags (Iterable[str]): 标签
+        """
+        now = monotonic()
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            self._invalidated_at[tag] = now
+            for key in list(self._keys_by_tag.get(tag, ())):
+                self._remove(key)
+        self._invalidations += 1
+        if len(self._generations) > _MAX_GENERATIONS:
+            self.clear()
+
+    def clear(self) -> None:
+        """清空缓存，正在进行的请求的响应也不会被缓存"""
+        self._entries.clear()
+        self._keys_by_tag.clear()
+        self._generations.clear()
+        self._invalidated_at.clear()
+        self._cleared_at = monotonic()
+        self._bytes = 0
+        self._epoch += 1
+
+    def track(self, session: AsyncSession, table: str, row_ids: Iterable[Any]) -> None:
+        """记录会话中写入的记录，事务提交后使相关的响应失效
+
+        Args:
+            session (AsyncSession): 数据库会话
+            table (str): 表名
+            row_ids (Iterable[Any]): 写入的记录 ID
+        """
+        tags = {item_tag(table, row_id) for row_id in row_ids}
+        if not tags:
+            return
+        tags.add(table_tag(table))
+
+        on_commit(session, _PENDING_KEY, set, self.invalidate).update(tags)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """缓存的统计信息（缓存的响应数量和大小、命中率、写入、淘汰和失效次数）"""
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": round(self._hits / lookups, 4) if lookups else None,
+            "bypasses": self._bypasses,
+            "stores": self._stores,
+            "evictions": self._evictions,
+            "invalidations": self._invalidations,
+            "replica_skips": self._replica_skips,
+        }
+
+
+RESPONSE_CACHE = ResponseCache()
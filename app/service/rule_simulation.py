@@ -0,0 +1,274 @@
+from typing import Optional
+
+from time import perf_counter
+
+import numpy as np
+from numpy.typing import NDArray
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from loguru import logger
+
+from app.database.table.instrument_record import Instrument
+from app.database.table.instrument_storage_rule import RuleStatus, RuleType
+from app.database.table.instrument_storage_rule_record import StorageLocationType
+from app.database.table.location_cabinet import Cabinet
+from app.model.instrument_storge_rule import RuleSimulation, RuleViolation
+from app.util.type.guid import GUID
+
+# COPY 二进制格式中的一行：字段数量，然后每个字段是 4 字节长度和 8 字节的 bigint （大端序）
+_ROW_DTYPE = np.dtype(
+    [
+        ("fields", ">i2"),
+        ("id_length", ">i4"),
+        ("id", ">i8"),
+        ("cabinet_length", ">i4"),
+        ("cabinet", ">i8"),
+        ("category_length", ">i4"),
+        ("category", ">i8"),
+    ]
+)
+# 文件头：11 字节签名、 4 字节标志和 4 字节的扩展区长度
+_COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+_COPY_HEADER_SIZE = 19
+_COPY_TRAILER = b"\xff\xff"
+
+# 累积到这个大小之后再批量解析，减少 NumPy 调用的次数
+_PARSE_BUFFER_SIZE = 1 << 22
+
+_COPY_QUERY = (
+    f"SELECT id, located_cabinet, instrument_category FROM {Instrument.__tablename__} "
+    + "WHERE instrument_category = ANY($1::bigint[])"
+)
+
+
+class PermissionMatrix:
+    """器械类别 × 存储柜的存放权限矩阵，每个器械类别一行，按位保存
+
+    最后一列对应不存在的存储柜，只有黑名单规则允许存放在不存在的存储柜中。
+    """
+
+    def __init__(
+        self,
+        categories: NDArray[np.int64],
+        cabinets: NDArray[np.int64],
+        allowed: NDArray[np.bool_],
+    ):
+        """创建权限矩阵
+
+        Args:
+            categories (NDArray[np.int64]): 排好序的器械类别 ID
+            cabinets (NDArray[np.int64]): 排好序的存储柜 ID
+            allowed (NDArray[np.bool_]): 形状为 (器械类别数量, 存储柜数量 + 1) 的权限矩阵
+        """
+        self.categories = categories
+        self.cabinets = cabinets
+        self.bits = np.packbits(allowed, axis=1)
+
+    @classmethod
+    def compile(
+        cls,
+        rule: RuleSimulation,
+        cabinets: NDArray[np.int64],
+        cabinet_rooms: NDArray[np.int64],
+    ) -> "PermissionMatrix":
+        """将一条存储规则编译为权限矩阵，只包含规则涉及的器械类别
+
+        Args:
+            rule (RuleSimulation): 存储规则
+            cabinets (NDArray[np.int64]): 排好序的全部存储柜 ID
+            cabinet_rooms (NDArray[np.int64]): 与存储柜对应的所在房间 ID
+
+        Returns:
+            PermissionMatrix: 权限矩阵
+        """
+        categories = np.unique(
+            np.fromiter(
+                (record.instrument_category.guid for record in rule.records),
+                dtype=np.int64,
+                count=len(rule.records),
+            )
+        )
+        # 黑名单默认允许，白名单和禁止任何存储默认不允许
+        listed_value = rule.rule_type is not RuleType.BLACK_LIST
+        allowed = np.full(
+            (len(categories), len(cabinets) + 1), not listed_value, dtype=np.bool_
+        )
+        if rule.rule_type is not RuleType.ALL_FORBID:
+            for record in rule.records:
+                row = np.searchsorted(categories, record.instrument_category.guid)
+                location = record.storage_location.guid
+                if record.storage_location_type is StorageLocationType.ROOM:
+                    allowed[row, :-1][cabinet_rooms == location] = listed_value
+                else:
+                    column = np.searchsorted(cabinets, location)
+                    if column < len(cabinets) and cabinets[column] == location:
+                        allowed[row, column] = listed_value
+        return cls(categories, cabinets, allowed)
+
+    def allowed(
+        self, categories: NDArray[np.int64], cabinets: NDArray[np.int64]
+    ) -> NDArray[np.bool_]:
+        """批量判断器械类别能否存放在存储柜中
+
+        Args:
+            categories (NDArray[np.int64]): 器械类别 ID （必须都在矩阵中）
+            cabinets (NDArray[np.int64]): 存储柜 ID
+
+        Returns:
+            NDArray[np.bool_]: 是否允许存放
+        """
+        rows = np.searchsorted(self.categories, categories)
+        columns = np.searchsorted(self.cabinets, cabinets)
+        if len(self.cabinets):
+            found = self.cabinets[np.minimum(columns, len(self.cabinets) - 1)]
+            columns[found != cabinets] = len(self.cabinets)
+        else:
+            columns[:] = 0
+        packed = self.bits[rows, columns >> 3]
+        return ((packed >> (7 - (columns & 7))) & 1).astype(np.bool_)
+
+
+class _ViolationCollector:
+    """解析 COPY 输出的二进制数据，只保留违反规则的器械"""
+
+    def __init__(self, matrix: PermissionMatrix):
+        self._matrix = matrix
+        self._buffer = bytearray()
+        self._header_skipped = False
+        self._ids: list[NDArray[np.int64]] = []
+        self._cabinets: list[NDArray[np.int64]] = []
+        self.scanned = 0
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        if len(self._buffer) >= _PARSE_BUFFER_SIZE:
+            self._parse()
+
+    def _parse(self) -> None:
+        if not self._header_skipped:
+            if len(self._buffer) < _COPY_HEADER_SIZE:
+                return
+            if not self._buffer.startswith(_COPY_SIGNATURE):
+                raise ValueError("unexpected COPY binary signature")
+            extension = int.from_bytes(self._buffer[15:19], "big")
+            del self._buffer[: _COPY_HEADER_SIZE + extension]
+            self._header_skipped = True
+
+        count = len(self._buffer) // _ROW_DTYPE.itemsize
+        if not count:
+            return
+        size = count * _ROW_DTYPE.itemsize
+        rows = np.frombuffer(bytes(self._buffer[:size]), dtype=_ROW_DTYPE)
+        del self._buffer[:size]
+        if np.any(rows["fields"] != 3):
+            raise ValueError("unexpected COPY binary row layout")
+
+        cabinets = rows["cabinet"].astype(np.int64)
+        denied = ~self._matrix.allowed(rows["category"].astype(np.int64), cabinets)
+        if denied.any():
+            self._ids.append(rows["id"][denied].astype(np.int64))
+            self._cabinets.append(cabinets[denied])
+        self.scanned += len(rows)
+
+    def finish(self) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
+        """解析剩余的数据并检查结尾标记
+
+        Returns:
+            tuple[NDArray[np.int64], NDArray[np.int64]]: 违反规则的器械 ID 和所在存储柜
+        """
+        self._parse()
+        if bytes(self._buffer) != _COPY_TRAILER:
+            raise ValueError("unexpected end of COPY binary data")
+        if not self._ids:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(self._ids), np.concatenate(self._cabinets)
+
+
+def _group_by_cabinet(
+    ids: NDArray[np.int64],
+    cabinets: NDArray[np.int64],
+    max_per_cabinet: Optional[int],
+) -> list[RuleViolation]:
+    # 先按照 ID 排序，再按照存储柜稳定排序，每个存储柜中的器械保持 ID 顺序
+    if max_per_cabinet != 0:
+        order = np.argsort(ids)
+        ids, cabinets = ids[order], cabinets[order]
+    order = np.argsort(cabinets, kind="stable")
+    ids, cabinets = ids[order], cabinets[order]
+
+    bounds = np.flatnonzero(np.diff(cabinets)) + 1
+    starts = np.concatenate(([0], bounds)) if len(cabinets) else bounds
+    ends = np.append(bounds, len(cabinets))
+
+    violations = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        returned = end
+        if max_per_cabinet is not None:
+            returned = min(end, start + max_per_cabinet)
+        violations.append(
+            RuleViolation.construct(
+                cabinet=GUID(int(cabinets[start]), need_varification=False),
+                violation_count=end - start,
+                instruments=list(map(str, ids[start:returned].tolist())),
+            )
+        )
+    return violations
+
+
+async def simulate_rule(
+    session: AsyncSession,
+    rule: RuleSimulation,
+    max_per_cabinet: Optional[int] = None,
+) -> list[RuleViolation]:
+    """找出现有的器械中会违反一条存储规则的器械，不修改任何数据
+
+    规则编译为器械类别 × 存储柜的位矩阵，规则涉及的器械类别的全部器械通过 COPY 的二进制格式
+    读取，并使用 NumPy 批量判断，不会为每条记录创建 Python 对象。只检查这一条规则，不考虑其他规则。
+
+    Args:
+        session (AsyncSession): 数据库会话
+        rule (RuleSimulation): 要检查的存储规则
+        max_per_cabinet (Optional[int], optional): 每个存储柜最多返回的器械数量，为空时不限制. Defaults to None.
+
+    Returns:
+        list[RuleViolation]: 按照存储柜分组的违反规则的器械，按照存储柜 ID 排序
+    """
+    if rule.rule_status is not RuleStatus.ENABLED or not rule.records:
+        return []
+
+    start = perf_counter()
+    result = await session.execute(
+        select(Cabinet.id, Cabinet.located_room).order_by(Cabinet.id)
+    )
+    cabinet_rows = result.all()
+    cabinets = np.fromiter(
+        (row.id for row in cabinet_rows), dtype=np.int64, count=len(cabinet_rows)
+    )
+    cabinet_rooms = np.fromiter(
+        (row.located_room for row in cabinet_rows),
+        dtype=np.int64,
+        count=len(cabinet_rows),
+    )
+    matrix = PermissionMatrix.compile(rule, cabinets, cabinet_rooms)
+
+    collector = _ViolationCollector(matrix)
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_from_query(  # type: ignore
+        _COPY_QUERY,
+        matrix.categories.tolist(),
+        output=collector.write,
+        format="binary",
+    )
+    ids, violating_cabinets = collector.finish()
+
+    violations = _group_by_cabinet(ids, violating_cabinets, max_per_cabinet)
+    logger.info(
+        f"storage rule simulation scanned {collector.scanned} instruments, "
+        + f"{len(ids)} violations in {len(violations)} cabinets, "
+        + f"took {(perf_counter() - start) * 1000:.1f} ms"
+    )
+    return violations
@@ -0,0 +1,286 @@
+from typing import Any, Iterable, NamedTuple, Optional, TypeVar
+
+from asyncio import Lock, Task, CancelledError, create_task, sleep
+from hashlib import md5
+from time import monotonic
+from types import MappingProxyType
+
+from sqlalchemy import Text, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from loguru import logger
+
+from app.database import DB
+from app.database.after_commit import on_commit
+from app.database.table.setting import Setting, SettingValueType
+from app.model.setting import ParsedValue, parse_setting_value
+from app.util.env import SETTINGS
+
+# 会话中等待提交后应用的设置项变更
+_PENDING_KEY = "setting_changes"
+
+# 设置项的全部内容按照 ID 顺序拼接后的摘要，其他进程修改了任何设置项时都会变化
+_ROW_TEXT = func.concat_ws(
+    ":",
+    Setting.id,
+    cast(Setting.value_type, Text),
+    Setting.setting_key,
+    Setting.setting_value,
+)
+_SEPARATOR = literal_column("','")
+
+_DefaultT = TypeVar("_DefaultT")
+
+# 设置项 ID 对应的键名、值类型和未转换类型的值
+_RawRows = dict[int, tuple[str, SettingValueType, Optional[str]]]
+
+
+def _digest_of(rows: _RawRows) -> Optional[str]:
+    """在本地计算与 _ROW_TEXT 相同的摘要，没有设置项时与数据库一样为 None"""
+    if not rows:
+        return None
+    text = ",".join(
+        ":".join(
+            str(part)
+            for part in (setting_id, value_type.name, setting_key, raw_value)
+            # concat_ws 会跳过空值
+            if part is not None
+        )
+        for setting_id, (setting_key, value_type, raw_value) in sorted(rows.items())
+    )
+    return md5(text.encode()).hexdigest()
+
+
+class SettingSnapshot(NamedTuple):
+    """某一时刻全部设置项转换类型后的值，快照创建后不会再修改"""
+
+    version: int
+    values: MappingProxyType[str, ParsedValue]
+    # 设置项 ID 和键名，修改键名时用来移除原来的键
+    keys: MappingProxyType[int, str]
+
+
+_EMPTY_SNAPSHOT = SettingSnapshot(0, MappingProxyType({}), MappingProxyType({}))
+
+
+class SettingCache:
+    """进程内的运行时设置项快照，读取设置项只需要一次字典查找
+
+    设置项在加载时按照 value_type 转换类型，读取时不再解析；类型不匹配的设置项不会加入快照。
+    每次变化都生成新的快照并整体替换，读取到的快照不会被并发的写入修改。
+
+    通过 CRUD 对象写入的设置项在事务提交后立即生效，同时在本地重新计算摘要，本进程的写入不会
+    触发重新加载；后台任务定期比较设置表内容的摘要，发现其他进程的修改时重新加载全部设置项。
+    """
+
+    def __init__(self):
+        self._snapshot = _EMPTY_SNAPSHOT
+        self._digest: Optional[str] = None
+        # 用来在本地重新计算摘要，包括类型不匹配而没有加入快照的设置项
+        self._rows: _RawRows = {}
+        self._lock = Lock()
+        self._loaded = False
+        self._checked_at: Optional[float] = None
+        self._loads = 0
+        self._incremental_updates = 0
+        self._task: Optional[Task] = None
+
+    # 查询
+
+    @property
+    def snapshot(self) -> SettingSnapshot:
+        """当前的设置项快照，需要同时读取多个设置项时使用同一个快照"""
+        return self._snapshot
+
+    def get(
+        self, setting_key: str, default: Optional[_DefaultT] = None
+    ) -> ParsedValue | Optional[_DefaultT]:
+        """读取转换类型后的设置项的值
+
+        Args:
+            setting_key (str): 设置项键名
+            default (_DefaultT, optional): 设置项不存在时返回的值. Defaults to None.
+
+        Returns:
+            ParsedValue | _DefaultT: 设置项的值
+        """
+        return self._snapshot.values.get(setting_key, default)
+
+    # 加载
+
+    async def refresh(self, session: AsyncSession) -> None:
+        """比较设置表内容的摘要，发生变化时重新加载全部设置项
+
+        Args:
+            session (AsyncSession): 数据库会话
+        """
+        async with self._lock:
+            digest = await session.scalar(
+                select(
+                    func.md5(
+                        func.string_agg(
+                            _ROW_TEXT, aggregate_order_by(_SEPARATOR, Setting.id)
+                        )
+                    )
+                )
+            )
+            if not self._loaded or digest != self._digest:
+                await self._load(session)
+            self._checked_at = monotonic()
+
+    async def _load(self, session: AsyncSession) -> None:
+        version = self._snapshot.version
+        # 摘要与设置项在同一条语句中读取，与加载的内容一致
+        result = await session.execute(
+            select(
+                Setting.id,
+                Setting.setting_key,
+                Setting.value_type,
+                Setting.setting_value,
+                func.md5(
+                    func.string_agg(_ROW_TEXT, _SEPARATOR).over(
+                        order_by=Setting.id, rows=(None, None)
+                    )
+                ),
+            ).order_by(Setting.id)
+        )
+        rows = result.all()
+
+        if self._snapshot.version != version:
+            # 加载期间应用了本进程的写入，加载的结果可能更旧，下一次检查时重新加载
+            self._digest = None
+            return
+
+        values: dict[str, ParsedValue] = {}
+        keys: dict[int, str] = {}
+        self._rows = {}
+        for setting_id, setting_key, value_type, raw_value, _ in rows:
+            self._rows[setting_id] = (setting_key, value_type, raw_value)
+            parsed = self._parse(setting_key, value_type, raw_value)
+            if parsed is not None:
+                values[setting_key] = parsed
+                keys[setting_id] = setting_key
+        self._swap(values, keys)
+        self._digest = rows[0][-1] if rows else None
+        self._loaded = True
+        self._loads += 1
+        logger.info(f"settings loaded: {len(values)} settings")
+
+    @staticmethod
+    def _parse(
+        setting_key: str, value_type: SettingValueType, raw_value: Optional[str]
+    ) -> Optional[ParsedValue]:
+        if raw_value is None:
+            return None
+        try:
+            return parse_setting_value(value_type, raw_value)
+        except ValueError:
+            logger.warning(f"setting {setting_key} doesn't match the type {value_type}")
+            return None
+
+    def _swap(self, values: dict[str, ParsedValue], keys: dict[int, str]) -> None:
+        self._snapshot = SettingSnapshot(
+            self._snapshot.version + 1,
+            MappingProxyType(values),
+            MappingProxyType(keys),
+        )
+
+    # 后台任务
+
+    async def start(self) -> None:
+        """加载设置项并启动定期检查其他进程修改的后台任务"""
+        try:
+            async with DB.client.new_session() as session:
+                await self.refresh(session)
+        except (SQLAlchemyError, OSError) as error:
+            logger.warning(f"can not load settings: {error}")
+        self._task = create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        interval: float = SETTINGS.setting_cache.refresh_seconds  # type: ignore
+        while True:
+            await sleep(interval)
+            try:
+                async with DB.client.new_session() as session:
+                    await self.refresh(session)
+            except (SQLAlchemyError, OSError) as error:
+                logger.warning(f"setting refresh failed: {error}")
+
+    # 跟踪会话中的写入
+
+    def track(
+        self, session: AsyncSession, rows: Iterable[Setting], deleted: bool
+    ) -> None:
+        """记录会话中写入的设置项，事务提交后生成新的快照
+
+        Args:
+            session (AsyncSession): 数据库会话
+            rows (Iterable[Setting]): 写入的设置项
+            deleted (bool): 是否为删除
+        """
+        changes = [
+            (
+                row.id,
+                None
+                if deleted
+                else (row.setting_key, row.value_type, row.setting_value),
+            )
+            for row in rows
+        ]
+        if not changes:
+            return
+
+        on_commit(session, _PENDING_KEY, list, self._apply_changes).extend(changes)
+
+    def _apply_changes(self, changes: list[tuple[Any, ...]]) -> None:
+        values = dict(self._snapshot.values)
+        keys = dict(self._snapshot.keys)
+        for setting_id, setting in changes:
+            old_key = keys.pop(setting_id, None)
+            if old_key is not None:
+                values.pop(old_key, None)
+            if setting is None:
+                self._rows.pop(setting_id, None)
+                continue
+            self._rows[setting_id] = setting
+            setting_key, value_type, raw_value = setting
+            parsed = self._parse(setting_key, value_type, raw_value)
+            if parsed is not None:
+                values[setting_key] = parsed
+                keys[setting_id] = setting_key
+        self._swap(values, keys)
+        self._incremental_updates += 1
+        # 其他进程在这之前的修改不在本地的记录中，摘要仍然不同，下一次检查时会重新加载
+        if self._loaded:
+            self._digest = _digest_of(self._rows)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """设置项快照的统计信息（版本、设置项数量、加载和增量更新次数）"""
+        return {
+            "version": self._snapshot.version,
+            "settings": len(self._snapshot.values),
+            "loads": self._loads,
+            "incremental_updates": self._incremental_updates,
+            "checked_seconds_ago": (
+                None
+                if self._checked_at is None
+                else round(monotonic() - self._checked_at, 3)
+            ),
+        }
+
+
+SETTING_CACHE = SettingCache()
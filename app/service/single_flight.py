@@ -0,0 +1,120 @@
+from typing import Any, Awaitable, Callable, Hashable, Optional, TypeVar
+
+from asyncio import (
+    Task,
+    TimeoutError as AsyncTimeoutError,
+    create_task,
+    shield,
+    wait_for,
+)
+from time import monotonic
+
+_ResultT = TypeVar("_ResultT")
+
+
+class SingleFlightTimeout(Exception):
+    """等待其他请求正在执行的调用超时"""
+
+
+class _Flight:
+    """正在执行的调用，期限在调用开始时确定，同一个键的所有等待者共用"""
+
+    __slots__ = ("task", "deadline", "followers")
+
+    def __init__(self, task: Task, deadline: float):
+        self.task = task
+        self.deadline = deadline
+        self.followers = 0
+
+
+class SingleFlight:
+    """合并并发的相同调用，同一个键同时只执行一次，其他调用等待并共享结果或异常
+
+    调用在单独的任务中执行，发起调用的请求被取消时不会影响等待同一个结果的其他请求。
+    每个键的调用开始时确定等待期限：等待者最多等到期限为止；超过期限的调用不再接受新的等待者，
+    之后到达的相同调用重新执行，不会继续堆积在卡住的调用上。
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Flight] = {}
+
+        self._leaders = 0
+        self._followers = 0
+        self._timeouts = 0
+        self._expired = 0
+        self._errors = 0
+        self._max_followers = 0
+
+    async def run(
+        self,
+        key: Hashable,
+        call: Callable[[], Awaitable[_ResultT]],
+        timeout: Callable[[Hashable], float] | float,
+    ) -> tuple[_ResultT, bool]:
+        """执行调用，相同的键已经有正在执行的调用时等待它的结果
+
+        Args:
+            key (Hashable): 调用的键
+            call (Callable[[], Awaitable[_ResultT]]): 没有正在执行的调用时执行的调用
+            timeout (Callable[[Hashable], float] | float): 等待这个键的调用的最长时间（秒），
+                也可以传入根据键返回等待时间的函数；只在调用开始时使用，之后的等待者共用同一个期限
+
+        Raises:
+            SingleFlightTimeout: 等待超过期限，调用仍然继续执行
+            Exception: 调用抛出的异常，所有等待的请求都会收到同一个异常
+
+        Returns:
+            tuple[_ResultT, bool]: 调用的结果和结果是否来自其他请求发起的调用
+        """
+        now = monotonic()
+        flight = self._calls.get(key)
+        if flight is not None and flight.deadline <= now:
+            # 超过期限的调用只交给发起它的请求等待
+            del self._calls[key]
+            self._expired += 1
+            flight = None
+
+        if flight is None:
+            seconds = timeout(key) if callable(timeout) else timeout
+            task = create_task(call())
+            self._calls[key] = _Flight(task, now + seconds)
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self._leaders += 1
+            # 发起调用的请求就是执行调用本身，不设置等待期限
+            return await shield(task), False
+
+        flight.followers += 1
+        self._followers += 1
+        self._max_followers = max(self._max_followers, flight.followers)
+        try:
+            return await wait_for(shield(flight.task), flight.deadline - now), True
+        except AsyncTimeoutError as error:
+            if flight.task.done():
+                raise
+            self._timeouts += 1
+            raise SingleFlightTimeout(key) from error
+
+    def _finish(self, key: Hashable, task: Task) -> None:
+        flight: Optional[_Flight] = self._calls.get(key)
+        if flight is not None and flight.task is task:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            self._errors += 1
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """合并调用的统计信息（正在执行的调用数量、执行和共享结果的次数、等待超时和出错次数）"""
+        total = self._leaders + self._followers
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self._leaders,
+            "followers": self._followers,
+            "coalesced_ratio": round(self._followers / total, 4) if total else None,
+            "max_followers": self._max_followers,
+            "timeouts": self._timeouts,
+            "expired": self._expired,
+            "errors": self._errors,
+        }
+
+
+SINGLE_FLIGHT = SingleFlight()
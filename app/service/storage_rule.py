@@ -0,0 +1,461 @@
+from typing import Any, Callable, Iterable, NamedTuple, Optional
+
+from asyncio import Lock
+from time import monotonic
+
+from sqlalchemy import (
+    ColumnElement,
+    ScalarSelect,
+    Text,
+    cast,
+    func,
+    literal_column,
+    select,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from loguru import logger
+
+from app.database.after_commit import on_commit
+from app.database.table.instrument_storage_rule import (
+    InstrumentStorageRule,
+    RuleStatus,
+    RuleType,
+)
+from app.database.table.instrument_storage_rule_record import (
+    StorageLocationType,
+    StorageRuleRecord,
+)
+from app.database.table.location_cabinet import Cabinet
+from app.util.env import SETTINGS
+
+# 会话中等待提交后应用的规则变更
+_PENDING_KEY = "storage_rule_changes"
+
+_EMPTY: frozenset[int] = frozenset()
+
+_SEPARATOR = literal_column("','")
+
+
+def _digest_of(
+    id_column: ColumnElement[int], *columns: ColumnElement[Any]
+) -> ScalarSelect[str]:
+    # 按照 ID 顺序拼接加载时读取的全部列后的摘要，任何一列的修改都会改变摘要
+    return select(
+        func.md5(
+            func.string_agg(
+                func.concat_ws(":", id_column, *columns),
+                aggregate_order_by(_SEPARATOR, id_column),
+            )
+        )
+    ).scalar_subquery()
+
+
+class _Rule(NamedTuple):
+    rule_type: RuleType
+    enabled: bool
+
+
+class _RuleRecord(NamedTuple):
+    rule: int
+    location_type: StorageLocationType
+    location: int
+    category: int
+
+
+class _Placement(NamedTuple):
+    """编译后的单个器械类别的存放限制"""
+
+    forbid_all: bool
+    blocked: frozenset[int]
+    # 白名单规则允许的存储柜（多条白名单规则取交集），为空表示没有白名单限制
+    allowed: Optional[frozenset[int]]
+
+
+class StorageRuleEngine:
+    """编译到内存中的存储规则，判断器械类别能否存放在存储柜中时不需要查询数据库
+
+    规则的含义：
+
+        - ALL_FORBID: 记录中的器械类别不能存放在任何位置
+        - BLACK_LIST: 记录中的器械类别不能存放在记录的位置
+        - WHITE_LIST: 记录中的器械类别只能存放在记录的位置
+
+    只有全部启用的规则都允许时才能存放。房间类型的位置会展开为房间中的全部存储柜。
+
+    通过 CRUD 对象写入的规则、规则记录和存储柜会在事务提交后增量更新；
+    其他进程的修改通过 refresh 定期比较数据表的摘要发现，发现变化时重新加载全部规则。
+    """
+
+    def __init__(self):
+        self._rules: dict[int, _Rule] = {}
+        self._records: dict[int, _RuleRecord] = {}
+        self._records_by_rule: dict[int, set[int]] = {}
+        self._records_by_category: dict[int, set[int]] = {}
+        self._records_by_room: dict[int, set[int]] = {}
+        self._cabinet_room: dict[int, int] = {}
+        self._room_cabinets: dict[int, set[int]] = {}
+
+        self._placements: dict[int, _Placement] = {}
+
+        self._lock = Lock()
+        self._fingerprint: Optional[tuple[Any, ...]] = None
+        self._checked_at: Optional[float] = None
+        self._loads = 0
+        self._incremental_updates = 0
+
+    # 查询
+
+    def may_store(self, category: int, cabinet: int) -> bool:
+        """判断器械类别能否存放在存储柜中
+
+        Args:
+            category (int): 器械类别 ID
+            cabinet (int): 存储柜 ID
+
+        Returns:
+            bool: 是否允许存放
+        """
+        placement = self._placements.get(category)
+        if placement is None:
+            return True
+        if placement.forbid_all or cabinet in placement.blocked:
+            return False
+        return placement.allowed is None or cabinet in placement.allowed
+
+    def may_store_many(self, pairs: Iterable[tuple[int, int]]) -> list[bool]:
+        """批量判断器械类别能否存放在存储柜中
+
+        Args:
+            pairs (Iterable[tuple[int, int]]): 器械类别 ID 和存储柜 ID
+
+        Returns:
+            list[bool]: 与输入顺序一致的判断结果
+        """
+        may_store = self.may_store
+        return [may_store(category, cabinet) for category, cabinet in pairs]
+
+    def candidate_cabinets(self, category: int) -> Optional[frozenset[int]]:
+        """获取器械类别最多能存放的存储柜，用于缩小查找范围
+
+        Args:
+            category (int): 器械类别 ID
+
+        Returns:
+            Optional[frozenset[int]]: 白名单规则允许的存储柜（其中的存储柜仍然需要使用 may_store 判断），
+                没有白名单限制时为 None ，禁止任何存储时为空集合
+        """
+        placement = self._placements.get(category)
+        if placement is None:
+            return None
+        if placement.forbid_all:
+            return _EMPTY
+        return placement.allowed
+
+    # 加载
+
+    async def refresh(self, session: AsyncSession) -> None:
+        """确保规则已经加载，并且距离上次检查超过设置的间隔时比较数据表摘要
+
+        Args:
+            session (AsyncSession): 数据库会话
+        """
+        interval: float = SETTINGS.storage_rule.refresh_seconds  # type: ignore
+        if self._checked_at is not None and monotonic() - self._checked_at < interval:
+            return
+
+        async with self._lock:
+            if (
+                self._checked_at is not None
+                and monotonic() - self._checked_at < interval
+            ):
+                return
+            fingerprint = await self._query_fingerprint(session)
+            if fingerprint != self._fingerprint:
+                await self._load(session)
+                self._fingerprint = fingerprint
+            self._checked_at = monotonic()
+
+    @staticmethod
+    async def _query_fingerprint(session: AsyncSession) -> tuple[Any, ...]:
+        # 存储柜的当前容量经常变化，只比较 ID 和所在房间
+        result = await session.execute(
+            select(
+                _digest_of(
+                    InstrumentStorageRule.id,
+                    cast(InstrumentStorageRule.rule_type, Text),
+                    cast(InstrumentStorageRule.rule_status, Text),
+                ),
+                _digest_of(
+                    StorageRuleRecord.id,
+                    StorageRuleRecord.storage_rule,
+                    cast(StorageRuleRecord.storage_location_type, Text),
+                    StorageRuleRecord.storage_location,
+                    StorageRuleRecord.instrument_category,
+                ),
+                _digest_of(Cabinet.id, Cabinet.located_room),
+            )
+        )
+        return tuple(result.one())
+
+    async def _load(self, session: AsyncSession) -> None:
+        rules = await session.execute(
+            select(
+                InstrumentStorageRule.id,
+                InstrumentStorageRule.rule_type,
+                InstrumentStorageRule.rule_status,
+            )
+        )
+        records = await session.execute(
+            select(
+                StorageRuleRecord.id,
+                StorageRuleRecord.storage_rule,
+                StorageRuleRecord.storage_location_type,
+                StorageRuleRecord.storage_location,
+                StorageRuleRecord.instrument_category,
+            )
+        )
+        cabinets = await session.execute(select(Cabinet.id, Cabinet.located_room))
+
+        self.__init_state()
+        for rule_id, rule_type, status in rules:
+            self._rules[rule_id] = _Rule(rule_type, status is RuleStatus.ENABLED)
+        for record_id, *record in records:
+            self._add_record(record_id, _RuleRecord(*record))
+        for cabinet_id, room in cabinets:
+            self._add_cabinet(cabinet_id, room)
+        for category in self._records_by_category:
+            self._compile(category)
+
+        self._loads += 1
+        logger.info(
+            f"storage rules loaded: {len(self._rules)} rules, "
+            + f"{len(self._records)} records, {len(self._placements)} restricted categories"
+        )
+
+    def __init_state(self) -> None:
+        self._rules = {}
+        self._records = {}
+        self._records_by_rule = {}
+        self._records_by_category = {}
+        self._records_by_room = {}
+        self._cabinet_room = {}
+        self._room_cabinets = {}
+        self._placements = {}
+
+    # 编译
+
+    def _cabinets_of(self, record: _RuleRecord) -> Iterable[int]:
+        if record.location_type is StorageLocationType.CABINET:
+            return (record.location,)
+        return self._room_cabinets.get(record.location, _EMPTY)
+
+    def _compile(self, category: int) -> None:
+        forbid_all = False
+        blocked: set[int] = set()
+        whitelists: dict[int, set[int]] = {}
+
+        for record_id in self._records_by_category.get(category, _EMPTY):
+            record = self._records[record_id]
+            rule = self._rules.get(record.rule)
+            if rule is None or not rule.enabled:
+                continue
+            if rule.rule_type is RuleType.ALL_FORBID:
+                forbid_all = True
+            elif rule.rule_type is RuleType.BLACK_LIST:
+                blocked.update(self._cabinets_of(record))
+            else:
+                whitelists.setdefault(record.rule, set()).update(
+                    self._cabinets_of(record)
+                )
+
+        allowed: Optional[frozenset[int]] = None
+        if whitelists:
+            allowed = frozenset(set.intersection(*whitelists.values()))
+
+        if not forbid_all and not blocked and allowed is None:
+            self._placements.pop(category, None)
+        else:
+            self._placements[category] = _Placement(
+                forbid_all, frozenset(blocked), allowed
+            )
+
+    # 维护源数据
+
+    def _add_record(self, record_id: int, record: _RuleRecord) -> None:
+        self._records[record_id] = record
+        self._records_by_rule.setdefault(record.rule, set()).add(record_id)
+        self._records_by_category.setdefault(record.category, set()).add(record_id)
+        if record.location_type is StorageLocationType.ROOM:
+            self._records_by_room.setdefault(record.location, set()).add(record_id)
+
+    def _remove_record(self, record_id: int) -> Optional[_RuleRecord]:
+        record = self._records.pop(record_id, None)
+        if record is None:
+            return None
+        self._records_by_rule.get(record.rule, set()).discard(record_id)
+        self._records_by_category.get(record.category, set()).discard(record_id)
+        if record.location_type is StorageLocationType.ROOM:
+            self._records_by_room.get(record.location, set()).discard(record_id)
+        return record
+
+    def _add_cabinet(self, cabinet_id: int, room: int) -> None:
+        self._cabinet_room[cabinet_id] = room
+        self._room_cabinets.setdefault(room, set()).add(cabinet_id)
+
+    def _remove_cabinet(self, cabinet_id: int) -> Optional[int]:
+        room = self._cabinet_room.pop(cabinet_id, None)
+        if room is not None:
+            self._room_cabinets.get(room, set()).discard(cabinet_id)
+        return room
+
+    def _categories_of_records(self, record_ids: Iterable[int]) -> set[int]:
+        return {self._records[record_id].category for record_id in record_ids}
+
+    def apply_rule(self, rule_id: int, rule: Optional[_Rule]) -> None:
+        """应用一条规则的变更
+
+        Args:
+            rule_id (int): 规则 ID
+            rule (Optional[_Rule]): 新的规则，删除时为 None
+        """
+        if rule is None:
+            self._rules.pop(rule_id, None)
+        else:
+            self._rules[rule_id] = rule
+        for category in self._categories_of_records(
+            self._records_by_rule.get(rule_id, _EMPTY)
+        ):
+            self._compile(category)
+
+    def apply_record(self, record_id: int, record: Optional[_RuleRecord]) -> None:
+        """应用一条规则记录的变更
+
+        Args:
+            record_id (int): 规则记录 ID
+            record (Optional[_RuleRecord]): 新的规则记录，删除时为 None
+        """
+        categories: set[int] = set()
+        old = self._remove_record(record_id)
+        if old is not None:
+            categories.add(old.category)
+        if record is not None:
+            self._add_record(record_id, record)
+            categories.add(record.category)
+        for category in categories:
+            self._compile(category)
+
+    def apply_cabinet(self, cabinet_id: int, room: Optional[int]) -> None:
+        """应用一个存储柜的变更（新建、删除或移动到其他房间）
+
+        Args:
+            cabinet_id (int): 存储柜 ID
+            room (Optional[int]): 所在房间，删除时为 None
+        """
+        old_room = self._cabinet_room.get(cabinet_id)
+        if old_room == room:
+            return
+        self._remove_cabinet(cabinet_id)
+        if room is not None:
+            self._add_cabinet(cabinet_id, room)
+
+        record_ids: set[int] = set()
+        for changed_room in (old_room, room):
+            if changed_room is not None:
+                record_ids.update(self._records_by_room.get(changed_room, _EMPTY))
+        for category in self._categories_of_records(record_ids):
+            self._compile(category)
+
+    # 跟踪会话中的写入
+
+    def _track(self, session: AsyncSession, change: Callable[[], None]) -> None:
+        on_commit(session, _PENDING_KEY, list, self._apply_changes).append(change)
+
+    def _apply_changes(self, changes: list[Callable[[], None]]) -> None:
+        for change in changes:
+            change()
+            self._incremental_updates += 1
+
+    def track_rules(
+        self,
+        session: AsyncSession,
+        rows: Iterable[InstrumentStorageRule],
+        deleted: bool,
+    ) -> None:
+        """记录会话中写入的规则，事务提交后应用
+
+        Args:
+            session (AsyncSession): 数据库会话
+            rows (Iterable[InstrumentStorageRule]): 写入的规则
+            deleted (bool): 是否为删除
+        """
+        for row in rows:
+            rule = None
+            if not deleted:
+                rule = _Rule(row.rule_type, row.rule_status is RuleStatus.ENABLED)  # type: ignore
+            self._track(
+                session,
+                lambda rule_id=row.id, rule=rule: self.apply_rule(rule_id, rule),
+            )
+
+    def track_records(
+        self, session: AsyncSession, rows: Iterable[StorageRuleRecord], deleted: bool
+    ) -> None:
+        """记录会话中写入的规则记录，事务提交后应用
+
+        Args:
+            session (AsyncSession): 数据库会话
+            rows (Iterable[StorageRuleRecord]): 写入的规则记录
+            deleted (bool): 是否为删除
+        """
+        for row in rows:
+            record = None
+            if not deleted:
+                record = _RuleRecord(
+                    row.storage_rule,  # type: ignore
+                    row.storage_location_type,  # type: ignore
+                    row.storage_location,  # type: ignore
+                    row.instrument_category,  # type: ignore
+                )
+            self._track(
+                session,
+                lambda record_id=row.id, record=record: self.apply_record(
+                    record_id, record
+                ),
+            )
+
+    def track_cabinets(
+        self, session: AsyncSession, rows: Iterable[Cabinet], deleted: bool
+    ) -> None:
+        """记录会话中写入的存储柜，事务提交后应用
+
+        Args:
+            session (AsyncSession): 数据库会话
+            rows (Iterable[Cabinet]): 写入的存储柜
+            deleted (bool): 是否为删除
+        """
+        for row in rows:
+            room = None if deleted else row.located_room
+            self._track(
+                session,
+                lambda cabinet_id=row.id, room=room: self.apply_cabinet(
+                    cabinet_id, room  # type: ignore
+                ),
+            )
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """规则引擎的统计信息"""
+        return {
+            "rules": len(self._rules),
+            "enabled_rules": sum(rule.enabled for rule in self._rules.values()),
+            "records": len(self._records),
+            "cabinets": len(self._cabinet_room),
+            "restricted_categories": len(self._placements),
+            "loads": self._loads,
+            "incremental_updates": self._incremental_updates,
+        }
+
+
+STORAGE_RULES = StorageRuleEngine()
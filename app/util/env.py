@@ -1,4 +1,4 @@
-from typing import Optional, Any, TypeVar, Type
+from typing import Optional, Any, TypeVar, Type, Literal
 
 from pathlib import Path
 
@@ -29,7 +29,12 @@ class _ServiceSettings(BaseSettings):
         title="信任的域名列表",
     )
 
-    gzip_min_size: Optional[int] = Field(500, ge=0, title="开始使用 GZIP 压缩的最小大小")
+    gzip_min_size: Optional[int] = Field(
+        500,
+        ge=0,
+        title="开始压缩响应的最小大小",
+        description="沿用原来的名称， zstd 、 brotli 和 gzip 压缩都使用这个值",
+    )
 
     @staticmethod
     def __transform_relative_path(path: Optional[Path]) -> Optional[Path]:
@@ -155,6 +160,75 @@ class _DatabaseSettings(BaseSettings):
 
     database_name: str = Field(..., title="使用的数据库名")
 
+    echo: Optional[bool] = Field(False, title="是否在日志中记录执行的 SQL 语句")
+
+    pool_size: Optional[int] = Field(
+        5,
+        gt=0,
+        title="连接池保持的连接数",
+        description="每个工作进程单独维护连接池，数据库的最大连接数需要大于 进程数 × (pool_size + max_overflow)",
+    )
+    max_overflow: Optional[int] = Field(
+        10,
+        ge=0,
+        title="连接池允许超出的连接数",
+        description="连接池已满时最多额外建立的连接数，这些连接归还后会被关闭",
+    )
+    pool_timeout: Optional[float] = Field(
+        30.0,
+        gt=0,
+        title="等待空闲连接的超时时间（秒）",
+    )
+    pool_recycle: Optional[int] = Field(
+        -1,
+        ge=-1,
+        title="连接的最长使用时间（秒）",
+        description="超过此时间的连接会在下次取出时重新建立，设置为 -1 表示不限制",
+    )
+    pool_pre_ping: Optional[bool] = Field(
+        False,
+        title="取出连接时是否检查连接可用",
+        description="每次取出连接会多一次往返，可以避免使用已经被数据库或网络设备断开的连接",
+    )
+    statement_cache_size: Optional[int] = Field(
+        100,
+        ge=0,
+        title="每个连接缓存的预编译语句数量",
+        description="通过 PgBouncer 等事务级连接池访问数据库时需要设置为 0",
+    )
+
+    replica_hosts: Optional[list[str] | str] = Field(
+        [],
+        title="从库地址列表",
+        description="使用逗号分隔的 host:port 列表，省略端口时使用主库的端口。只读接口会轮流使用复制延迟正常的从库",
+        examples=["10.0.0.2:5432, 10.0.0.3:5432"],
+    )
+    replica_max_lag_seconds: Optional[float] = Field(
+        5.0,
+        ge=0,
+        title="从库允许的最大复制延迟（秒）",
+        description="复制延迟超过此值或无法连接的从库会被移出读取轮换，恢复后自动加入",
+    )
+    replica_check_interval: Optional[float] = Field(
+        5.0,
+        gt=0,
+        title="检查从库复制延迟的间隔（秒）",
+    )
+
+    @validator("replica_hosts")
+    def split_replica_hosts(cls, value: list[str] | str) -> list[str]:
+        """将逗号分隔的从库地址转换为列表
+
+        Args:
+            value (list[str] | str): 从库地址
+
+        Returns:
+            list[str]: 从库地址列表
+        """
+        if isinstance(value, str):
+            return [host for host in CommaSeparatedStrings(value) if host]
+        return value
+
     class Config:
         env_prefix = "DB_"
         fields: dict[str, dict[str, str]] = {
@@ -231,10 +305,337 @@ class _IDServiceSettings(BaseSettings):
     )
     port: Optional[int] = Field(3306, gt=0, title="ID服务端口")
 
+    mode: Literal["embedded", "service"] = Field(
+        "embedded",
+        title="ID 生成方式",
+        description="""
+        可选的生成方式有：
+
+            - embedded: 在服务进程内生成，启动时从数据库租用 worker 序号
+            - service:  从 pysnowflake 服务获取
+
+        默认为进程内生成（ embedded ）。""",
+    )
+    data_center: Optional[int] = Field(
+        0,
+        ge=0,
+        le=3,
+        title="数据中心序号",
+        description="进程内生成时使用的 2 bit 数据中心序号， worker 序号在数据中心内租用",
+    )
+    worker_lease_seconds: Optional[int] = Field(
+        60,
+        ge=10,
+        title="worker 序号租约时长（秒）",
+        description="进程内生成时 worker 序号的租约时长，服务会在租约到期前自动续约",
+    )
+
+    buffer_min_batch: Optional[int] = Field(
+        100,
+        gt=0,
+        title="每次预取 ID 的最小数量",
+        description="使用 pysnowflake 服务时，本地缓冲区每次补充的最小数量，也是缓冲区的最小目标深度",
+    )
+    buffer_max_batch: Optional[int] = Field(5000, gt=0, title="每次预取 ID 的最大数量")
+    buffer_seconds: Optional[float] = Field(
+        5.0,
+        gt=0,
+        title="缓冲区覆盖的消耗时长（秒）",
+        description="根据观测到的 ID 消耗速率调整缓冲区深度，使其能够覆盖这段时间内的消耗",
+    )
+    buffer_max_id_age_seconds: Optional[float] = Field(
+        60.0,
+        gt=0,
+        title="缓冲区中 ID 的最大存放时长（秒）",
+        description="超过此时长的 ID 会被丢弃，保证 ID 中的时间戳与记录的创建时间接近",
+    )
+    refill_concurrency: Optional[int] = Field(4, gt=0, title="预取 ID 时的并发请求数")
+    request_timeout: Optional[float] = Field(2.0, gt=0, title="请求 ID 服务的超时时间（秒）")
+
     class Config:
         env_prefix = "ID_SERVICE_"
 
 
+class _ImportSettings(BaseSettings):
+    chunk_size: Optional[int] = Field(
+        5000,
+        gt=0,
+        le=50000,
+        title="批量导入时每批的记录数",
+        description="每批记录单独校验、写入并提交，导入中断后可以从最后提交的批次继续",
+    )
+    max_errors_per_chunk: Optional[int] = Field(
+        100,
+        ge=0,
+        title="每批最多报告的错误记录数",
+        description="超过此数量的错误记录只计数，不再报告详细信息",
+    )
+    read_size: Optional[int] = Field(
+        1 << 16,
+        gt=0,
+        title="每次读取的数据大小（字节）",
+        description="读取上传的文件和解压数据时每次处理的最大字节数",
+    )
+
+    class Config:
+        env_prefix = "IMPORT_"
+
+
+class _ExportSettings(BaseSettings):
+    batch_size: Optional[int] = Field(
+        1000,
+        gt=0,
+        le=100000,
+        title="流式导出时每批读取的记录数",
+        description="导出时使用服务端游标分批读取，每批编码后立即发送，占用的内存只与此值有关",
+    )
+
+    class Config:
+        env_prefix = "EXPORT_"
+
+
+class _TrustedReadSettings(BaseSettings):
+    verify_ratio: Optional[float] = Field(
+        0.0,
+        ge=0,
+        le=1,
+        title="读取记录时抽样校验的比例",
+        description="从数据库读取的记录直接创建数据模型，不执行校验。调试时可以设置为大于 0 的值，按比例抽样校验并在日志中记录不一致的记录",
+    )
+
+    class Config:
+        env_prefix = "TRUSTED_READ_"
+
+
+class _StorageRuleSettings(BaseSettings):
+    refresh_seconds: Optional[float] = Field(
+        5.0,
+        ge=0,
+        title="检查存储规则变化的间隔（秒）",
+        description="本进程写入的规则会立即生效，其他进程写入的规则最多延迟这个时间后生效。设置为 0 时每次检查都会比较数据表摘要",
+    )
+
+    class Config:
+        env_prefix = "STORAGE_RULE_"
+
+
+class _CabinetCapacitySettings(BaseSettings):
+    rollup_interval: Optional[float] = Field(
+        1.0,
+        gt=0,
+        title="汇总容量分片的间隔（秒）",
+        description="开启了容量分片的存储柜，当前容量和状态会按照这个间隔从分片汇总",
+    )
+    max_counter_shards: Optional[int] = Field(
+        64,
+        ge=1,
+        title="单个存储柜最多的容量分片数量",
+    )
+
+    class Config:
+        env_prefix = "CABINET_CAPACITY_"
+
+
+class _ReservationSettings(BaseSettings):
+    default_ttl: Optional[float] = Field(
+        900,
+        gt=0,
+        title="容量预留默认的有效时间（秒）",
+    )
+    max_ttl: Optional[float] = Field(
+        86400,
+        gt=0,
+        title="容量预留最长的有效时间（秒）",
+    )
+    sync_interval: Optional[float] = Field(
+        5.0,
+        gt=0,
+        title="查询即将到期的预留的间隔（秒）",
+        description="其他进程创建的预留会在这个间隔内加入本进程的到期队列，进程退出后留下的预留也由其他进程过期",
+    )
+
+    class Config:
+        env_prefix = "CABINET_RESERVATION_"
+
+
+class _PlacementSettings(BaseSettings):
+    refresh_seconds: Optional[float] = Field(
+        2.0,
+        ge=0,
+        title="重新加载存储柜剩余容量索引的间隔（秒）",
+        description="本进程修改的容量在提交后立即更新到索引中，其他进程修改的容量最多延迟这个时间",
+    )
+
+    class Config:
+        env_prefix = "CABINET_PLACEMENT_"
+
+
+class _CabinetSlotSettings(BaseSettings):
+    max_slots: Optional[int] = Field(
+        65536,
+        ge=1,
+        title="单个存储柜最多的槽位数量",
+    )
+    refresh_seconds: Optional[float] = Field(
+        5.0,
+        ge=0,
+        title="重新加载内存中槽位占用位图的间隔（秒）",
+        description="占用槽位时总是在数据库中确认，这个间隔只影响查询空闲槽位时能否看到其他进程释放的槽位",
+    )
+
+    class Config:
+        env_prefix = "CABINET_SLOT_"
+
+
+class _InstrumentExpirySettings(BaseSettings):
+    enabled: Optional[bool] = Field(
+        True,
+        title="是否在本进程中运行器械过期任务",
+        description="开启的进程中同一时间只有持有租约的一个进程执行过期任务",
+    )
+    window_seconds: Optional[float] = Field(
+        60.0,
+        gt=0,
+        title="每次加载的过期时间窗口（秒）",
+        description="只将这段时间内到期的器械加载到内存中的堆里",
+    )
+    window_size: Optional[int] = Field(
+        10000,
+        gt=0,
+        title="每次最多加载的器械数量",
+    )
+    sync_interval: Optional[float] = Field(
+        5.0,
+        gt=0,
+        title="重新加载过期时间窗口的间隔（秒）",
+        description="其他进程创建或修改的器械会在这个间隔内加入堆中",
+    )
+    batch_size: Optional[int] = Field(
+        1000,
+        gt=0,
+        title="每个事务中最多过期的器械数量",
+    )
+    lease_seconds: Optional[float] = Field(
+        30.0,
+        gt=0,
+        title="过期任务租约的时长（秒）",
+        description="持有租约的进程退出后，其他进程最多在这段时间后接管过期任务",
+    )
+
+    class Config:
+        env_prefix = "INSTRUMENT_EXPIRY_"
+
+
+class _ExpireRecomputeSettings(BaseSettings):
+    enabled: Optional[bool] = Field(
+        True,
+        title="是否在本进程中执行过期时间重新计算任务",
+        description="开启的进程中同一时间只有持有租约的一个进程执行任务",
+    )
+    chunk_size: Optional[int] = Field(
+        5000,
+        gt=0,
+        title="每一段（每个事务）最多修改的器械数量",
+    )
+    pause_seconds: Optional[float] = Field(
+        0.05,
+        ge=0,
+        title="两段之间停顿的时间（秒）",
+    )
+    poll_interval: Optional[float] = Field(
+        5.0,
+        gt=0,
+        title="检查其他进程创建的任务的间隔（秒）",
+    )
+    lease_seconds: Optional[float] = Field(
+        30.0,
+        gt=0,
+        title="任务租约的时长（秒）",
+    )
+
+    class Config:
+        env_prefix = "EXPIRE_RECOMPUTE_"
+
+
+class _SettingCacheSettings(BaseSettings):
+    refresh_seconds: Optional[float] = Field(
+        1.0,
+        gt=0,
+        title="检查设置项变化的间隔（秒）",
+        description="本进程写入的设置项提交后立即生效，其他进程写入的设置项最多延迟这个时间后生效",
+    )
+
+    class Config:
+        env_prefix = "SETTING_CACHE_"
+
+
+class _ResponseCacheSettings(BaseSettings):
+    enabled: Optional[bool] = Field(
+        True,
+        title="是否缓存房间、存储柜、器械分类和存储规则的查询响应",
+    )
+    ttl_seconds: Optional[float] = Field(
+        30.0,
+        gt=0,
+        title="缓存的响应的有效时间（秒）",
+        description="本进程的写入会立即使相关的响应失效，其他进程的写入最多延迟这个时间（配置了从库时再加上从库的复制延迟）后可见",
+    )
+    max_entries: Optional[int] = Field(
+        2048,
+        gt=0,
+        title="最多缓存的响应数量",
+    )
+    max_bytes: Optional[int] = Field(
+        32 * 1024 * 1024,
+        gt=0,
+        title="缓存的响应体最多占用的内存（字节）",
+    )
+    max_entry_bytes: Optional[int] = Field(
+        1024 * 1024,
+        gt=0,
+        title="单个响应体的最大长度（字节）",
+        description="超过这个长度的响应不会被缓存",
+    )
+    coalesce: Optional[bool] = Field(
+        True,
+        title="是否合并没有命中缓存的相同请求",
+        description="同时到达的相同请求只查询和序列化一次",
+    )
+    coalesce_timeout_seconds: Optional[float] = Field(
+        10.0,
+        gt=0,
+        title="等待相同请求的响应的最长时间（秒）",
+        description="超时后单独处理这个请求",
+    )
+
+    class Config:
+        env_prefix = "RESPONSE_CACHE_"
+
+
+class _CompressionSettings(BaseSettings):
+    offload_bytes: Optional[int] = Field(
+        256 * 1024,
+        gt=0,
+        title="在线程池中压缩的最小响应体长度（字节）",
+        description="压缩更大的响应体时不阻塞事件循环",
+    )
+    cache_max_bytes: Optional[int] = Field(
+        16 * 1024 * 1024,
+        ge=0,
+        title="缓存的压缩结果最多占用的内存（字节）",
+        description="为 0 时不缓存压缩结果",
+    )
+    cache_max_entry_bytes: Optional[int] = Field(
+        1024 * 1024,
+        gt=0,
+        title="缓存压缩结果的最大响应体长度（字节）",
+        description="压缩前超过这个长度的响应体每次都重新压缩",
+    )
+
+    class Config:
+        env_prefix = "COMPRESSION_"
+
+
 _SettingsT = TypeVar("_SettingsT", bound="BaseSettings")
 
 
@@ -244,6 +645,19 @@ class Settings:
     __docs: Optional[_DocsSettings]
     __log: Optional[_LogSettings]
     __id_service: Optional[_IDServiceSettings]
+    __instrument_import: Optional[_ImportSettings]
+    __export: Optional[_ExportSettings]
+    __trusted_read: Optional[_TrustedReadSettings]
+    __storage_rule: Optional[_StorageRuleSettings]
+    __cabinet_capacity: Optional[_CabinetCapacitySettings]
+    __reservation: Optional[_ReservationSettings]
+    __placement: Optional[_PlacementSettings]
+    __cabinet_slot: Optional[_CabinetSlotSettings]
+    __instrument_expiry: Optional[_InstrumentExpirySettings]
+    __expire_recompute: Optional[_ExpireRecomputeSettings]
+    __setting_cache: Optional[_SettingCacheSettings]
+    __response_cache: Optional[_ResponseCacheSettings]
+    __compression: Optional[_CompressionSettings]
 
     __env_file_config: dict[str, Any] = {
         "_env_file": ".env",
@@ -285,6 +699,71 @@ class Settings:
         """ID 服务设置"""
         return self.__get_settings__("__id_service", _IDServiceSettings)
 
+    @property
+    def instrument_import(self) -> _ImportSettings:
+        """器械批量导入设置"""
+        return self.__get_settings__("__instrument_import", _ImportSettings)
+
+    @property
+    def export(self) -> _ExportSettings:
+        """流式导出设置"""
+        return self.__get_settings__("__export", _ExportSettings)
+
+    @property
+    def trusted_read(self) -> _TrustedReadSettings:
+        """读取记录时的校验设置"""
+        return self.__get_settings__("__trusted_read", _TrustedReadSettings)
+
+    @property
+    def storage_rule(self) -> _StorageRuleSettings:
+        """存储规则引擎设置"""
+        return self.__get_settings__("__storage_rule", _StorageRuleSettings)
+
+    @property
+    def cabinet_capacity(self) -> _CabinetCapacitySettings:
+        """存储柜容量设置"""
+        return self.__get_settings__("__cabinet_capacity", _CabinetCapacitySettings)
+
+    @property
+    def reservation(self) -> _ReservationSettings:
+        """存储柜容量预留设置"""
+        return self.__get_settings__("__reservation", _ReservationSettings)
+
+    @property
+    def placement(self) -> _PlacementSettings:
+        """存放位置推荐设置"""
+        return self.__get_settings__("__placement", _PlacementSettings)
+
+    @property
+    def cabinet_slot(self) -> _CabinetSlotSettings:
+        """存储柜槽位设置"""
+        return self.__get_settings__("__cabinet_slot", _CabinetSlotSettings)
+
+    @property
+    def instrument_expiry(self) -> _InstrumentExpirySettings:
+        """器械过期任务设置"""
+        return self.__get_settings__("__instrument_expiry", _InstrumentExpirySettings)
+
+    @property
+    def expire_recompute(self) -> _ExpireRecomputeSettings:
+        """过期时间重新计算任务设置"""
+        return self.__get_settings__("__expire_recompute", _ExpireRecomputeSettings)
+
+    @property
+    def setting_cache(self) -> _SettingCacheSettings:
+        """运行时设置项缓存设置"""
+        return self.__get_settings__("__setting_cache", _SettingCacheSettings)
+
+    @property
+    def response_cache(self) -> _ResponseCacheSettings:
+        """查询响应缓存设置"""
+        return self.__get_settings__("__response_cache", _ResponseCacheSettings)
+
+    @property
+    def compression(self) -> _CompressionSettings:
+        """响应压缩设置"""
+        return self.__get_settings__("__compression", _CompressionSettings)
+
     def set_env_files_path(self, env_file_path: Path) -> None:
         """修改用于加载环境变量的文件路径
 
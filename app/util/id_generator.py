@@ -0,0 +1,724 @@
+from typing import Optional, Protocol, Any
+
+from os import getpid
+from socket import gethostname
+from collections import deque
+from datetime import datetime, timedelta
+from threading import Lock, local
+from concurrent.futures import ThreadPoolExecutor
+from time import time, time_ns, monotonic
+from asyncio import (
+    AbstractEventLoop,
+    Event,
+    Task,
+    CancelledError,
+    TimeoutError as AsyncTimeoutError,
+    create_task,
+    gather,
+    get_running_loop,
+    sleep,
+    wait_for,
+)
+
+from requests import Session as RequestsSession
+from requests.exceptions import RequestException
+
+from loguru import logger
+
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import insert
+
+from snowflake.server.generator import EPOCH_TIMESTAMP
+
+from app.database import DB
+from app.database.table.id_worker_lease import IDWorkerLease
+from app.util.env import SETTINGS
+from app.util.metrics import Histogram
+
+TIMESTAMP_SHIFT = 22
+DATA_CENTER_SHIFT = 20
+WORKER_SHIFT = 12
+
+MAX_DATA_CENTER = 0x03
+MAX_WORKER = 0xFF
+MAX_SEQUENCE = 0xFFF
+
+# 时钟回拨超过此值时记录警告日志（毫秒）
+_ROLLBACK_WARNING_MS = 1000
+
+# 缓冲区后台补充任务的检查间隔和失败重试的退避时间（秒）
+_REFILL_TICK_SECONDS = 1.0
+_REFILL_MIN_BACKOFF = 0.5
+_REFILL_MAX_BACKOFF = 30.0
+
+
+def current_timestamp_ms() -> int:
+    """获取当前的毫秒时间戳
+
+    Returns:
+        int: 毫秒时间戳
+    """
+    return time_ns() // 1_000_000
+
+
+def _in_event_loop() -> bool:
+    try:
+        get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class IDProvider(Protocol):
+    """ID 提供者接口， GUID.generate 通过它获取新的 ID"""
+
+    def next_id(self) -> int:
+        ...
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        ...
+
+
+class SnowflakeGenerator:
+    """进程内的雪花算法 ID 生成器，位布局与 pysnowflake 保持一致
+
+    :| 1 bit |  41 bit   |   2 bit    |  8 bit  |  12 bit  |
+    :|  Sign | Timestamp | DataCenter |  Worker | Sequence |
+
+    生成器使用逻辑时钟：系统时钟回拨时继续沿用最后一次使用的时间戳并递增序列号，
+    序列号用尽时借用下一毫秒，因此不会生成重复的 ID 。
+    """
+
+    def __init__(
+        self,
+        data_center: int,
+        worker: int,
+        last_timestamp_ms: int = EPOCH_TIMESTAMP,
+        lease_deadline: float = float("inf"),
+    ):
+        """初始化生成器
+
+        Args:
+            data_center (int): 2 bit 数据中心序号
+            worker (int): 8 bit 机器序号
+            last_timestamp_ms (int, optional): 上一个持有者最后使用的时间戳，新的 ID 晚于这个时间戳.
+                Defaults to EPOCH_TIMESTAMP.
+            lease_deadline (float, optional): 租约到期的 monotonic 时间. Defaults to float("inf").
+
+        Raises:
+            ValueError: 序号超出范围时抛出异常
+        """
+        if not 0 <= data_center <= MAX_DATA_CENTER:
+            raise ValueError(f"data center must be in [0, {MAX_DATA_CENTER}]")
+        if not 0 <= worker <= MAX_WORKER:
+            raise ValueError(f"worker must be in [0, {MAX_WORKER}]")
+
+        self.data_center = data_center
+        self.worker = worker
+
+        self._node_bits = (data_center << DATA_CENTER_SHIFT) | (worker << WORKER_SHIFT)
+        # 上一个持有者可能已经用完了最后一毫秒的任意序列号，从它的下一毫秒开始生成
+        self._last_timestamp = max(last_timestamp_ms + 1, EPOCH_TIMESTAMP)
+        self._sequence = -1
+        self._lease_deadline = lease_deadline
+        self._lock = Lock()
+
+        self._generated_ids = 0
+        self._sequence_overload = 0
+        self._clock_rollbacks = 0
+        self._max_rollback_ms = 0
+
+    @property
+    def last_timestamp_ms(self) -> int:
+        """最后一次生成 ID 使用的时间戳"""
+        return self._last_timestamp
+
+    def extend_lease(self, lease_deadline: float) -> None:
+        """更新租约到期时间
+
+        Args:
+            lease_deadline (float): 新的租约到期 monotonic 时间
+        """
+        self._lease_deadline = lease_deadline
+
+    def next_id(self) -> int:
+        """生成一个新的 ID
+
+        Raises:
+            RuntimeError: worker 序号的租约已经过期时抛出异常
+
+        Returns:
+            int: 新的 ID
+        """
+        with self._lock:
+            if monotonic() > self._lease_deadline:
+                raise RuntimeError(
+                    f"worker lease of {self.data_center}-{self.worker} is expired"
+                )
+
+            now = current_timestamp_ms()
+
+            if now > self._last_timestamp:
+                self._last_timestamp = now
+                self._sequence = 0
+            else:
+                if now < self._last_timestamp:
+                    self._record_rollback(self._last_timestamp - now)
+
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    # 当前毫秒的序列号已用尽，借用下一毫秒而不是阻塞等待
+                    self._last_timestamp += 1
+                    self._sequence = 0
+                    self._sequence_overload += 1
+
+            self._generated_ids += 1
+            return (
+                ((self._last_timestamp - EPOCH_TIMESTAMP) << TIMESTAMP_SHIFT)
+                | self._node_bits
+                | self._sequence
+            )
+
+    def _record_rollback(self, rollback_ms: int) -> None:
+        if rollback_ms > self._max_rollback_ms:
+            if rollback_ms >= _ROLLBACK_WARNING_MS:
+                logger.warning(
+                    f"Clock went backwards for {rollback_ms} ms, "
+                    + "keep generating ids on the logical clock."
+                )
+            self._max_rollback_ms = rollback_ms
+        self._clock_rollbacks += 1
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """生成器的统计信息"""
+        return {
+            "mode": "embedded",
+            "dc": self.data_center,
+            "worker": self.worker,
+            "timestamp": current_timestamp_ms(),
+            "last_timestamp": self._last_timestamp,
+            "sequence": self._sequence,
+            "generated_ids": self._generated_ids,
+            "sequence_overload": self._sequence_overload,
+            "clock_rollbacks": self._clock_rollbacks,
+            "max_rollback_ms": self._max_rollback_ms,
+        }
+
+
+class BufferedIDClient:
+    """从 pysnowflake 服务批量预取 ID 的客户端
+
+    本地缓冲区中保存预取的 ID ，获取 ID 只需要从缓冲区中弹出一个元素，不会阻塞事件循环。
+    缓冲区低于水位线时在后台线程池中补充，补充数量根据观测到的 ID 消耗速率自适应调整。
+    ID 服务短暂不可用时继续使用缓冲区中的 ID ，并按指数退避重试。
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        min_batch: int,
+        max_batch: int,
+        buffer_seconds: float,
+        max_id_age_seconds: float,
+        concurrency: int,
+        request_timeout: float,
+    ):
+        """初始化客户端
+
+        Args:
+            host (str): ID 服务主机地址
+            port (int): ID 服务端口
+            min_batch (int): 每次补充的最小数量，同时也是缓冲区的最小目标深度
+            max_batch (int): 每次补充的最大数量
+            buffer_seconds (float): 缓冲区需要覆盖的消耗时长（秒）
+            max_id_age_seconds (float): 缓冲区中 ID 的最大存放时长（秒），超过后丢弃
+            concurrency (int): 补充时并发请求 ID 服务的线程数
+            request_timeout (float): 请求 ID 服务的超时时间（秒）
+        """
+        self._api_uri = f"http://{host}:{port}/"
+        self._min_batch = min_batch
+        self._max_batch = max_batch
+        self._buffer_seconds = buffer_seconds
+        self._max_id_age_ms = int(max_id_age_seconds * 1000)
+        self._concurrency = concurrency
+        self._request_timeout = request_timeout
+
+        self._buffer: deque[int] = deque()
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="id-refill"
+        )
+        self._thread_local = local()
+
+        self._loop: Optional[AbstractEventLoop] = None
+        self._refill_event: Optional[Event] = None
+        self._refill_task: Optional[Task] = None
+
+        self._consume_rate = 0.0
+        self._consumed = 0
+        self._consumed_at_last_tick = 0
+        self._last_tick = monotonic()
+
+        self._refill_latency = Histogram()
+        self._last_batch_size = 0
+        self._fetched_ids = 0
+        self._refill_failures = 0
+        self._stalls = 0
+        self._rejected = 0
+        self._dropped_ids = 0
+        self._outage_since: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+    @property
+    def target_depth(self) -> int:
+        """缓冲区的目标深度，至少能覆盖 buffer_seconds 秒的消耗"""
+        return max(self._min_batch, int(self._consume_rate * self._buffer_seconds))
+
+    async def start(self) -> None:
+        """预取第一批 ID 并启动后台补充任务
+
+        ID 服务不可用时只记录警告，不会阻止服务启动。
+        """
+        self._loop = get_running_loop()
+        self._refill_event = Event()
+
+        if not await self._refill(self._min_batch):
+            logger.warning(
+                f"Can not prefetch ids from {self._api_uri}: {self._last_error}"
+            )
+
+        self._refill_task = create_task(self._refill_loop())
+
+    async def stop(self) -> None:
+        """停止后台补充任务"""
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            self._refill_task = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def next_id(self) -> int:
+        """从缓冲区中获取一个 ID
+
+        缓冲区为空时记录为一次停顿并立即触发补充：在事件循环线程中直接抛出异常，不会同步请求
+        ID 服务阻塞事件循环；在其他线程（例如导入时校验数据的线程）中同步请求一个 ID 。
+
+        Raises:
+            RuntimeError: 缓冲区为空且在事件循环线程中，或 ID 服务不可用时抛出异常
+
+        Returns:
+            int: 新的 ID
+        """
+        oldest_timestamp = current_timestamp_ms() - self._max_id_age_ms
+
+        while True:
+            try:
+                guid = self._buffer.popleft()
+            except IndexError:
+                guid = self._fetch_when_empty()
+                break
+
+            if (guid >> TIMESTAMP_SHIFT) + EPOCH_TIMESTAMP >= oldest_timestamp:
+                break
+            self._dropped_ids += 1
+
+        self._consumed += 1
+        if len(self._buffer) < self.target_depth // 2:
+            self._request_refill()
+        return guid
+
+    def _fetch_when_empty(self) -> int:
+        self._stalls += 1
+        self._request_refill()
+        if _in_event_loop():
+            self._rejected += 1
+            raise RuntimeError("id buffer is empty, wait for the background refill")
+        try:
+            return self._fetch_sync(1)[0]
+        except RequestException as error:
+            raise RuntimeError(
+                f"id buffer is empty and id service is unavailable: {error}"
+            ) from error
+
+    def _request_refill(self) -> None:
+        if self._loop is None or self._refill_event is None:
+            return
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._refill_event.set)
+
+    def _fetch_sync(self, count: int) -> list[int]:
+        session: Optional[RequestsSession] = getattr(
+            self._thread_local, "session", None
+        )
+        if session is None:
+            session = RequestsSession()
+            self._thread_local.session = session
+
+        guids = []
+        for _ in range(count):
+            response = session.get(self._api_uri, timeout=self._request_timeout)
+            response.raise_for_status()
+            guids.append(int(response.text))
+        return guids
+
+    async def _refill(self, count: int) -> bool:
+        assert self._loop is not None, "client is not started"
+
+        chunk_size = -(-count // self._concurrency)
+        chunks = [
+            min(chunk_size, count - start) for start in range(0, count, chunk_size)
+        ]
+
+        refill_start = monotonic()
+        results = await gather(
+            *(
+                self._loop.run_in_executor(self._executor, self._fetch_sync, chunk)
+                for chunk in chunks
+            ),
+            return_exceptions=True,
+        )
+        self._refill_latency.observe((monotonic() - refill_start) * 1000)
+
+        fetched: list[int] = []
+        errors: list[BaseException] = []
+        for result in results:
+            if isinstance(result, BaseException):
+                errors.append(result)
+            else:
+                fetched.extend(result)
+
+        # 并发获取的 ID 顺序交错，排序后保证按顺序分配
+        self._buffer.extend(sorted(fetched))
+        self._fetched_ids += len(fetched)
+        self._last_batch_size = len(fetched)
+
+        if errors:
+            self._refill_failures += 1
+            self._last_error = str(errors[0])
+            if self._outage_since is None:
+                self._outage_since = time()
+            return False
+
+        if self._outage_since is not None:
+            logger.info(
+                f"id service recovered after {time() - self._outage_since:.1f} s"
+            )
+            self._outage_since = None
+        return True
+
+    def _drop_stale_ids(self) -> None:
+        oldest_timestamp = current_timestamp_ms() - self._max_id_age_ms
+        while self._buffer:
+            guid = self._buffer[0]
+            if (guid >> TIMESTAMP_SHIFT) + EPOCH_TIMESTAMP >= oldest_timestamp:
+                return
+            try:
+                self._buffer.popleft()
+            except IndexError:
+                return
+            self._dropped_ids += 1
+
+    def _update_consume_rate(self) -> None:
+        now = monotonic()
+        elapsed = now - self._last_tick
+        if elapsed <= 0:
+            return
+
+        current_rate = (self._consumed - self._consumed_at_last_tick) / elapsed
+        # 指数加权平均，突增时快速上调，回落时缓慢下调
+        alpha = 0.5 if current_rate > self._consume_rate else 0.1
+        self._consume_rate += alpha * (current_rate - self._consume_rate)
+
+        self._consumed_at_last_tick = self._consumed
+        self._last_tick = now
+
+    async def _refill_loop(self) -> None:
+        assert self._refill_event is not None, "client is not started"
+
+        backoff = _REFILL_MIN_BACKOFF
+
+        while True:
+            try:
+                await wait_for(self._refill_event.wait(), timeout=_REFILL_TICK_SECONDS)
+            except AsyncTimeoutError:
+                pass
+            self._refill_event.clear()
+            self._update_consume_rate()
+            self._drop_stale_ids()
+
+            depth = len(self._buffer)
+            target_depth = self.target_depth
+            if depth >= target_depth // 2:
+                continue
+
+            batch = min(max(target_depth - depth, self._min_batch), self._max_batch)
+            if await self._refill(batch):
+                backoff = _REFILL_MIN_BACKOFF
+                continue
+
+            logger.warning(
+                f"Can not refill ids ({depth} left in buffer), "
+                + f"retry in {backoff:.1f} s: {self._last_error}"
+            )
+            await sleep(backoff)
+            backoff = min(backoff * 2, _REFILL_MAX_BACKOFF)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """客户端的统计信息，包括缓冲区深度和补充耗时"""
+        return {
+            "mode": "service",
+            "buffer_depth": len(self._buffer),
+            "target_depth": self.target_depth,
+            "consume_rate": round(self._consume_rate, 3),
+            "consumed_ids": self._consumed,
+            "fetched_ids": self._fetched_ids,
+            "last_batch_size": self._last_batch_size,
+            "dropped_ids": self._dropped_ids,
+            "stalls": self._stalls,
+            "rejected": self._rejected,
+            "refill_failures": self._refill_failures,
+            "refill_latency_ms": self._refill_latency.snapshot(),
+            "outage_since": self._outage_since,
+            "last_error": self._last_error,
+        }
+
+
+class _WorkerLease:
+    """在数据库中租用 worker 序号，保证同一数据中心内的序号不会被多个进程同时使用"""
+
+    owner: str
+
+    def __init__(self):
+        self.owner = f"{gethostname()[:32]}:{getpid()}"
+        self.lease_id: Optional[int] = None
+
+    async def acquire(self, data_center: int, lease_seconds: int) -> tuple[int, int]:
+        """租用一个空闲的 worker 序号
+
+        优先选择空闲时间最长的序号，降低重启后时钟回拨导致 ID 重复的可能。
+
+        Args:
+            data_center (int): 数据中心序号
+            lease_seconds (int): 租约时长（秒）
+
+        Raises:
+            RuntimeError: 没有空闲的 worker 序号时抛出异常
+
+        Returns:
+            tuple[int, int]: worker 序号和上一个持有者最后使用的时间戳
+        """
+        async with DB.client.new_session() as session:
+            await session.execute(
+                insert(IDWorkerLease)
+                .values(
+                    [
+                        {
+                            "id": (data_center << 8) | worker,
+                            "data_center": data_center,
+                            "worker": worker,
+                            "lease_expire_at": datetime(1970, 1, 1),
+                            "last_timestamp_ms": 0,
+                        }
+                        for worker in range(MAX_WORKER + 1)
+                    ]
+                )
+                .on_conflict_do_nothing(index_elements=[IDWorkerLease.id])
+            )
+            await session.commit()
+
+            candidate = (
+                select(IDWorkerLease.id)
+                .where(
+                    IDWorkerLease.data_center == data_center,
+                    IDWorkerLease.lease_expire_at <= func.now(),
+                )
+                .order_by(IDWorkerLease.lease_expire_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            result = await session.execute(
+                update(IDWorkerLease)
+                .where(IDWorkerLease.id == candidate)
+                .values(
+                    lease_owner=self.owner,
+                    lease_expire_at=func.now() + timedelta(seconds=lease_seconds),
+                )
+                .returning(
+                    IDWorkerLease.id,
+                    IDWorkerLease.worker,
+                    IDWorkerLease.last_timestamp_ms,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            row = result.one_or_none()
+            await session.commit()
+
+        if row is None:
+            raise RuntimeError(f"No free worker left in data center {data_center}")
+
+        self.lease_id = row.id
+        return row.worker, row.last_timestamp_ms
+
+    async def renew(self, lease_seconds: int, last_timestamp_ms: int) -> bool:
+        """续约当前持有的 worker 序号
+
+        Args:
+            lease_seconds (int): 租约时长（秒）
+            last_timestamp_ms (int): 最后生成 ID 使用的时间戳
+
+        Returns:
+            bool: 续约成功返回真，租约已经被其他进程占用时返回假
+        """
+        async with DB.client.new_session() as session:
+            result = await session.execute(
+                update(IDWorkerLease)
+                .where(
+                    IDWorkerLease.id == self.lease_id,
+                    IDWorkerLease.lease_owner == self.owner,
+                )
+                .values(
+                    lease_expire_at=func.now() + timedelta(seconds=lease_seconds),
+                    last_timestamp_ms=last_timestamp_ms,
+                )
+                .returning(IDWorkerLease.id)
+                .execution_options(synchronize_session=False)
+            )
+            renewed = result.one_or_none() is not None
+            await session.commit()
+        return renewed
+
+    async def release(self, last_timestamp_ms: int) -> None:
+        """释放当前持有的 worker 序号
+
+        Args:
+            last_timestamp_ms (int): 最后生成 ID 使用的时间戳
+        """
+        if self.lease_id is None:
+            return
+
+        async with DB.client.new_session() as session:
+            await session.execute(
+                update(IDWorkerLease)
+                .where(
+                    IDWorkerLease.id == self.lease_id,
+                    IDWorkerLease.lease_owner == self.owner,
+                )
+                .values(
+                    lease_owner=None,
+                    lease_expire_at=func.now(),
+                    last_timestamp_ms=last_timestamp_ms,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        self.lease_id = None
+
+
+class _IDGenerator:
+    """ID 生成客户端，根据设置选择进程内生成或者从 pysnowflake 服务获取"""
+
+    _provider: Optional[IDProvider] = None
+    _lease: Optional[_WorkerLease] = None
+    _keep_alive_task: Optional[Task] = None
+
+    async def start(self) -> None:
+        """初始化 ID 生成器"""
+        if SETTINGS.id_service.mode == "service":
+            settings = SETTINGS.id_service
+            buffered_client = BufferedIDClient(
+                host=settings.host,  # type: ignore
+                port=settings.port,  # type: ignore
+                min_batch=settings.buffer_min_batch,  # type: ignore
+                max_batch=settings.buffer_max_batch,  # type: ignore
+                buffer_seconds=settings.buffer_seconds,  # type: ignore
+                max_id_age_seconds=settings.buffer_max_id_age_seconds,  # type: ignore
+                concurrency=settings.refill_concurrency,  # type: ignore
+                request_timeout=settings.request_timeout,  # type: ignore
+            )
+            await buffered_client.start()
+            self._provider = buffered_client
+            return
+
+        await self._start_embedded()
+        self._keep_alive_task = create_task(self._keep_alive())
+
+    async def stop(self) -> None:
+        """停止 ID 生成器，释放持有的 worker 序号"""
+        if isinstance(self._provider, BufferedIDClient):
+            await self._provider.stop()
+
+        if self._keep_alive_task is not None:
+            self._keep_alive_task.cancel()
+            self._keep_alive_task = None
+
+        if self._lease is not None and isinstance(self._provider, SnowflakeGenerator):
+            await self._lease.release(self._provider.last_timestamp_ms)
+            self._lease = None
+
+    def next_id(self) -> int:
+        """获取一个新的 ID
+
+        Raises:
+            RuntimeError: ID 生成器尚未初始化时抛出异常
+
+        Returns:
+            int: 新的 ID
+        """
+        if self._provider is None:
+            raise RuntimeError("id generator is not started")
+        return self._provider.next_id()
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """ID 生成器的统计信息"""
+        if self._provider is None:
+            return {}
+        return self._provider.stats
+
+    async def _start_embedded(self) -> None:
+        data_center: int = SETTINGS.id_service.data_center  # type: ignore
+        lease_seconds: int = SETTINGS.id_service.worker_lease_seconds  # type: ignore
+
+        self._lease = self._lease or _WorkerLease()
+        lease_start = monotonic()
+        worker, last_timestamp_ms = await self._lease.acquire(
+            data_center, lease_seconds
+        )
+
+        self._provider = SnowflakeGenerator(
+            data_center,
+            worker,
+            last_timestamp_ms=last_timestamp_ms,
+            lease_deadline=lease_start + lease_seconds,
+        )
+        logger.info(f"id generator started with worker {data_center}-{worker}")
+
+    async def _keep_alive(self) -> None:
+        lease_seconds: int = SETTINGS.id_service.worker_lease_seconds  # type: ignore
+
+        while True:
+            await sleep(lease_seconds / 3)
+
+            generator = self._provider
+            if self._lease is None or not isinstance(generator, SnowflakeGenerator):
+                return
+
+            try:
+                renew_start = monotonic()
+                if await self._lease.renew(lease_seconds, generator.last_timestamp_ms):
+                    generator.extend_lease(renew_start + lease_seconds)
+                    continue
+
+                logger.error("Worker lease is taken by others, acquiring a new one.")
+                await self._start_embedded()
+            except CancelledError:
+                raise
+            except Exception as error:  # pylint: disable=broad-except
+                logger.warning(f"Can not renew worker lease: {error}")
+
+
+ID_GENERATOR = _IDGenerator()
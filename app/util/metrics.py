@@ -0,0 +1,77 @@
+from typing import Any, Sequence
+
+from bisect import bisect_left
+from threading import Lock
+
+# 默认的耗时直方图分桶上限（毫秒）
+DEFAULT_LATENCY_BUCKETS_MS: tuple[float, ...] = (
+    1,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+)
+
+
+class Histogram:
+    """固定分桶的直方图，用于统计耗时等指标的分布
+
+    最后一个分桶为 +Inf ，记录所有超过最大上限的观测值。
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        """初始化直方图
+
+        Args:
+            buckets (Sequence[float], optional): 递增的分桶上限. Defaults to DEFAULT_LATENCY_BUCKETS_MS.
+        """
+        self._buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        """记录一个观测值
+
+        Args:
+            value (float): 观测值
+        """
+        with self._lock:
+            self._counts[bisect_left(self._buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    @property
+    def count(self) -> int:
+        """观测值数量"""
+        return self._count
+
+    def snapshot(self) -> dict[str, Any]:
+        """获取直方图当前的快照
+
+        Returns:
+            dict[str, Any]: 包含各分桶计数、总数、平均值和最大值
+        """
+        with self._lock:
+            buckets = {
+                f"le_{bound:g}": count
+                for bound, count in zip(self._buckets, self._counts)
+            }
+            buckets["le_inf"] = self._counts[-1]
+            return {
+                "buckets": buckets,
+                "count": self._count,
+                "sum": round(self._sum, 3),
+                "avg": round(self._sum / self._count, 3) if self._count else 0,
+                "max": round(self._max, 3),
+            }
@@ -1,35 +1,43 @@
-from typing import Type, TypeVar, Any
+from typing import Optional, Type, TypeVar, Any
 
 from sys import exit as sys_exit
 
 from time import strftime, localtime
+from datetime import datetime, timezone
 
-from requests.exceptions import ConnectionError as RequestsConnectionError
+from sqlalchemy.exc import SQLAlchemyError
 
 from loguru import logger
 
-from snowflake import client
 from snowflake.server.generator import EPOCH_TIMESTAMP
 
-from app.util.env import SETTINGS
+from app.util.id_generator import ID_GENERATOR, TIMESTAMP_SHIFT
 from app.util.type.custom_validator import ValidatedValue
 
 
-def init_snowflake_client() -> None:
-    """初始化 ID 服务客户端"""
+async def init_snowflake_client() -> None:
+    """初始化 ID 生成器"""
     try:
-        client.setup(SETTINGS.id_service.host, SETTINGS.id_service.port)
-        logger.info(f"id service status: {client.get_stats()}")
-    except RequestsConnectionError as error:
-        logger.error(f"Can not init id service: {error}")
+        await ID_GENERATOR.start()
+        logger.info(f"id generator status: {ID_GENERATOR.stats}")
+    except (SQLAlchemyError, RuntimeError) as error:
+        logger.error(f"Can not init id generator: {error}")
         sys_exit()
 
 
+async def close_snowflake_client() -> None:
+    """关闭 ID 生成器"""
+    await ID_GENERATOR.stop()
+
+
 _GuidT = TypeVar("_GuidT", bound="GUID")
 
+# 数据库中 BIGINT 能保存的最大值
+MAX_GUID = (1 << 63) - 1
+
 
 class GUID(ValidatedValue[_GuidT]):
-    """使用雪花算法生成的全局唯一识别码，依赖于 pysnowflake 生成
+    """使用雪花算法生成的全局唯一识别码，默认在进程内生成，位布局与 pysnowflake 一致
 
     :| 1 bit |                   41 bit                  |   2 bit    |  8 bit   |    12 bit    |
     :|  Sign |                  Timestamp                | DataCenter |  Worker  |   Sequence   |
@@ -59,12 +67,12 @@ class GUID(ValidatedValue[_GuidT]):
 
     @classmethod
     def generate(cls: Type[_GuidT]) -> _GuidT:
-        """从服务端获取新的 GUID
+        """生成新的 GUID
 
         Returns:
             T: 新的 GUID 对象
         """
-        return cls(client.get_guid(), need_varification=False)
+        return cls(ID_GENERATOR.next_id(), need_varification=False)
 
     @classmethod
     def parse_str(cls: Type[_GuidT], guid: str) -> _GuidT:
@@ -116,7 +124,7 @@ class GUID(ValidatedValue[_GuidT]):
         Returns:
             int: 41 bit 时间戳，单位为毫秒
         """
-        return (self.__id >> 22) + EPOCH_TIMESTAMP
+        return (self.__id >> TIMESTAMP_SHIFT) + EPOCH_TIMESTAMP
 
     @property
     def create_time_str(self) -> str:
@@ -155,6 +163,60 @@ class GUID(ValidatedValue[_GuidT]):
         """
         return self.__id & 0xFFF
 
+    @staticmethod
+    def min_guid_of_timestamp(timestamp_ms: int) -> int:
+        """获取指定毫秒内生成的最小 GUID
+
+        Args:
+            timestamp_ms (int): 毫秒时间戳
+
+        Returns:
+            int: 该毫秒内可能生成的最小 GUID
+        """
+        guid = max(timestamp_ms - EPOCH_TIMESTAMP, 0) << TIMESTAMP_SHIFT
+        return min(guid, MAX_GUID)  # 超出 41 bit 时间戳范围时使用 BIGINT 的最大值
+
+    @staticmethod
+    def max_guid_of_timestamp(timestamp_ms: int) -> int:
+        """获取指定毫秒内生成的最大 GUID
+
+        Args:
+            timestamp_ms (int): 毫秒时间戳
+
+        Returns:
+            int: 该毫秒内可能生成的最大 GUID
+        """
+        guid = GUID.min_guid_of_timestamp(timestamp_ms) | ((1 << TIMESTAMP_SHIFT) - 1)
+        return min(guid, MAX_GUID)
+
+    @staticmethod
+    def range_of_time(
+        start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> tuple[Optional[int], Optional[int]]:
+        """获取在时间段内生成的 GUID 范围，用来将创建时间的过滤条件转换为主键的范围查询
+
+        没有时区信息的时间按照 UTC 时间处理（与数据库中保存的时间一致）。
+
+        Args:
+            start (Optional[datetime], optional): 开始时间（包含）. Defaults to None.
+            end (Optional[datetime], optional): 结束时间（包含）. Defaults to None.
+
+        Returns:
+            tuple[Optional[int], Optional[int]]: GUID 的上下界（包含），对应的时间为空时返回 None
+        """
+
+        def to_timestamp_ms(time: datetime) -> int:
+            if time.tzinfo is None:
+                time = time.replace(tzinfo=timezone.utc)
+            return int(time.timestamp() * 1000)
+
+        return (
+            None
+            if start is None
+            else GUID.min_guid_of_timestamp(to_timestamp_ms(start)),
+            None if end is None else GUID.max_guid_of_timestamp(to_timestamp_ms(end)),
+        )
+
     @staticmethod
     def is_valid_guid(guid: int) -> bool:
         """判断 GUID 是否合法
@@ -206,6 +268,9 @@ class GUID(ValidatedValue[_GuidT]):
     def __ne__(self, other: object) -> bool:
         return not self.__eq__(other)
 
+    def __hash__(self) -> int:
+        return hash(self.__id)
+
     def __repr__(self) -> str:
         return f"<GUID: {self.__id}>"
 
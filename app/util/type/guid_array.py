@@ -0,0 +1,79 @@
+from typing import Iterable
+
+import numpy as np
+from numpy.typing import NDArray
+
+from snowflake.server.generator import EPOCH_TIMESTAMP
+
+from app.util.id_generator import TIMESTAMP_SHIFT, DATA_CENTER_SHIFT, WORKER_SHIFT
+from app.util.id_generator import MAX_DATA_CENTER, MAX_WORKER, MAX_SEQUENCE
+
+
+def as_guid_array(guids: Iterable[int] | NDArray[np.int64]) -> NDArray[np.int64]:
+    """将 GUID 序列转换为 int64 数组
+
+    GUID 的符号位必定为 0 ，所以可以无损的保存在 int64 中。
+
+    Args:
+        guids (Iterable[int] | NDArray[np.int64]): GUID 序列
+
+    Returns:
+        NDArray[np.int64]: GUID 数组
+    """
+    if isinstance(guids, np.ndarray):
+        return guids.astype(np.int64, copy=False)
+    return np.fromiter(guids, dtype=np.int64)
+
+
+def decode_guids(
+    guids: Iterable[int] | NDArray[np.int64],
+) -> dict[str, NDArray[np.int64]]:
+    """批量解析 GUID 中包含的信息，用于对大量记录进行分析
+
+    Args:
+        guids (Iterable[int] | NDArray[np.int64]): GUID 序列
+
+    Returns:
+        dict[str, NDArray[np.int64]]: 与 GUID.get_all_details 中键名一致的各字段数组
+    """
+    array = as_guid_array(guids)
+    return {
+        "guid": array,
+        "timestamp": (array >> TIMESTAMP_SHIFT) + EPOCH_TIMESTAMP,
+        "data_center": (array >> DATA_CENTER_SHIFT) & MAX_DATA_CENTER,
+        "worker": (array >> WORKER_SHIFT) & MAX_WORKER,
+        "sequence": array & MAX_SEQUENCE,
+    }
+
+
+def guids_to_datetime64(
+    guids: Iterable[int] | NDArray[np.int64],
+) -> NDArray[np.datetime64]:
+    """批量获取 GUID 的创建时间
+
+    Args:
+        guids (Iterable[int] | NDArray[np.int64]): GUID 序列
+
+    Returns:
+        NDArray[np.datetime64]: UTC 创建时间数组，精度为毫秒
+    """
+    array = as_guid_array(guids)
+    return ((array >> TIMESTAMP_SHIFT) + EPOCH_TIMESTAMP).astype("datetime64[ms]")
+
+
+def count_by_create_time(
+    guids: Iterable[int] | NDArray[np.int64], bucket_ms: int
+) -> tuple[NDArray[np.datetime64], NDArray[np.int64]]:
+    """按照创建时间分段统计 GUID 数量
+
+    Args:
+        guids (Iterable[int] | NDArray[np.int64]): GUID 序列
+        bucket_ms (int): 分段时长（毫秒）
+
+    Returns:
+        tuple[NDArray[np.datetime64], NDArray[np.int64]]: 各分段的开始时间和对应的数量
+    """
+    array = as_guid_array(guids)
+    timestamps = (array >> TIMESTAMP_SHIFT) + EPOCH_TIMESTAMP
+    buckets, counts = np.unique(timestamps // bucket_ms, return_counts=True)
+    return (buckets * bucket_ms).astype("datetime64[ms]"), counts
@@ -0,0 +1,10 @@
+from pydantic import stricturl
+
+from app.util.string_length import URL_LENGTH
+
+# 与 HttpUrl 的校验规则相同，但是长度限制与数据库中的 URL 字段一致
+LimitedHttpUrl = stricturl(
+    max_length=URL_LENGTH,
+    tld_required=True,
+    allowed_schemes={"http", "https"},
+)
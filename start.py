@@ -1,10 +1,11 @@
 from typing import Optional
 
+from asyncio import run as asyncio_run
 from pathlib import Path
 
 from uvicorn import run as uvicorn_run
 
-from typer import Typer, Option
+from typer import Typer, Argument, Option, Exit, echo
 
 from pydantic import validate_arguments
 
@@ -41,6 +42,54 @@ def run(
     )
 
 
+@app.command(name="import")
+@validate_arguments
+def import_instruments(
+    file: Path = Argument(
+        ..., exists=True, dir_okay=False, help="CSV 或 NDJSON 文件，可以使用 gzip 压缩"
+    ),
+    file_format: Optional[str] = Option(
+        None, "--format", help="数据格式（ csv 或 ndjson ），默认根据文件名推断"
+    ),
+    offset: int = Option(0, min=0, help="跳过的记录数，用于继续中断的导入"),
+    chunk_size: Optional[int] = Option(None, min=1, help="每批的记录数"),
+    env_file: Optional[Path] = Option(None, help="手动指定环境变量文件位置"),
+):
+    """批量导入器械记录"""
+    if env_file is not None:
+        SETTINGS.set_env_files_path(env_file)
+
+    # 数据库连接地址在导入时读取设置，需要在指定环境变量文件之后导入
+    from app.model.instrument_import import ImportChunkReport
+    from app.service.instrument_import import import_file, guess_format
+
+    import_format = guess_format(file_format or file.name)
+    if import_format is None:
+        echo("Unknown file format, please use --format csv or ndjson.", err=True)
+        raise Exit(code=2)
+
+    def print_chunk(chunk: ImportChunkReport) -> None:
+        echo(
+            f"chunk {chunk.index}: records {chunk.start_offset}-{chunk.end_offset}, "
+            + f"imported {chunk.imported}, failed {chunk.failed}"
+            + (f", error: {chunk.error}" if chunk.error else "")
+        )
+        for row_error in chunk.errors:
+            echo(f"  record {row_error.offset}: {row_error.error}")
+
+    report = asyncio_run(
+        import_file(file, import_format, offset, chunk_size, on_chunk=print_chunk)
+    )
+    echo(
+        f"Imported {report.imported} records, {report.failed} failed, "
+        + f"in {report.elapsed_ms / 1000:.2f}s."
+    )
+    if not report.completed:
+        echo(f"Import stopped: {report.error}", err=True)
+        echo(f"Resume with: --offset {report.next_offset}", err=True)
+        raise Exit(code=1)
+
+
 @app.command()
 @validate_arguments
 def test():
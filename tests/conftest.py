@@ -0,0 +1,6 @@
+import os
+
+# 导入配置时必须提供数据库连接信息，测试不会连接数据库
+os.environ.setdefault("DB_USERNAME", "test")
+os.environ.setdefault("DB_PASSWORD", "test")
+os.environ.setdefault("DB_NAME", "test")
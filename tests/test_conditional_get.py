@@ -0,0 +1,90 @@
+import asyncio
+import zlib
+
+from starlette.datastructures import Headers
+from starlette.types import Message, Receive, Scope, Send
+
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.conditional_get import (
+    ConditionalGetMiddleware,
+    encoded_etag,
+    etag_of,
+    none_match,
+    version_etag,
+)
+from app.service.compression import CODECS
+
+BODY = b'{"data":[]}'
+
+
+def _app(headers: list[tuple[bytes, bytes]], body: bytes = BODY):
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+def _get(
+    app, if_none_match: bytes | None = None, accept_encoding: bytes | None = None
+) -> list[Message]:
+    headers = [] if if_none_match is None else [(b"if-none-match", if_none_match)]
+    if accept_encoding is not None:
+        headers.append((b"accept-encoding", accept_encoding))
+    scope = {"type": "http", "method": "GET", "headers": headers}
+    messages: list[Message] = []
+
+    async def receive() -> Message:
+        return {"type": "http.request"}
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    asyncio.run(ConditionalGetMiddleware(app)(scope, receive, send))
+    return messages
+
+
+def test_version_etag_is_weak_and_matches_weakly():
+    etag = version_etag("Room", 100, (1, "735"))
+
+    assert etag.startswith(b'W/"')
+    assert etag == version_etag("Room", 100, (1, "735"))
+    assert etag != version_etag("Room", 100, (1, "736"))
+    assert none_match(Headers({"if-none-match": etag.decode()}), etag)
+    assert none_match(Headers({"if-none-match": etag.decode()[2:]}), etag)
+    assert not none_match(Headers({"if-none-match": '"other"'}), etag)
+
+
+def test_body_etag_is_added():
+    start, body = _get(_app([]))
+
+    assert (b"etag", etag_of(BODY)) in start["headers"]
+    assert body["body"] == BODY
+
+    start, body = _get(_app([]), etag_of(BODY))
+    assert start["status"] == 304
+    assert body["body"] == b""
+
+
+def test_existing_etag_is_kept():
+    etag = version_etag("Room", 1, "735")
+    start, _ = _get(_app([(b"etag", etag)]))
+
+    assert [value for name, value in start["headers"] if name == b"etag"] == [etag]
+
+    start, _ = _get(_app([(b"etag", etag)]), etag)
+    assert start["status"] == 304
+
+
+def test_compressed_etag_reuses_body_digest():
+    body = b"x" * 1000
+    app = CompressionMiddleware(_app([], body))
+    start, message = _get(app, accept_encoding=b"gzip")
+    gzip = next(codec for codec in CODECS if codec.name == "gzip")
+    etag = encoded_etag(etag_of(body), f"gzip{gzip.dynamic_level}")
+
+    assert Headers(raw=start["headers"])["etag"] == etag.decode()
+    assert zlib.decompress(message["body"], wbits=31) == body
+
+    start, _ = _get(app, etag, b"gzip")
+    assert start["status"] == 304
@@ -0,0 +1,130 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from app.crud import base
+from app.crud.base import CRUDBase
+from app.crud.location_room import ROOM_CRUD
+from app.database.table import Base
+from app.database.table.location_cabinet import Cabinet, CabinetStatus
+from app.database.table.location_room import Room
+from app.model.location_room import RoomInCreate, RoomInUpdate
+from app.util.type.guid import GUID
+
+# 与 test_cabinet_capacity 相同，批量写入的测试需要 TEST_DATABASE_URL 指向一个可以随意清空的数据库
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+needs_database = pytest.mark.skipif(
+    DATABASE_URL is None, reason="TEST_DATABASE_URL is not set"
+)
+
+ROOM_ID = 5208970514513141504
+
+
+def test_to_row_for_create():
+    crud = CRUDBase(Cabinet)
+    row = crud.to_row(
+        {
+            "id": GUID(ROOM_ID, need_varification=False),
+            "located_room": ROOM_ID,
+            "status": 1,
+            "cabinet_comment": None,
+            "created_at": None,
+            "cabinet_name": None,
+            "unknown": "dropped",
+        }
+    )
+
+    # 有默认值和由数据库维护的空字段不写入，可以为空的字段保留空值
+    assert row == {
+        "id": ROOM_ID,
+        "located_room": ROOM_ID,
+        "status": CabinetStatus.ENABLED,
+        "cabinet_comment": None,
+    }
+
+
+def test_to_row_for_update_keeps_none():
+    crud = CRUDBase(Cabinet)
+    row = crud.to_row({"cabinet_name": None, "status": 0}, for_update=True)
+
+    assert row == {"cabinet_name": None, "status": CabinetStatus.DISABLED}
+
+
+def test_rows_are_grouped_by_keys_and_chunked(monkeypatch: pytest.MonkeyPatch):
+    crud = CRUDBase(Room)
+    rows = [{"id": 1, "room_name": "a"}, {"room_name": "b", "id": 2}, {"id": 3}]
+
+    assert crud._group_by_keys(rows) == {
+        ("id", "room_name"): rows[:2],
+        ("id",): rows[2:],
+    }
+
+    monkeypatch.setattr(base, "MAX_BIND_PARAMS", 10)
+    assert crud._chunk_size(3) == 3
+    assert crud._chunk_size(20) == 1
+
+
+async def _with_engine(test) -> None:
+    tables = [Room.__table__]
+    engine = create_async_engine(DATABASE_URL)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all, tables=tables)
+            await conn.run_sync(Base.metadata.create_all, tables=tables)
+        await test(engine)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all, tables=tables)
+        await engine.dispose()
+
+
+@needs_database
+def test_bulk_create_update_delete(monkeypatch: pytest.MonkeyPatch):
+    # 参数上限很小，每条语句只能写入几行，覆盖拆分语句的情况
+    monkeypatch.setattr(base, "MAX_BIND_PARAMS", 9)
+
+    async def test(engine: AsyncEngine) -> None:
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        ids = [ROOM_ID + index for index in range(5)]
+
+        async with sessions() as session:
+            created = await ROOM_CRUD.create_multi(
+                session,
+                [
+                    RoomInCreate(id=guid, room_name=f"Room_{index}")
+                    for index, guid in enumerate(ids)
+                ],
+            )
+            await session.commit()
+        assert [room.id for room in created] == ids
+        assert created[0].room_comment == "" and created[0].created_at is not None
+
+        async with sessions() as session:
+            updated = await ROOM_CRUD.update_multi(
+                session,
+                {
+                    ids[0]: RoomInUpdate(room_name="Renamed"),
+                    ids[1]: {"room_comment": "comment"},
+                    ids[2]: RoomInUpdate(room_name="Renamed", room_comment=None),
+                    # 不存在的记录会被忽略
+                    ROOM_ID - 1: {"room_name": "Missing"},
+                },
+            )
+            await session.commit()
+        by_id = {room.id: room for room in updated}
+        assert set(by_id) == set(ids[:3])
+        assert by_id[ids[0]].room_name == "Renamed"
+        assert by_id[ids[1]].room_comment == "comment"
+        assert by_id[ids[2]].room_comment is None
+
+        async with sessions() as session:
+            deleted = await ROOM_CRUD.delete_multi(session, [ids[0], ROOM_ID - 1])
+            await session.commit()
+            remaining = await session.scalar(select(func.count()).select_from(Room))
+        assert [room.id for room in deleted] == [ids[0]]
+        assert remaining == 4
+
+    asyncio.run(_with_engine(test))
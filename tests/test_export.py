@@ -0,0 +1,76 @@
+import csv
+import json
+from datetime import datetime
+from io import StringIO
+from types import SimpleNamespace
+
+from app.crud.location_cabinet import CABINET_CRUD
+from app.database.table.location_cabinet import CabinetStatus
+from app.model.location_cabinet import Cabinet
+from app.model.serializer import dumps
+from app.service.export import RowExporter
+
+CABINET_ID = 5208970514613141504
+ROOM_ID = 5208970514513141504
+NOW = datetime(2023, 3, 1, 8, 0, 0, 123456)
+
+EXPORTER = RowExporter(CABINET_CRUD, Cabinet)
+
+
+def _cabinet(cabinet_id: int, comment: str | None) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=cabinet_id,
+        created_at=NOW,
+        updated_at=NOW,
+        located_room=ROOM_ID,
+        cabinet_name="Cabinet_1",
+        cabinet_comment=comment,
+        cabinet_image_url=None,
+        max_number=5,
+        current_number=2,
+        slot_count=0,
+        status=CabinetStatus.ENABLED,
+    )
+
+
+CABINETS = [_cabinet(CABINET_ID, None), _cabinet(CABINET_ID + 1, '逗号, "引号"')]
+
+
+def _rows() -> list[tuple]:
+    # 查询返回的列与导出的字段顺序一致
+    return [
+        tuple(getattr(cabinet, name) for name in EXPORTER.field_names)
+        for cabinet in CABINETS
+    ]
+
+
+def _listed() -> list[dict]:
+    # 列表接口中的数据
+    return json.loads(dumps(Cabinet.from_rows(CABINETS)))
+
+
+def test_ndjson_matches_list_endpoint():
+    lines = EXPORTER.encode_ndjson(_rows()).decode().splitlines()
+
+    assert [json.loads(line) for line in lines] == _listed()
+    # 不转义中文
+    assert "逗号" in lines[1]
+
+
+def test_csv_matches_list_endpoint():
+    data = EXPORTER.encode_csv([], with_header=True) + EXPORTER.encode_csv(_rows())
+    header, *records = csv.reader(StringIO(data.decode()))
+
+    assert header == EXPORTER.field_names
+    expected = [
+        ["" if value is None else str(value) for value in item.values()]
+        for item in _listed()
+    ]
+    assert records == expected
+    assert records[0][header.index("id")] == str(CABINET_ID)
+    assert records[0][header.index("created_at")] == "2023-03-01T08:00:00.123456Z"
+
+
+def test_empty_batch():
+    assert EXPORTER.encode_ndjson([]) == b""
+    assert EXPORTER.encode_csv([]) == b""
@@ -0,0 +1,109 @@
+from time import monotonic
+
+import pytest
+
+from snowflake.server.generator import EPOCH_TIMESTAMP, Generator
+
+from app.util import id_generator
+from app.util.id_generator import (
+    DATA_CENTER_SHIFT,
+    MAX_SEQUENCE,
+    TIMESTAMP_SHIFT,
+    WORKER_SHIFT,
+    SnowflakeGenerator,
+)
+
+NOW = EPOCH_TIMESTAMP + 1_000_000
+
+
+class _Clock:
+    def __init__(self, timestamp_ms: int):
+        self.timestamp_ms = timestamp_ms
+
+    def __call__(self) -> int:
+        return self.timestamp_ms
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch: pytest.MonkeyPatch) -> _Clock:
+    clock = _Clock(NOW)
+    monkeypatch.setattr(id_generator, "current_timestamp_ms", clock)
+    return clock
+
+
+def _timestamp_of(guid: int) -> int:
+    return (guid >> TIMESTAMP_SHIFT) + EPOCH_TIMESTAMP
+
+
+def _sequence_of(guid: int) -> int:
+    return guid & MAX_SEQUENCE
+
+
+def test_bit_layout_matches_pysnowflake(clock: _Clock):
+    generator = SnowflakeGenerator(2, 173)
+    first, second = generator.next_id(), generator.next_id()
+
+    # pysnowflake 的布局：时间戳左移 22 位，机器号 ((dc << 8) | worker) 左移 12 位
+    node_id = Generator(2, 173).node_id
+    assert first == ((clock.timestamp_ms - EPOCH_TIMESTAMP) << 22) | (node_id << 12)
+    assert second == first + 1
+
+    assert _timestamp_of(first) == clock.timestamp_ms
+    assert (first >> DATA_CENTER_SHIFT) & 0x03 == 2
+    assert (first >> WORKER_SHIFT) & 0xFF == 173
+    assert _sequence_of(second) == 1
+
+
+def test_sequence_overflow_borrows_next_millisecond(clock: _Clock):
+    generator = SnowflakeGenerator(0, 1)
+    ids = [generator.next_id() for _ in range(MAX_SEQUENCE + 3)]
+
+    assert ids == sorted(set(ids))
+    assert {_timestamp_of(guid) for guid in ids[: MAX_SEQUENCE + 1]} == {NOW}
+    assert [_timestamp_of(guid) for guid in ids[MAX_SEQUENCE + 1 :]] == [NOW + 1] * 2
+    assert [_sequence_of(guid) for guid in ids[MAX_SEQUENCE + 1 :]] == [0, 1]
+    assert generator.stats["sequence_overload"] == 1
+
+    # 系统时钟追上借用的时间戳之前继续使用借用的时间戳
+    clock.timestamp_ms = NOW + 1
+    assert _timestamp_of(generator.next_id()) == NOW + 1
+    clock.timestamp_ms = NOW + 2
+    assert _sequence_of(generator.next_id()) == 0
+
+
+def test_clock_rollback_never_reissues_ids(clock: _Clock):
+    generator = SnowflakeGenerator(1, 2)
+    ids = [generator.next_id() for _ in range(3)]
+
+    clock.timestamp_ms = NOW - 50
+    ids += [generator.next_id() for _ in range(10)]
+    clock.timestamp_ms = NOW
+    ids += [generator.next_id() for _ in range(3)]
+    clock.timestamp_ms = NOW + 2
+    ids.append(generator.next_id())
+
+    assert ids == sorted(set(ids))
+    assert {_timestamp_of(guid) for guid in ids[:-1]} == {NOW}
+    assert _sequence_of(ids[-1]) == 0
+    assert generator.stats["clock_rollbacks"] == 10
+    assert generator.stats["max_rollback_ms"] == 50
+
+
+def test_previous_holder_timestamp_is_not_reused(clock: _Clock):
+    # 上一个持有者可能已经用完了最后一毫秒的序列号，无论时钟是否追上都从下一毫秒开始
+    for timestamp_ms in (NOW - 10, NOW, NOW + 10):
+        generator = SnowflakeGenerator(0, 3, last_timestamp_ms=timestamp_ms)
+        guid = generator.next_id()
+
+        assert _timestamp_of(guid) > timestamp_ms
+        assert _timestamp_of(guid) == max(clock.timestamp_ms, timestamp_ms + 1)
+
+
+def test_expired_lease_refuses_to_generate(clock: _Clock):
+    generator = SnowflakeGenerator(0, 4, lease_deadline=monotonic() - 1)
+    with pytest.raises(RuntimeError):
+        generator.next_id()
+    assert generator.stats["generated_ids"] == 0
+
+    generator.extend_lease(monotonic() + 60)
+    assert _timestamp_of(generator.next_id()) == clock.timestamp_ms
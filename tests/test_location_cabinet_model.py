@@ -0,0 +1,82 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.database.table.location_cabinet import CabinetStatus
+from app.model.location_cabinet import Cabinet, CabinetInCreate, derive_status
+
+CABINET_ID = 5208970514613141504
+ROOM_ID = 5208970514513141504
+NOW = datetime(2023, 3, 1, 8, 0, 0)
+
+DISABLED = CabinetStatus.DISABLED
+ENABLED = CabinetStatus.ENABLED
+FULL_LOAD = CabinetStatus.FULL_LOAD
+
+
+@pytest.mark.parametrize(
+    ("max_number", "current_number", "status", "expected"),
+    [
+        (5, 5, DISABLED, DISABLED),
+        (0, 0, DISABLED, DISABLED),
+        (5, 2, DISABLED, DISABLED),
+        (5, 5, ENABLED, FULL_LOAD),
+        (0, 0, ENABLED, FULL_LOAD),
+        (5, 4, FULL_LOAD, ENABLED),
+        (5, 4, ENABLED, ENABLED),
+    ],
+)
+def test_derive_status(
+    max_number: int,
+    current_number: int,
+    status: CabinetStatus,
+    expected: CabinetStatus,
+):
+    assert derive_status(max_number, current_number, status) is expected
+
+
+def _row(max_number: int, current_number: int, status: CabinetStatus):
+    return SimpleNamespace(
+        id=CABINET_ID,
+        created_at=NOW,
+        updated_at=NOW,
+        located_room=ROOM_ID,
+        cabinet_name="Cabinet_1",
+        max_number=max_number,
+        current_number=current_number,
+        status=status,
+    )
+
+
+def test_response_keeps_disabled_status():
+    # 与数据库中保存的状态一致，已满或容量为 0 的禁用存储柜仍然是禁用
+    rows = [_row(5, 5, DISABLED), _row(0, 0, DISABLED), _row(5, 5, ENABLED)]
+    statuses = [cabinet.status for cabinet in Cabinet.from_rows(rows)]
+
+    assert statuses == [DISABLED, DISABLED, FULL_LOAD]
+
+
+def test_response_matches_validated_model():
+    row = _row(3, 3, DISABLED)
+    assert Cabinet.from_rows([row])[0].status is Cabinet.from_orm(row).status
+
+
+def test_create_keeps_disabled_status():
+    cabinet = CabinetInCreate(
+        id=CABINET_ID,
+        located_room=ROOM_ID,
+        max_number=5,
+        current_number=5,
+        status=DISABLED,
+    )
+    assert cabinet.status is DISABLED
+
+    cabinet = CabinetInCreate(
+        id=CABINET_ID,
+        located_room=ROOM_ID,
+        max_number=5,
+        current_number=5,
+        status=ENABLED,
+    )
+    assert cabinet.status is FULL_LOAD
@@ -0,0 +1,75 @@
+from typing import Optional
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.model import base
+from app.model.base import DataModel
+from app.model.location_room import Room
+from app.util.env import SETTINGS
+from app.util.type.guid import GUID
+
+ROW_ID = 5208970514513141504
+PARENT_ID = 5208970514613141504
+NOW = datetime(2023, 3, 1, 8, 0, 0)
+
+
+class _Sample(DataModel):
+    parent: GUID
+    owner: Optional[GUID] = None
+    tags: list[int] = []
+
+
+def _row(**values) -> SimpleNamespace:
+    return SimpleNamespace(id=ROW_ID, created_at=NOW, updated_at=NOW, **values)
+
+
+@pytest.mark.parametrize(
+    ("model", "row"),
+    [
+        (_Sample, _row(parent=PARENT_ID, owner=None, tags=[1, 2])),
+        (_Sample, _row(parent=PARENT_ID, owner=PARENT_ID, tags=[])),
+        # 记录中没有的字段使用默认值，也不会出现在 __fields_set__ 中
+        (_Sample, _row(parent=PARENT_ID)),
+        (Room, _row(room_name="Room_1", room_comment=None, room_image_url=None)),
+        (
+            Room,
+            _row(
+                room_name="Room_1",
+                room_comment="comment",
+                room_image_url="https://example.com/image.png",
+            ),
+        ),
+    ],
+)
+def test_from_rows_matches_from_orm(model, row):
+    trusted = model.from_rows([row])[0]
+    validated = model.from_orm(row)
+
+    assert trusted.dict() == validated.dict()
+    assert trusted.json() == validated.json()
+    assert trusted.__fields_set__ == validated.__fields_set__
+
+
+def test_guid_fields_are_wrapped():
+    sample = _Sample.from_rows([_row(parent=PARENT_ID, owner=None)])[0]
+
+    assert isinstance(sample.id, GUID) and sample.id.guid == ROW_ID
+    assert isinstance(sample.parent, GUID) and sample.parent.guid == PARENT_ID
+    assert sample.owner is None
+
+
+def test_sampled_rows_are_verified(monkeypatch: pytest.MonkeyPatch):
+    warnings: list[str] = []
+    monkeypatch.setattr(SETTINGS.trusted_read, "verify_ratio", 1.0)
+    monkeypatch.setattr(base.logger, "warning", warnings.append)
+
+    Room.from_rows([_row(room_name="Room_1")])
+    assert not warnings
+
+    # 数据库中的记录不符合校验规则时记录日志，仍然返回直接创建的数据模型
+    rooms = Room.from_rows([_row(room_name="not a valid name!")])
+    assert rooms[0].room_name == "not a valid name!"
+    assert len(warnings) == 1 and "failed validation" in warnings[0]
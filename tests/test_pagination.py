@@ -0,0 +1,86 @@
+import json
+from base64 import urlsafe_b64encode
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.crud.base import CRUDBase
+from app.crud.pagination import ListFilter, decode_cursor, encode_cursor
+from app.database.table.instrument_record import Instrument
+
+ROW_ID = 5208970514906742784
+EXPIRE_TIME = datetime(2023, 3, 1, 8, 0, 0, 123456)
+
+ID_KEYS = (Instrument.id,)
+EXPIRE_KEYS = (Instrument.expire_time, Instrument.id)
+
+
+def _raw_cursor(payload: object) -> str:
+    data = json.dumps(payload).encode()
+    return urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+@pytest.mark.parametrize(
+    ("keys", "values"),
+    [(ID_KEYS, (ROW_ID,)), (EXPIRE_KEYS, (EXPIRE_TIME, ROW_ID))],
+    ids=["id", "expire_time"],
+)
+def test_cursor_round_trip(keys, values):
+    cursor = encode_cursor(keys, values)
+
+    # 去掉了填充的 = ，可以直接放在查询参数中
+    assert "=" not in cursor
+    assert decode_cursor(cursor, keys) == values
+
+
+@pytest.mark.parametrize(
+    ("cursor", "keys"),
+    [
+        ("not a cursor!", ID_KEYS),
+        (urlsafe_b64encode(b"[1, 2").decode(), ID_KEYS),
+        (_raw_cursor([ROW_ID]), ID_KEYS),
+        (_raw_cursor({"k": ["id"]}), ID_KEYS),
+        # 使用另一种排序方式的游标
+        (encode_cursor(ID_KEYS, (ROW_ID,)), EXPIRE_KEYS),
+        (encode_cursor(EXPIRE_KEYS, (EXPIRE_TIME, ROW_ID)), ID_KEYS),
+        # 排序列和值的数量不一致
+        (_raw_cursor({"k": ["id"], "v": [ROW_ID, ROW_ID]}), ID_KEYS),
+        (_raw_cursor({"k": ["id"], "v": []}), ID_KEYS),
+        # 值的类型与排序列不一致
+        (_raw_cursor({"k": ["id"], "v": [str(ROW_ID)]}), ID_KEYS),
+        (_raw_cursor({"k": ["id"], "v": [1.5]}), ID_KEYS),
+        (_raw_cursor({"k": ["id"], "v": [True]}), ID_KEYS),
+        (_raw_cursor({"k": ["expire_time", "id"], "v": [1, ROW_ID]}), EXPIRE_KEYS),
+        (_raw_cursor({"k": ["expire_time", "id"], "v": ["x", ROW_ID]}), EXPIRE_KEYS),
+    ],
+)
+def test_invalid_cursor(cursor: str, keys):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, keys)
+    assert error.value.status_code == 400
+
+
+def _compiled_conditions(list_filter: ListFilter, after: str) -> list[str]:
+    crud = CRUDBase(Instrument)
+    _, conditions = crud._page_conditions(list_filter, after, None, None)
+    return [
+        str(condition.compile(dialect=postgresql.dialect())) for condition in conditions
+    ]
+
+
+def test_single_key_cursor_compares_id():
+    cursor = encode_cursor(ID_KEYS, (ROW_ID,))
+
+    assert _compiled_conditions(ListFilter(), cursor) == ["instruments.id > %(id_1)s"]
+
+
+def test_tuple_key_cursor_compares_row_values():
+    list_filter = ListFilter(order_by=(Instrument.expire_time,))
+    cursor = encode_cursor(EXPIRE_KEYS, (EXPIRE_TIME, ROW_ID))
+
+    # 排序列的值相同时按照 ID 继续，不会跳过或重复记录
+    assert _compiled_conditions(list_filter, cursor) == [
+        "(instruments.expire_time, instruments.id) > (%(param_1)s, %(param_2)s)"
+    ]
@@ -0,0 +1,89 @@
+from time import monotonic
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database.after_commit import on_commit
+from app.service.response_cache import ResponseCache, item_tag, table_tag
+
+TABLE = "location_room"
+ROW_ID = 5208970514513141504
+TAGS = (item_tag(TABLE, ROW_ID),)
+
+
+@pytest.fixture(name="session")
+def fixture_session():
+    # on_commit 只使用 AsyncSession.sync_session ，用同步会话模拟
+    with Session(create_engine("sqlite://")) as sync_session:
+        sync_session.connection()
+        yield SimpleNamespace(sync_session=sync_session)
+
+
+def _cached(cache: ResponseCache) -> bool:
+    return cache.store(
+        "detail", TAGS, cache.generations(TAGS), monotonic(), 200, [], b"{}"
+    )
+
+
+def test_invalidate_after_commit(session):
+    cache = ResponseCache()
+    assert _cached(cache)
+
+    cache.track(session, TABLE, [ROW_ID])
+    # 提交之前其他请求仍然读取到提交之前的数据
+    assert cache.get("detail") is not None
+
+    session.sync_session.commit()
+    assert cache.get("detail") is None
+    assert cache.generations((table_tag(TABLE),)) == (0, 1)
+
+
+def test_rollback_keeps_cached_responses(session):
+    cache = ResponseCache()
+    assert _cached(cache)
+
+    cache.track(session, TABLE, [ROW_ID])
+    session.sync_session.rollback()
+    assert cache.get("detail") is not None
+    assert cache.stats["invalidations"] == 0
+
+    # 回滚时丢弃记录的写入，之后的提交不会再使响应失效
+    session.sync_session.connection()
+    session.sync_session.commit()
+    assert cache.get("detail") is not None
+
+
+def test_write_during_request_is_not_cached():
+    cache = ResponseCache()
+    generations = cache.generations(TAGS)
+    cache.invalidate(TAGS)
+
+    assert not cache.store("detail", TAGS, generations, monotonic(), 200, [], b"{}")
+    assert cache.get("detail") is None
+
+
+def test_on_commit_shares_pending_changes(session):
+    committed: list[list[int]] = []
+    first = on_commit(session, "changes", list, committed.append)
+    second = on_commit(session, "changes", list, committed.append)
+    first.append(1)
+    second.append(2)
+
+    session.sync_session.commit()
+    assert committed == [[1, 2]]
+
+
+def test_on_rollback_and_failing_callback(session):
+    rolled_back: list[list[int]] = []
+
+    def fail(_: list[int]) -> None:
+        raise RuntimeError("failed")
+
+    on_commit(session, "failing", list, fail, fail).append(0)
+    on_commit(session, "changes", list, None, rolled_back.append).append(1)
+
+    # 回调的异常只记录日志，不影响其他回调
+    session.sync_session.rollback()
+    assert rolled_back == [[1]]
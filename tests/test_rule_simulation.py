@@ -0,0 +1,106 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.service import rule_simulation
+from app.service.rule_simulation import (
+    _ROW_DTYPE,
+    PermissionMatrix,
+    _ViolationCollector,
+)
+
+# 从 PostgreSQL 捕获的 COPY (SELECT id, located_cabinet, instrument_category ...)
+# TO STDOUT WITH (FORMAT binary) 输出，包含三行：
+#   (5208970514906742784, 101, 7), (5208970514906742785, 102, 7), (5208970514906742786, 101, 8)
+CAPTURED_COPY = (
+    b"PGCOPY\n\xff\r\n\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+    b"\x00\x03\x00\x00\x00\x08HI\xfb\x15\xc2\x80\x00\x00"
+    b"\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00e"
+    b"\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00\x07"
+    b"\x00\x03\x00\x00\x00\x08HI\xfb\x15\xc2\x80\x00\x01"
+    b"\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00f"
+    b"\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00\x07"
+    b"\x00\x03\x00\x00\x00\x08HI\xfb\x15\xc2\x80\x00\x02"
+    b"\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00e"
+    b"\x00\x00\x00\x08\x00\x00\x00\x00\x00\x00\x00\x08"
+    b"\xff\xff"
+)
+FIRST_ID = 5208970514906742784
+
+
+def _matrix() -> PermissionMatrix:
+    # 类别 7 只能存放在存储柜 101 ，类别 8 只能存放在存储柜 102
+    return PermissionMatrix(
+        np.array([7, 8], dtype=np.int64),
+        np.array([101, 102], dtype=np.int64),
+        np.array([[True, False, False], [False, True, False]]),
+    )
+
+
+def _collect(chunks: list[bytes]) -> tuple[_ViolationCollector, list, list]:
+    collector = _ViolationCollector(_matrix())
+
+    async def feed() -> None:
+        for chunk in chunks:
+            await collector.write(chunk)
+
+    asyncio.run(feed())
+    ids, cabinets = collector.finish()
+    return collector, ids.tolist(), cabinets.tolist()
+
+
+def test_row_layout_matches_copy_binary():
+    # 2 字节字段数量 + 3 × (4 字节长度 + 8 字节 bigint)
+    assert _ROW_DTYPE.itemsize == 38
+    assert len(CAPTURED_COPY) == 19 + 3 * _ROW_DTYPE.itemsize + 2
+
+
+def test_captured_payload():
+    collector, ids, cabinets = _collect([CAPTURED_COPY])
+
+    assert collector.scanned == 3
+    assert ids == [FIRST_ID + 1, FIRST_ID + 2]
+    assert cabinets == [102, 101]
+
+
+def test_rows_split_across_chunks(monkeypatch: pytest.MonkeyPatch):
+    # 每次写入都立即解析，文件头和行都会被拆分到不同的数据块中
+    monkeypatch.setattr(rule_simulation, "_PARSE_BUFFER_SIZE", 1)
+    chunks = [CAPTURED_COPY[start : start + 7] for start in range(0, 135, 7)]
+    collector, ids, cabinets = _collect(chunks)
+
+    assert collector.scanned == 3
+    assert ids == [FIRST_ID + 1, FIRST_ID + 2]
+    assert cabinets == [102, 101]
+
+
+def test_header_extension_is_skipped():
+    extension = b"\x00\x00\x00\x04abcd"
+    payload = CAPTURED_COPY[:15] + extension + CAPTURED_COPY[19:]
+    collector, ids, _ = _collect([payload])
+
+    assert collector.scanned == 3
+    assert ids == [FIRST_ID + 1, FIRST_ID + 2]
+
+
+def test_empty_result():
+    collector, ids, cabinets = _collect([CAPTURED_COPY[:19], b"\xff\xff"])
+
+    assert collector.scanned == 0
+    assert ids == cabinets == []
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        b"PGCOPY\n\xff\r\n\x01" + CAPTURED_COPY[11:],
+        CAPTURED_COPY[:-2],
+        CAPTURED_COPY[:-10],
+        CAPTURED_COPY[:19] + b"\x00\x02" + CAPTURED_COPY[21:],
+    ],
+    ids=["signature", "missing trailer", "truncated row", "field count"],
+)
+def test_malformed_payload(payload: bytes):
+    with pytest.raises(ValueError):
+        _collect([payload])
@@ -0,0 +1,47 @@
+from hashlib import md5
+
+from app.database.table.setting import SettingValueType
+from app.service.setting_cache import SettingCache
+
+
+def _loaded_cache() -> SettingCache:
+    cache = SettingCache()
+    # 相当于已经加载了一个空的设置表
+    cache._loaded = True
+    return cache
+
+
+def test_local_write_recomputes_digest():
+    cache = _loaded_cache()
+    cache._apply_changes(
+        [
+            (2, ("MAX_X", SettingValueType.INTEGER, "abc")),
+            (1, ("NAME", SettingValueType.STRING, "设置")),
+            (3, ("EMPTY", SettingValueType.FLOAT, None)),
+        ]
+    )
+
+    # 与 md5(string_agg(concat_ws(':', ...), ',' ORDER BY id)) 的结果相同，空值被跳过
+    expected = md5("1:STRING:NAME:设置,2:INTEGER:MAX_X:abc,3:FLOAT:EMPTY".encode())
+    assert cache._digest == expected.hexdigest()
+    # 类型不匹配的设置项不会加入快照，但仍然参与摘要的计算
+    assert cache.get("MAX_X") is None
+    assert cache.get("NAME") == "设置"
+
+
+def test_delete_recomputes_digest():
+    cache = _loaded_cache()
+    cache._apply_changes([(1, ("NAME", SettingValueType.STRING, "a"))])
+    cache._apply_changes([(1, None)])
+
+    assert cache._digest is None
+    assert cache.stats["settings"] == 0
+
+
+def test_write_before_load_keeps_digest():
+    # 还没有加载时本地的记录不完整，保留原来的摘要，下一次检查时加载全部设置项
+    cache = SettingCache()
+    cache._apply_changes([(1, ("NAME", SettingValueType.STRING, "a"))])
+
+    assert cache._digest is None
+    assert cache.get("NAME") == "a"
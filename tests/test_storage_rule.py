@@ -0,0 +1,92 @@
+from app.database.table.instrument_storage_rule import RuleType
+from app.database.table.instrument_storage_rule_record import StorageLocationType
+from app.service.storage_rule import StorageRuleEngine, _Rule, _RuleRecord
+
+CATEGORY = 7
+OTHER_CATEGORY = 8
+ROOM, OTHER_ROOM = 1, 2
+# 存储柜 101 和 102 在房间 1 ，存储柜 201 在房间 2
+CABINETS = {101: ROOM, 102: ROOM, 201: OTHER_ROOM}
+
+CABINET = StorageLocationType.CABINET
+ROOM_LOCATION = StorageLocationType.ROOM
+
+
+def _engine(*rules: tuple[int, RuleType]) -> StorageRuleEngine:
+    engine = StorageRuleEngine()
+    for cabinet, room in CABINETS.items():
+        engine.apply_cabinet(cabinet, room)
+    for rule_id, rule_type in rules:
+        engine.apply_rule(rule_id, _Rule(rule_type, True))
+    return engine
+
+
+def _allowed(engine: StorageRuleEngine, category: int = CATEGORY) -> set[int]:
+    return {cabinet for cabinet in CABINETS if engine.may_store(category, cabinet)}
+
+
+def test_unrestricted_category():
+    engine = _engine()
+
+    assert _allowed(engine) == set(CABINETS)
+    assert engine.candidate_cabinets(CATEGORY) is None
+
+
+def test_black_list_room_expands_to_cabinets():
+    engine = _engine((1, RuleType.BLACK_LIST))
+    engine.apply_record(10, _RuleRecord(1, ROOM_LOCATION, ROOM, CATEGORY))
+
+    assert _allowed(engine) == {201}
+    assert _allowed(engine, OTHER_CATEGORY) == set(CABINETS)
+
+    # 新建在房间中的存储柜和移动到房间中的存储柜同样受限制
+    engine.apply_cabinet(103, ROOM)
+    engine.apply_cabinet(201, ROOM)
+    assert not engine.may_store(CATEGORY, 103)
+    assert not engine.may_store(CATEGORY, 201)
+
+
+def test_white_lists_intersect():
+    engine = _engine((1, RuleType.WHITE_LIST), (2, RuleType.WHITE_LIST))
+    engine.apply_record(10, _RuleRecord(1, ROOM_LOCATION, ROOM, CATEGORY))
+    engine.apply_record(11, _RuleRecord(2, CABINET, 102, CATEGORY))
+    engine.apply_record(12, _RuleRecord(2, CABINET, 201, CATEGORY))
+
+    assert _allowed(engine) == {102}
+    assert engine.candidate_cabinets(CATEGORY) == {102}
+
+    # 同一条规则中的多条记录取并集
+    engine.apply_record(13, _RuleRecord(1, CABINET, 201, CATEGORY))
+    assert _allowed(engine) == {102, 201}
+
+
+def test_disabled_and_deleted_rules_are_ignored():
+    engine = _engine((1, RuleType.ALL_FORBID))
+    engine.apply_record(10, _RuleRecord(1, CABINET, 101, CATEGORY))
+    assert _allowed(engine) == set()
+    assert engine.candidate_cabinets(CATEGORY) == set()
+
+    engine.apply_rule(1, _Rule(RuleType.ALL_FORBID, False))
+    assert _allowed(engine) == set(CABINETS)
+
+    engine.apply_rule(1, _Rule(RuleType.BLACK_LIST, True))
+    assert _allowed(engine) == {102, 201}
+
+    engine.apply_rule(1, None)
+    assert _allowed(engine) == set(CABINETS)
+
+
+def test_record_moves_to_another_category():
+    engine = _engine((1, RuleType.BLACK_LIST))
+    engine.apply_record(10, _RuleRecord(1, CABINET, 101, CATEGORY))
+    engine.apply_record(10, _RuleRecord(1, CABINET, 101, OTHER_CATEGORY))
+
+    assert _allowed(engine) == set(CABINETS)
+    assert _allowed(engine, OTHER_CATEGORY) == {102, 201}
+    assert engine.may_store_many([(CATEGORY, 101), (OTHER_CATEGORY, 101)]) == [
+        True,
+        False,
+    ]
+
+    engine.apply_record(10, None)
+    assert _allowed(engine, OTHER_CATEGORY) == set(CABINETS)
@@ -0,0 +1,69 @@
+"""比较默认的响应序列化方式和 EnvelopeResponse 的耗时
+
+不会连接数据库，但是需要和服务相同的环境变量（或 .env 文件）才能导入配置。
+
+用法:
+    python -m tools.benchmark_serializer [rows] [rounds]
+"""
+import sys
+import asyncio
+from datetime import datetime, timedelta
+from timeit import Timer
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from starlette.responses import JSONResponse
+
+from app.model.instrument_record import InstrumentRecord, InstrumentRecordInResponse
+from app.model.serializer import EnvelopeResponse
+from app.util.type.guid import GUID
+
+
+def make_rows(count: int) -> list[InstrumentRecord]:
+    """生成与批量创建接口返回的数据相似的记录"""
+    created_at = datetime(2023, 3, 1, 8, 0, 0, 123456)
+    base_id = GUID.min_guid_of_timestamp(int(created_at.timestamp() * 1000)) + 4096
+    return [
+        InstrumentRecord(
+            id=GUID(base_id + index),
+            created_at=created_at,
+            updated_at=created_at,
+            located_cabinet=GUID(base_id - 1 - index % 16),
+            instrument_category=GUID(base_id - 100 - index % 4),
+            expire_time=created_at + timedelta(hours=index % 4 + 1),
+        )
+        for index in range(count)
+    ]
+
+
+def main(count: int = 1000, rounds: int = 50) -> None:
+    rows = make_rows(count)
+    field = create_response_field(name="response", type_=InstrumentRecordInResponse)
+    loop = asyncio.new_event_loop()
+
+    def default_path() -> bytes:
+        # 与 FastAPI 处理路由返回值的流程一致：校验、jsonable_encoder、json.dumps
+        content = loop.run_until_complete(
+            serialize_response(
+                field=field,
+                response_content=InstrumentRecordInResponse(data=rows),
+                is_coroutine=True,
+            )
+        )
+        return JSONResponse(content).body
+
+    def fast_path() -> bytes:
+        return EnvelopeResponse(InstrumentRecordInResponse.of(rows)).body
+
+    assert default_path() == fast_path(), "output differs"
+
+    default_time = min(Timer(default_path).repeat(5, rounds)) / rounds
+    fast_time = min(Timer(fast_path).repeat(5, rounds)) / rounds
+    print(f"rows: {count}, body: {len(fast_path())} bytes")
+    print(f"default:  {default_time * 1000:8.2f} ms")
+    print(f"envelope: {fast_time * 1000:8.2f} ms ({default_time / fast_time:.1f}x)")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))